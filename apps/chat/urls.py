@@ -1,6 +1,7 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
 urlpatterns = [
-    path('', views.chat_view, name='chat'),
-]
\ No newline at end of file
+    path('', views.chat_view_async if settings.BEDROCK_ASYNC_VIEWS else views.chat_view, name='chat'),
+]
@@ -1,65 +1,93 @@
 import json
 import logging
-from django.http import StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
+from common.bedrock import async_clients as async_bedrock
 from common.bedrock.clients import BedrockClients
-from common.bedrock.streaming import stream_bedrock_response, sse_event
+from common.bedrock.streaming import astream_bedrock_response, stream_bedrock_response, sse_event, sse_response
+from common.decorators import async_require_http_methods
 
 logger = logging.getLogger(__name__)
 
+
+def build_chat_request(data: dict):
+    """요청 데이터에서 (model, body) 생성 - 필수 필드가 없으면 None 반환"""
+    # ✅ 'message' 필드를 'messages' 배열로 변환
+    if 'message' in data:
+        user_message = data['message']
+        messages = [{"role": "user", "content": user_message}]
+    elif 'messages' in data:
+        messages = data['messages']
+    else:
+        return None
+
+    model = data.get('model', 'anthropic.claude-3-5-sonnet-20240620-v1:0')
+    max_tokens = data.get('max_tokens', 4096)
+    temperature = data.get('temperature', 1.0)
+    system = data.get('system')
+
+    body = {
+        "anthropic_version": "bedrock-2023-05-31",
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+        "messages": messages
+    }
+
+    if system:
+        body["system"] = system
+
+    logger.info(f"Chat request - Model: {model}, Message: {messages[0]['content'][:50]}...")
+
+    return model, body
+
+
+def missing_fields_response():
+    return sse_response([sse_event({'type': 'error', 'message': 'Missing required fields: message or messages'})])
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def chat_view(request):
     """AI 채팅 (스트리밍)"""
     try:
         data = json.loads(request.body)
-        
-        # ✅ 'message' 필드를 'messages' 배열로 변환
-        if 'message' in data:
-            user_message = data['message']
-            messages = [{"role": "user", "content": user_message}]
-        elif 'messages' in data:
-            messages = data['messages']
-        else:
-            return StreamingHttpResponse(
-                [sse_event({'type': 'error', 'message': 'Missing required fields: message or messages'})],
-                content_type='text/event-stream'
-            )
-        
-        model = data.get('model', 'anthropic.claude-3-5-sonnet-20240620-v1:0')
-        max_tokens = data.get('max_tokens', 4096)
-        temperature = data.get('temperature', 1.0)
-        system = data.get('system')
-        
-        body = {
-            "anthropic_version": "bedrock-2023-05-31",
-            "max_tokens": max_tokens,
-            "temperature": temperature,
-            "messages": messages
-        }
-        
-        if system:
-            body["system"] = system
-        
-        logger.info(f"Chat request - Model: {model}, Message: {messages[0]['content'][:50]}...")
-        
+
+        chat_request = build_chat_request(data)
+        if chat_request is None:
+            return missing_fields_response()
+        model, body = chat_request
+
         bedrock_runtime = BedrockClients.get_runtime()
         response = bedrock_runtime.invoke_model_with_response_stream(
             modelId=model,
             body=json.dumps(body)
         )
-        
-        return StreamingHttpResponse(
-            stream_bedrock_response(response),
-            content_type='text/event-stream'
-        )
-        
+
+        return sse_response(stream_bedrock_response(response))
+
     except Exception as e:
         logger.error(f"Chat error: {str(e)}")
         import traceback
         logger.error(f"Traceback: {traceback.format_exc()}")
-        return StreamingHttpResponse(
-            [sse_event({'type': 'error', 'message': str(e)})],
-            content_type='text/event-stream'
-        )
\ No newline at end of file
+        return sse_response([sse_event({'type': 'error', 'message': str(e)})])
+
+
+@csrf_exempt
+@async_require_http_methods(["POST"])
+async def chat_view_async(request):
+    """AI 채팅 (비동기 스트리밍) - ASGI 전용"""
+    try:
+        data = json.loads(request.body)
+
+        chat_request = build_chat_request(data)
+        if chat_request is None:
+            return missing_fields_response()
+        model, body = chat_request
+
+        response = await async_bedrock.invoke_model_with_response_stream(model, body)
+
+        return sse_response(astream_bedrock_response(response))
+
+    except Exception as e:
+        logger.error(f"Chat error: {str(e)}", exc_info=True)
+        return sse_response([sse_event({'type': 'error', 'message': str(e)})])
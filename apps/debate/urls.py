@@ -1,7 +1,8 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
 urlpatterns = [
     path('topics/recommend', views.recommend_debate_topics, name='recommend_debate_topics'),
-    path('<str:room_id>/summary', views.debate_summary, name='debate_summary'),
+    path('<str:room_id>/summary', views.debate_summary_async if settings.BEDROCK_ASYNC_VIEWS else views.debate_summary, name='debate_summary'),
 ]
\ No newline at end of file
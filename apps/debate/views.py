@@ -2,12 +2,14 @@ import json
 import logging
 import os
 import time
-import boto3
-from django.http import StreamingHttpResponse, JsonResponse
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
+from common.bedrock import async_clients as async_bedrock
 from common.bedrock.clients import BedrockClients
-from common.bedrock.streaming import sse_event
+from common.bedrock.prompt_cache import get_compiled_prompt
+from common.decorators import async_require_http_methods
 
 from .redis_repository import load_debate_messages
 
@@ -59,6 +61,98 @@ def build_debate_messages_json_lines(messages):
 
     return "\n".join(lines), used_count
 
+class DebateSummaryError(Exception):
+    """요약 요청을 처리할 수 없는 경우 (HTTP 상태코드 포함)"""
+
+    def __init__(self, message: str, status: int):
+        super().__init__(message)
+        self.status = status
+
+    def to_response(self):
+        return JsonResponse({"error": str(self)}, status=self.status, json_dumps_params={"ensure_ascii": False})
+
+
+def prepare_debate_summary(room_id: str, data: dict):
+    """
+    토론 요약 호출 준비 (topic 검증, Redis 메시지 로드/필터링, Prompt ARN 확인)
+
+    Returns:
+        (topic, used_count, prompt_arn, prompt_variables)
+    """
+    topic = (data.get("topic") or "").strip()
+    
+    if not topic:
+        logger.warning(f"[DebateSummary] FAILED - room_id={room_id}, reason=missing_topic")
+        raise DebateSummaryError("Missing topic", 400)
+    
+    logger.info(f"[DebateSummary] Topic received - room_id={room_id}, topic={topic[:50]}...")
+
+    # Redis에서 토론 메시지 읽기
+    logger.debug(f"[DebateSummary] Loading messages from Redis - room_id={room_id}")
+    messages = load_debate_messages(room_id)
+    
+    if not messages:
+        logger.warning(f"[DebateSummary] FAILED - room_id={room_id}, reason=no_messages_in_redis")
+        raise DebateSummaryError("No debate messages in Redis", 404)
+    
+    logger.info(f"[DebateSummary] Messages loaded - room_id={room_id}, total_count={len(messages)}")
+
+    # 메시지 필터링 및 변환
+    debate_messages_str, used_count = build_debate_messages_json_lines(messages)
+    
+    if used_count == 0:
+        logger.warning(f"[DebateSummary] FAILED - room_id={room_id}, reason=no_usable_messages, total_count={len(messages)}")
+        raise DebateSummaryError("No usable CHAT messages (all filtered)", 404)
+    
+    logger.info(f"[DebateSummary] Messages filtered - room_id={room_id}, total={len(messages)}, used={used_count}, filtered_out={len(messages)-used_count}")
+
+    # Bedrock Prompt ARN 확인
+    prompt_arn = os.getenv("AWS_BEDROCK_DEBATE_SUMMARY_PROMPT_ARN")
+    if not prompt_arn:
+        logger.error(f"[DebateSummary] FAILED - room_id={room_id}, reason=prompt_arn_not_configured")
+        raise DebateSummaryError("AWS_BEDROCK_DEBATE_SUMMARY_PROMPT_ARN not configured", 500)
+
+    # Bedrock 프롬프트에 들어갈 변수
+    prompt_variables = {
+        "topic": topic,
+        "debate_messages": debate_messages_str,
+    }
+
+    logger.info(f"[DebateSummary] Invoking Bedrock - room_id={room_id}, topic={topic}, used_count={used_count}, prompt_arn={prompt_arn}")
+
+    return topic, used_count, prompt_arn, prompt_variables
+
+
+def build_summary_response(room_id: str, topic: str, used_count: int, text: str):
+    """모델 응답을 JSON으로 파싱해 반환 (실패 시 원문 텍스트 반환)"""
+    try:
+        parsed = json.loads(text)
+        logger.info(f"[DebateSummary] SUCCESS - room_id={room_id}, response_type=json, keys={list(parsed.keys())}")
+        return JsonResponse(
+            {
+                "room_id": room_id,
+                "topic": topic,
+                "used_message_count": used_count,
+                "result": parsed,
+            },
+            json_dumps_params={"ensure_ascii": False},
+            status=200,
+        )
+    except Exception as parse_error:
+        logger.warning(f"[DebateSummary] JSON parse failed - room_id={room_id}, error={str(parse_error)}, returning raw text")
+        logger.debug(f"[DebateSummary] Raw response preview - room_id={room_id}, text={text[:200]}...")
+        return JsonResponse(
+            {
+                "room_id": room_id,
+                "topic": topic,
+                "used_message_count": used_count,
+                "text": text,
+            },
+            json_dumps_params={"ensure_ascii": False},
+            status=200,
+        )
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def debate_summary(request, room_id: str):
@@ -67,93 +161,54 @@ def debate_summary(request, room_id: str):
         
         # Request body 파싱
         data = parse_json_body(request)
-        topic = (data.get("topic") or "").strip()
-        
-        if not topic:
-            logger.warning(f"[DebateSummary] FAILED - room_id={room_id}, reason=missing_topic")
-            return JsonResponse({"error": "Missing topic"}, status=400, json_dumps_params={"ensure_ascii": False})
         
-        logger.info(f"[DebateSummary] Topic received - room_id={room_id}, topic={topic[:50]}...")
-
-        # Redis에서 토론 메시지 읽기
-        logger.debug(f"[DebateSummary] Loading messages from Redis - room_id={room_id}")
-        messages = load_debate_messages(room_id)
+        try:
+            topic, used_count, prompt_arn, prompt_variables = prepare_debate_summary(room_id, data)
+        except DebateSummaryError as e:
+            return e.to_response()
         
-        if not messages:
-            logger.warning(f"[DebateSummary] FAILED - room_id={room_id}, reason=no_messages_in_redis")
-            return JsonResponse(
-                {"error": "No debate messages in Redis"},
-                status=404,
-                json_dumps_params={"ensure_ascii": False}
-            )
+        # Bedrock 호출
+        invoke_start = time.time()
+        text = invoke_bedrock_prompt(prompt_arn, prompt_variables)
+        invoke_duration = time.time() - invoke_start
         
-        logger.info(f"[DebateSummary] Messages loaded - room_id={room_id}, total_count={len(messages)}")
+        logger.info(f"[DebateSummary] Bedrock response received - room_id={room_id}, duration={invoke_duration:.2f}s, response_length={len(text)}")
 
-        # 메시지 필터링 및 변환
-        debate_messages_str, used_count = build_debate_messages_json_lines(messages)
-        
-        if used_count == 0:
-            logger.warning(f"[DebateSummary] FAILED - room_id={room_id}, reason=no_usable_messages, total_count={len(messages)}")
-            return JsonResponse(
-                {"error": "No usable CHAT messages (all filtered)"},
-                status=404,
-                json_dumps_params={"ensure_ascii": False}
-            )
-        
-        logger.info(f"[DebateSummary] Messages filtered - room_id={room_id}, total={len(messages)}, used={used_count}, filtered_out={len(messages)-used_count}")
+        return build_summary_response(room_id, topic, used_count, text)
+
+    except Exception as e:
+        logger.error(f"[DebateSummary] ERROR - room_id={room_id}, error={str(e)}", exc_info=True)
+        return JsonResponse(
+            {"error": str(e)},
+            status=500,
+            json_dumps_params={"ensure_ascii": False},
+        )
 
-        # Bedrock Prompt ARN 확인
-        prompt_arn = os.getenv("AWS_BEDROCK_DEBATE_SUMMARY_PROMPT_ARN")
-        if not prompt_arn:
-            logger.error(f"[DebateSummary] FAILED - room_id={room_id}, reason=prompt_arn_not_configured")
-            return JsonResponse(
-                {"error": "AWS_BEDROCK_DEBATE_SUMMARY_PROMPT_ARN not configured"},
-                status=500,
-                json_dumps_params={"ensure_ascii": False}
-            )
-
-        # Bedrock 프롬프트에 들어갈 변수
-        prompt_variables = {
-            "topic": topic,
-            "debate_messages": debate_messages_str,
-        }
 
-        logger.info(f"[DebateSummary] Invoking Bedrock - room_id={room_id}, topic={topic}, used_count={used_count}, prompt_arn={prompt_arn}")
+@csrf_exempt
+@async_require_http_methods(["POST"])
+async def debate_summary_async(request, room_id: str):
+    """토론 요약 (비동기) - ASGI 전용"""
+    try:
+        logger.info(f"[DebateSummary] START (async) - room_id={room_id}")
+        
+        data = parse_json_body(request)
+        
+        try:
+            # Redis 조회가 포함되므로 스레드에서 실행
+            topic, used_count, prompt_arn, prompt_variables = await sync_to_async(
+                prepare_debate_summary, thread_sensitive=False
+            )(room_id, data)
+        except DebateSummaryError as e:
+            return e.to_response()
         
-        # Bedrock 호출
         invoke_start = time.time()
-        text = invoke_bedrock_prompt(prompt_arn, prompt_variables)
+        text = await ainvoke_bedrock_prompt(prompt_arn, prompt_variables)
         invoke_duration = time.time() - invoke_start
         
         logger.info(f"[DebateSummary] Bedrock response received - room_id={room_id}, duration={invoke_duration:.2f}s, response_length={len(text)}")
 
-        # 응답 파싱 시도
-        try:
-            parsed = json.loads(text)
-            logger.info(f"[DebateSummary] SUCCESS - room_id={room_id}, response_type=json, keys={list(parsed.keys())}")
-            return JsonResponse(
-                {
-                    "room_id": room_id,
-                    "topic": topic,
-                    "used_message_count": used_count,
-                    "result": parsed,
-                },
-                json_dumps_params={"ensure_ascii": False},
-                status=200,
-            )
-        except Exception as parse_error:
-            logger.warning(f"[DebateSummary] JSON parse failed - room_id={room_id}, error={str(parse_error)}, returning raw text")
-            logger.debug(f"[DebateSummary] Raw response preview - room_id={room_id}, text={text[:200]}...")
-            return JsonResponse(
-                {
-                    "room_id": room_id,
-                    "topic": topic,
-                    "used_message_count": used_count,
-                    "text": text,
-                },
-                json_dumps_params={"ensure_ascii": False},
-                status=200,
-            )
+        return build_summary_response(room_id, topic, used_count, text)
 
     except Exception as e:
         logger.error(f"[DebateSummary] ERROR - room_id={room_id}, error={str(e)}", exc_info=True)
@@ -184,184 +239,30 @@ def recommend_debate_topics(request):
         logger.info(f"Debate topics request - Query: {user_query[:50]}...")
         logger.info(f"Using Prompt ARN: {prompt_arn}")
         
-        bedrock_agent = boto3.client(
-            service_name='bedrock-agent',
-            region_name=os.getenv('AWS_REGION', 'ap-northeast-2')
-        )
-        
-        # Prompt 정보 가져오기
-        prompt_response = bedrock_agent.get_prompt(
-            promptIdentifier=prompt_arn
-        )
+        bedrock_agent = BedrockClients.get_agent()
         
-        logger.info(f"Prompt retrieved: {prompt_response.get('name', 'Unknown')}")
+        # 컴파일된 Prompt 가져오기 (캐시)
+        compiled = get_compiled_prompt(prompt_arn, client=bedrock_agent)
         
-        variants = prompt_response.get('variants', [])
-        if not variants:
-            raise ValueError("Prompt has no variants")
-        
-        variant = variants[0]
-        template_type = variant.get('templateType', 'TEXT')
-        model_id = prompt_response.get('defaultModelId', 'anthropic.claude-3-5-sonnet-20240620-v1:0')
+        logger.info(f"Prompt retrieved: {compiled.name}, Template type: {compiled.template_type}")
         
         prompt_variables = {"user_query": user_query}
+        body = compiled.build_body(prompt_variables, fallback_user_message=user_query)
         
         bedrock_runtime = BedrockClients.get_runtime()
         
-        body = {}
-        
-        # TEXT 템플릿 처리
-        if template_type == 'TEXT':
-            template_config = variant.get('templateConfiguration', {})
-            template_text = template_config.get('text', {}).get('text', '')
-            
-            formatted_prompt = template_text
-            for var_name, var_value in prompt_variables.items():
-                formatted_prompt = formatted_prompt.replace(f"{{{{{var_name}}}}}", str(var_value))
-            
-            inference_config = variant.get('inferenceConfiguration', {})
-            
-            body = {
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": inference_config.get('maxTokens', 4096),
-                "temperature": inference_config.get('temperature', 1.0),
-                "messages": [{"role": "user", "content": formatted_prompt}]
-            }
-            
-            if 'stopSequences' in inference_config:
-                body['stop_sequences'] = inference_config['stopSequences']
-            
-            # 동기 호출로 전체 응답 받기
-            response = bedrock_runtime.invoke_model(
-                modelId=model_id,
-                body=json.dumps(body)
-            )
-            
-            result = json.loads(response['body'].read())
-            full_text = result['content'][0]['text']
-            
-            return parse_and_return_topics(full_text)
-        
-        # ✅ CHAT 템플릿 처리 추가
-        elif template_type == 'CHAT':
-            template_config = variant.get('templateConfiguration', {})
-            chat_config = template_config.get('chat', {})
-            messages = chat_config.get('messages', [])
-            system_prompts = chat_config.get('system', [])
-            
-            inference_config = variant.get('inferenceConfiguration', {})
-            
-            # 메시지 포맷팅
-            formatted_messages = []
-            for msg in messages:
-                role = msg.get('role', 'user')
-                content_blocks = msg.get('content', [])
-                
-                formatted_content = []
-                for block in content_blocks:
-                    if 'text' in block:
-                        text = block['text']
-                        # 변수 치환
-                        for var_name, var_value in prompt_variables.items():
-                            text = text.replace(f"{{{{{var_name}}}}}", str(var_value))
-                        if text.strip():
-                            formatted_content.append({"type": "text", "text": text})
-                
-                if formatted_content:
-                    content_text = " ".join([c['text'] for c in formatted_content if 'text' in c])
-                    if content_text.strip():
-                        formatted_messages.append({
-                            "role": role,
-                            "content": content_text
-                        })
-            
-            # user 메시지가 없거나 마지막이 user가 아니면 추가
-            if not formatted_messages or formatted_messages[-1].get('role') != 'user':
-                formatted_messages.append({
-                    "role": "user",
-                    "content": user_query
-                })
-            elif formatted_messages and not formatted_messages[0].get('content', '').strip():
-                formatted_messages[0]['content'] = user_query
-            
-            body = {
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": inference_config.get('maxTokens', 4096),
-                "temperature": inference_config.get('temperature', 1.0),
-                "messages": formatted_messages
-            }
-            
-            # System prompt 처리
-            if system_prompts:
-                system_text = []
-                for sys_prompt in system_prompts:
-                    if 'text' in sys_prompt:
-                        text = sys_prompt['text']
-                        for var_name, var_value in prompt_variables.items():
-                            text = text.replace(f"{{{{{var_name}}}}}", str(var_value))
-                        system_text.append(text)
-                
-                if system_text:
-                    body['system'] = " ".join(system_text)
-            
-            if 'stopSequences' in inference_config:
-                body['stop_sequences'] = inference_config['stopSequences']
-            
-            logger.info(f"Invoking model: {model_id}")
-            
-            response = bedrock_runtime.invoke_model(
-                modelId=model_id,
-                body=json.dumps(body)
-            )
-            
-            result = json.loads(response['body'].read())
-            full_text = result['content'][0]['text']
-            
-            return parse_and_return_topics(full_text)
+        logger.info(f"Invoking model: {compiled.model_id}")
         
-        else:
-            raise ValueError(f"Unsupported template type: {template_type}")
-            
-        logger.info(f"Invoking model: {model_id}")
-        
-        # Invoke Model (Non-Streaming)
+        # 동기 호출로 전체 응답 받기
         response = bedrock_runtime.invoke_model(
-            modelId=model_id,
+            modelId=compiled.model_id,
             body=json.dumps(body)
         )
         
-        response_body = json.loads(response.get('body').read())
-        
-        # Extract text content
-        final_text = ""
-        for content in response_body.get('content', []):
-            if content.get('type') == 'text':
-                final_text += content.get('text', '')
-                
-        logger.info(f"Model response received: {len(final_text)} chars")
+        result = json.loads(response['body'].read())
+        full_text = result['content'][0]['text']
         
-        # Parse JSON from model response
-        # 모델이 JSON 블록(```json ... ```)으로 감싸서 줄 수도 있으므로 처리
-        clean_text = final_text.strip()
-        if clean_text.startswith('```json'):
-            clean_text = clean_text[7:]
-        if clean_text.endswith('```'):
-            clean_text = clean_text[:-3]
-        clean_text = clean_text.strip()
-            
-        try:
-            result_json = json.loads(clean_text)
-            return JsonResponse(result_json, safe=False)
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse model output as JSON: {clean_text[:100]}...")
-            # Fallback: Just return text wrapped in structure if needed, or error
-            # But frontend expects debate_topics structure. 
-            # If parsing fails, it's likely the model didn't follow instructions.
-            return JsonResponse({
-                'type': 'error',
-                'message': 'Failed to parse AI response',
-                'raw_response': final_text
-            }, status=500)
+        return parse_and_return_topics(full_text)
         
     except Exception as e:
         logger.error(f"Debate topics error: {str(e)}")
@@ -420,158 +321,43 @@ def parse_and_return_topics(full_text: str):
             }]
         })
 
-def stream_debate_response(response):
-    """TEXT 템플릿 스트리밍 응답"""
-    full_text = ""
-    
-    try:
-        for event in response['body']:
-            chunk = json.loads(event['chunk']['bytes'])
-            
-            if chunk['type'] == 'content_block_delta':
-                text = chunk['delta'].get('text', '')
-                if text:
-                    full_text += text
-                    yield sse_event({'type': 'content', 'text': text})
-            
-            elif chunk['type'] == 'message_stop':
-                logger.info(f"Message stop received")
-        
-        logger.info(f"Stream complete. Total text length: {len(full_text)}")
-        yield sse_event({'type': 'done', 'total_length': len(full_text)})
-        
-    except Exception as e:
-        logger.error(f"Streaming error: {str(e)}")
-        yield sse_event({'type': 'error', 'message': str(e)})
-
-def stream_debate_response_buffered(response):
-    """CHAT 템플릿 스트리밍 응답 (버퍼링)"""
-    full_text = ""
-    buffer = ""
-    buffer_size = 10
-    
-    try:
-        for event in response['body']:
-            chunk = json.loads(event['chunk']['bytes'])
-            
-            if chunk['type'] == 'content_block_delta':
-                text = chunk['delta'].get('text', '')
-                if text:
-                    full_text += text
-                    buffer += text
-                    if len(buffer) >= buffer_size:
-                        yield sse_event({'type': 'content', 'text': buffer})
-                        logger.info(f"Sent text chunk: {buffer[:30]}...")
-                        buffer = ""
-            
-            elif chunk['type'] == 'message_stop':
-                logger.info(f"Message stop received")
-        
-        # 남은 버퍼 전송
-        if buffer:
-            yield sse_event({'type': 'content', 'text': buffer})
-            logger.info(f"Sent final buffer: {buffer[:30]}...")
-        
-        logger.info(f"Stream complete. Total text length: {len(full_text)}")
-        yield sse_event({'type': 'done', 'total_length': len(full_text)})
-        
-    except Exception as e:
-        logger.error(f"Streaming error: {str(e)}")
-        yield sse_event({'type': 'error', 'message': str(e)})
-
 def invoke_bedrock_prompt(prompt_arn: str, prompt_variables: dict) -> str:
     
-    bedrock_agent = boto3.client(
-        service_name="bedrock-agent",
-        region_name=os.getenv("AWS_REGION", "ap-northeast-2")
-    )
+    bedrock_agent = BedrockClients.get_agent()
     bedrock_runtime = BedrockClients.get_runtime()
 
-    prompt_response = bedrock_agent.get_prompt(promptIdentifier=prompt_arn)
-    logger.info(f"Prompt retrieved: {prompt_response.get('name', 'Unknown')}")
-
-    variants = prompt_response.get("variants", [])
-    if not variants:
-        raise ValueError("Prompt has no variants")
-
-    variant = variants[0]
-    template_type = variant.get("templateType", "TEXT")
-    model_id = prompt_response.get("defaultModelId", "anthropic.claude-3-5-sonnet-20240620-v1:0")
-    inference_config = variant.get("inferenceConfiguration", {})
-
-    if template_type == "TEXT":
-        template_text = variant.get("templateConfiguration", {}).get("text", {}).get("text", "")
-        formatted_prompt = template_text
-        for var_name, var_value in prompt_variables.items():
-            formatted_prompt = formatted_prompt.replace(f"{{{{{var_name}}}}}", str(var_value))
-
-        body = {
-            "anthropic_version": "bedrock-2023-05-31",
-            "max_tokens": inference_config.get("maxTokens", 4096),
-            "temperature": inference_config.get("temperature", 1.0),
-            "messages": [{"role": "user", "content": formatted_prompt}],
-        }
-        if "stopSequences" in inference_config:
-            body["stop_sequences"] = inference_config["stopSequences"]
-
-    elif template_type == "CHAT":
-        chat_config = variant.get("templateConfiguration", {}).get("chat", {})
-        messages = chat_config.get("messages", [])
-        system_prompts = chat_config.get("system", [])
-
-        formatted_messages = []
-        for msg in messages:
-            role = msg.get("role", "user")
-            content_blocks = msg.get("content", [])
-            text_parts = []
-
-            for block in content_blocks:
-                if "text" in block:
-                    text = block["text"]
-                    for var_name, var_value in prompt_variables.items():
-                        text = text.replace(f"{{{{{var_name}}}}}", str(var_value))
-                    if text.strip():
-                        text_parts.append(text)
-
-            if text_parts:
-                formatted_messages.append({"role": role, "content": " ".join(text_parts)})
-
-        body = {
-            "anthropic_version": "bedrock-2023-05-31",
-            "max_tokens": inference_config.get("maxTokens", 4096),
-            "temperature": inference_config.get("temperature", 1.0),
-            "messages": formatted_messages,
-        }
+    compiled = get_compiled_prompt(prompt_arn, client=bedrock_agent)
+    logger.info(f"Prompt retrieved: {compiled.name}")
 
-        # system prompt
-        if system_prompts:
-            system_texts = []
-            for sys_prompt in system_prompts:
-                if "text" in sys_prompt:
-                    text = sys_prompt["text"]
-                    for var_name, var_value in prompt_variables.items():
-                        text = text.replace(f"{{{{{var_name}}}}}", str(var_value))
-                    if text.strip():
-                        system_texts.append(text)
-            if system_texts:
-                body["system"] = " ".join(system_texts)
-
-        if "stopSequences" in inference_config:
-            body["stop_sequences"] = inference_config["stopSequences"]
-
-    else:
-        raise ValueError(f"Unsupported template type: {template_type}")
+    body = compiled.build_body(prompt_variables)
 
     resp = bedrock_runtime.invoke_model(
-        modelId=model_id,
+        modelId=compiled.model_id,
         body=json.dumps(body),
         accept="application/json",
         contentType="application/json",
     )
 
     raw = resp["body"].read().decode("utf-8")
-    data = json.loads(raw)
+    return extract_response_text(json.loads(raw))
+
+
+async def ainvoke_bedrock_prompt(prompt_arn: str, prompt_variables: dict) -> str:
+    """invoke_bedrock_prompt의 비동기 버전 (aiobotocore)"""
+    bedrock_agent = BedrockClients.get_agent()
+
+    # 캐시 miss일 때만 get_prompt 호출이 발생하므로 별도 스레드에서 조회
+    compiled = await sync_to_async(get_compiled_prompt, thread_sensitive=False)(prompt_arn, client=bedrock_agent)
+    logger.info(f"Prompt retrieved: {compiled.name}")
+
+    body = compiled.build_body(prompt_variables)
+
+    data = await async_bedrock.invoke_model(compiled.model_id, body)
+    return extract_response_text(data)
+
 
+def extract_response_text(data: dict) -> str:
+    """invoke_model 응답 body에서 텍스트 추출"""
     text = ""
     content = data.get("content")
     if isinstance(content, list) and content:
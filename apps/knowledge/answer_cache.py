@@ -0,0 +1,106 @@
+"""
+Knowledge Base 답변 캐시
+
+수업 시간에는 같은 교과 질문이 하루에도 여러 번 들어오므로, 완료된 KB 답변(본문 + 인용)을 저장했다가
+같은 질문이 오면 Bedrock 호출 없이 같은 SSE 이벤트(content -> citation(s) -> done)로 재생합니다.
+기본은 정규화한 질문의 정확 일치만 쓰고, KB_ANSWER_CACHE_NEAR_MATCH를 켜면 숫자/고유명이 같은
+거의 같은 질문도 재사용합니다.
+키는 KB ID + 모델 ARN 단위로 나뉘며, 조회 방식은 semantic_cache.SemanticCache 참고.
+"""
+import logging
+import threading
+from dataclasses import asdict, dataclass
+from typing import List, Optional
+
+from django.conf import settings
+
+from common.bedrock.streaming import StreamResult, citations_event, content_event, done_event
+
+from .entities import entity_signature
+from .retrieval import fanout_kb_ids
+from .semantic_cache import SemanticCache, near_match_similarity
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY_PREFIX = 'kb:answer'
+
+
+@dataclass
+class CachedAnswer:
+    query: str
+    text: str
+    citations: list
+
+
+def replay_frames(answer: CachedAnswer, chunk_chars: int = 200, citation_encoder=None) -> List[str]:
+    """
+    캐시된 답변을 실제 스트림과 같은 SSE 이벤트로 변환
+
+    citation_encoder는 응답할 파이프라인의 것 (있으면 citation 프레임 + 원문 재등록, 없으면 citations 프레임)
+    """
+    frames = [content_event(answer.text[i:i + chunk_chars]) for i in range(0, len(answer.text), chunk_chars)]
+    compactor = citation_encoder() if citation_encoder else None
+    if compactor is not None:
+        frames.extend(frame for frame in map(compactor.encode, answer.citations) if frame is not None)
+        compactor.complete()
+    elif answer.citations:
+        frames.append(citations_event(answer.citations))
+    frames.append(done_event(len(answer.text)))
+    return frames
+
+
+def kb_scope(kb_request: dict) -> str:
+    """같은 질문이라도 KB(팬아웃이면 KB 목록)/모델이 다르면 다른 답변"""
+    config = kb_request['retrieveAndGenerateConfiguration']['knowledgeBaseConfiguration']
+    return f"{','.join(sorted(fanout_kb_ids(kb_request)))}|{config.get('modelArn')}"
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> SemanticCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SemanticCache(
+                    name='KB 답변 캐시',
+                    redis_prefix=REDIS_KEY_PREFIX,
+                    max_size=getattr(settings, 'KB_ANSWER_CACHE_MAX_SIZE', 1000),
+                    ttl=getattr(settings, 'KB_ANSWER_CACHE_TTL', 86400),
+                    similarity=near_match_similarity('KB_ANSWER_CACHE'),
+                    use_redis=getattr(settings, 'KB_ANSWER_CACHE_REDIS', True),
+                    signature=entity_signature,
+                )
+    return _cache
+
+
+def cached_kb_answer(kb_request: dict, citation_encoder=None) -> Optional[List[str]]:
+    """캐시 hit이면 재생할 SSE 프레임 목록, 아니면 None (citation_encoder: 응답 파이프라인의 인용 인코더)"""
+    if not getattr(settings, 'KB_ANSWER_CACHE_ENABLED', True):
+        return None
+    try:
+        cached = get_answer_cache().lookup(kb_scope(kb_request), kb_request['input']['text'])
+    except Exception as e:
+        logger.warning(f"KB 답변 캐시 조회 실패: {str(e)}")
+        return None
+    if cached is None:
+        return None
+    return replay_frames(
+        CachedAnswer(**cached), getattr(settings, 'KB_ANSWER_CACHE_REPLAY_CHUNK_CHARS', 200), citation_encoder
+    )
+
+
+def remember_kb_answer(kb_request: dict):
+    """KB 스트림 완료 훅 (StreamPipeline on_done) - 비활성화 시 None"""
+    if not getattr(settings, 'KB_ANSWER_CACHE_ENABLED', True):
+        return None
+    scope, query = kb_scope(kb_request), kb_request['input']['text']
+
+    def on_done_cache(result: StreamResult):
+        if result.text:
+            answer = CachedAnswer(query=query, text=result.text, citations=result.citations)
+            get_answer_cache().store(scope, query, asdict(answer))
+
+    return on_done_cache
@@ -0,0 +1,236 @@
+"""
+Knowledge Base 인용 압축
+
+retrieve_and_generate의 citation 이벤트에는 검색된 청크 원문이 통째로 들어 있어, 끝에 한 번에 보내는
+citations 프레임이 답변보다 커지는 경우가 많습니다. 압축 모드에서는
+
+- 인용이 도착할 때마다 바로 `citation` 프레임으로 보내고 (끝의 citations 프레임 없음)
+- 참조는 출처 URI + 청크 단위로 중복을 제거해, 스트림에서 처음 나올 때만 발췌(KB_CITATION_EXCERPT_CHARS)를 싣고
+  이후에는 id만 보냄
+- 원문은 ReferenceStore(로컬 LRU + Redis)에 저장해 `/api/knowledge/citations/<id>`로 따로 조회
+
+    data: {"type": "citation", "span": {"start": 0, "end": 42},
+           "references": [{"id": "...", "uri": "s3://...", "excerpt": "...", "truncated": true}, {"id": "..."}]}
+
+응답 형식이 달라지므로 요청마다 고릅니다: `?citations=compact|full` 또는 `X-Citations: compact|full` 헤더,
+둘 다 없으면 KB_CITATIONS_COMPACT (기본 false - 기존 citations 프레임)
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from django.conf import settings
+
+from common.bedrock.streaming import StreamResult, sse_event
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY_PREFIX = 'kb:citation'
+CHUNK_ID_METADATA_KEY = 'x-amz-bedrock-kb-chunk-id'
+
+CITATIONS_QUERY_PARAM = 'citations'
+CITATIONS_HEADER = 'X-Citations'
+CITATION_FORMATS = ('compact', 'full')
+
+
+def compact_citations_enabled() -> bool:
+    """요청에서 형식을 고르지 않았을 때의 기본값"""
+    return getattr(settings, 'KB_CITATIONS_COMPACT', False)
+
+
+def compact_citations_requested(request) -> bool:
+    """요청이 압축 인용 형식을 원하는지 (?citations= > X-Citations 헤더 > KB_CITATIONS_COMPACT)"""
+    for value in (request.GET.get(CITATIONS_QUERY_PARAM), request.headers.get(CITATIONS_HEADER)):
+        value = (value or '').strip().lower()
+        if value in CITATION_FORMATS:
+            return value == 'compact'
+    return compact_citations_enabled()
+
+
+def reference_uri(reference: dict) -> str:
+    """location의 종류(s3Location, webLocation 등)와 관계없이 출처 URI/URL"""
+    for value in (reference.get('location') or {}).values():
+        if isinstance(value, dict):
+            uri = value.get('uri') or value.get('url')
+            if uri:
+                return uri
+    return ''
+
+
+def reference_id(reference: dict) -> str:
+    """출처 URI + 청크 ID (없으면 청크 본문 해시)로 만든 참조 id"""
+    chunk = (reference.get('metadata') or {}).get(CHUNK_ID_METADATA_KEY)
+    if not chunk:
+        text = (reference.get('content') or {}).get('text', '')
+        chunk = hashlib.sha1(text.encode('utf-8')).hexdigest()
+    return hashlib.sha1(f"{reference_uri(reference)}\n{chunk}".encode('utf-8')).hexdigest()[:20]
+
+
+class ReferenceStore:
+    """참조 id -> 원문 참조 (로컬 LRU + Redis)"""
+
+    def __init__(self, max_size: int = 5000, ttl: int = 86400, use_redis: bool = False):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.use_redis = use_redis
+
+        self._entries: "OrderedDict[str, Tuple[dict, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # 여러 스레드가 동시에 갱신하므로 카운터는 별도 락으로 보호
+        self._stats = {'hits': 0, 'misses': 0, 'redis_hits': 0, 'evictions': 0}
+        self._stats_lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls) -> "ReferenceStore":
+        return cls(
+            max_size=getattr(settings, 'KB_CITATION_STORE_MAX_SIZE', 5000),
+            ttl=getattr(settings, 'KB_CITATION_STORE_TTL', 86400),
+            use_redis=getattr(settings, 'KB_CITATION_STORE_REDIS', True),
+        )
+
+    def get(self, ref_id: str) -> Optional[dict]:
+        reference = self._get_local(ref_id)
+        if reference is None:
+            reference = self._get_redis(ref_id)
+            if reference is not None:
+                self._count('redis_hits')
+                self.put_local(ref_id, reference)
+        if reference is None:
+            self._count('misses')
+            return None
+        self._count('hits')
+        return reference
+
+    def put_local(self, ref_id: str, reference: dict):
+        """프로세스 내 저장 (스트림 루프에서 호출 - I/O 없음)"""
+        with self._lock:
+            self._entries[ref_id] = (reference, time.monotonic() + self.ttl)
+            self._entries.move_to_end(ref_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._count('evictions')
+
+    def put_redis(self, references: dict):
+        """{id: 참조}를 파이프라인 한 번으로 Redis에 저장 (스트림 완료 훅에서 호출)"""
+        if not self.use_redis or not references:
+            return
+        try:
+            pipe = self._redis().pipeline()
+            for ref_id, reference in references.items():
+                pipe.set(self._redis_key(ref_id), json.dumps(reference, ensure_ascii=False, default=str), ex=self.ttl)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"인용 원문 Redis 저장 실패: {str(e)}")
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        total = stats['hits'] + stats['misses']
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            **stats,
+            "hit_rate": round(stats['hits'] / total, 4) if total else 0.0,
+        }
+
+    # ----- 내부 구현 -----
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def _get_local(self, ref_id: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(ref_id)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._entries[ref_id]
+                return None
+            self._entries.move_to_end(ref_id)
+            return entry[0]
+
+    def _redis(self):
+        from common.redis.redis_client import get_redis_client
+        return get_redis_client()
+
+    def _redis_key(self, ref_id: str) -> str:
+        return f"{REDIS_KEY_PREFIX}:{ref_id}"
+
+    def _get_redis(self, ref_id: str) -> Optional[dict]:
+        if not self.use_redis:
+            return None
+        try:
+            raw = self._redis().get(self._redis_key(ref_id))
+            return json.loads(raw) if raw else None
+        except Exception as e:
+            logger.warning(f"인용 원문 Redis 조회 실패: {str(e)}")
+            return None
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_reference_store() -> ReferenceStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ReferenceStore.from_settings()
+    return _store
+
+
+class CitationCompactor:
+    """스트림 1회분 인용 인코더 (StreamPipeline citation_encoder)"""
+
+    def __init__(self, excerpt_chars: int = 200, store: ReferenceStore = None):
+        self.excerpt_chars = excerpt_chars
+        self.store = store or get_reference_store()
+        self._sent = set()
+        self._new = {}
+
+    def encode(self, citation: dict) -> Optional[str]:
+        """raw citation -> citation 프레임 (참조가 없으면 None)"""
+        references = []
+        seen = set()
+        for reference in citation.get('retrievedReferences') or []:
+            ref_id = reference_id(reference)
+            if ref_id in seen:
+                continue
+            seen.add(ref_id)
+            if ref_id in self._sent:
+                references.append({'id': ref_id})
+                continue
+            self._sent.add(ref_id)
+            self._new[ref_id] = reference
+            self.store.put_local(ref_id, reference)
+            references.append(self._compact(ref_id, reference))
+        if not references:
+            return None
+        span = ((citation.get('generatedResponsePart') or {}).get('textResponsePart') or {}).get('span')
+        return sse_event({'type': 'citation', 'span': span, 'references': references})
+
+    def _compact(self, ref_id: str, reference: dict) -> dict:
+        text = (reference.get('content') or {}).get('text', '')
+        return {
+            'id': ref_id,
+            'uri': reference_uri(reference),
+            'excerpt': text[:self.excerpt_chars],
+            'truncated': len(text) > self.excerpt_chars,
+        }
+
+    def complete(self, result: StreamResult = None):
+        """스트림에서 새로 나온 원문을 Redis에 저장 (다른 워커에서도 조회 가능하도록)"""
+        self.store.put_redis(self._new)
+        self._new = {}
+
+
+def new_citation_compactor() -> CitationCompactor:
+    """압축 형식 StreamPipeline의 citation_encoder 팩토리"""
+    return CitationCompactor(excerpt_chars=getattr(settings, 'KB_CITATION_EXCERPT_CHARS', 200))
@@ -0,0 +1,51 @@
+"""
+질문 고유 요소 추출 (의미 캐시 near-match 가드)
+
+문자 n-gram 유사도는 철자가 얼마나 겹치는지만 보므로 '1592년'/'1597년', '신라'/'고려'처럼
+한두 글자만 다른 전혀 다른 질문도 높은 점수가 나옵니다. 의미 캐시는 아래 요소가 정확히 같은
+질문끼리만 near-match를 허용합니다.
+
+- 숫자 (연도, 6.25 등)
+- 전쟁/전투/사건 (gazetteer), 인물 (AIPerson 이름 인덱스), 국가/왕조 이름
+"""
+import logging
+import re
+from typing import Optional, Tuple
+
+from django.conf import settings
+
+from apps.tools.gazetteer import GAZETTEER
+from apps.tools.name_index import AhoCorasick, get_name_index, normalize_name
+
+logger = logging.getLogger(__name__)
+
+DIGITS_PATTERN = re.compile(r"\d+")
+
+# 한 글자 국호(청, 명, 당 ...)는 일반 단어와 겹치므로 제외
+STATE_NAMES = (
+    '고조선', '부여', '고구려', '백제', '신라', '가야', '발해', '통일신라', '후백제', '후고구려', '태봉',
+    '고려', '조선', '대한제국', '대한민국', '북한', '일본', '중국', '거란', '여진', '몽골', '후금',
+)
+
+_states = AhoCorasick()
+for _name in STATE_NAMES:
+    _states.add(_name, _name)
+_states.build()
+
+
+def entity_signature(text: str) -> Optional[Tuple[tuple, tuple]]:
+    """
+    (숫자 목록, 고유명 목록) - near-match는 이 값이 같은 질문끼리만 허용
+
+    인물 인덱스를 읽지 못하면 None (판단할 수 없으므로 near-match 하지 않음)
+    """
+    key = normalize_name(text)
+    entities = {entry['name'] for entry in GAZETTEER.find_in(text)}
+    entities.update(name for _, _, name in _states.find_all(key))
+    if getattr(settings, 'AIPERSON_CACHE_ENABLED', True):
+        try:
+            entities.update(person.name for _, _, person in get_name_index().find_all_in(key))
+        except Exception as e:
+            logger.warning(f"인물 이름 인덱스 조회 실패 (near-match 생략): {str(e)}")
+            return None
+    return tuple(DIGITS_PATTERN.findall(key)), tuple(sorted(entities))
@@ -0,0 +1,409 @@
+"""
+Knowledge Base 검색/생성 분리 모드 (KB_MODE=retrieve_then_generate)
+
+retrieve_and_generate_stream은 검색과 생성을 한 번에 하므로 검색 결과를 재사용할 수 없습니다.
+분리 모드에서는
+
+    1. bedrock-agent-runtime retrieve로 검색 (결과 passage를 질문/KB ID 단위로 캐싱)
+    2. passage를 컨텍스트로 넣어 invoke_model_with_response_stream으로 답변 생성
+
+순서로 처리해, 같은 질문(정규화 후 정확 일치)은 검색 단계를 건너뜁니다. KB_RETRIEVAL_CACHE_NEAR_MATCH를 켜면
+숫자/고유명이 같고 유사도가 KB_RETRIEVAL_CACHE_SIMILARITY 이상인 질문도 재사용합니다.
+인용(citations)은 retrieve_and_generate_stream의 citation 이벤트와 같은 형식으로 만듭니다.
+
+다중 KB 팬아웃 (교과서/학년별 KB): KB ID가 여러 개면(KB_FANOUT_IDS 또는 요청의 kb_ids) KB_MODE와 관계없이
+분리 모드로 처리합니다. 각 KB를 동시에 검색하고(KB마다 KB_FANOUT_TIMEOUT, 늦은 KB는 제외), 결과를 합쳐
+로컬에서 재정렬(rerank)한 상위 passage로 답변을 한 번 생성하므로 지연은 가장 느린 검색 하나로 제한됩니다.
+"""
+import asyncio
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from common.bedrock import async_clients as async_bedrock
+from common.bedrock.clients import BedrockClients
+from common.bedrock.streaming import INVOKE_MODEL, StreamPipeline
+from common.bedrock.templates import ANTHROPIC_VERSION
+
+from common.text import normalize_query
+
+from .citations import reference_id
+from .entities import entity_signature
+from .semantic_cache import HashedNgramVectorizer, SemanticCache, near_match_similarity
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY_PREFIX = 'kb:retrieval'
+MODE_RETRIEVE_AND_GENERATE = 'retrieve_and_generate'
+MODE_RETRIEVE_THEN_GENERATE = 'retrieve_then_generate'
+# 팬아웃 KB 목록 - 로컬 전용 키로 Bedrock 요청에는 넘기지 않음 (팬아웃은 항상 분리 모드)
+FANOUT_KEY = 'fanoutKnowledgeBaseIds'
+
+GENERATION_SYSTEM_PROMPT = (
+    "너는 역사 교과서 AI 도우미다. 아래 <passages>의 검색 결과만 근거로 학생의 질문에 한국어로 답하라. "
+    "검색 결과에 없는 내용은 추측하지 말고 모른다고 답하라. 출처 번호나 태그는 출력하지 않는다."
+)
+
+
+def split_mode_enabled() -> bool:
+    return getattr(settings, 'KB_MODE', MODE_RETRIEVE_AND_GENERATE) == MODE_RETRIEVE_THEN_GENERATE
+
+
+class PassageSource:
+    """
+    passage 기반 invoke_model 스트림 - 텍스트는 INVOKE_MODEL과 같고, message_stop에서
+    retrieve_and_generate 형식의 citation을 하나 만들어 냄 (요청마다 생성)
+    """
+    stream_key = INVOKE_MODEL.stream_key
+
+    def __init__(self, passages: List[dict]):
+        self.passages = passages
+        self._parts = []
+
+    @staticmethod
+    def decode(event):
+        return INVOKE_MODEL.decode(event)
+
+    def extract(self, chunk):
+        text, _, stop = INVOKE_MODEL.extract(chunk)
+        if text:
+            self._parts.append(text)
+        if stop:
+            # 스트림은 message_stop 뒤에 끝나므로 stop 대신 인용을 넘겨 꼬리 프레임에 포함시킴
+            citation = build_citation(''.join(self._parts), self.passages)
+            return None, citation, False
+        return text, None, False
+
+
+def build_citation(text: str, passages: List[dict]) -> Optional[dict]:
+    """답변 전체를 근거 passage 전체에 연결한 citation (retrieve_and_generate_stream 형식)"""
+    if not text or not passages:
+        return None
+    return {
+        'generatedResponsePart': {
+            'textResponsePart': {
+                'text': text,
+                'span': {'start': 0, 'end': len(text) - 1}
+            }
+        },
+        'retrievedReferences': [
+            {
+                'content': passage.get('content', {}),
+                'location': passage.get('location', {}),
+                'metadata': passage.get('metadata', {}),
+            }
+            for passage in passages
+        ]
+    }
+
+
+def with_fanout(kb_request: dict, kb_ids) -> dict:
+    """검색할 KB가 둘 이상이면 팬아웃 목록을 붙임 (첫 KB가 knowledgeBaseId)"""
+    kb_ids = list(dict.fromkeys(kb_id for kb_id in kb_ids or [] if kb_id))
+    if len(kb_ids) > 1:
+        kb_request['retrieveAndGenerateConfiguration']['knowledgeBaseConfiguration']['knowledgeBaseId'] = kb_ids[0]
+        kb_request[FANOUT_KEY] = kb_ids
+    return kb_request
+
+
+def fanout_kb_ids(kb_request: dict) -> List[str]:
+    """검색할 KB ID 목록 (팬아웃이 아니면 knowledgeBaseId 하나)"""
+    config = kb_request['retrieveAndGenerateConfiguration']['knowledgeBaseConfiguration']
+    return kb_request.get(FANOUT_KEY) or [config['knowledgeBaseId']]
+
+
+def kb_config(kb_request: dict) -> Tuple[str, str, str]:
+    """retrieve_and_generate 요청에서 (질문, KB ID, 모델 ARN) 추출"""
+    config = kb_request['retrieveAndGenerateConfiguration']['knowledgeBaseConfiguration']
+    return kb_request['input']['text'], config['knowledgeBaseId'], config['modelArn']
+
+
+def build_retrieve_request(query: str, kb_id: str) -> dict:
+    return {
+        'knowledgeBaseId': kb_id,
+        'retrievalQuery': {'text': query},
+        'retrievalConfiguration': {
+            'vectorSearchConfiguration': {
+                'numberOfResults': getattr(settings, 'KB_RETRIEVAL_RESULTS', 5)
+            }
+        }
+    }
+
+
+def build_generation_body(query: str, passages: List[dict]) -> dict:
+    context = "\n\n".join(
+        f"[{index}] {passage.get('content', {}).get('text', '')}"
+        for index, passage in enumerate(passages, start=1)
+    )
+    return {
+        "anthropic_version": ANTHROPIC_VERSION,
+        "max_tokens": getattr(settings, 'KB_GENERATION_MAX_TOKENS', 2048),
+        "temperature": 0.3,
+        "system": GENERATION_SYSTEM_PROMPT,
+        "messages": [{
+            "role": "user",
+            "content": f"<passages>\n{context}\n</passages>\n\n질문: {query}"
+        }]
+    }
+
+
+def generation_model_id(model_arn: str) -> str:
+    """생성 모델 (KB_GENERATION_MODEL_ID가 없으면 retrieve_and_generate와 같은 모델 ARN)"""
+    return getattr(settings, 'KB_GENERATION_MODEL_ID', '') or model_arn
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_retrieval_cache() -> SemanticCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SemanticCache(
+                    name='KB 검색 캐시',
+                    redis_prefix=REDIS_KEY_PREFIX,
+                    max_size=getattr(settings, 'KB_RETRIEVAL_CACHE_MAX_SIZE', 2000),
+                    ttl=getattr(settings, 'KB_RETRIEVAL_CACHE_TTL', 3600),
+                    similarity=near_match_similarity('KB_RETRIEVAL_CACHE'),
+                    use_redis=getattr(settings, 'KB_RETRIEVAL_CACHE_REDIS', True),
+                    signature=entity_signature,
+                )
+    return _cache
+
+
+def _passages_from(response: dict) -> List[dict]:
+    return [
+        {
+            'content': result.get('content', {}),
+            'location': result.get('location', {}),
+            'metadata': result.get('metadata', {}),
+            'score': result.get('score'),
+        }
+        for result in response.get('retrievalResults', [])
+    ]
+
+
+def _cached_passages(query: str, kb_id: str) -> Optional[List[dict]]:
+    cached = get_retrieval_cache().lookup(kb_id, query)
+    return cached['passages'] if cached is not None else None
+
+
+def _remember_passages(query: str, kb_id: str, passages: List[dict]):
+    if passages:
+        get_retrieval_cache().store(kb_id, query, {'query': query, 'passages': passages})
+
+
+def retrieve_passages(query: str, kb_id: str) -> List[dict]:
+    """검색 결과 passage (캐시 우선)"""
+    passages = _cached_passages(query, kb_id)
+    if passages is not None:
+        return passages
+    response = BedrockClients.get_agent_runtime().retrieve(**build_retrieve_request(query, kb_id))
+    passages = _passages_from(response)
+    _remember_passages(query, kb_id, passages)
+    logger.info(f"KB retrieve: {len(passages)} passages (KB ID: {kb_id})")
+    return passages
+
+
+async def aretrieve_passages(query: str, kb_id: str) -> List[dict]:
+    """retrieve_passages의 비동기 버전 (캐시는 Redis 티어가 있으므로 스레드에서)"""
+    passages = await sync_to_async(_cached_passages, thread_sensitive=False)(query, kb_id)
+    if passages is not None:
+        return passages
+    response = await async_bedrock.retrieve(**build_retrieve_request(query, kb_id))
+    passages = _passages_from(response)
+    await sync_to_async(_remember_passages, thread_sensitive=False)(query, kb_id, passages)
+    logger.info(f"KB retrieve (async): {len(passages)} passages (KB ID: {kb_id})")
+    return passages
+
+
+_fanout_stats = {'requests': 0, 'timeouts': 0, 'failures': 0, 'exhausted': 0}
+_fanout_lock = threading.Lock()
+_executor = None
+# 시간 초과 후에도 끝까지 실행해 캐시를 채우는 비동기 검색 (GC 방지용 참조)
+_late_tasks = set()
+_vectorizer = HashedNgramVectorizer()
+
+
+def _count(name: str, amount: int = 1):
+    with _fanout_lock:
+        _fanout_stats[name] += amount
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _fanout_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'KB_FANOUT_WORKERS', 16),
+                    thread_name_prefix='kb-fanout',
+                )
+    return _executor
+
+
+def fanout_stats() -> dict:
+    with _fanout_lock:
+        return dict(_fanout_stats)
+
+
+def rerank(query: str, passages: List[dict], top_k: int) -> List[dict]:
+    """
+    여러 KB의 passage를 합쳐 상위 top_k 선택
+
+    KB마다 점수 분포가 달라 검색 점수는 KB 안에서 min-max 정규화하고, 질문과의 문자 n-gram
+    코사인 유사도를 KB_FANOUT_LEXICAL_WEIGHT 비율로 섞습니다. 같은 출처/청크는 점수가 높은 쪽만 남깁니다.
+    """
+    ranges = {}
+    for passage in passages:
+        score = passage.get('score') or 0.0
+        low, high = ranges.get(passage['kb_id'], (score, score))
+        ranges[passage['kb_id']] = (min(low, score), max(high, score))
+
+    weight = getattr(settings, 'KB_FANOUT_LEXICAL_WEIGHT', 0.3)
+    query_vector = _vectorizer.transform(normalize_query(query))
+    best = {}
+    for passage in passages:
+        low, high = ranges[passage['kb_id']]
+        semantic = ((passage.get('score') or 0.0) - low) / (high - low) if high > low else 1.0
+        text = normalize_query(passage.get('content', {}).get('text', ''))
+        lexical = float(_vectorizer.transform(text) @ query_vector)
+        ranked = (1 - weight) * semantic + weight * lexical
+        ref_id = reference_id(passage)
+        if ref_id not in best or ranked > best[ref_id][0]:
+            best[ref_id] = (ranked, passage)
+
+    ordered = sorted(best.values(), key=lambda item: item[0], reverse=True)
+    return [passage for _, passage in ordered[:top_k]]
+
+
+def _merge(query: str, kb_ids: List[str], results: dict, errors: list) -> List[dict]:
+    """
+    KB별 결과 병합
+
+    제시간에 결과를 준 KB가 하나도 없으면 근거 없는 생성이 되지 않도록 실패로 처리합니다
+    (실패한 KB가 있으면 첫 예외, 모두 시간 초과면 TimeoutError).
+    """
+    if not results:
+        _count('exhausted')
+        if errors:
+            raise errors[0]
+        raise TimeoutError(f"KB 팬아웃 검색 시간 초과: {', '.join(kb_ids)}")
+    passages = [
+        {**passage, 'kb_id': kb_id}
+        for kb_id in kb_ids if kb_id in results
+        for passage in results[kb_id]
+    ]
+    top_k = getattr(settings, 'KB_FANOUT_TOP_K', getattr(settings, 'KB_RETRIEVAL_RESULTS', 5))
+    merged = rerank(query, passages, top_k)
+    logger.info(f"KB 팬아웃: {len(results)}/{len(kb_ids)} KB, {len(passages)} -> {len(merged)} passages")
+    return merged
+
+
+def retrieve_fanout(query: str, kb_ids: List[str]) -> List[dict]:
+    """여러 KB 동시 검색 후 병합 (KB_FANOUT_TIMEOUT 안에 끝난 KB만 사용)"""
+    if len(kb_ids) == 1:
+        return retrieve_passages(query, kb_ids[0])
+    _count('requests')
+    futures = {_get_executor().submit(retrieve_passages, query, kb_id): kb_id for kb_id in kb_ids}
+    # 동시에 시작했으므로 전체 대기 시간이 곧 KB별 타임아웃
+    # 이미 실행 중인 검색은 취소되지 않고 끝까지 실행되어 캐시에 저장됨 (시작 전이면 취소)
+    done, pending = wait(futures, timeout=getattr(settings, 'KB_FANOUT_TIMEOUT', 3.0))
+
+    results, errors = {}, []
+    for future in done:
+        try:
+            results[futures[future]] = future.result()
+        except Exception as e:
+            _count('failures')
+            errors.append(e)
+            logger.warning(f"KB 팬아웃 검색 실패 ({futures[future]}): {str(e)}")
+    for future in pending:
+        future.cancel()
+        _count('timeouts')
+        logger.warning(f"KB 팬아웃 검색 시간 초과: {futures[future]}")
+    return _merge(query, kb_ids, results, errors)
+
+
+async def aretrieve_fanout(query: str, kb_ids: List[str]) -> List[dict]:
+    """retrieve_fanout의 비동기 버전"""
+    if len(kb_ids) == 1:
+        return await aretrieve_passages(query, kb_ids[0])
+    _count('requests')
+    tasks = {asyncio.ensure_future(aretrieve_passages(query, kb_id)): kb_id for kb_id in kb_ids}
+    done, pending = await asyncio.wait(tasks, timeout=getattr(settings, 'KB_FANOUT_TIMEOUT', 3.0))
+
+    results, errors = {}, []
+    for task in done:
+        if task.exception() is not None:
+            _count('failures')
+            errors.append(task.exception())
+            logger.warning(f"KB 팬아웃 검색 실패 ({tasks[task]}): {str(task.exception())}")
+        else:
+            results[tasks[task]] = task.result()
+    for task in pending:
+        # 취소하지 않고 끝까지 실행해 캐시를 채움 (동기 버전과 동일)
+        _late_tasks.add(task)
+        task.add_done_callback(_finish_late_task)
+        _count('timeouts')
+        logger.warning(f"KB 팬아웃 검색 시간 초과: {tasks[task]}")
+    return _merge(query, kb_ids, results, errors)
+
+
+def _finish_late_task(task):
+    _late_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"KB 팬아웃 지연 검색 실패: {str(task.exception())}")
+
+
+def passage_pipeline(passages: List[dict], pipeline: StreamPipeline) -> StreamPipeline:
+    """기존 KB 파이프라인과 같은 이름(coalesce 설정)으로 passage 소스 파이프라인 생성"""
+    return StreamPipeline(
+        PassageSource(passages),
+        min_chars=pipeline.min_chars,
+        max_delay_ms=pipeline.max_delay_ms,
+        on_done=pipeline.hooks,
+        name=pipeline.name,
+        citation_encoder=pipeline.citation_encoder,
+    )
+
+
+def start_kb_stream(kb_request: dict, pipeline: StreamPipeline):
+    """
+    KB 답변 스트림 시작 -> (처리할 파이프라인, Bedrock 응답)
+
+    KB_MODE에 따라 retrieve_and_generate_stream 또는 retrieve + invoke_model_with_response_stream
+    (팬아웃 요청은 항상 후자)
+    """
+    kb_ids = fanout_kb_ids(kb_request)
+    if len(kb_ids) == 1 and not split_mode_enabled():
+        return pipeline, BedrockClients.get_agent_runtime().retrieve_and_generate_stream(**kb_request)
+
+    query, _, model_arn = kb_config(kb_request)
+    passages = retrieve_fanout(query, kb_ids)
+    response = BedrockClients.get_runtime().invoke_model_with_response_stream(
+        modelId=generation_model_id(model_arn),
+        body=json.dumps(build_generation_body(query, passages)),
+    )
+    return passage_pipeline(passages, pipeline), response
+
+
+async def astart_kb_stream(kb_request: dict, pipeline: StreamPipeline):
+    """start_kb_stream의 비동기 버전"""
+    kb_ids = fanout_kb_ids(kb_request)
+    if len(kb_ids) == 1 and not split_mode_enabled():
+        return pipeline, await async_bedrock.retrieve_and_generate_stream(**kb_request)
+
+    query, _, model_arn = kb_config(kb_request)
+    passages = await aretrieve_fanout(query, kb_ids)
+    response = await async_bedrock.invoke_model_with_response_stream(
+        generation_model_id(model_arn), build_generation_body(query, passages)
+    )
+    return passage_pipeline(passages, pipeline), response
@@ -0,0 +1,233 @@
+"""
+질문 기반 의미 캐시 (KB 답변 / 검색 결과 캐시 공통)
+
+조회 순서 (scope 단위로 분리 - 예: KB ID + 모델 ARN)
+    1. 정확 일치: 정규화한 질문(common.text.normalize_query)의 해시 - 로컬 LRU, 다음 Redis
+    2. near-match (similarity를 지정한 경우만): 로컬 벡터 인덱스에서 코사인 유사도가 similarity 이상인 질문
+       (문자 n-gram을 해싱한 벡터 + NumPy 내적, 외부 임베딩 호출 없음)
+
+문자 n-gram 유사도는 의미가 아니라 철자가 겹치는 정도이므로 '1592년'/'1597년'처럼 다른 질문도 높게 나옵니다.
+near-match는 기본으로 끄고, 켜더라도 signature(예: entities.entity_signature - 숫자/고유명)가
+정확히 같은 질문끼리만 비교합니다.
+
+값은 JSON으로 직렬화할 수 있는 dict입니다.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import numpy as np
+from django.conf import settings
+
+from common.text import normalize_query
+
+logger = logging.getLogger(__name__)
+
+
+def near_match_similarity(prefix: str) -> Optional[float]:
+    """{prefix}_NEAR_MATCH가 켜져 있으면 {prefix}_SIMILARITY, 아니면 None (정확 일치만)"""
+    if not getattr(settings, f'{prefix}_NEAR_MATCH', False):
+        return None
+    return getattr(settings, f'{prefix}_SIMILARITY', 0.95)
+
+
+class HashedNgramVectorizer:
+    """문자 n-gram을 고정 차원으로 해싱한 L2 정규화 벡터 (프로세스 간 같은 값이 나오도록 crc32 사용)"""
+
+    def __init__(self, dim: int = 2048, ngram_sizes=(1, 2, 3)):
+        self.dim = dim
+        self.ngram_sizes = ngram_sizes
+
+    def transform(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for size in self.ngram_sizes:
+            for i in range(len(text) - size + 1):
+                vector[zlib.crc32(text[i:i + size].encode('utf-8')) % self.dim] += 1.0
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector
+
+
+@dataclass
+class _Entry:
+    value: dict
+    vector: Optional[np.ndarray]
+    signature: object
+    expires_at: float
+
+
+class SemanticCache:
+    """
+    Args:
+        similarity: near-match 코사인 유사도 하한 (None이면 정확 일치만)
+        signature: 질문 키 -> near-match 허용 조건 값 (같은 값끼리만 비교, None을 돌려주면 near-match 생략)
+    """
+
+    def __init__(self, name: str, redis_prefix: str, max_size: int = 1000, ttl: int = 3600,
+                 similarity: Optional[float] = None, use_redis: bool = False, dim: int = 2048,
+                 signature: Optional[Callable[[str], object]] = None):
+        self.name = name
+        self.redis_prefix = redis_prefix
+        self.max_size = max_size
+        self.ttl = ttl
+        self.similarity = similarity
+        self.use_redis = use_redis
+        self.signature = signature
+        self.vectorizer = HashedNgramVectorizer(dim=dim)
+
+        self._entries: "OrderedDict[tuple, _Entry]" = OrderedDict()
+        # (scope, signature) -> (키 목록, 벡터 행렬) - 저장/만료 시 다시 만듦
+        self._matrices = {}
+        self._lock = threading.Lock()
+
+        # 여러 스레드가 동시에 갱신하므로 카운터는 별도 락으로 보호
+        self._stats = {'exact_hits': 0, 'redis_hits': 0, 'semantic_hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+        self._stats_lock = threading.Lock()
+
+    def lookup(self, scope: str, query: str) -> Optional[dict]:
+        key = normalize_query(query)
+        if not key:
+            return None
+
+        value = self._get_local((scope, key))
+        if value is not None:
+            self._count('exact_hits')
+            return value
+
+        value = self._get_redis(scope, key)
+        if value is not None:
+            self._count('redis_hits')
+            self._set_local((scope, key), value)
+            return value
+
+        value, score, matched = self._nearest(scope, key)
+        if value is not None:
+            self._count('semantic_hits')
+            logger.info(f"{self.name} 의미 일치: '{key[:30]}' ~ '{matched[:30]}' ({score:.3f})")
+            return value
+
+        self._count('misses')
+        return None
+
+    def store(self, scope: str, query: str, value: dict):
+        key = normalize_query(query)
+        if not key:
+            return
+        self._set_local((scope, key), value)
+        self._set_redis(scope, key, value)
+        self._count('stores')
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        hits = stats['exact_hits'] + stats['redis_hits'] + stats['semantic_hits']
+        total = hits + stats['misses']
+        return {
+            **stats,
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'near_match': self.similarity is not None,
+            'hit_rate': round(hits / total, 4) if total else 0.0,
+        }
+
+    # ----- 내부 구현 -----
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def _get_local(self, cache_key) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.monotonic():
+                del self._entries[cache_key]
+                self._matrices.pop((cache_key[0], entry.signature), None)
+                return None
+            self._entries.move_to_end(cache_key)
+            return entry.value
+
+    def _signature(self, key: str):
+        return self.signature(key) if self.signature is not None else ()
+
+    def _set_local(self, cache_key, value: dict):
+        # near-match를 쓰지 않으면 벡터/시그니처 계산 생략
+        vector, signature = None, None
+        if self.similarity is not None:
+            signature = self._signature(cache_key[1])
+            if signature is not None:
+                vector = self.vectorizer.transform(cache_key[1])
+        with self._lock:
+            previous = self._entries.get(cache_key)
+            if previous is not None:
+                self._matrices.pop((cache_key[0], previous.signature), None)
+            self._entries[cache_key] = _Entry(value, vector, signature, time.monotonic() + self.ttl)
+            self._entries.move_to_end(cache_key)
+            self._matrices.pop((cache_key[0], signature), None)
+            while len(self._entries) > self.max_size:
+                evicted, entry = self._entries.popitem(last=False)
+                self._matrices.pop((evicted[0], entry.signature), None)
+                self._count('evictions')
+
+    def _nearest(self, scope: str, key: str):
+        """scope 안에서 시그니처가 같고 가장 비슷한 질문의 값 -> (값 또는 None, 유사도, 일치한 질문 키)"""
+        if self.similarity is None:
+            return None, 0.0, None
+        signature = self._signature(key)
+        if signature is None:
+            return None, 0.0, None
+        group = (scope, signature)
+        with self._lock:
+            index = self._matrices.get(group)
+            if index is None:
+                keys = [
+                    k for k, entry in self._entries.items()
+                    if k[0] == scope and entry.signature == signature and entry.vector is not None
+                ]
+                if not keys:
+                    return None, 0.0, None
+                index = (keys, np.stack([self._entries[k].vector for k in keys]))
+                self._matrices[group] = index
+        keys, matrix = index
+
+        scores = matrix @ self.vectorizer.transform(key)
+        best = int(np.argmax(scores))
+        score = float(scores[best])
+        if score < self.similarity:
+            return None, score, None
+        return self._get_local(keys[best]), score, keys[best][1]
+
+    def _redis(self):
+        from common.redis.redis_client import get_redis_client
+        return get_redis_client()
+
+    def _redis_key(self, scope: str, key: str) -> str:
+        digest = hashlib.sha1(f"{scope}\n{key}".encode('utf-8')).hexdigest()
+        return f"{self.redis_prefix}:{digest}"
+
+    def _get_redis(self, scope: str, key: str) -> Optional[dict]:
+        if not self.use_redis:
+            return None
+        try:
+            raw = self._redis().get(self._redis_key(scope, key))
+            return json.loads(raw) if raw else None
+        except Exception as e:
+            logger.warning(f"{self.name} Redis 조회 실패: {str(e)}")
+            return None
+
+    def _set_redis(self, scope: str, key: str, value: dict):
+        if not self.use_redis:
+            return
+        try:
+            raw = json.dumps(value, ensure_ascii=False, default=str)
+            self._redis().set(self._redis_key(scope, key), raw, ex=self.ttl)
+        except Exception as e:
+            logger.warning(f"{self.name} Redis 저장 실패: {str(e)}")
@@ -0,0 +1,61 @@
+import json
+
+from django.test import SimpleTestCase, override_settings
+
+from apps.knowledge import answer_cache
+from apps.knowledge.answer_cache import CachedAnswer, cached_kb_answer, kb_scope, remember_kb_answer, replay_frames
+from common.bedrock.streaming import StreamResult
+
+
+def kb_request(query, kb_id='kb1', model_arn='arn:model'):
+    return {
+        'input': {'text': query},
+        'retrieveAndGenerateConfiguration': {
+            'type': 'KNOWLEDGE_BASE',
+            'knowledgeBaseConfiguration': {'knowledgeBaseId': kb_id, 'modelArn': model_arn},
+        },
+    }
+
+
+def parse(frames):
+    return [json.loads(frame[len('data: '):]) for frame in frames]
+
+
+@override_settings(KB_ANSWER_CACHE_ENABLED=True, KB_ANSWER_CACHE_REDIS=False, KB_ANSWER_CACHE_NEAR_MATCH=False,
+                   KB_CITATIONS_COMPACT=False, AIPERSON_CACHE_ENABLED=False)
+class AnswerCacheTests(SimpleTestCase):
+    def setUp(self):
+        answer_cache._cache = None
+
+    def tearDown(self):
+        answer_cache._cache = None
+
+    def test_replay_frames_order(self):
+        events = parse(replay_frames(CachedAnswer(query='q', text='가' * 5, citations=[{'c': 1}]), chunk_chars=2))
+        self.assertEqual([e['type'] for e in events], ['content', 'content', 'content', 'citations', 'done'])
+        self.assertEqual(''.join(e['text'] for e in events if e['type'] == 'content'), '가' * 5)
+        self.assertEqual(events[-1]['total_length'], 5)
+
+    def test_scope_includes_model(self):
+        self.assertNotEqual(kb_scope(kb_request('q')), kb_scope(kb_request('q', model_arn='arn:other')))
+
+    def test_round_trip(self):
+        request = kb_request("임진왜란은 언제 일어났어?")
+        self.assertIsNone(cached_kb_answer(request))
+        remember_kb_answer(request)(StreamResult(text='1592년', citations=[]))
+        events = parse(cached_kb_answer(kb_request("임진왜란은 언제 일어났어")))
+        self.assertEqual(events[0], {'type': 'content', 'text': '1592년'})
+
+    def test_empty_answer_not_stored(self):
+        request = kb_request("질문")
+        remember_kb_answer(request)(StreamResult(text=''))
+        self.assertIsNone(cached_kb_answer(request))
+
+    def test_different_year_not_reused(self):
+        remember_kb_answer(kb_request("1592년에 일어난 전쟁은?"))(StreamResult(text='임진왜란'))
+        self.assertIsNone(cached_kb_answer(kb_request("1597년에 일어난 전쟁은?")))
+
+    @override_settings(KB_ANSWER_CACHE_ENABLED=False)
+    def test_disabled(self):
+        self.assertIsNone(remember_kb_answer(kb_request('q')))
+        self.assertIsNone(cached_kb_answer(kb_request('q')))
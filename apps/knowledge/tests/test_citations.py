@@ -0,0 +1,120 @@
+import json
+import threading
+
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from apps.knowledge.answer_cache import CachedAnswer, replay_frames
+from apps.knowledge.citations import (
+    CHUNK_ID_METADATA_KEY, CitationCompactor, ReferenceStore, compact_citations_requested, new_citation_compactor,
+    reference_id, reference_uri,
+)
+
+
+def reference(uri, text, chunk=None):
+    ref = {'location': {'s3Location': {'uri': uri}}, 'content': {'text': text}}
+    if chunk:
+        ref['metadata'] = {CHUNK_ID_METADATA_KEY: chunk}
+    return ref
+
+
+def citation(*references, start=0, end=10):
+    return {
+        'generatedResponsePart': {'textResponsePart': {'span': {'start': start, 'end': end}}},
+        'retrievedReferences': list(references),
+    }
+
+
+def payload(frame):
+    return json.loads(frame.split('data: ', 1)[1])
+
+
+class NegotiationTests(SimpleTestCase):
+    def requested(self, path='/api/chat', **headers):
+        return compact_citations_requested(RequestFactory().post(path, **headers))
+
+    @override_settings(KB_CITATIONS_COMPACT=False)
+    def test_full_by_default(self):
+        self.assertFalse(self.requested())
+
+    @override_settings(KB_CITATIONS_COMPACT=False)
+    def test_query_param_and_header(self):
+        self.assertTrue(self.requested('/api/chat?citations=compact'))
+        self.assertTrue(self.requested(HTTP_X_CITATIONS='Compact'))
+        self.assertFalse(self.requested(HTTP_X_CITATIONS='unknown'))
+
+    @override_settings(KB_CITATIONS_COMPACT=True)
+    def test_query_param_wins(self):
+        self.assertTrue(self.requested())
+        self.assertFalse(self.requested('/api/chat?citations=full', HTTP_X_CITATIONS='compact'))
+
+
+class ReferenceIdTests(SimpleTestCase):
+    def test_uri_and_chunk(self):
+        self.assertEqual(reference_uri(reference('s3://a', 'x')), 's3://a')
+        self.assertEqual(reference_uri({'location': {'webLocation': {'url': 'https://w'}}}), 'https://w')
+        self.assertEqual(reference_id(reference('s3://a', 'x', 'c1')), reference_id(reference('s3://a', 'y', 'c1')))
+        self.assertNotEqual(reference_id(reference('s3://a', 'x', 'c1')), reference_id(reference('s3://b', 'x', 'c1')))
+
+    def test_falls_back_to_text_hash(self):
+        self.assertNotEqual(reference_id(reference('s3://a', 'x')), reference_id(reference('s3://a', 'y')))
+
+
+class CompactorTests(SimpleTestCase):
+    def setUp(self):
+        self.store = ReferenceStore(use_redis=False)
+        self.compactor = CitationCompactor(excerpt_chars=3, store=self.store)
+
+    def test_excerpt_once_then_id_only(self):
+        ref = reference('s3://a', '가나다라마', 'c1')
+        first = payload(self.compactor.encode(citation(ref, ref)))
+        self.assertEqual(first['span'], {'start': 0, 'end': 10})
+        self.assertEqual(len(first['references']), 1)
+        self.assertEqual(first['references'][0]['excerpt'], '가나다')
+        self.assertTrue(first['references'][0]['truncated'])
+
+        second = payload(self.compactor.encode(citation(ref)))
+        self.assertEqual(second['references'], [{'id': reference_id(ref)}])
+        self.assertEqual(self.store.get(reference_id(ref)), ref)
+
+    def test_empty_citation(self):
+        self.assertIsNone(self.compactor.encode(citation()))
+
+
+class ReferenceStoreTests(SimpleTestCase):
+    def test_lru_and_stats(self):
+        store = ReferenceStore(max_size=1, use_redis=False)
+        store.put_local('a', {'n': 1})
+        store.put_local('b', {'n': 2})
+        self.assertIsNone(store.get('a'))
+        self.assertEqual(store.get('b'), {'n': 2})
+        stats = store.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['evictions']), (1, 1, 1))
+
+    def test_concurrent_lookups_counted_exactly(self):
+        store = ReferenceStore(use_redis=False)
+        store.put_local('a', {'n': 1})
+
+        def read():
+            for _ in range(500):
+                store.get('a')
+
+        threads = [threading.Thread(target=read) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(store.stats()['hits'], 4000)
+
+
+class ReplayFramesTests(SimpleTestCase):
+    def setUp(self):
+        self.answer = CachedAnswer(query='q', text='답변', citations=[citation(reference('s3://a', '본문', 'c1'))])
+
+    def test_full_format(self):
+        types = [payload(f)['type'] for f in replay_frames(self.answer)]
+        self.assertEqual(types, ['content', 'citations', 'done'])
+
+    @override_settings(KB_CITATION_STORE_REDIS=False)
+    def test_compact_format(self):
+        types = [payload(f)['type'] for f in replay_frames(self.answer, citation_encoder=new_citation_compactor)]
+        self.assertEqual(types, ['content', 'citation', 'done'])
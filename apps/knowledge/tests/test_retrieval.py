@@ -0,0 +1,185 @@
+import asyncio
+import json
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from apps.knowledge import retrieval
+from apps.knowledge.retrieval import PassageSource, build_citation, build_generation_body, start_kb_stream
+from common.bedrock.streaming import KNOWLEDGE_BASE, StreamPipeline
+
+from .test_answer_cache import kb_request, parse
+
+
+def passage(text, uri='s3://bucket/doc', score=0.8):
+    return {'content': {'text': text}, 'location': {'type': 'S3', 's3Location': {'uri': uri}},
+            'metadata': {}, 'score': score}
+
+
+def invoke_events(*texts):
+    chunks = [{'type': 'content_block_delta', 'delta': {'text': text}} for text in texts]
+    chunks.append({'type': 'message_stop'})
+    return [{'chunk': {'bytes': json.dumps(chunk).encode()}} for chunk in chunks]
+
+
+class PassageSourceTests(SimpleTestCase):
+    def test_citation_emitted_at_message_stop(self):
+        source = PassageSource([passage('근거')])
+        outputs = [source.extract(source.decode(event)) for event in invoke_events('가나', '다')]
+        self.assertEqual([text for text, _, _ in outputs], ['가나', '다', None])
+        citation = outputs[-1][1]
+        self.assertEqual(citation['generatedResponsePart']['textResponsePart']['span'], {'start': 0, 'end': 2})
+        self.assertEqual(citation['retrievedReferences'][0]['content'], {'text': '근거'})
+        self.assertNotIn('score', citation['retrievedReferences'][0])
+        self.assertFalse(any(stop for _, _, stop in outputs))
+
+    def test_no_citation_without_passages(self):
+        self.assertIsNone(build_citation('답', []))
+
+    def test_generation_body_numbers_passages(self):
+        body = build_generation_body('질문', [passage('가'), passage('나')])
+        self.assertIn('[1] 가\n\n[2] 나', body['messages'][0]['content'])
+        self.assertTrue(body['messages'][0]['content'].endswith('질문: 질문'))
+
+
+@override_settings(KB_MODE='retrieve_then_generate', KB_RETRIEVAL_CACHE_REDIS=False, KB_RETRIEVAL_CACHE_NEAR_MATCH=False,
+                   KB_CITATIONS_COMPACT=False, AIPERSON_CACHE_ENABLED=False)
+class SplitModeTests(SimpleTestCase):
+    def setUp(self):
+        retrieval._cache = None
+        self.agent = mock.Mock()
+        self.agent.retrieve.return_value = {'retrievalResults': [passage('임진왜란은 1592년')]}
+        self.runtime = mock.Mock()
+        self.runtime.invoke_model_with_response_stream.side_effect = lambda **kw: {'body': invoke_events('1592년')}
+        patcher = mock.patch.multiple(
+            retrieval.BedrockClients, get_agent_runtime=mock.Mock(return_value=self.agent),
+            get_runtime=mock.Mock(return_value=self.runtime))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        retrieval._cache = None
+
+    def stream(self, query):
+        pipeline, response = start_kb_stream(kb_request(query), StreamPipeline(KNOWLEDGE_BASE, name='test'))
+        return parse(pipeline.stream(response))
+
+    def test_stream_shape_matches_retrieve_and_generate(self):
+        events = self.stream("임진왜란은 언제 일어났어?")
+        self.assertEqual([e['type'] for e in events], ['content', 'citations', 'done'])
+        self.assertEqual(events[1]['data'][0]['retrievedReferences'][0]['location']['s3Location']['uri'], 's3://bucket/doc')
+
+    def test_retrieval_cached_by_normalized_query(self):
+        self.stream("임진왜란은 언제 일어났어?")
+        self.stream("임진왜란은 언제 일어났어")
+        self.assertEqual(self.agent.retrieve.call_count, 1)
+        self.assertEqual(self.runtime.invoke_model_with_response_stream.call_count, 2)
+
+    def test_opposite_question_not_reused(self):
+        self.stream("임진왜란 때 조선 수군이 승리한 대표적인 해전은?")
+        self.stream("임진왜란 때 조선 수군이 패배한 대표적인 해전은?")
+        self.assertEqual(self.agent.retrieve.call_count, 2)
+
+    @override_settings(KB_RETRIEVAL_CACHE_NEAR_MATCH=True)
+    def test_opposite_question_not_reused_with_near_match(self):
+        retrieval._cache = None
+        self.stream("임진왜란 때 조선 수군이 승리한 대표적인 해전은?")
+        self.stream("임진왜란 때 조선 수군이 패배한 대표적인 해전은?")
+        self.stream("1597년 조선 수군의 해전은?")
+        self.stream("1592년 조선 수군의 해전은?")
+        self.assertEqual(self.agent.retrieve.call_count, 4)
+
+    @override_settings(KB_MODE='retrieve_and_generate')
+    def test_default_mode_uses_retrieve_and_generate(self):
+        self.agent.retrieve_and_generate_stream.return_value = {'stream': [{'output': {'text': '답'}}]}
+        events = self.stream("질문")
+        self.assertEqual(events[0], {'type': 'content', 'text': '답'})
+        self.agent.retrieve.assert_not_called()
+
+
+@override_settings(KB_FANOUT_LEXICAL_WEIGHT=0.0, KB_FANOUT_TOP_K=3, KB_FANOUT_TIMEOUT=0.2)
+class FanoutTests(SimpleTestCase):
+    def test_with_fanout_dedupes_ids(self):
+        request = retrieval.with_fanout(kb_request('질문'), ['kb2', 'kb3', 'kb2', ''])
+        self.assertEqual(retrieval.fanout_kb_ids(request), ['kb2', 'kb3'])
+        self.assertEqual(retrieval.fanout_kb_ids(retrieval.with_fanout(kb_request('질문'), ['kb9'])),
+                         [retrieval.kb_config(kb_request('질문'))[1]])
+
+    def test_rerank_normalizes_scores_per_kb_and_dedupes(self):
+        passages = [
+            {**passage('a', uri='s3://a', score=0.9), 'kb_id': 'kb1'},
+            {**passage('b', uri='s3://b', score=0.5), 'kb_id': 'kb1'},
+            # kb2는 점수 분포가 낮지만 KB 안에서는 1등
+            {**passage('c', uri='s3://c', score=0.2), 'kb_id': 'kb2'},
+            {**passage('d', uri='s3://d', score=0.1), 'kb_id': 'kb2'},
+            {**passage('a', uri='s3://a', score=0.9), 'kb_id': 'kb1'},
+        ]
+        ranked = [p['content']['text'] for p in retrieval.rerank('질문', passages, top_k=3)]
+        self.assertEqual(sorted(ranked[:2]), ['a', 'c'])
+        self.assertEqual(len(ranked), 3)
+
+    def fake_retrieve(self, results):
+        def retrieve(query, kb_id):
+            outcome = results[kb_id]
+            if isinstance(outcome, Exception):
+                raise outcome
+            if outcome == 'slow':
+                time.sleep(0.5)
+                return []
+            return outcome
+        return retrieve
+
+    def test_partial_failure_and_timeout_use_remaining_kbs(self):
+        results = {'kb1': [passage('가', uri='s3://1')], 'kb2': RuntimeError('down'), 'kb3': 'slow'}
+        before = retrieval.fanout_stats()
+        with mock.patch.object(retrieval, 'retrieve_passages', side_effect=self.fake_retrieve(results)), \
+                self.assertLogs('apps.knowledge.retrieval', 'WARNING'):
+            merged = retrieval.retrieve_fanout('질문', ['kb1', 'kb2', 'kb3'])
+        self.assertEqual([(p['kb_id'], p['content']['text']) for p in merged], [('kb1', '가')])
+        after = retrieval.fanout_stats()
+        self.assertEqual(after['failures'] - before['failures'], 1)
+        self.assertEqual(after['timeouts'] - before['timeouts'], 1)
+
+    def test_all_failed_raises_first_error(self):
+        results = {'kb1': RuntimeError('down'), 'kb2': RuntimeError('down')}
+        with mock.patch.object(retrieval, 'retrieve_passages', side_effect=self.fake_retrieve(results)), \
+                self.assertLogs('apps.knowledge.retrieval', 'WARNING'), self.assertRaises(RuntimeError):
+            retrieval.retrieve_fanout('질문', ['kb1', 'kb2'])
+
+    def test_all_timed_out_raises(self):
+        results = {'kb1': 'slow', 'kb2': 'slow'}
+        before = retrieval.fanout_stats()
+        with mock.patch.object(retrieval, 'retrieve_passages', side_effect=self.fake_retrieve(results)), \
+                self.assertLogs('apps.knowledge.retrieval', 'WARNING'), \
+                self.assertRaisesMessage(TimeoutError, 'kb1, kb2'):
+            retrieval.retrieve_fanout('질문', ['kb1', 'kb2'])
+        self.assertEqual(retrieval.fanout_stats()['exhausted'] - before['exhausted'], 1)
+
+    def test_async_all_timed_out_raises_and_late_results_finish(self):
+        finished = []
+
+        async def aretrieve(query, kb_id):
+            await asyncio.sleep(0.3)
+            finished.append(kb_id)
+            return [passage(kb_id)]
+
+        async def scenario():
+            with self.assertRaises(TimeoutError):
+                await retrieval.aretrieve_fanout('질문', ['kb1', 'kb2'])
+            # 시간 초과된 검색도 취소되지 않고 끝까지 실행됨 (캐시 저장)
+            await asyncio.gather(*retrieval._late_tasks)
+
+        with mock.patch.object(retrieval, 'aretrieve_passages', side_effect=aretrieve), \
+                self.assertLogs('apps.knowledge.retrieval', 'WARNING'):
+            asyncio.run(scenario())
+        self.assertEqual(sorted(finished), ['kb1', 'kb2'])
+        self.assertEqual(retrieval._late_tasks, set())
+
+    def test_async_fanout(self):
+        async def aretrieve(query, kb_id):
+            return [passage(kb_id, uri=f's3://{kb_id}')]
+
+        with mock.patch.object(retrieval, 'aretrieve_passages', side_effect=aretrieve):
+            merged = asyncio.run(retrieval.aretrieve_fanout('질문', ['kb1', 'kb2']))
+        self.assertEqual(sorted(p['kb_id'] for p in merged), ['kb1', 'kb2'])
@@ -0,0 +1,113 @@
+import threading
+
+from django.test import SimpleTestCase, override_settings
+
+from apps.knowledge.entities import entity_signature
+from apps.knowledge.semantic_cache import SemanticCache, near_match_similarity
+
+# 철자는 거의 같지만 답이 다른 질문 쌍 - 어떤 설정에서도 near-match 되면 안 됨
+NEGATIVE_PAIRS = [
+    ("1592년에 일어난 전쟁은 무엇인가요?", "1597년에 일어난 전쟁은 무엇인가요?"),
+    ("신라의 삼국 통일 과정을 설명해줘", "고려의 후삼국 통일 과정을 설명해줘"),
+    ("임진왜란 때 조선 수군이 승리한 대표적인 해전은?", "임진왜란 때 조선 수군이 패배한 대표적인 해전은?"),
+    ("병자호란의 결과를 알려줘", "정묘호란의 결과를 알려줘"),
+]
+PARAPHRASE = ("임진왜란은 언제 일어났어?", "임진왜란은 언제 일어났어요?")
+
+
+def make_cache(similarity=None, signature=entity_signature):
+    return SemanticCache(name='test', redis_prefix='test', similarity=similarity, signature=signature)
+
+
+@override_settings(AIPERSON_CACHE_ENABLED=False)
+class SemanticCacheTests(SimpleTestCase):
+    def test_exact_match_after_normalization(self):
+        cache = make_cache()
+        cache.store('kb', "임진왜란은 언제 일어났어?", {'text': 'a'})
+        self.assertEqual(cache.lookup('kb', "임진왜란은  언제 일어났어"), {'text': 'a'})
+        self.assertEqual(cache.stats()['exact_hits'], 1)
+
+    def test_concurrent_lookups_counted_exactly(self):
+        cache = make_cache()
+        cache.store('kb', "임진왜란은 언제 일어났어?", {'text': 'a'})
+
+        def read():
+            for _ in range(500):
+                cache.lookup('kb', "임진왜란은 언제 일어났어?")
+
+        threads = [threading.Thread(target=read) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(cache.stats()['exact_hits'], 4000)
+
+    def test_scopes_are_separate(self):
+        cache = make_cache()
+        cache.store('kb1', "임진왜란은 언제 일어났어?", {'text': 'a'})
+        self.assertIsNone(cache.lookup('kb2', "임진왜란은 언제 일어났어?"))
+
+    def test_near_match_off_by_default(self):
+        cache = make_cache()
+        self.assertFalse(cache.stats()['near_match'])
+        cache.store('kb', PARAPHRASE[0], {'text': 'a'})
+        self.assertIsNone(cache.lookup('kb', PARAPHRASE[1]))
+
+    def test_negative_pairs_miss_by_default(self):
+        for stored, asked in NEGATIVE_PAIRS:
+            cache = make_cache()
+            cache.store('kb', stored, {'text': stored})
+            self.assertIsNone(cache.lookup('kb', asked), (stored, asked))
+
+    def test_negative_pairs_miss_with_near_match(self):
+        for stored, asked in NEGATIVE_PAIRS:
+            cache = make_cache(similarity=0.95)
+            cache.store('kb', stored, {'text': stored})
+            self.assertIsNone(cache.lookup('kb', asked), (stored, asked))
+
+    def test_entity_guard_rejects_even_at_low_threshold(self):
+        # 숫자/고유명이 다르면 유사도와 관계없이 비교 대상이 아님
+        for stored, asked in NEGATIVE_PAIRS[:2] + NEGATIVE_PAIRS[3:]:
+            cache = make_cache(similarity=0.5)
+            cache.store('kb', stored, {'text': stored})
+            self.assertIsNone(cache.lookup('kb', asked), (stored, asked))
+
+    def test_near_match_hits_paraphrase_with_same_entities(self):
+        cache = make_cache(similarity=0.95)
+        cache.store('kb', PARAPHRASE[0], {'text': 'a'})
+        self.assertEqual(cache.lookup('kb', PARAPHRASE[1]), {'text': 'a'})
+        self.assertEqual(cache.stats()['semantic_hits'], 1)
+
+    def test_unknown_signature_disables_near_match(self):
+        cache = make_cache(similarity=0.5, signature=lambda key: None)
+        cache.store('kb', PARAPHRASE[0], {'text': 'a'})
+        self.assertIsNone(cache.lookup('kb', PARAPHRASE[1]))
+
+    def test_eviction_keeps_max_size(self):
+        cache = SemanticCache(name='test', redis_prefix='test', max_size=2)
+        for query in ("가", "나", "다"):
+            cache.store('kb', query + "질문", {'q': query})
+        self.assertEqual(cache.stats()['size'], 2)
+        self.assertIsNone(cache.lookup('kb', "가질문"))
+
+
+@override_settings(AIPERSON_CACHE_ENABLED=False)
+class EntitySignatureTests(SimpleTestCase):
+    def test_digits_and_entities(self):
+        digits, entities = entity_signature("1592년 임진왜란 때 조선 수군")
+        self.assertEqual(digits, ('1592',))
+        self.assertIn('임진왜란', entities)
+        self.assertIn('조선', entities)
+
+    def test_states(self):
+        self.assertNotEqual(entity_signature("신라의 삼국 통일"), entity_signature("고려의 후삼국 통일"))
+
+
+class NearMatchSettingTests(SimpleTestCase):
+    @override_settings(KB_ANSWER_CACHE_NEAR_MATCH=False)
+    def test_off(self):
+        self.assertIsNone(near_match_similarity('KB_ANSWER_CACHE'))
+
+    @override_settings(KB_ANSWER_CACHE_NEAR_MATCH=True, KB_ANSWER_CACHE_SIMILARITY=0.97)
+    def test_on(self):
+        self.assertEqual(near_match_similarity('KB_ANSWER_CACHE'), 0.97)
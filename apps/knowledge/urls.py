@@ -1,7 +1,8 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
 urlpatterns = [
-    path('', views.knowledge_base_view, name='knowledge_chat'),
+    path('', views.knowledge_base_view_async if settings.BEDROCK_ASYNC_VIEWS else views.knowledge_base_view, name='knowledge_chat'),
     path('knowledge/speak/', views.chatbot_tts_view, name='chatbot_tts_view')
 ]
\ No newline at end of file
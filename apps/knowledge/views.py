@@ -2,15 +2,68 @@ import json
 import logging
 import os
 import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.http import StreamingHttpResponse, JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
-from common.bedrock.clients import BedrockClients
-from common.bedrock.streaming import sse_event
+from common.bedrock.streaming import KNOWLEDGE_BASE, StreamPipeline, sse_event, sse_response
+from common.decorators import async_require_http_methods
 from rest_framework.decorators import api_view
 
+from apps.knowledge.answer_cache import cached_kb_answer, remember_kb_answer
+from apps.knowledge.citations import compact_citations_requested, get_reference_store, new_citation_compactor
+from apps.knowledge.retrieval import astart_kb_stream, start_kb_stream, with_fanout
+
 logger = logging.getLogger(__name__)
 
+KNOWLEDGE_BASE_PIPELINE = StreamPipeline(KNOWLEDGE_BASE, name='knowledge')
+# ?citations=compact / X-Citations: compact 요청용 (인용을 도착할 때마다 압축해서 전송)
+KNOWLEDGE_BASE_COMPACT_PIPELINE = StreamPipeline(KNOWLEDGE_BASE, name='knowledge', citation_encoder=new_citation_compactor)
+
+
+def kb_pipeline(request) -> StreamPipeline:
+    """요청이 고른 인용 형식의 KB 파이프라인"""
+    return KNOWLEDGE_BASE_COMPACT_PIPELINE if compact_citations_requested(request) else KNOWLEDGE_BASE_PIPELINE
+
+def build_kb_request(data: dict) -> dict:
+    """
+    retrieve_and_generate_stream 요청 파라미터 생성
+
+    kb_ids(목록)를 주거나, kb_id 없이 KB_FANOUT_IDS가 설정돼 있으면 여러 KB 팬아웃 요청이 됩니다.
+
+    Raises:
+        ValueError: 질의 또는 KB 설정이 없는 경우
+    """
+    query = data.get('message') or data.get('query')
+    
+    if not query:
+        raise ValueError('Missing required field: message or query')
+    
+    kb_ids = data.get('kb_ids') or ([] if data.get('kb_id') else getattr(settings, 'KB_FANOUT_IDS', []))
+    
+    # ✅ .env 파일의 실제 변수명 사용
+    kb_id = data.get('kb_id') or (kb_ids[0] if kb_ids else None) or os.getenv('BEDROCK_KB_ID')
+    model_arn = data.get('model_arn') or os.getenv('BEDROCK_KB_MODEL_ARN')
+    
+    if not kb_id or not model_arn:
+        logger.error(f"Missing config - KB_ID: {kb_id}, MODEL_ARN: {model_arn}")
+        raise ValueError(f'KB_ID or MODEL_ARN not configured. KB_ID={kb_id}, MODEL_ARN={model_arn}')
+    
+    logger.info(f"KB request - KB ID: {kb_ids or kb_id}, Query: {query[:50]}...")
+    
+    return with_fanout({
+        'input': {'text': query},
+        'retrieveAndGenerateConfiguration': {
+            'type': 'KNOWLEDGE_BASE',
+            'knowledgeBaseConfiguration': {
+                'knowledgeBaseId': kb_id,
+                'modelArn': model_arn
+            }
+        }
+    }, kb_ids)
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def knowledge_base_view(request):
@@ -18,87 +71,59 @@ def knowledge_base_view(request):
     try:
         data = json.loads(request.body)
         
-        query = data.get('message') or data.get('query')
+        try:
+            kb_request = build_kb_request(data)
+        except ValueError as e:
+            return sse_response([sse_event({'type': 'error', 'message': str(e)})])
         
-        if not query:
-            return StreamingHttpResponse(
-                [sse_event({'type': 'error', 'message': 'Missing required field: message or query'})],
-                content_type='text/event-stream'
-            )
-        
-        # ✅ .env 파일의 실제 변수명 사용
-        kb_id = data.get('kb_id') or os.getenv('BEDROCK_KB_ID')
-        model_arn = data.get('model_arn') or os.getenv('BEDROCK_KB_MODEL_ARN')
-        
-        if not kb_id or not model_arn:
-            logger.error(f"Missing config - KB_ID: {kb_id}, MODEL_ARN: {model_arn}")
-            return StreamingHttpResponse(
-                [sse_event({'type': 'error', 'message': f'KB_ID or MODEL_ARN not configured. KB_ID={kb_id}, MODEL_ARN={model_arn}'})],
-                content_type='text/event-stream'
-            )
+        pipeline = kb_pipeline(request)
+        cached = cached_kb_answer(kb_request, pipeline.citation_encoder)
+        if cached is not None:
+            return sse_response(cached)
         
-        logger.info(f"KB request - KB ID: {kb_id}, Query: {query[:50]}...")
-        
-        bedrock_agent_runtime = BedrockClients.get_agent_runtime()
-        response = bedrock_agent_runtime.retrieve_and_generate_stream(
-            input={'text': query},
-            retrieveAndGenerateConfiguration={
-                'type': 'KNOWLEDGE_BASE',
-                'knowledgeBaseConfiguration': {
-                    'knowledgeBaseId': kb_id,
-                    'modelArn': model_arn
-                }
-            }
-        )
+        pipeline, response = start_kb_stream(kb_request, pipeline)
         
-        return StreamingHttpResponse(
-            stream_knowledge_base_response(response),
-            content_type='text/event-stream'
-        )
+        return sse_response(pipeline.stream(response, on_done=remember_kb_answer(kb_request)))
         
     except Exception as e:
         logger.error(f"KB error: {str(e)}")
         import traceback
         logger.error(f"Traceback: {traceback.format_exc()}")
-        return StreamingHttpResponse(
-            [sse_event({'type': 'error', 'message': str(e)})],
-            content_type='text/event-stream'
-        )
-
-def stream_knowledge_base_response(response):
-    """Knowledge Base 스트리밍 응답"""
-    citations = []
-    full_text = ""
-    
+        return sse_response([sse_event({'type': 'error', 'message': str(e)})])
+
+@csrf_exempt
+@async_require_http_methods(["POST"])
+async def knowledge_base_view_async(request):
+    """Knowledge Base 검색 (비동기 스트리밍) - ASGI 전용"""
     try:
-        for event in response['stream']:
-            if 'output' in event:
-                output_data = event['output']
-                if 'text' in output_data:
-                    text = output_data['text']
-                    full_text += text
-                    yield sse_event({'type': 'content', 'text': text})
-                    logger.info(f"Sent text chunk: {text[:30]}...")
-            
-            elif 'citation' in event:
-                citation_data = event['citation']
-                citations.append(citation_data)
-                logger.info("Citation received")
+        data = json.loads(request.body)
         
-        if citations:
-            logger.info(f"Sending {len(citations)} citations")
-            yield sse_event({
-                'type': 'citations',
-                'count': len(citations),
-                'data': citations
-            })
+        try:
+            kb_request = build_kb_request(data)
+        except ValueError as e:
+            return sse_response([sse_event({'type': 'error', 'message': str(e)})])
         
-        logger.info(f"Stream complete. Total text length: {len(full_text)}")
-        yield sse_event({'type': 'done', 'total_length': len(full_text)})
+        # Redis 티어 조회가 있으므로 스레드에서
+        pipeline = kb_pipeline(request)
+        cached = await sync_to_async(cached_kb_answer, thread_sensitive=False)(kb_request, pipeline.citation_encoder)
+        if cached is not None:
+            return sse_response(cached)
+        
+        pipeline, response = await astart_kb_stream(kb_request, pipeline)
+        
+        return sse_response(pipeline.astream(response, on_done=remember_kb_answer(kb_request)))
         
     except Exception as e:
-        logger.error(f"Streaming error: {str(e)}")
-        yield sse_event({'type': 'error', 'message': str(e)})
+        logger.error(f"KB error: {str(e)}", exc_info=True)
+        return sse_response([sse_event({'type': 'error', 'message': str(e)})])
+
+@require_http_methods(["GET"])
+def citation_view(request, reference_id):
+    """인용 원문 조회 (SSE citation 프레임의 참조 id)"""
+    reference = get_reference_store().get(reference_id)
+    if reference is None:
+        return JsonResponse({'error': 'Citation not found or expired'}, status=404)
+    return JsonResponse({'id': reference_id, **reference}, json_dumps_params={'ensure_ascii': False})
 
 @csrf_exempt
 @api_view(["POST"])
@@ -0,0 +1,128 @@
+"""
+대화 이력 메시지 코덱
+
+Redis 리스트에 저장되는 MessageDTO의 직렬화 형식입니다.
+
+- json: 기존 형식 (`{"role": ..., "content": ...}` UTF-8 JSON) - 다른 서비스와 공유하는 기본값
+- binary: [버전 1바이트][플래그 1바이트][role 1바이트][본문]
+    - 본문은 UTF-8 content (JSON 키/따옴표/이스케이프 없음)
+    - 본문이 compress_min_bytes 이상이면 zlib 또는 zstd로 압축 (작아질 때만)
+
+디코딩은 첫 바이트로 형식을 판별하므로 ('{' = JSON, 0x01 = binary v1) 형식을 바꿔도
+기존 JSON 엔트리를 그대로 읽을 수 있습니다.
+"""
+import json
+import logging
+import zlib
+
+from django.conf import settings
+
+from .dto import MessageDTO
+
+try:
+    import zstandard
+except ImportError:  # 선택 의존성
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+BINARY_V1 = 0x01
+JSON_PREFIX = ord('{')
+
+FLAG_ZLIB = 0x01
+FLAG_ZSTD = 0x02
+
+ROLE_CODES = {'user': 0, 'assistant': 1, 'system': 2}
+ROLE_NAMES = {code: role for role, code in ROLE_CODES.items()}
+
+
+class CodecError(ValueError):
+    pass
+
+
+class JsonCodec:
+    name = 'json'
+
+    def encode(self, message: MessageDTO) -> bytes:
+        return json.dumps(message.to_dict(), ensure_ascii=False).encode('utf-8')
+
+    def decode(self, raw: bytes) -> MessageDTO:
+        return MessageDTO.from_dict(json.loads(raw))
+
+
+class BinaryCodec:
+    name = 'binary'
+
+    def __init__(self, compression: str = 'zlib', compress_min_bytes: int = 512, level: int = 3):
+        if compression == 'zstd' and zstandard is None:
+            logger.warning("zstandard 미설치 - 대화 이력 압축을 zlib으로 대체")
+            compression = 'zlib'
+        self.compression = compression
+        self.compress_min_bytes = compress_min_bytes
+        self.level = level
+        self._zstd_compressor = zstandard.ZstdCompressor(level=level) if compression == 'zstd' else None
+
+    def encode(self, message: MessageDTO) -> bytes:
+        role_code = ROLE_CODES.get(message.role)
+        if role_code is None:
+            raise CodecError(f"Unsupported role: {message.role}")
+
+        payload = (message.content or '').encode('utf-8')
+        flags = 0
+        if self.compression != 'none' and len(payload) >= self.compress_min_bytes:
+            if self._zstd_compressor is not None:
+                compressed, flag = self._zstd_compressor.compress(payload), FLAG_ZSTD
+            else:
+                compressed, flag = zlib.compress(payload, self.level), FLAG_ZLIB
+            if len(compressed) < len(payload):
+                payload, flags = compressed, flag
+
+        return bytes((BINARY_V1, flags, role_code)) + payload
+
+    @staticmethod
+    def decode(raw: bytes) -> MessageDTO:
+        flags, role_code = raw[1], raw[2]
+        payload = raw[3:]
+        if flags & FLAG_ZSTD:
+            if zstandard is None:
+                raise CodecError("zstd 압축 메시지지만 zstandard가 설치되어 있지 않음")
+            payload = zstandard.ZstdDecompressor().decompress(payload)
+        elif flags & FLAG_ZLIB:
+            payload = zlib.decompress(payload)
+
+        role = ROLE_NAMES.get(role_code)
+        if role is None:
+            raise CodecError(f"Unknown role code: {role_code}")
+        return MessageDTO(role=role, content=payload.decode('utf-8'))
+
+
+_json_codec = JsonCodec()
+_codec = None
+
+
+def decode_message(raw) -> MessageDTO:
+    """저장 형식(JSON / binary v1)을 판별해 디코딩"""
+    if isinstance(raw, str):
+        return _json_codec.decode(raw)
+    if not raw:
+        raise CodecError("Empty message")
+    head = raw[0]
+    if head == JSON_PREFIX:
+        return _json_codec.decode(raw)
+    if head == BINARY_V1:
+        return BinaryCodec.decode(raw)
+    raise CodecError(f"Unknown message format version: {head}")
+
+
+def get_codec():
+    """settings의 CHAT_HISTORY_CODEC에 따른 쓰기 코덱 (프로세스 단위 싱글톤)"""
+    global _codec
+    if _codec is None:
+        if getattr(settings, 'CHAT_HISTORY_CODEC', 'json') == 'binary':
+            _codec = BinaryCodec(
+                compression=getattr(settings, 'CHAT_HISTORY_COMPRESSION', 'zlib'),
+                compress_min_bytes=getattr(settings, 'CHAT_HISTORY_COMPRESS_MIN_BYTES', 512),
+            )
+        else:
+            _codec = _json_codec
+    return _codec
@@ -0,0 +1,87 @@
+"""
+캐릭터 채팅 멀티턴 히스토리 윈도우
+
+Redis 대화 이력에서 최근 N개(LRANGE -N -1)만 읽고, 로컬 토큰 추정으로 예산에 맞게 잘라
+Bedrock 요청 messages에 넣을 수 있는 형태로 반환합니다. 오래된 대화는 롤링 요약(summarizer)으로 대체됩니다.
+세션이 길어져도 턴당 읽기/입력 토큰 비용은 윈도우 크기 + 요약으로 고정됩니다.
+"""
+import logging
+from typing import List
+from uuid import UUID
+
+from django.conf import settings
+
+from common.bedrock.tokens import estimate_message_tokens
+
+from .dto import MessageDTO
+from .history_writer import get_history_writer
+from .redis_chat_repository import RedisChatRepository
+from .summarizer import schedule_summary, summary_due
+
+logger = logging.getLogger(__name__)
+
+
+def fit_history_window(messages: List[MessageDTO], token_budget: int) -> List[dict]:
+    """
+    최신 메시지부터 거꾸로 담아 token_budget 안에 들어가는 윈도우 생성
+
+    Anthropic messages 규칙에 맞도록 user로 시작하고 assistant로 끝나게 다듬습니다.
+    (현재 질문이 user 메시지로 뒤에 붙기 때문)
+    """
+    window = []
+    used = 0
+    for message in reversed(messages):
+        if message.role not in ('user', 'assistant') or not message.content:
+            continue
+        item = {"role": message.role, "content": message.content}
+        cost = estimate_message_tokens(item)
+        if used + cost > token_budget:
+            break
+        window.append(item)
+        used += cost
+    window.reverse()
+
+    while window and window[0]['role'] != 'user':
+        window.pop(0)
+    while window and window[-1]['role'] != 'assistant':
+        window.pop()
+    return window
+
+
+def load_history_context(prompt_id: str, user_id: UUID, repository: RedisChatRepository = None):
+    """
+    캐릭터 채팅 히스토리 조회 -> (요약 또는 None, 최근 윈도우)
+
+    요약에 이미 반영된(cursor 이전) 메시지는 윈도우에서 빼고, 오래된 메시지가 쌓였으면
+    백그라운드 요약을 예약합니다. 위치는 모두 LTRIM으로 잘린 메시지(trimmed)를 포함한 논리 위치입니다.
+    실패 시 (None, []) - 히스토리 없이 답변.
+    """
+    max_messages = getattr(settings, 'CHAT_HISTORY_WINDOW_MESSAGES', 20)
+    token_budget = getattr(settings, 'CHAT_HISTORY_TOKEN_BUDGET', 2000)
+    if max_messages <= 0 or token_budget <= 0:
+        return None, []
+
+    try:
+        repository = repository or RedisChatRepository()
+        key = repository.build_aiperson_key(prompt_id, user_id)
+        if getattr(settings, 'CHAT_HISTORY_WRITE_BEHIND', False):
+            # 직전 턴이 아직 write-behind 큐에 있으면 기록될 때까지 기다림 (read-your-writes)
+            if not get_history_writer().wait_for_key(key, getattr(settings, 'CHAT_HISTORY_READ_WAIT_SECONDS', 2.0)):
+                logger.warning(f"History write-behind 대기 시간 초과 - 직전 턴 없이 조회 (key={key})")
+        messages, length, summary = repository.get_history_tail(key, max_messages)
+
+        total = length + int(summary.get('trimmed', 0))
+        cursor = min(int(summary.get('cursor', 0)), total)
+        first_index = total - len(messages)
+        if cursor > first_index:
+            messages = messages[cursor - first_index:]
+
+        if summary_due(total, cursor):
+            schedule_summary(key, total, cursor, summary.get('summary', ''))
+
+        window = fit_history_window(messages, token_budget)
+        logger.info(f"History window: {len(window)} messages, summary cursor={cursor} (key={key})")
+        return summary.get('summary') or None, window
+    except Exception as e:
+        logger.error(f"History load failed: {str(e)}")
+        return None, []
@@ -0,0 +1,193 @@
+"""
+대화 이력 write-behind 저장
+
+스트리밍 완료 훅(on_done)에서 Redis에 직접 쓰면 느린 Redis가 사용자의 done 이벤트와 워커를 붙잡으므로,
+턴을 bounded 큐에 넣기만 하고 백그라운드 스레드가 여러 사용자의 턴을 모아 파이프라인 한 번으로 기록합니다.
+
+- 큐가 가득 차면 해당 턴은 버리고 dropped로 집계 (스트리밍 경로를 막지 않음)
+- 같은 key의 다음 턴이 이력을 읽기 전에 wait_for_key로 아직 기록되지 않은 턴을 기다림 (read-your-writes)
+- 종료 시(ASGI lifespan.shutdown, atexit) 남은 큐를 모두 기록, 종료 후 들어온 턴은 바로 기록
+- stats()는 /metrics에서 backlog/dropped 등을 노출
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from datetime import timedelta
+from typing import List, Optional
+
+from django.conf import settings
+
+from .dto import MessageDTO
+from .redis_chat_repository import RedisChatRepository
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryWriter:
+    def __init__(self, max_queue_size: int = 10000, batch_size: int = 100, repository=None):
+        self.batch_size = batch_size
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._repository = repository
+        self._worker = None
+        self._lock = threading.Lock()
+        # key -> 큐에 있거나 기록 중인 턴 수 (기록이 끝나면 _written으로 알림)
+        self._pending = {}
+        self._written = threading.Condition(self._lock)
+        self._stopping = False
+        self._stats = {
+            'enqueued': 0,
+            'written': 0,
+            'dropped': 0,
+            'failed': 0,
+            'batches': 0,
+        }
+        # submit은 요청 스레드 여러 개, _write는 워커 스레드에서 갱신하므로 락으로 보호
+        self._stats_lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            max_queue_size=getattr(settings, 'CHAT_HISTORY_QUEUE_SIZE', 10000),
+            batch_size=getattr(settings, 'CHAT_HISTORY_BATCH_SIZE', 100),
+        )
+
+    @property
+    def repository(self) -> RedisChatRepository:
+        if self._repository is None:
+            self._repository = RedisChatRepository()
+        return self._repository
+
+    def submit(self, key: str, messages: List[MessageDTO], ttl: Optional[timedelta],
+               max_length: Optional[int] = None) -> bool:
+        """
+        턴 하나를 큐에 넣음 (가득 차면 False, dropped 집계)
+
+        shutdown 이후에는 워커가 없으므로 큐에 넣지 않고 호출한 스레드에서 바로 기록합니다.
+        """
+        entry = (key, messages, ttl, max_length)
+        self._ensure_worker()
+        with self._lock:
+            stopping = self._stopping
+            if not stopping:
+                try:
+                    self._queue.put_nowait(entry)
+                except queue.Full:
+                    full = True
+                else:
+                    full = False
+                    self._pending[key] = self._pending.get(key, 0) + 1
+
+        if stopping:
+            return self._write([entry])
+        if full:
+            self._count('dropped')
+            logger.warning(f"대화 이력 큐 가득 참 - 턴 폐기: {key} (backlog={self._queue.qsize()})")
+            return False
+        self._count('enqueued')
+        return True
+
+    def wait_for_key(self, key: str, timeout: float) -> bool:
+        """key에 대해 큐에 넣은 턴이 모두 기록(또는 실패)될 때까지 최대 timeout초 대기 - 기다린 뒤 남은 턴이 없으면 True"""
+        with self._written:
+            return self._written.wait_for(lambda: not self._pending.get(key), timeout)
+
+    def _count(self, name: str, amount: int = 1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def _ensure_worker(self):
+        if self._worker is not None or self._stopping:
+            return
+        with self._lock:
+            if self._worker is None and not self._stopping:
+                self._worker = threading.Thread(target=self._run, name='history-writer', daemon=True)
+                self._worker.start()
+                atexit.register(self.shutdown)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self._write(batch)
+            self._mark_done(batch)
+            if stop:
+                break
+
+    def _write(self, batch) -> bool:
+        try:
+            self.repository.append_many(batch)
+            self._count('written', len(batch))
+            self._count('batches')
+            return True
+        except Exception as e:
+            self._count('failed', len(batch))
+            logger.error(f"대화 이력 배치 저장 실패 ({len(batch)}턴): {str(e)}")
+            return False
+
+    def _mark_done(self, batch):
+        """기록을 시도한 턴을 pending에서 빼고 wait_for_key 대기자를 깨움 (실패해도 더 기다리지 않도록)"""
+        with self._written:
+            for key, *_ in batch:
+                remaining = self._pending.get(key, 0) - 1
+                if remaining > 0:
+                    self._pending[key] = remaining
+                else:
+                    self._pending.pop(key, None)
+            self._written.notify_all()
+
+    def shutdown(self, timeout: float = 10.0):
+        """남은 큐를 모두 기록하고 워커 종료 (이후 submit은 바로 기록)"""
+        with self._lock:
+            if self._stopping:
+                return
+            self._stopping = True
+        if self._worker is None:
+            return
+        deadline = time.monotonic() + timeout
+        # 워커가 큐를 비운 뒤 멈추도록 종료 표시는 맨 뒤에 넣음
+        while True:
+            try:
+                self._queue.put(None, timeout=max(deadline - time.monotonic(), 0.01))
+                break
+            except queue.Full:
+                if time.monotonic() >= deadline:
+                    break
+        self._worker.join(max(deadline - time.monotonic(), 0.0))
+        logger.info(f"대화 이력 writer 종료: {self.stats()}")
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        return {
+            **stats,
+            'backlog': self._queue.qsize(),
+            'max_queue_size': self._queue.maxsize,
+            'running': self._worker is not None and self._worker.is_alive(),
+        }
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_history_writer() -> HistoryWriter:
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = HistoryWriter.from_settings()
+    return _writer
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+
+from apps.prompt.redis_chat_repository import (
+    AIPERSON_KEY_PREFIX,
+    CHATBOT_KEY_PREFIX,
+    DEFAULT_TTL,
+    INDEX_BACKFILLED_KEY,
+    SCAN_COUNT,
+    RedisChatRepository,
+)
+
+
+class Command(BaseCommand):
+    help = "기존 대화 이력 키를 사용자별 인덱스(user:{user_id}:chat_keys)에 등록 (SCAN 기반, KEYS 미사용)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=SCAN_COUNT, help='SCAN COUNT 힌트 / 파이프라인 배치 크기')
+        parser.add_argument('--dry-run', action='store_true', help='등록하지 않고 대상 키 수만 출력')
+
+    def handle(self, *args, **options):
+        repo = RedisChatRepository()
+        client = repo.redis
+        count = options['count']
+        dry_run = options['dry_run']
+
+        ttl_seconds = int(DEFAULT_TTL.total_seconds())
+        registered = 0
+        pipe = client.pipeline(transaction=False)
+        pending = 0
+
+        for prefix in (AIPERSON_KEY_PREFIX, CHATBOT_KEY_PREFIX):
+            for key in client.scan_iter(match=f"{prefix}*", count=count):
+                # 요약/락 등 부속 키는 제외 (삭제 시 원본 키에서 파생)
+                if key.endswith(':summary') or key.endswith(':lock'):
+                    continue
+                user_id = repo.user_id_from_key(key)
+                if user_id is None:
+                    continue
+                registered += 1
+                if dry_run:
+                    continue
+
+                index_key = repo.build_index_key(user_id)
+                pipe.sadd(index_key, key)
+                # 인덱스 TTL은 다음 쓰기 때 히스토리 TTL로 갱신됨 (남는 멤버는 삭제 시 무시됨)
+                pipe.expire(index_key, ttl_seconds)
+                pending += 1
+                if pending >= count:
+                    pipe.execute()
+                    pending = 0
+
+        if not dry_run:
+            if pending:
+                pipe.execute()
+            client.set(INDEX_BACKFILLED_KEY, 1)
+
+        action = "대상" if dry_run else "등록"
+        self.stdout.write(self.style.SUCCESS(f"채팅 키 인덱스 {action}: {registered}개"))
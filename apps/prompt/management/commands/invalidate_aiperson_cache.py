@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from apps.prompt.person_cache import INVALIDATE_ALL, get_person_cache
+
+
+class Command(BaseCommand):
+    help = "ai_person 테이블 변경 후 모든 워커의 AIPerson 캐시 무효화 (Redis pub/sub)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prompt-id', default=INVALIDATE_ALL, help='변경된 promptId (기본값: 전체)')
+
+    def handle(self, *args, **options):
+        cache = get_person_cache()
+        cache.publish_invalidation(options['prompt_id'])
+        self.stdout.write(self.style.SUCCESS(f"무효화 발행: {cache.channel} <- {options['prompt_id']}"))
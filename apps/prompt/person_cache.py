@@ -0,0 +1,275 @@
+"""
+AIPerson 프로세스 내 캐시
+
+ai_person 테이블은 작고 거의 바뀌지 않으므로 전체 행을 메모리에 올려 두고
+promptId / name 으로 조회합니다. 캐릭터 채팅, TTS, 라우터의 인물 조회가 Postgres를 타지 않습니다.
+
+- 서버 시작 시 preload() (config/asgi.py, config/wsgi.py)
+- 캐시에 없는 promptId는 DB에서 한 번 읽어 채움 (read-through, 없으면 짧게 negative 캐시)
+- 다른 워커/서비스에서 테이블을 바꾸면 Redis 채널(AIPERSON_CACHE_CHANNEL)에 publish
+  -> 모든 uvicorn 워커의 구독 스레드가 받아 다음 조회 때 전체를 다시 읽음
+- 메시지를 놓쳐도 AIPERSON_CACHE_TTL마다 다시 읽음
+"""
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from common.redis.redis_client import get_redis_client
+
+from .models import AIPerson
+
+logger = logging.getLogger(__name__)
+
+INVALIDATE_ALL = '*'
+
+
+class AIPersonCache:
+    def __init__(self, ttl: int = 600, negative_ttl: int = 30, channel: str = 'aiperson:invalidate'):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.channel = channel
+        self.version = 0
+        self._by_id: Dict[str, AIPerson] = {}
+        self._by_name: Dict[str, List[AIPerson]] = {}
+        self._missing: Dict[str, float] = {}
+        self._loaded_at = None
+        self._stale = True
+        # 무효화될 때마다 증가 - 적재 중(DB 조회 중)에 들어온 무효화를 놓치지 않기 위함
+        self._generation = 0
+        # _lock: 스냅샷/negative 캐시 교체·갱신 (짧게만 잡음), _load_lock: 적재를 한 번에 하나만 (DB 조회 동안 잡음)
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._listeners: List[Callable[[int], None]] = []
+        self._subscriber = None
+        self._stats = {'hits': 0, 'misses': 0, 'db_loads': 0, 'invalidations': 0}
+        # 요청 스레드/이벤트 루프/구독 스레드가 동시에 갱신하므로 락으로 보호
+        self._stats_lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            ttl=getattr(settings, 'AIPERSON_CACHE_TTL', 600),
+            negative_ttl=getattr(settings, 'AIPERSON_CACHE_NEGATIVE_TTL', 30),
+            channel=getattr(settings, 'AIPERSON_CACHE_CHANNEL', 'aiperson:invalidate'),
+        )
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    # ---- 조회 ----
+
+    def get(self, prompt_id: str) -> AIPerson:
+        """promptId로 조회 (없으면 AIPerson.DoesNotExist)"""
+        self._ensure_fresh()
+        person = self._by_id.get(prompt_id)
+        if person is not None:
+            self._count('hits')
+            return person
+
+        with self._lock:
+            missing_until = self._missing.get(prompt_id)
+        if missing_until is not None and missing_until > time.monotonic():
+            self._count('hits')
+            raise AIPerson.DoesNotExist(f"AIPerson not found: {prompt_id}")
+
+        # 스냅샷 이후 추가된 행일 수 있으므로 DB에서 한 번 확인
+        self._count('misses')
+        try:
+            person = AIPerson.objects.get(promptId=prompt_id)
+        except AIPerson.DoesNotExist:
+            with self._lock:
+                self._missing[prompt_id] = time.monotonic() + self.negative_ttl
+            raise
+        with self._lock:
+            self._by_id[person.promptId] = person
+            self._by_name.setdefault(person.name, []).append(person)
+        return person
+
+    async def aget(self, prompt_id: str) -> AIPerson:
+        """get의 비동기 버전 - 캐시 히트면 스레드 전환 없이 반환"""
+        if not self._needs_reload():
+            person = self._by_id.get(prompt_id)
+            if person is not None:
+                self._count('hits')
+                return person
+        return await sync_to_async(self.get, thread_sensitive=False)(prompt_id)
+
+    def get_by_name(self, name: str) -> Optional[AIPerson]:
+        self._ensure_fresh()
+        persons = self._by_name.get(name)
+        return persons[0] if persons else None
+
+    def current_version(self) -> int:
+        """필요하면 재적재한 뒤의 스냅샷 version (파생 인덱스의 최신 여부 확인용)"""
+        self._ensure_fresh()
+        return self.version
+
+    def all(self) -> List[AIPerson]:
+        self._ensure_fresh()
+        return list(self._by_id.values())
+
+    # ---- 적재 / 무효화 ----
+
+    def _needs_reload(self) -> bool:
+        return self._stale or self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl
+
+    def _ensure_fresh(self):
+        if self._needs_reload():
+            self.load()
+
+    def load(self):
+        """
+        ai_person 전체를 다시 읽어 스냅샷 교체
+
+        DB 조회는 _lock 밖에서 하고 교체만 _lock 안에서 하므로, 적재 중에도 다른 스레드는 기존 스냅샷으로 응답합니다.
+        이미 다른 스레드가 적재 중이면 기다리지 않고 돌아갑니다 (스냅샷이 아직 없는 첫 적재만 기다림).
+        """
+        if not self._load_lock.acquire(blocking=self._loaded_at is None):
+            return
+        try:
+            if not self._needs_reload():
+                return
+            with self._lock:
+                generation = self._generation
+            persons = list(AIPerson.objects.all())
+            by_id = {}
+            by_name = {}
+            for person in persons:
+                by_id[person.promptId] = person
+                by_name.setdefault(person.name, []).append(person)
+            with self._lock:
+                self._by_id, self._by_name = by_id, by_name
+                self._missing = {}
+                self._loaded_at = time.monotonic()
+                # 조회하는 동안 무효화가 들어왔으면 다음 조회 때 다시 읽음
+                self._stale = self._generation != generation
+                self.version += 1
+                version = self.version
+            self._count('db_loads')
+        finally:
+            self._load_lock.release()
+        logger.info(f"AIPerson 캐시 적재: {len(persons)}명 (version={version})")
+        for listener in list(self._listeners):
+            try:
+                listener(version)
+            except Exception as e:
+                logger.error(f"AIPerson 캐시 리스너 오류: {str(e)}")
+
+    def invalidate(self, prompt_id: str = INVALIDATE_ALL):
+        """다음 조회 때 전체를 다시 읽도록 표시 (테이블이 작아 부분 갱신 대신 전체 재적재)"""
+        self._mark_stale()
+        self._count('invalidations')
+        logger.info(f"AIPerson 캐시 무효화: {prompt_id}")
+
+    def _mark_stale(self):
+        with self._lock:
+            self._generation += 1
+            self._stale = True
+
+    def add_reload_listener(self, callback: Callable[[int], None]):
+        """재적재될 때마다 callback(version) 호출 (이름 인덱스 재구성 등)"""
+        self._listeners.append(callback)
+
+    def publish_invalidation(self, prompt_id: str = INVALIDATE_ALL):
+        """모든 워커에 무효화 전파 (자기 자신 포함)"""
+        self.invalidate(prompt_id)
+        try:
+            get_redis_client().publish(self.channel, prompt_id or INVALIDATE_ALL)
+        except Exception as e:
+            logger.error(f"AIPerson 캐시 무효화 publish 실패: {str(e)}")
+
+    # ---- 워커 간 무효화 구독 ----
+
+    def start_subscriber(self):
+        if self._subscriber is not None:
+            return
+        with self._lock:
+            if self._subscriber is None:
+                self._subscriber = threading.Thread(target=self._listen, name='aiperson-cache-sub', daemon=True)
+                self._subscriber.start()
+
+    def _listen(self):
+        backoff = 1
+        while True:
+            pubsub = None
+            try:
+                pubsub = get_redis_client().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                backoff = 1
+                while True:
+                    # socket_timeout(5초)보다 짧게 폴링
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message.get('type') == 'message':
+                        self.invalidate(message.get('data') or INVALIDATE_ALL)
+            except Exception as e:
+                logger.warning(f"AIPerson 캐시 구독 끊김, {backoff}초 후 재연결: {str(e)}")
+                # 끊긴 동안 놓친 무효화가 있을 수 있음
+                self._mark_stale()
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        return {
+            **stats,
+            'size': len(self._by_id),
+            'version': self.version,
+            'stale': self._needs_reload(),
+            'subscribed': self._subscriber is not None and self._subscriber.is_alive(),
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_person_cache() -> AIPersonCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = AIPersonCache.from_settings()
+    return _cache
+
+
+def preload():
+    """서버 시작 시 캐시 적재 + 무효화 구독 시작 (실패해도 첫 조회 때 다시 시도)"""
+    if not getattr(settings, 'AIPERSON_CACHE_ENABLED', True):
+        return
+    cache = get_person_cache()
+    cache.start_subscriber()
+    try:
+        cache.load()
+    except Exception as e:
+        logger.error(f"AIPerson 캐시 preload 실패: {str(e)}")
+
+
+def preload_in_background():
+    """
+    이벤트 루프가 이미 돌고 있을 수 있는 ASGI 시작 시점용 (ORM은 동기 컨텍스트에서만 호출 가능)
+    """
+    threading.Thread(target=preload, name='aiperson-cache-preload', daemon=True).start()
+
+
+def get_person(prompt_id: str) -> AIPerson:
+    if not getattr(settings, 'AIPERSON_CACHE_ENABLED', True):
+        return AIPerson.objects.get(promptId=prompt_id)
+    return get_person_cache().get(prompt_id)
+
+
+async def aget_person(prompt_id: str) -> AIPerson:
+    if not getattr(settings, 'AIPERSON_CACHE_ENABLED', True):
+        return await AIPerson.objects.aget(promptId=prompt_id)
+    return await get_person_cache().aget(prompt_id)
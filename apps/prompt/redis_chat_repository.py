@@ -1,74 +1,229 @@
-import json
+import logging
 from datetime import timedelta
-from typing import List, Optional, Set
+from typing import List, Optional, Set, Tuple
 from uuid import UUID
 
 import redis
 from django.conf import settings
 
+from .codecs import decode_message, get_codec
 from .dto import MessageDTO
-from common.redis.redis_client import get_redis_client
+from common.redis.redis_client import get_raw_redis_client, get_redis_client
 
 
 DEFAULT_TTL = timedelta(hours=6)
 
+AIPERSON_KEY_PREFIX = "aiperson:chat:"
+CHATBOT_KEY_PREFIX = "chatbot:chat:"
+# backfill_chat_index 실행 완료 표시 - 있으면 삭제 시 SCAN 보충 생략
+INDEX_BACKFILLED_KEY = "chat_index:backfilled"
+SCAN_COUNT = 500
+
+# RPUSH + LTRIM + EXPIRE(리스트/요약)를 원자적으로 실행
+# LTRIM으로 잘린 메시지 수를 요약 해시의 trimmed에 누적 -> 요약 cursor(논리 위치) = 리스트 위치 + trimmed
+# KEYS: [history, summary], ARGV: [max_length(0=무제한), ttl초(0=없음), message...]
+APPEND_SCRIPT = """
+local length = redis.call('RPUSH', KEYS[1], unpack(ARGV, 3))
+local max_length = tonumber(ARGV[1])
+if max_length > 0 and length > max_length then
+    redis.call('LTRIM', KEYS[1], -max_length, -1)
+    redis.call('HINCRBY', KEYS[2], 'trimmed', length - max_length)
+end
+local ttl = tonumber(ARGV[2])
+if ttl > 0 then
+    redis.call('EXPIRE', KEYS[1], ttl)
+    redis.call('EXPIRE', KEYS[2], ttl)
+end
+return length
+"""
+
+# 논리 위치 [start, end) 구간 조회 -> {실제 시작 논리 위치, 메시지 목록} (이미 잘린 앞부분은 건너뜀)
+# KEYS: [history, summary], ARGV: [start, end]
+RANGE_SCRIPT = """
+local trimmed = tonumber(redis.call('HGET', KEYS[2], 'trimmed') or '0')
+local first = math.max(tonumber(ARGV[1]), trimmed)
+local stop = tonumber(ARGV[2]) - 1
+if stop < first then
+    return {first, {}}
+end
+return {first, redis.call('LRANGE', KEYS[1], first - trimmed, stop - trimmed)}
+"""
+
+logger = logging.getLogger(__name__)
+
 class RedisChatRepository:
-    def __init__(self):
+    def __init__(self, codec=None):
         self.redis = get_redis_client()
+        # 대화 이력 리스트는 코덱이 만든 bytes를 그대로 주고받음
+        self.raw_redis = get_raw_redis_client()
+        self.codec = codec or get_codec()
+        self._append_script = self.raw_redis.register_script(APPEND_SCRIPT)
+        self._range_script = self.raw_redis.register_script(RANGE_SCRIPT)
 
     # key에 해당하는 전체 메시지 히스토리 조회
     def get_messages(self, key: str) -> List[MessageDTO]:
-        raw_list = self.redis.lrange(key, 0, -1)
+        raw_list = self.raw_redis.lrange(key, 0, -1)
         if not raw_list:
             return []
         return [self._deserialize(x) for x in raw_list]
 
+    # 최근 count개 메시지만 조회 (LRANGE -count -1)
+    def get_recent_messages(self, key: str, count: int) -> List[MessageDTO]:
+        if count <= 0:
+            return []
+        raw_list = self.raw_redis.lrange(key, -count, -1)
+        return [self._deserialize(x) for x in raw_list]
+
+    # 최근 count개 메시지 + 리스트 길이 + 요약을 MULTI 1회로 조회 (추가/LTRIM과 섞이지 않는 스냅샷)
+    # 반환: (messages, 리스트 길이, {"summary", "cursor", "trimmed"} 중 있는 필드 또는 {})
+    def get_history_tail(self, key: str, count: int):
+        pipe = self.raw_redis.pipeline(transaction=True)
+        pipe.lrange(key, -count, -1)
+        pipe.llen(key)
+        pipe.hgetall(self.build_summary_key(key))
+        raw_list, length, summary = pipe.execute()
+        summary = {k.decode('utf-8'): v.decode('utf-8') for k, v in (summary or {}).items()}
+        return [self._deserialize(x) for x in raw_list], length, summary
+
+    # 논리 위치(대화 시작부터, LTRIM으로 잘린 메시지 포함) [start, end) 구간 조회
+    # 반환: (실제 시작 위치, messages) - 이미 잘린 앞부분은 건너뛰므로 시작 위치가 start보다 클 수 있음
+    def get_messages_range(self, key: str, start: int, end: int) -> Tuple[int, List[MessageDTO]]:
+        if end <= start:
+            return start, []
+        first, raw_list = self._range_script(keys=[key, self.build_summary_key(key)], args=[start, end])
+        return int(first), [self._deserialize(x) for x in raw_list]
+
+    # 요약 저장 (cursor = 요약에 반영된 메시지의 논리 위치)
+    def save_summary(self, key: str, summary: str, cursor: int, ttl: Optional[timedelta] = DEFAULT_TTL):
+        summary_key = self.build_summary_key(key)
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.hset(summary_key, mapping={'summary': summary, 'cursor': cursor})
+        if ttl is not None:
+            pipe.expire(summary_key, int(ttl.total_seconds()))
+        pipe.execute()
+
     # 메시지 1개 추가
     def append_message(self, key: str, message: MessageDTO):
         self.append_message_with_ttl(key, message, DEFAULT_TTL)
 
     # 메시지 1개 추가 (TTL 지정)
     def append_message_with_ttl(self, key: str, message: MessageDTO, ttl: Optional[timedelta]):
-        json_str = self._serialize(message)
-        self.redis.rpush(key, json_str)
+        self.append_messages(key, [message], ttl)
+
+    # 메시지 여러 개를 한 번에 추가 (MULTI 파이프라인 1회 왕복: APPEND_SCRIPT + 사용자 인덱스)
+    def append_messages(self, key: str, messages: List[MessageDTO],
+                        ttl: Optional[timedelta] = DEFAULT_TTL, max_length: Optional[int] = None):
+        if not messages:
+            return
+        pipe = self.raw_redis.pipeline(transaction=True)
+        self._queue_append(pipe, key, messages, ttl, max_length)
+        pipe.execute()
+
+    # 여러 key의 대화 턴을 파이프라인 1회로 추가 (write-behind 배치용)
+    # entries: [(key, messages, ttl, max_length), ...]
+    def append_many(self, entries):
+        if not entries:
+            return
+        pipe = self.raw_redis.pipeline(transaction=False)
+        for key, messages, ttl, max_length in entries:
+            self._queue_append(pipe, key, messages, ttl, max_length)
+        pipe.execute()
+
+    def _queue_append(self, pipe, key: str, messages: List[MessageDTO],
+                      ttl: Optional[timedelta], max_length: Optional[int]):
+        # 최근 max_length개만 유지하고, 요약 해시도 리스트와 같은 TTL로 갱신 (요약이 먼저 만료되지 않도록)
+        self._append_script(
+            keys=[key, self.build_summary_key(key)],
+            args=[max_length or 0, int(ttl.total_seconds()) if ttl is not None else 0,
+                  *[self._serialize(m) for m in messages]],
+            client=pipe,
+        )
+        self._queue_index(pipe, key, ttl)
+
+    # 사용자별 키 인덱스 등록 (삭제 시 KEYS 대신 사용)
+    def _queue_index(self, pipe, key: str, ttl: Optional[timedelta]):
+        user_id = self.user_id_from_key(key)
+        if user_id is None:
+            return
+        index_key = self.build_index_key(user_id)
+        pipe.sadd(index_key, key)
+        # 인덱스는 히스토리보다 먼저 만료되지 않도록 같은 TTL로 갱신
         if ttl is not None:
-            self.redis.expire(key, int(ttl.total_seconds()))
+            pipe.expire(index_key, int(ttl.total_seconds()))
 
     # 특정 key의 히스토리 삭제
     def delete_by_key(self, key: str):
-        self.redis.delete(key)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.unlink(key, self.build_summary_key(key))
+        user_id = self.user_id_from_key(key)
+        if user_id is not None:
+            pipe.srem(self.build_index_key(user_id), key)
+        pipe.execute()
 
-    # 패턴으로 여러 키 삭제
-    def delete_by_pattern(self, pattern: str):
-        keys = self.redis.keys(pattern)
-        if keys:
-            self.redis.delete(*keys)
+    # 패턴으로 여러 키 삭제 (KEYS 대신 SCAN + 배치 UNLINK)
+    def delete_by_pattern(self, pattern: str) -> int:
+        deleted = 0
+        batch = []
+        for key in self.redis.scan_iter(match=pattern, count=SCAN_COUNT):
+            batch.append(key)
+            if len(batch) >= SCAN_COUNT:
+                deleted += self.redis.unlink(*batch)
+                batch = []
+        if batch:
+            deleted += self.redis.unlink(*batch)
+        return deleted
 
     def delete_all_aiperson_chats(self, user_id: UUID):
-        pattern = f"aiperson:chat:*:{user_id}"
-        keys = self.redis.keys(pattern)
+        index_key = self.build_index_key(user_id)
+        keys = [k for k in self.redis.smembers(index_key) if k.startswith(AIPERSON_KEY_PREFIX)]
+
+        # 인덱스 도입 전 키가 남아 있을 수 있으면(백필 전) SCAN으로 보충
+        if not self.redis.exists(INDEX_BACKFILLED_KEY):
+            keys = set(keys)
+            keys.update(self.redis.scan_iter(match=f"{AIPERSON_KEY_PREFIX}*:{user_id}", count=SCAN_COUNT))
+            keys = list(keys)
+
         if keys:
-            self.redis.delete(*keys)
-            print(f"[REDIS] Deleted {len(keys)} AI Person chat keys for user: {user_id}")
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.unlink(*keys, *[self.build_summary_key(k) for k in keys])
+            pipe.srem(index_key, *keys)
+            pipe.execute()
+            logger.info(f"[REDIS] Deleted {len(keys)} AI Person chat keys for user: {user_id}")
 
     def delete_all_chatbot_chats(self, user_id: UUID):
-        pattern = f"chatbot:chat:{user_id}"
-        keys = self.redis.keys(pattern)
-        if keys:
-            self.redis.delete(*keys)
-            print(f"[REDIS] Deleted {len(keys)} chatbot chat keys for user: {user_id}")
+        # 챗봇 이력은 사용자당 키 1개라 패턴 조회 없이 바로 삭제
+        key = f"{CHATBOT_KEY_PREFIX}{user_id}"
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.unlink(key)
+        pipe.srem(self.build_index_key(user_id), key)
+        deleted, _ = pipe.execute()
+        if deleted:
+            logger.info(f"[REDIS] Deleted {deleted} chatbot chat keys for user: {user_id}")
 
     def build_aiperson_key(self, prompt_id: str, user_id: UUID) -> str:
-        return f"aiperson:chat:{prompt_id}:{user_id}"
+        return f"{AIPERSON_KEY_PREFIX}{prompt_id}:{user_id}"
+
+    def build_summary_key(self, key: str) -> str:
+        return f"{key}:summary"
+
+    def build_index_key(self, user_id) -> str:
+        return f"user:{user_id}:chat_keys"
+
+    @staticmethod
+    def user_id_from_key(key: str) -> Optional[str]:
+        """aiperson:chat:{prompt_id}:{user_id} / chatbot:chat:{user_id} 에서 user_id 추출"""
+        if key.startswith(AIPERSON_KEY_PREFIX) or key.startswith(CHATBOT_KEY_PREFIX):
+            return key.rsplit(':', 1)[1]
+        return None
 
-    def _serialize(self, message: MessageDTO) -> str:
+    def _serialize(self, message: MessageDTO) -> bytes:
         try:
-            return json.dumps(message.to_dict(), ensure_ascii=False)
+            return self.codec.encode(message)
         except Exception as e:
             raise RuntimeError("Redis 직렬화 실패") from e
 
-    def _deserialize(self, json_str: str) -> MessageDTO:
+    def _deserialize(self, raw) -> MessageDTO:
         try:
-            return MessageDTO.from_dict(json.loads(json_str))
+            return decode_message(raw)
         except Exception as e:
             raise RuntimeError("Redis 역직렬화 실패") from e
@@ -0,0 +1,147 @@
+"""
+대화 롤링 요약 (히스토리 압축)
+
+대화가 CHAT_SUMMARY_TRIGGER_MESSAGES를 넘으면 최근 CHAT_SUMMARY_KEEP_RECENT개를 제외한 오래된 메시지를
+백그라운드에서 요약해 `{history_key}:summary` 해시({summary, cursor, trimmed})에 저장합니다.
+cursor는 요약에 반영된 메시지의 논리 위치(대화 시작부터 센 수)이며, 다음 요약은
+이전 요약 + [cursor, 새 cursor) 구간만 입력으로 받아 점진적으로 갱신합니다.
+
+CHAT_HISTORY_MAX_LENGTH로 리스트를 LTRIM하면 잘린 개수가 같은 해시의 trimmed에 누적되므로
+(RedisChatRepository.APPEND_SCRIPT) 리스트 위치 = 논리 위치 - trimmed로 계산합니다.
+요약 해시는 메시지를 추가할 때마다 리스트와 같은 TTL로 갱신되어 리스트보다 먼저 만료되지 않습니다.
+
+Bedrock에는 요약 + cursor 이후의 최근 윈도우만 보냅니다.
+"""
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from common.bedrock.clients import BedrockClients
+from common.bedrock.templates import ANTHROPIC_VERSION
+from common.redis.redis_client import acquire_lock, release_lock
+
+from .redis_chat_repository import DEFAULT_TTL, RedisChatRepository
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_SYSTEM_PROMPT = (
+    "너는 역사 인물과 학생의 대화를 요약하는 도우미다. "
+    "기존 요약과 새 대화를 합쳐, 이후 대화를 이어가는 데 필요한 사실·학생의 관심사·약속한 내용을 "
+    "한국어로 간결하게 정리하라. 요약문만 출력한다."
+)
+
+# 요약 1회(Bedrock 호출 포함)보다 충분히 길게
+SUMMARY_LOCK_TTL = 120
+
+_executor = None
+_executor_lock = threading.Lock()
+_in_flight = set()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'CHAT_SUMMARY_WORKERS', 2),
+                    thread_name_prefix='chat-summary',
+                )
+    return _executor
+
+
+def summary_due(length: int, cursor: int) -> bool:
+    """요약을 새로 만들어야 하는지 (오래된 미요약 메시지가 충분히 쌓였는지)"""
+    if not getattr(settings, 'CHAT_SUMMARY_ENABLED', False):
+        return False
+    if length < getattr(settings, 'CHAT_SUMMARY_TRIGGER_MESSAGES', 24):
+        return False
+    target = length - getattr(settings, 'CHAT_SUMMARY_KEEP_RECENT', 10)
+    return target - cursor >= getattr(settings, 'CHAT_SUMMARY_MIN_BATCH', 8)
+
+
+def schedule_summary(key: str, length: int, cursor: int, previous_summary: str = ''):
+    """백그라운드 요약 예약 (같은 키가 이미 진행 중이면 무시)"""
+    with _executor_lock:
+        if key in _in_flight:
+            return
+        _in_flight.add(key)
+    target = length - getattr(settings, 'CHAT_SUMMARY_KEEP_RECENT', 10)
+    # 요약은 user/assistant 쌍 단위로 끊음
+    target -= target % 2
+    _get_executor().submit(_summarize_safely, key, cursor, target, previous_summary)
+
+
+def _summarize_safely(key: str, cursor: int, target: int, previous_summary: str):
+    try:
+        summarize(key, cursor, target, previous_summary)
+    except Exception as e:
+        logger.error(f"대화 요약 실패 ({key}): {str(e)}")
+    finally:
+        with _executor_lock:
+            _in_flight.discard(key)
+
+
+def summarize(key: str, cursor: int, target: int, previous_summary: str = '',
+              repository: RedisChatRepository = None):
+    """논리 위치 [cursor, target) 구간을 이전 요약에 합쳐 새 요약 저장"""
+    repository = repository or RedisChatRepository()
+
+    # 여러 워커가 같은 대화를 동시에 요약하지 않도록 짧은 분산 락 (해제는 소유 토큰 확인 후)
+    lock_key = f"{repository.build_summary_key(key)}:lock"
+    token = acquire_lock(repository.redis, lock_key, SUMMARY_LOCK_TTL)
+    if token is None:
+        return
+
+    try:
+        # 락을 잡는 사이 다른 워커가 갱신했으면 그 상태에서 이어감
+        current = repository.redis.hgetall(repository.build_summary_key(key)) or {}
+        current_cursor = int(current.get('cursor', 0))
+        if current_cursor != cursor:
+            if current_cursor >= target:
+                return
+            cursor, previous_summary = current_cursor, current.get('summary', '')
+
+        start, messages = repository.get_messages_range(key, cursor, target)
+        if not messages:
+            return
+        if start > cursor:
+            logger.warning(f"요약 전에 잘린 메시지 {start - cursor}개 건너뜀 ({key})")
+        cursor = start
+
+        transcript = "\n".join(
+            f"{'학생' if m.role == 'user' else '인물'}: {m.content}" for m in messages
+        )
+        user_content = (
+            f"[기존 요약]\n{previous_summary or '(없음)'}\n\n[새 대화]\n{transcript}\n\n"
+            "위 내용을 합쳐 갱신된 요약을 작성하라."
+        )
+
+        body = {
+            "anthropic_version": ANTHROPIC_VERSION,
+            "max_tokens": getattr(settings, 'CHAT_SUMMARY_MAX_TOKENS', 512),
+            "temperature": 0.2,
+            "system": SUMMARY_SYSTEM_PROMPT,
+            "messages": [{"role": "user", "content": user_content}],
+        }
+        response = BedrockClients.get_runtime().invoke_model(
+            modelId=getattr(settings, 'CHAT_SUMMARY_MODEL_ID', 'anthropic.claude-3-haiku-20240307-v1:0'),
+            body=json.dumps(body),
+            accept="application/json",
+            contentType="application/json",
+        )
+        result = json.loads(response['body'].read())
+        summary = "".join(
+            block.get('text', '') for block in result.get('content', []) if block.get('type') == 'text'
+        ).strip()
+        if not summary:
+            return
+
+        repository.save_summary(key, summary, cursor + len(messages), DEFAULT_TTL)
+        logger.info(f"대화 요약 갱신: {key} (cursor {cursor} -> {cursor + len(messages)})")
+
+    finally:
+        release_lock(repository.redis, lock_key, token)
@@ -0,0 +1,25 @@
+"""fakeredis 기반 테스트 저장소 (fakeredis[lua]가 없으면 Redis가 필요한 테스트는 건너뜀)"""
+import unittest
+from unittest import mock
+
+try:
+    import fakeredis
+except ImportError:  # requirements-dev.txt
+    fakeredis = None
+
+requires_fakeredis = unittest.skipIf(fakeredis is None, 'fakeredis[lua] not installed')
+
+
+def fake_clients():
+    """같은 서버를 보는 (decode_responses=True, bytes) 클라이언트 쌍"""
+    server = fakeredis.FakeServer()
+    return fakeredis.FakeRedis(server=server, decode_responses=True), fakeredis.FakeRedis(server=server)
+
+
+def fake_repository(codec=None):
+    from apps.prompt.redis_chat_repository import RedisChatRepository
+
+    client, raw_client = fake_clients()
+    with mock.patch.multiple('apps.prompt.redis_chat_repository',
+                             get_redis_client=lambda: client, get_raw_redis_client=lambda: raw_client):
+        return RedisChatRepository(codec=codec)
@@ -0,0 +1,48 @@
+from django.test import SimpleTestCase
+
+from apps.prompt.codecs import BINARY_V1, FLAG_ZLIB, BinaryCodec, CodecError, JsonCodec, decode_message
+from apps.prompt.dto import MessageDTO
+
+from .redis_fixtures import fake_repository, requires_fakeredis
+
+
+class CodecTests(SimpleTestCase):
+    def test_binary_round_trip(self):
+        codec = BinaryCodec()
+        for message in (MessageDTO.user('안녕'), MessageDTO.assistant(''), MessageDTO.system('s')):
+            decoded = decode_message(codec.encode(message))
+            self.assertEqual((decoded.role, decoded.content), (message.role, message.content))
+
+    def test_large_payload_compressed(self):
+        raw = BinaryCodec(compress_min_bytes=16).encode(MessageDTO.assistant('조선 ' * 200))
+        self.assertEqual((raw[0], raw[1]), (BINARY_V1, FLAG_ZLIB))
+        self.assertEqual(decode_message(raw).content, '조선 ' * 200)
+
+    def test_incompressible_payload_stored_plain(self):
+        raw = BinaryCodec(compress_min_bytes=1).encode(MessageDTO.user('가'))
+        self.assertEqual(raw[1], 0)
+
+    def test_json_entries_still_readable(self):
+        raw = JsonCodec().encode(MessageDTO.user('질문'))
+        self.assertEqual(decode_message(raw).content, '질문')
+        self.assertEqual(decode_message(raw.decode('utf-8')).content, '질문')
+
+    def test_unknown_format_and_role(self):
+        with self.assertRaises(CodecError):
+            decode_message(b'\x09abc')
+        with self.assertRaises(CodecError):
+            decode_message(bytes((BINARY_V1, 0, 9)) + b'x')
+        with self.assertRaises(CodecError):
+            BinaryCodec().encode(MessageDTO(role='tool', content='x'))
+
+
+@requires_fakeredis
+class MixedFormatRepositoryTests(SimpleTestCase):
+    def test_json_and_binary_entries_in_one_history(self):
+        # CHAT_HISTORY_CODEC을 바꿔도 기존 JSON 엔트리와 새 binary 엔트리를 함께 읽음
+        repository = fake_repository(codec=JsonCodec())
+        key = repository.build_aiperson_key('p1', 'u1')
+        repository.append_message(key, MessageDTO.user('이전 형식'))
+        repository.codec = BinaryCodec()
+        repository.append_message(key, MessageDTO.assistant('새 형식'))
+        self.assertEqual([m.content for m in repository.get_messages(key)], ['이전 형식', '새 형식'])
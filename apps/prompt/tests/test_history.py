@@ -0,0 +1,190 @@
+import io
+import json
+from datetime import timedelta
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from apps.prompt import summarizer
+from apps.prompt.dto import MessageDTO
+from apps.prompt.history import fit_history_window, load_history_context
+from apps.prompt.summarizer import summarize, summary_due
+from common.redis.redis_client import acquire_lock, release_lock
+
+from .redis_fixtures import fake_clients, fake_repository, requires_fakeredis
+
+TTL = timedelta(hours=6)
+
+
+def turn(index):
+    return [MessageDTO.user(f"질문 {index}"), MessageDTO.assistant(f"답변 {index}")]
+
+
+def bedrock_summary(text):
+    runtime = mock.Mock()
+    runtime.invoke_model.return_value = {
+        'body': io.BytesIO(json.dumps({'content': [{'type': 'text', 'text': text}]}).encode())
+    }
+    return mock.patch.object(summarizer.BedrockClients, 'get_runtime', return_value=runtime)
+
+
+class FitHistoryWindowTests(SimpleTestCase):
+    def test_starts_with_user_and_ends_with_assistant(self):
+        messages = [MessageDTO.assistant('a0')] + turn(1) + [MessageDTO.user('dangling')]
+        window = fit_history_window(messages, 10_000)
+        self.assertEqual([m['role'] for m in window], ['user', 'assistant'])
+
+    def test_budget_keeps_most_recent(self):
+        messages = turn(1) + turn(2) + turn(3)
+        window = fit_history_window(messages, 20)
+        self.assertEqual(window[-1]['content'], '답변 3')
+        self.assertLess(len(window), 6)
+
+    def test_skips_empty_and_system(self):
+        messages = [MessageDTO.system('s'), MessageDTO.user('')] + turn(1)
+        self.assertEqual(len(fit_history_window(messages, 10_000)), 2)
+
+
+@override_settings(CHAT_SUMMARY_ENABLED=True, CHAT_SUMMARY_TRIGGER_MESSAGES=24,
+                   CHAT_SUMMARY_KEEP_RECENT=10, CHAT_SUMMARY_MIN_BATCH=8)
+class SummaryDueTests(SimpleTestCase):
+    def test_thresholds(self):
+        self.assertFalse(summary_due(20, 0))
+        self.assertTrue(summary_due(24, 0))
+        self.assertFalse(summary_due(30, 14))
+
+    @override_settings(CHAT_SUMMARY_ENABLED=False)
+    def test_disabled(self):
+        self.assertFalse(summary_due(100, 0))
+
+
+@requires_fakeredis
+class RepositoryTrimTests(SimpleTestCase):
+    def setUp(self):
+        self.repository = fake_repository()
+        self.key = self.repository.build_aiperson_key('p1', 'u1')
+
+    def test_trim_counts_dropped_messages(self):
+        for index in range(5):
+            self.repository.append_messages(self.key, turn(index), TTL, max_length=4)
+        messages, length, summary = self.repository.get_history_tail(self.key, 10)
+        self.assertEqual(length, 4)
+        self.assertEqual(summary['trimmed'], '6')
+        self.assertEqual(messages[0].content, '질문 3')
+
+    def test_range_uses_logical_positions(self):
+        for index in range(5):
+            self.repository.append_messages(self.key, turn(index), TTL, max_length=4)
+        start, messages = self.repository.get_messages_range(self.key, 4, 8)
+        self.assertEqual(start, 6)
+        self.assertEqual([m.content for m in messages], ['질문 3', '답변 3'])
+        start, messages = self.repository.get_messages_range(self.key, 8, 10)
+        self.assertEqual((start, [m.content for m in messages]), (8, ['질문 4', '답변 4']))
+
+    def test_append_refreshes_summary_ttl(self):
+        self.repository.append_messages(self.key, turn(0), TTL)
+        self.repository.save_summary(self.key, '요약', 2, ttl=timedelta(seconds=5))
+        self.repository.append_messages(self.key, turn(1), TTL)
+        summary_ttl = self.repository.redis.ttl(self.repository.build_summary_key(self.key))
+        self.assertGreater(summary_ttl, 5)
+        self.assertEqual(summary_ttl, self.repository.redis.ttl(self.key))
+
+    def test_append_many_batches_keys(self):
+        other = self.repository.build_aiperson_key('p2', 'u1')
+        self.repository.append_many([(self.key, turn(0), TTL, None), (other, turn(1), TTL, 1)])
+        self.assertEqual(len(self.repository.get_messages(self.key)), 2)
+        self.assertEqual([m.content for m in self.repository.get_messages(other)], ['답변 1'])
+        self.assertEqual(self.repository.redis.smembers(self.repository.build_index_key('u1')), {self.key, other})
+
+
+@requires_fakeredis
+@override_settings(CHAT_HISTORY_WINDOW_MESSAGES=20, CHAT_HISTORY_TOKEN_BUDGET=10_000, CHAT_SUMMARY_ENABLED=False)
+class LoadHistoryContextTests(SimpleTestCase):
+    def setUp(self):
+        self.repository = fake_repository()
+        self.key = self.repository.build_aiperson_key('p1', 'u1')
+
+    def test_summarized_messages_excluded_after_trim(self):
+        for index in range(10):
+            self.repository.append_messages(self.key, turn(index), TTL, max_length=8)
+        # 논리 위치 14까지 요약됨 (0~6턴) -> 리스트에 남은 6~9턴 중 7~9턴만 윈도우에
+        self.repository.save_summary(self.key, '요약', 14)
+        summary, window = load_history_context('p1', 'u1', repository=self.repository)
+        self.assertEqual(summary, '요약')
+        self.assertEqual(window[0]['content'], '질문 7')
+        self.assertEqual(len(window), 6)
+
+    def test_unsummarized_turns_kept_when_trimmed(self):
+        for index in range(10):
+            self.repository.append_messages(self.key, turn(index), TTL, max_length=8)
+        self.repository.save_summary(self.key, '요약', 4)
+        _, window = load_history_context('p1', 'u1', repository=self.repository)
+        self.assertEqual(window[0]['content'], '질문 6')
+        self.assertEqual(len(window), 8)
+
+    @override_settings(CHAT_HISTORY_WINDOW_MESSAGES=4)
+    def test_reads_only_recent_messages(self):
+        for index in range(5):
+            self.repository.append_messages(self.key, turn(index), TTL)
+        summary, window = load_history_context('p1', 'u1', repository=self.repository)
+        self.assertIsNone(summary)
+        self.assertEqual([m['content'] for m in window], ['질문 3', '답변 3', '질문 4', '답변 4'])
+
+    @override_settings(CHAT_HISTORY_WINDOW_MESSAGES=0)
+    def test_disabled_window(self):
+        self.repository.append_messages(self.key, turn(0), TTL)
+        self.assertEqual(load_history_context('p1', 'u1', repository=self.repository), (None, []))
+
+    def test_redis_failure_answers_without_history(self):
+        repository = mock.Mock(build_aiperson_key=self.repository.build_aiperson_key)
+        repository.get_history_tail.side_effect = ConnectionError('down')
+        with self.assertLogs('apps.prompt.history', 'ERROR'):
+            self.assertEqual(load_history_context('p1', 'u1', repository=repository), (None, []))
+
+
+@requires_fakeredis
+@override_settings(CHAT_SUMMARY_MODEL_ID='model')
+class SummarizeTests(SimpleTestCase):
+    def setUp(self):
+        self.repository = fake_repository()
+        self.key = self.repository.build_aiperson_key('p1', 'u1')
+
+    def test_incremental_summary_after_trim(self):
+        for index in range(10):
+            self.repository.append_messages(self.key, turn(index), TTL, max_length=8)
+        with bedrock_summary('새 요약') as get_runtime:
+            summarize(self.key, 0, 16, repository=self.repository)
+        content = json.loads(get_runtime.return_value.invoke_model.call_args.kwargs['body'])['messages'][0]['content']
+        self.assertIn('질문 6', content)
+        self.assertNotIn('질문 5', content)
+        stored = self.repository.redis.hgetall(self.repository.build_summary_key(self.key))
+        self.assertEqual((stored['summary'], stored['cursor']), ('새 요약', '16'))
+
+    def test_skips_when_locked_and_keeps_foreign_lock(self):
+        self.repository.append_messages(self.key, turn(0), TTL)
+        lock_key = f"{self.repository.build_summary_key(self.key)}:lock"
+        self.repository.redis.set(lock_key, 'other-worker')
+        with bedrock_summary('요약') as get_runtime:
+            summarize(self.key, 0, 2, repository=self.repository)
+        get_runtime.assert_not_called()
+        self.assertEqual(self.repository.redis.get(lock_key), 'other-worker')
+
+    def test_lock_released_after_summary(self):
+        self.repository.append_messages(self.key, turn(0), TTL)
+        with bedrock_summary('요약'):
+            summarize(self.key, 0, 2, repository=self.repository)
+        self.assertIsNone(self.repository.redis.get(f"{self.repository.build_summary_key(self.key)}:lock"))
+
+
+@requires_fakeredis
+class LockTests(SimpleTestCase):
+    def test_release_requires_owner_token(self):
+        client, _ = fake_clients()
+        token = acquire_lock(client, 'lock', 120)
+        self.assertIsNotNone(token)
+        self.assertIsNone(acquire_lock(client, 'lock', 120))
+        # 만료 후 다른 워커가 잡은 락은 이전 소유자가 지우지 못함
+        client.set('lock', 'new-owner')
+        self.assertFalse(release_lock(client, 'lock', token))
+        self.assertEqual(client.get('lock'), 'new-owner')
+        self.assertTrue(release_lock(client, 'lock', 'new-owner'))
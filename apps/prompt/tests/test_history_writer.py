@@ -0,0 +1,138 @@
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from apps.prompt import history
+from apps.prompt.dto import MessageDTO
+from apps.prompt.history import load_history_context
+from apps.prompt.history_writer import HistoryWriter
+
+from .redis_fixtures import fake_repository, requires_fakeredis
+
+TTL = timedelta(hours=6)
+
+
+class RecordingRepository:
+    def __init__(self, fail=False, delay=0.0):
+        self.delay = delay
+        self.batches = []
+        self.fail = fail
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def append_many(self, entries):
+        self.entered.set()
+        self.release.wait(5)
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError('redis down')
+        self.batches.append(list(entries))
+
+
+def turn(index):
+    return [MessageDTO.user(f"질문 {index}"), MessageDTO.assistant(f"답변 {index}")]
+
+
+class HistoryWriterTests(SimpleTestCase):
+    def test_shutdown_flushes_backlog(self):
+        repository = RecordingRepository()
+        writer = HistoryWriter(batch_size=10, repository=repository)
+        for index in range(25):
+            self.assertTrue(writer.submit(f"chatbot:chat:{index}", turn(index), TTL))
+        writer.shutdown()
+        keys = [entry[0] for batch in repository.batches for entry in batch]
+        self.assertEqual(keys, [f"chatbot:chat:{index}" for index in range(25)])
+        self.assertTrue(all(len(batch) <= 10 for batch in repository.batches))
+        stats = writer.stats()
+        self.assertEqual((stats['enqueued'], stats['written'], stats['backlog']), (25, 25, 0))
+        self.assertFalse(stats['running'])
+
+    def test_full_queue_drops_turn(self):
+        repository = RecordingRepository()
+        repository.release.clear()
+        writer = HistoryWriter(max_queue_size=1, repository=repository)
+        self.assertTrue(writer.submit('k1', turn(1), TTL))
+        self.assertTrue(repository.entered.wait(5))
+        self.assertTrue(writer.submit('k2', turn(2), TTL))
+        self.assertFalse(writer.submit('k3', turn(3), TTL))
+        self.assertEqual(writer.stats()['dropped'], 1)
+        repository.release.set()
+        writer.shutdown()
+        self.assertEqual(writer.stats()['written'], 2)
+
+    def test_failed_batch_counted(self):
+        writer = HistoryWriter(repository=RecordingRepository(fail=True))
+        writer.submit('k1', turn(1), TTL)
+        writer.shutdown()
+        self.assertEqual(writer.stats()['failed'], 1)
+        self.assertEqual(writer.stats()['written'], 0)
+
+    def test_concurrent_submits_counted_exactly(self):
+        writer = HistoryWriter(repository=RecordingRepository())
+
+        def submit_many(worker):
+            for index in range(200):
+                writer.submit(f"k{worker}:{index}", turn(index), TTL)
+
+        threads = [threading.Thread(target=submit_many, args=(worker,)) for worker in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        writer.shutdown()
+        stats = writer.stats()
+        self.assertEqual(stats['enqueued'], 1600)
+        self.assertEqual(stats['written'], 1600)
+
+    def test_submit_after_shutdown_written_synchronously(self):
+        repository = RecordingRepository()
+        writer = HistoryWriter(repository=repository)
+        writer.submit('k1', turn(1), TTL)
+        writer.shutdown()
+        self.assertTrue(writer.submit('k2', turn(2), TTL))
+        self.assertEqual([entry[0] for batch in repository.batches for entry in batch], ['k1', 'k2'])
+        self.assertEqual((writer.stats()['enqueued'], writer.stats()['written']), (1, 2))
+
+    def test_shutdown_before_first_submit(self):
+        repository = RecordingRepository()
+        writer = HistoryWriter(repository=repository)
+        writer.shutdown()
+        writer.submit('k1', turn(1), TTL)
+        self.assertFalse(writer.stats()['running'])
+        self.assertEqual(len(repository.batches), 1)
+
+    def test_wait_for_key(self):
+        repository = RecordingRepository()
+        repository.release.clear()
+        writer = HistoryWriter(repository=repository)
+        writer.submit('k1', turn(1), TTL)
+        self.assertFalse(writer.wait_for_key('k1', 0.05))
+        self.assertTrue(writer.wait_for_key('other', 0.05))
+        repository.release.set()
+        self.assertTrue(writer.wait_for_key('k1', 5))
+        writer.shutdown()
+
+
+@requires_fakeredis
+@override_settings(CHAT_HISTORY_WRITE_BEHIND=True, CHAT_HISTORY_READ_WAIT_SECONDS=5,
+                   CHAT_HISTORY_WINDOW_MESSAGES=20, CHAT_HISTORY_TOKEN_BUDGET=10_000, CHAT_SUMMARY_ENABLED=False)
+class ReadYourWritesTests(SimpleTestCase):
+    def test_next_turn_sees_previous_turn(self):
+        repository = fake_repository()
+        key = repository.build_aiperson_key('p1', 'u1')
+        slow = mock.Mock(wraps=repository)
+        slow.append_many.side_effect = lambda entries: (time.sleep(0.2), repository.append_many(entries))
+        writer = HistoryWriter(repository=slow)
+        self.addCleanup(writer.shutdown)
+
+        with mock.patch.object(history, 'get_history_writer', return_value=writer):
+            writer.submit(key, turn(1), TTL)
+            _, window = load_history_context('p1', 'u1', repository=repository)
+            writer.submit(key, turn(2), TTL)
+            _, next_window = load_history_context('p1', 'u1', repository=repository)
+        self.assertEqual([m['content'] for m in window], ['질문 1', '답변 1'])
+        self.assertEqual(len(next_window), 4)
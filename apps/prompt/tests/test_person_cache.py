@@ -0,0 +1,129 @@
+import asyncio
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from apps.prompt.models import AIPerson
+from apps.prompt.person_cache import AIPersonCache
+
+
+def person(prompt_id, name):
+    return AIPerson(promptId=prompt_id, name=name, era='조선')
+
+
+class FakeManager:
+    def __init__(self, persons):
+        self.persons = list(persons)
+        self.all_calls = 0
+        self.get_calls = 0
+        self.querying = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def all(self):
+        self.all_calls += 1
+        snapshot = list(self.persons)
+        self.querying.set()
+        self.release.wait(5)
+        return snapshot
+
+    def get(self, promptId):
+        self.get_calls += 1
+        for p in self.persons:
+            if p.promptId == promptId:
+                return p
+        raise AIPerson.DoesNotExist(promptId)
+
+
+class AIPersonCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.manager = FakeManager([person('p1', '세종대왕'), person('p2', '이순신')])
+        patcher = mock.patch.object(AIPerson, 'objects', self.manager)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_lookup_without_db_after_load(self):
+        cache = AIPersonCache()
+        self.assertEqual(cache.get('p1').name, '세종대왕')
+        self.assertEqual(cache.get_by_name('이순신').promptId, 'p2')
+        self.assertEqual(self.manager.all_calls, 1)
+        self.assertEqual(self.manager.get_calls, 0)
+        self.assertEqual(cache.stats()['hits'], 1)
+
+    def test_read_through_and_negative_cache(self):
+        cache = AIPersonCache()
+        cache.load()
+        self.manager.persons.append(person('p3', '장영실'))
+        self.assertEqual(cache.get('p3').name, '장영실')
+        for _ in range(2):
+            with self.assertRaises(AIPerson.DoesNotExist):
+                cache.get('missing')
+        self.assertEqual(self.manager.get_calls, 2)
+        self.assertEqual(cache.stats()['misses'], 2)
+
+    def test_invalidate_reloads_and_notifies(self):
+        cache, versions = AIPersonCache(), []
+        cache.add_reload_listener(versions.append)
+        cache.load()
+        cache.invalidate()
+        self.manager.persons = [person('p9', '정약용')]
+        self.assertEqual([p.promptId for p in cache.all()], ['p9'])
+        self.assertEqual(versions, [1, 2])
+        self.assertEqual(cache.stats()['invalidations'], 1)
+
+    def test_aget_hit_skips_thread(self):
+        cache = AIPersonCache()
+        cache.load()
+        with mock.patch('apps.prompt.person_cache.sync_to_async') as to_thread:
+            self.assertEqual(asyncio.run(cache.aget('p2')).name, '이순신')
+        to_thread.assert_not_called()
+
+    def test_concurrent_hits_counted_exactly(self):
+        cache = AIPersonCache()
+        cache.load()
+
+        def read():
+            for _ in range(500):
+                cache.get('p1')
+
+        threads = [threading.Thread(target=read) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(cache.stats()['hits'], 4000)
+
+    def start_blocked_reload(self, cache):
+        """DB 조회 중에 멈춘 재적재를 다른 스레드에서 시작"""
+        cache.invalidate()
+        self.manager.release.clear()
+        self.manager.querying.clear()
+        loader = threading.Thread(target=cache.load)
+        loader.start()
+        self.assertTrue(self.manager.querying.wait(5))
+        self.addCleanup(loader.join)
+        self.addCleanup(self.manager.release.set)
+        return loader
+
+    def test_readers_served_from_snapshot_during_reload(self):
+        cache = AIPersonCache()
+        cache.load()
+        self.start_blocked_reload(cache)
+        reader = threading.Thread(target=lambda: self.assertEqual(cache.get('p1').name, '세종대왕'))
+        reader.start()
+        reader.join(1)
+        self.assertFalse(reader.is_alive())
+        self.assertEqual(cache.version, 1)
+
+    def test_invalidation_during_reload_not_lost(self):
+        cache = AIPersonCache()
+        cache.load()
+        loader = self.start_blocked_reload(cache)
+        self.manager.persons = [person('p9', '정약용')]
+        cache.invalidate()
+        self.manager.release.set()
+        loader.join(5)
+        # 조회 시작 후 들어온 무효화 때문에 다음 조회 때 다시 읽음
+        self.assertTrue(cache.stats()['stale'])
+        self.assertEqual([p.promptId for p in cache.all()], ['p9'])
@@ -0,0 +1,87 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from apps.prompt.dto import MessageDTO
+from apps.prompt.redis_chat_repository import CHATBOT_KEY_PREFIX, INDEX_BACKFILLED_KEY
+
+from .redis_fixtures import fake_repository, requires_fakeredis
+
+TTL = timedelta(hours=6)
+
+
+@requires_fakeredis
+class AppendTests(SimpleTestCase):
+    def setUp(self):
+        self.repository = fake_repository()
+        self.key = self.repository.build_aiperson_key('p1', 'u1')
+
+    def test_turn_written_in_one_round_trip(self):
+        with mock.patch.object(self.repository.raw_redis, 'pipeline', wraps=self.repository.raw_redis.pipeline) as pipeline:
+            self.repository.append_messages(self.key, [MessageDTO.user('질문'), MessageDTO.assistant('답변')], TTL)
+        pipeline.assert_called_once()
+        self.assertEqual([m.content for m in self.repository.get_messages(self.key)], ['질문', '답변'])
+        self.assertGreater(self.repository.redis.ttl(self.key), 0)
+
+    def test_empty_append_is_noop(self):
+        self.repository.append_messages(self.key, [], TTL)
+        self.assertFalse(self.repository.redis.exists(self.key))
+
+    def test_recent_messages(self):
+        self.repository.append_messages(self.key, [MessageDTO.user(str(i)) for i in range(5)], TTL)
+        self.assertEqual([m.content for m in self.repository.get_recent_messages(self.key, 2)], ['3', '4'])
+        self.assertEqual(self.repository.get_recent_messages(self.key, 0), [])
+
+    def test_without_ttl(self):
+        self.repository.append_message_with_ttl(self.key, MessageDTO.user('영구'), None)
+        self.assertEqual(self.repository.redis.ttl(self.key), -1)
+
+
+@requires_fakeredis
+class IndexedDeleteTests(SimpleTestCase):
+    def setUp(self):
+        self.repository = fake_repository()
+        self.redis = self.repository.redis
+
+    def test_delete_aiperson_chats_uses_index(self):
+        keys = [self.repository.build_aiperson_key(p, 'u1') for p in ('p1', 'p2')]
+        other_user = self.repository.build_aiperson_key('p1', 'u2')
+        for key in keys + [other_user]:
+            self.repository.append_message(key, MessageDTO.user('질문'))
+        self.repository.save_summary(keys[0], '요약', 1)
+        self.redis.set(INDEX_BACKFILLED_KEY, 1)
+
+        with mock.patch.object(self.redis, 'scan_iter') as scan_iter:
+            self.repository.delete_all_aiperson_chats('u1')
+        scan_iter.assert_not_called()
+        self.assertEqual(self.redis.exists(*keys, self.repository.build_summary_key(keys[0])), 0)
+        self.assertTrue(self.redis.exists(other_user))
+        self.assertEqual(self.redis.smembers(self.repository.build_index_key('u1')), set())
+
+    def test_unindexed_keys_found_by_scan_before_backfill(self):
+        legacy = self.repository.build_aiperson_key('p1', 'u1')
+        self.redis.rpush(legacy, '{"role": "user", "content": "old"}')
+        self.repository.delete_all_aiperson_chats('u1')
+        self.assertFalse(self.redis.exists(legacy))
+
+    def test_delete_chatbot_chat_keeps_aiperson_index(self):
+        chatbot = f"{CHATBOT_KEY_PREFIX}u1"
+        aiperson = self.repository.build_aiperson_key('p1', 'u1')
+        self.repository.append_message(chatbot, MessageDTO.user('질문'))
+        self.repository.append_message(aiperson, MessageDTO.user('질문'))
+        self.repository.delete_all_chatbot_chats('u1')
+        self.assertFalse(self.redis.exists(chatbot))
+        self.assertEqual(self.redis.smembers(self.repository.build_index_key('u1')), {aiperson})
+
+    def test_backfill_registers_existing_keys(self):
+        legacy = self.repository.build_aiperson_key('p1', 'u1')
+        self.redis.rpush(legacy, '{"role": "user", "content": "old"}')
+        self.redis.hset(self.repository.build_summary_key(legacy), 'summary', '요약')
+        with mock.patch('apps.prompt.management.commands.backfill_chat_index.RedisChatRepository',
+                        return_value=self.repository):
+            call_command('backfill_chat_index', stdout=StringIO())
+        self.assertEqual(self.redis.smembers(self.repository.build_index_key('u1')), {legacy})
+        self.assertTrue(self.redis.exists(INDEX_BACKFILLED_KEY))
@@ -1,9 +1,13 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# ASGI(uvicorn) 구동 시 비동기 뷰 사용
+chat_view = views.prompt_view_async if settings.BEDROCK_ASYNC_VIEWS else views.prompt_view
+
 urlpatterns = [
-    path('character/<str:promptId>/chat', views.prompt_view, name='character-chat'),
-    path('ai-person/<str:promptId>/chat', views.prompt_view, name='prompt_chat'),
+    path('character/<str:promptId>/chat', chat_view, name='character-chat'),
+    path('ai-person/<str:promptId>/chat', chat_view, name='prompt_chat'),
     # 🆕 TTS 경로 추가
     path('prompt/speak/', views.tts_view, name='tts_speak'),
 ]
\ No newline at end of file
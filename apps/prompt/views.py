@@ -1,18 +1,30 @@
 import json
 import logging
 import os
-import boto3
 import requests
 from uuid import UUID
 from contextlib import closing
 
-from django.http import StreamingHttpResponse, JsonResponse
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 
 # Bedrock 관련 공통 모듈
+from common.bedrock import async_clients as async_bedrock
 from common.bedrock.clients import BedrockClients
-from common.bedrock.streaming import sse_event
+from common.bedrock.prompt_cache import get_compiled_prompt
+from common.bedrock.resumable import aresume_response, resumable_sse_response, resume_response, stream_owner
+from common.bedrock.streaming import (
+    INVOKE_MODEL,
+    StreamPipeline,
+    StreamResult,
+    sse_event,
+    sse_response,
+    streaming_response,
+)
+from common.decorators import async_require_http_methods
 
 # API 문서화 및 REST 프레임워크 관련
 from drf_spectacular.utils import extend_schema, OpenApiTypes
@@ -21,87 +33,136 @@ from rest_framework import serializers
 
 # 모델 및 레포지토리
 from apps.prompt.models import AIPerson
-from apps.prompt.redis_chat_repository import RedisChatRepository
+from apps.prompt.redis_chat_repository import DEFAULT_TTL, RedisChatRepository
 from apps.prompt.dto import MessageDTO
+from apps.prompt.history import load_history_context
+from apps.prompt.history_writer import get_history_writer
+from apps.prompt.person_cache import aget_person, get_person
 
 logger = logging.getLogger(__name__)
 
+# 델타 묶기는 SSE_COALESCE_* 기본값 사용 (엔드포인트별 조정은 SSE_COALESCE_ENDPOINTS)
+TEXT_PROMPT_PIPELINE = StreamPipeline(INVOKE_MODEL, name='prompt-text')
+CHAT_PROMPT_PIPELINE = StreamPipeline(INVOKE_MODEL, name='prompt-chat')
+
 from apps.prompt.models import AIPerson
 
 from dotenv import load_dotenv
 load_dotenv()
 
-@csrf_exempt
-@require_http_methods(["POST"])
-def prompt_view(request, promptId=None):
-    """Bedrock Prompt 호출 (스트리밍) - FastAPI 로직 포팅"""
-    env_prompt_arn = os.getenv('AWS_BEDROCK_AI_PERSON_ARN')
+class PromptRequestError(Exception):
+    """요청 파라미터 오류 (SSE error 이벤트로 응답)"""
+
+
+def parse_prompt_request(request, promptId=None):
+    """요청에서 (prompt_id, user_query, user_id, variables) 추출"""
+    data = json.loads(request.body)
+    
+    # promptId는 URL에서, user_query는 body에서
+    prompt_id = promptId or data.get('prompt_id')
+    user_query = data.get('message') or data.get('user_query')
+    
+    user_id = request.GET.get("userId") or data.get("userId")
+
+    if not prompt_id or not user_query:
+        raise PromptRequestError('Missing prompt_id or message')
+    
+    if not user_id:
+        raise PromptRequestError('Missing userId in query param')
     
     try:
-        data = json.loads(request.body)
-        
-        # promptId는 URL에서, user_query는 body에서
-        prompt_id = promptId or data.get('prompt_id')
-        user_query = data.get('message') or data.get('user_query')
-        
-        user_id = request.GET.get("userId") or data.get("userId")
+        user_id = UUID(user_id)
+    except ValueError:
+        raise PromptRequestError('Invalid userId')
 
-        if not prompt_id or not user_query:
-            return StreamingHttpResponse(
-                [sse_event({'type': 'error', 'message': 'Missing prompt_id or message'})],
-                content_type='text/event-stream'
-            )
-        
-        if not user_id:
-            return StreamingHttpResponse(
-                [sse_event({"type": "error", "message": "Missing userId in query param"})],
-                content_type="text/event-stream",
-            )
-        
-        try:
-            user_id = UUID(user_id)
-        except ValueError:
-            return StreamingHttpResponse(
-                [sse_event({'type': 'error', 'message': 'Invalid userId'})],
-                content_type='text/event-stream'
-            )
+    return prompt_id, user_query, user_id, data.get('variables', {})
 
-        redis_repo = RedisChatRepository()
-        history_key = redis_repo.build_aiperson_key(prompt_id, user_id)
 
-        user_msg = MessageDTO.user(user_query)
+def build_person_variables(ai_person: AIPerson) -> dict:
+    """AI 인물 정보를 프롬프트 변수로 변환"""
+    logger.info(f"Found AI Person: {ai_person.name} from {ai_person.era}")
 
-        def on_done_save(full_response: str):
-            try:
-                assistant_msg = MessageDTO.assistant(full_response)
-                redis_repo.append_message(history_key, user_msg)
-                redis_repo.append_message(history_key, assistant_msg)
-                logger.info("Saved chat history key=%s (user_len=%s, assistant_len=%s)",
-                            history_key, len(user_query), len(full_response))
-            except Exception as e:
-                logger.error("Redis save failed: %s", str(e))
-    
+    person_variables = {
+        'name': ai_person.name,
+        'era': ai_person.era,
+        'summary': ai_person.summary or '',
+        'year': str(ai_person.year) if ai_person.year else '',
+        'greeting_message': ai_person.greetingMessage or '',
+        'ex_question': ai_person.exQuestion or '',
+    }
+
+    if ai_person.latitude is not None and ai_person.longitude is not None:
+        person_variables['location'] = f"위도: {ai_person.latitude}, 경도: {ai_person.longitude}"
+
+    return person_variables
+
+
+def resolve_prompt_identifier(prompt_id: str) -> str:
+    """promptId가 ARN이면 그대로, 아니면 환경변수의 AI Person 프롬프트 사용"""
+    if prompt_id and prompt_id.startswith('arn:'):
+        prompt_identifier = prompt_id
+    else:
+        prompt_identifier = os.getenv('AWS_BEDROCK_AI_PERSON_ARN')
+
+    if not prompt_identifier:
+        logger.error("에러: 환경변수 AWS_BEDROCK_AI_PERSON을 읽지 못했습니다.")
+
+    logger.info(f"Using Prompt ARN: {prompt_identifier}")
+    return prompt_identifier
+
+
+def make_history_saver(prompt_id: str, user_id: UUID, user_query: str):
+    """스트림 완료 시 (user, assistant) 한 턴을 Redis 히스토리에 저장하는 콜백 생성"""
+    redis_repo = RedisChatRepository()
+    history_key = redis_repo.build_aiperson_key(prompt_id, user_id)
+
+    user_msg = MessageDTO.user(user_query)
+
+    def on_done_save(result: StreamResult):
+        full_response = result.text
         try:
-            ai_person = AIPerson.objects.get(promptId=prompt_id)
-            logger.info(f"Found AI Person: {ai_person.name} from {ai_person.era}")
-
-            person_variables = {
-                'name': ai_person.name,
-                'era': ai_person.era,
-                'summary': ai_person.summary or '',
-                'year': str(ai_person.year) if ai_person.year else '',
-                'greeting_message': ai_person.greetingMessage or '',
-                'ex_question': ai_person.exQuestion or '',
-            }
+            messages = [user_msg, MessageDTO.assistant(full_response)]
+            max_length = getattr(settings, 'CHAT_HISTORY_MAX_LENGTH', 0)
+            if getattr(settings, 'CHAT_HISTORY_WRITE_BEHIND', False):
+                # 큐에만 넣고 done 이벤트를 바로 보냄 (기록은 history-writer 스레드가 배치로)
+                get_history_writer().submit(history_key, messages, DEFAULT_TTL, max_length)
+            else:
+                redis_repo.append_messages(history_key, messages, DEFAULT_TTL, max_length=max_length)
+            logger.info("Saved chat history key=%s (user_len=%s, assistant_len=%s)",
+                        history_key, len(user_query), len(full_response))
+        except Exception as e:
+            logger.error("Redis save failed: %s", str(e))
 
-            if ai_person.latitude is not None and ai_person.longitude is not None:
-                person_variables['location'] = f"위도: {ai_person.latitude}, 경도: {ai_person.longitude}"
+    return on_done_save
 
+
+def error_stream_response(message: str):
+    return sse_response([sse_event({'type': 'error', 'message': message})])
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def prompt_view(request, promptId=None):
+    """Bedrock Prompt 호출 (스트리밍) - FastAPI 로직 포팅"""
+    # 끊긴 스트림 재연결 (Last-Event-ID) - Bedrock 재호출 없이 Redis에서 재생
+    resumed = resume_response(request)
+    if resumed is not None:
+        return resumed
+
+    try:
+        try:
+            prompt_id, user_query, user_id, variables = parse_prompt_request(request, promptId)
+        except PromptRequestError as e:
+            return error_stream_response(str(e))
+
+        on_done_save = make_history_saver(prompt_id, user_id, user_query)
+    
+        try:
+            person_variables = build_person_variables(get_person(prompt_id))
         except AIPerson.DoesNotExist:
             logger.warning(f"AI Person not found for prompt_id: {prompt_id}")
             person_variables = {}
 
-        variables = data.get('variables', {})
         prompt_variables = {
             "user_query": user_query,
             **person_variables,  # AI 인물 정보
@@ -110,252 +171,118 @@ def prompt_view(request, promptId=None):
 
         logger.info(f"Prompt variables: {list(prompt_variables.keys())}")
 
-        # Bedrock Agent 클라이언트
-        bedrock_agent = boto3.client(
-            service_name='bedrock-agent',
-            region_name=os.getenv('CLOUD_AWS_REGION', 'ap-northeast-2')
-        )
+        # Bedrock Agent 클라이언트 (레지스트리에서 재사용)
+        bedrock_agent = BedrockClients.get_agent(os.getenv('CLOUD_AWS_REGION', 'ap-northeast-2'))
         
-        if prompt_id and prompt_id.startswith('arn:'):
-            prompt_identifier = prompt_id
-        else:
-            prompt_identifier = env_prompt_arn
-
-        if not prompt_identifier:
-            logger.error("에러: 환경변수 AWS_BEDROCK_AI_PERSON을 읽지 못했습니다.")
-
-        logger.info(f"Using Prompt ARN: {prompt_identifier}")
+        prompt_identifier = resolve_prompt_identifier(prompt_id)
         
         try:
-            # Prompt 가져오기
-            prompt_response = bedrock_agent.get_prompt(
-                promptIdentifier=prompt_identifier
-            )
+            # 컴파일된 Prompt 가져오기 (캐시)
+            compiled = get_compiled_prompt(prompt_identifier, client=bedrock_agent)
             
-            logger.info(f"Prompt retrieved: {prompt_response.get('name', 'Unknown')}")
+            logger.info(f"Prompt retrieved: {compiled.name}, Template type: {compiled.template_type}")
             
-            variants = prompt_response.get('variants', [])
-            if not variants:
-                raise ValueError("Prompt has no variants")
-            
-            variant = variants[0]
-            template_type = variant.get('templateType', 'TEXT')
-            
-            logger.info(f"Template type: {template_type}")
-            
-            model_id = prompt_response.get('defaultModelId', 'anthropic.claude-3-5-sonnet-20240620-v1:0')
+            # 이전 대화 요약(system) + 최근 대화 윈도우(현재 질문 앞)
+            summary, history = load_history_context(prompt_id, user_id)
+
+            body = compiled.build_body(
+                prompt_variables, fallback_user_message=user_query, history=history, summary=summary
+            )
             
             # Bedrock Runtime
             bedrock_runtime = BedrockClients.get_runtime()
             
-            # TEXT 템플릿 처리
-            if template_type == 'TEXT':
-                template_config = variant.get('templateConfiguration', {})
-                template_text = template_config.get('text', {}).get('text', '')
-                
-                # 변수 치환
-                formatted_prompt = template_text
-                for var_name, var_value in prompt_variables.items():
-                    formatted_prompt = formatted_prompt.replace(f"{{{{{var_name}}}}}", str(var_value))
-                
-                logger.info(f"Formatted prompt (first 100 chars): {formatted_prompt[:100]}...")
-                
-                inference_config = variant.get('inferenceConfiguration', {})
-                
-                body = {
-                    "anthropic_version": "bedrock-2023-05-31",
-                    "max_tokens": inference_config.get('maxTokens', 4096),
-                    "temperature": inference_config.get('temperature', 1.0),
-                    "messages": [
-                        {
-                            "role": "user",
-                            "content": formatted_prompt
-                        }
-                    ]
-                }
-                
-                if 'stopSequences' in inference_config:
-                    body['stop_sequences'] = inference_config['stopSequences']
-                
-                logger.info(f"Invoking model: {model_id}")
-                
-                response = bedrock_runtime.invoke_model_with_response_stream(
-                    modelId=model_id,
-                    body=json.dumps(body)
-                )
-                
-                return StreamingHttpResponse(
-                    stream_text_prompt_response(response, on_done=on_done_save),
-                    content_type='text/event-stream'
-                )
+            logger.info(f"Invoking model: {compiled.model_id}")
             
-            # CHAT 템플릿 처리
-            elif template_type == 'CHAT':
-                template_config = variant.get('templateConfiguration', {})
-                chat_config = template_config.get('chat', {})
-                messages = chat_config.get('messages', [])
-                system_prompts = chat_config.get('system', [])
-                
-                logger.info(f"CHAT template - Messages: {len(messages)}, System prompts: {len(system_prompts)}")
-                
-                inference_config = variant.get('inferenceConfiguration', {})
-                
-                formatted_messages = []
-                for msg in messages:
-                    role = msg.get('role', 'user')
-                    content_blocks = msg.get('content', [])
-                    
-                    formatted_content = []
-                    for block in content_blocks:
-                        if 'text' in block:
-                            text = block['text']
-                            for var_name, var_value in prompt_variables.items():
-                                text = text.replace(f"{{{{{var_name}}}}}", str(var_value))
-                            if text.strip():
-                                formatted_content.append({"type": "text", "text": text})
-                    
-                    if formatted_content:
-                        content_text = " ".join([c['text'] for c in formatted_content if 'text' in c])
-                        if content_text.strip():
-                            formatted_messages.append({
-                                "role": role,
-                                "content": content_text
-                            })
-                
-                # user 메시지가 없거나 마지막이 user가 아니면 추가
-                if not formatted_messages or formatted_messages[-1].get('role') != 'user':
-                    formatted_messages.append({
-                        "role": "user",
-                        "content": user_query
-                    })
-                elif formatted_messages and not formatted_messages[0].get('content', '').strip():
-                    formatted_messages[0]['content'] = user_query
-                
-                logger.info(f"Formatted {len(formatted_messages)} messages")
-                
-                body = {
-                    "anthropic_version": "bedrock-2023-05-31",
-                    "max_tokens": inference_config.get('maxTokens', 4096),
-                    "temperature": inference_config.get('temperature', 1.0),
-                    "messages": formatted_messages
-                }
-                
-                # System prompt 처리
-                if system_prompts:
-                    system_text = []
-                    for sys_prompt in system_prompts:
-                        if 'text' in sys_prompt:
-                            text = sys_prompt['text']
-                            for var_name, var_value in prompt_variables.items():
-                                text = text.replace(f"{{{{{var_name}}}}}", str(var_value))
-                            system_text.append(text)
-                    
-                    if system_text:
-                        body['system'] = " ".join(system_text)
-                
-                if 'stopSequences' in inference_config:
-                    body['stop_sequences'] = inference_config['stopSequences']
-                
-                logger.info(f"Invoking model: {model_id}")
-                
-                response = bedrock_runtime.invoke_model_with_response_stream(
-                    modelId=model_id,
-                    body=json.dumps(body)
-                )
-                
-                return StreamingHttpResponse(
-                    stream_chat_prompt_response(response, on_done=on_done_save),
-                    content_type='text/event-stream'
-                )
+            response = bedrock_runtime.invoke_model_with_response_stream(
+                modelId=compiled.model_id,
+                body=json.dumps(body)
+            )
             
+            if compiled.template_type == 'TEXT':
+                stream = TEXT_PROMPT_PIPELINE.stream(response, on_done=on_done_save)
             else:
-                raise ValueError(f"Unsupported template type: {template_type}")
+                stream = CHAT_PROMPT_PIPELINE.stream(response, on_done=on_done_save)
+            
+            return resumable_sse_response(stream, stream_owner(request))
         
         except bedrock_agent.exceptions.ResourceNotFoundException:
             error_msg = f"Prompt not found: {prompt_id}"
             logger.error(error_msg)
-            return StreamingHttpResponse(
-                [sse_event({'type': 'error', 'message': error_msg})],
-                content_type='text/event-stream'
-            )
+            return error_stream_response(error_msg)
         
     except Exception as e:
         logger.error(f"Prompt error: {str(e)}")
         import traceback
         logger.error(f"Traceback: {traceback.format_exc()}")
-        return StreamingHttpResponse(
-            [sse_event({'type': 'error', 'message': str(e)})],
-            content_type='text/event-stream'
-        )
-
-def stream_text_prompt_response(response, on_done=None):
-    """TEXT 템플릿 스트리밍 응답"""
-    full_text = ""
-    
-    try:
-        for event in response['body']:
-            chunk = json.loads(event['chunk']['bytes'])
-            
-            if chunk['type'] == 'content_block_delta':
-                text = chunk['delta'].get('text', '')
-                if text:
-                    full_text += text
-                    yield sse_event({'type': 'content', 'text': text})
-                    logger.info(f"Sent text chunk: {text[:30]}...")
-            
-            elif chunk['type'] == 'message_stop':
-                logger.info(f"Message stop received")
-        
-        logger.info(f"Stream complete. Total text length: {len(full_text)}")
-        
-        if callable(on_done):
-            on_done(full_text)
-        
-        yield sse_event({'type': 'done', 'total_length': len(full_text)})
-        
-    except Exception as e:
-        logger.error(f"Streaming error: {str(e)}")
-        yield sse_event({'type': 'error', 'message': str(e)})
-
-def stream_chat_prompt_response(response, on_done=None):
-    """CHAT 템플릿 스트리밍 응답 (버퍼링)"""
-    full_text = ""
-    buffer = ""
-    buffer_size = 10
-    
+        return error_stream_response(str(e))
+
+
+@csrf_exempt
+@async_require_http_methods(["POST"])
+async def prompt_view_async(request, promptId=None):
+    """Bedrock Prompt 호출 (비동기 스트리밍) - ASGI 전용"""
+    resumed = await aresume_response(request)
+    if resumed is not None:
+        return resumed
+
     try:
-        for event in response['body']:
-            chunk = json.loads(event['chunk']['bytes'])
-            
-            if chunk['type'] == 'content_block_delta':
-                text = chunk['delta'].get('text', '')
-                if text:
-                    full_text += text
-                    buffer += text
-                    if len(buffer) >= buffer_size:
-                        yield sse_event({'type': 'content', 'text': buffer})
-                        logger.info(f"Sent text chunk: {buffer[:30]}...")
-                        buffer = ""
-            
-            elif chunk['type'] == 'message_stop':
-                logger.info(f"Message stop received")
-        
-        # 남은 버퍼 전송
-        if buffer:
-            yield sse_event({'type': 'content', 'text': buffer})
-            logger.info(f"Sent final buffer: {buffer[:30]}...")
-        
-        logger.info(f"Stream complete. Total text length: {len(full_text)}")
-        
-        if callable(on_done):
-            on_done(full_text)
-        
-        yield sse_event({'type': 'done', 'total_length': len(full_text)})
-        
+        try:
+            prompt_id, user_query, user_id, variables = parse_prompt_request(request, promptId)
+        except PromptRequestError as e:
+            return error_stream_response(str(e))
+
+        on_done_save = make_history_saver(prompt_id, user_id, user_query)
+
+        try:
+            person_variables = build_person_variables(await aget_person(prompt_id))
+        except AIPerson.DoesNotExist:
+            logger.warning(f"AI Person not found for prompt_id: {prompt_id}")
+            person_variables = {}
+
+        prompt_variables = {
+            "user_query": user_query,
+            **person_variables,
+            **variables
+        }
+
+        bedrock_agent = BedrockClients.get_agent(os.getenv('CLOUD_AWS_REGION', 'ap-northeast-2'))
+
+        prompt_identifier = resolve_prompt_identifier(prompt_id)
+
+        try:
+            # 캐시 miss일 때만 get_prompt 호출이 발생하므로 별도 스레드에서 조회
+            compiled = await sync_to_async(get_compiled_prompt, thread_sensitive=False)(
+                prompt_identifier, client=bedrock_agent
+            )
+
+            # 이전 대화 요약(system) + 최근 대화 윈도우(현재 질문 앞)
+            summary, history = await sync_to_async(load_history_context, thread_sensitive=False)(prompt_id, user_id)
+
+            body = compiled.build_body(
+                prompt_variables, fallback_user_message=user_query, history=history, summary=summary
+            )
+
+            logger.info(f"Invoking model (async): {compiled.model_id}")
+
+            response = await async_bedrock.invoke_model_with_response_stream(compiled.model_id, body)
+
+            if compiled.template_type == 'TEXT':
+                stream = TEXT_PROMPT_PIPELINE.astream(response, on_done=on_done_save)
+            else:
+                stream = CHAT_PROMPT_PIPELINE.astream(response, on_done=on_done_save)
+
+            return resumable_sse_response(stream, stream_owner(request))
+
+        except bedrock_agent.exceptions.ResourceNotFoundException:
+            error_msg = f"Prompt not found: {prompt_id}"
+            logger.error(error_msg)
+            return error_stream_response(error_msg)
+
     except Exception as e:
-        logger.error(f"Streaming error: {str(e)}")
-        yield sse_event({'type': 'error', 'message': str(e)})
-        
+        logger.error(f"Prompt error: {str(e)}", exc_info=True)
+        return error_stream_response(str(e))
+
         
 # TTS
 class TTSSerializer(serializers.Serializer):
@@ -396,7 +323,7 @@ def tts_view(request):
         
         if prompt_id:
             try:
-                person = AIPerson.objects.get(promptId=prompt_id)
+                person = get_person(prompt_id)
                 logger.info(f"   ✅ 인물 찾음: {person.name}")
                 
                 if person.voiceId:
@@ -489,7 +416,7 @@ def tts_view(request):
             if content_length:
                 logger.info(f"   - 오디오 파일 크기: {int(content_length) / 1024:.2f} KB")
             
-            res = StreamingHttpResponse(
+            res = streaming_response(
                 response.iter_content(chunk_size=8192), 
                 content_type='audio/mpeg'
             )
@@ -0,0 +1,156 @@
+"""
+Agent Chat Intent 캐시
+
+같은 질문("임진왜란 알려줘", "세종대왕이랑 대화하고 싶어")이 반복될 때마다 Converse를 부르지 않도록
+정규화한 질문을 키로 라우팅 결과(tool_call 이름/입력 또는 KB)를 캐싱합니다.
+
+- 정규화: common.text.normalize_query (구두점·조사·공백 제거)
+- 1차: 프로세스 내 LRU (OrderedDict), 2차: Redis (워커 간 공유, 선택)
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from django.conf import settings
+
+from common.text import normalize_query
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY_PREFIX = 'router:intent'
+
+class IntentCache:
+    def __init__(self, max_size: int = 2048, ttl: int = 3600, use_redis: bool = False):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.use_redis = use_redis
+
+        self._entries: "OrderedDict[str, Tuple[dict, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # 여러 스레드가 동시에 갱신하므로 카운터는 별도 락으로 보호
+        self._stats = {'hits': 0, 'misses': 0, 'redis_hits': 0, 'evictions': 0}
+        self._stats_lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls) -> "IntentCache":
+        return cls(
+            max_size=getattr(settings, 'ROUTER_INTENT_CACHE_MAX_SIZE', 2048),
+            ttl=getattr(settings, 'ROUTER_INTENT_CACHE_TTL', 3600),
+            use_redis=getattr(settings, 'ROUTER_INTENT_CACHE_REDIS', True),
+        )
+
+    def get(self, query: str) -> Optional[dict]:
+        """캐시된 라우팅 결과 (없으면 None)"""
+        key = normalize_query(query)
+        if not key:
+            return None
+
+        result = self._get_local(key)
+        if result is None:
+            result = self._get_redis(key)
+            if result is not None:
+                self._count('redis_hits')
+                self._set_local(key, result)
+
+        if result is None:
+            self._count('misses')
+            return None
+        self._count('hits')
+        logger.info(f"Intent 캐시 hit: {key} -> {result.get('action', 'knowledge_base')}")
+        return result
+
+    def put(self, query: str, result: dict):
+        """Converse 라우팅 결과 저장 (tool_call은 이름/입력만, 텍스트는 KB 라우팅 표시만)"""
+        key = normalize_query(query)
+        if not key:
+            return
+        if result.get('type') == 'tool_call':
+            entry = {"type": "tool_call", "action": result['action'], "input": result.get('input', {})}
+        else:
+            entry = {"type": "text", "content": ""}
+        self._set_local(key, entry)
+        self._set_redis(key, entry)
+
+    def clear(self):
+        """프로세스 내 캐시 전체 비우기 (Redis 티어는 TTL로 만료)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        total = stats['hits'] + stats['misses']
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            **stats,
+            "hit_rate": round(stats['hits'] / total, 4) if total else 0.0,
+        }
+
+    # ----- 내부 구현 -----
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def _get_local(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def _set_local(self, key: str, result: dict):
+        with self._lock:
+            self._entries[key] = (result, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._count('evictions')
+
+    def _redis(self):
+        from common.redis.redis_client import get_redis_client
+        return get_redis_client()
+
+    def _redis_key(self, key: str) -> str:
+        return f"{REDIS_KEY_PREFIX}:{hashlib.sha1(key.encode('utf-8')).hexdigest()}"
+
+    def _get_redis(self, key: str) -> Optional[dict]:
+        if not self.use_redis:
+            return None
+        try:
+            raw = self._redis().get(self._redis_key(key))
+            return json.loads(raw) if raw else None
+        except Exception as e:
+            logger.warning(f"Intent 캐시 Redis 조회 실패: {str(e)}")
+            return None
+
+    def _set_redis(self, key: str, result: dict):
+        if not self.use_redis:
+            return
+        try:
+            self._redis().set(self._redis_key(key), json.dumps(result, ensure_ascii=False), ex=self.ttl)
+        except Exception as e:
+            logger.warning(f"Intent 캐시 Redis 저장 실패: {str(e)}")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_intent_cache() -> IntentCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = IntentCache.from_settings()
+    return _cache
@@ -0,0 +1,227 @@
+"""
+로컬 Intent 사전 분류기 (Converse 호출 전 fast-path)
+
+표면 형태만으로 분명한 요청은 Bedrock Converse 왕복 없이 바로 라우팅합니다.
+
+- navigate_to_person: "XXX한테 말걸어줘" 류 패턴 + AIPerson 이름 인덱스에 있는 인물
+- navigate_to_war: 질문에 전쟁 사전(gazetteer)의 전쟁이 하나만 나올 때
+- Knowledge Base: "XXX에 대해 알려줘", "XXX가 뭐야?" 류 정보 요청
+  (정보 요청 패턴만으로는 도구 호출을 배제할 수 없으므로 임계값 미만 - Converse로 넘기되
+  추측 KB 호출(ROUTER_SPECULATIVE_KB)의 근거로만 사용)
+
+confidence가 ROUTER_PREROUTE_THRESHOLD 미만이면 Converse로 넘기고, 이때 로컬 추정과
+Converse 결과의 일치 여부를 규칙별로 집계합니다. 확신한 경우도 ROUTER_PREROUTE_SHADOW_RATE 비율만큼
+백그라운드에서 Converse를 호출해 비교하므로, 로그/metrics의 일치율로 임계값을 조정할 수 있습니다.
+"""
+import logging
+import random
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from django.conf import settings
+
+from apps.tools.definitions import TOOL_NAVIGATE_TO_PERSON, TOOL_NAVIGATE_TO_WAR
+from apps.tools.gazetteer import GAZETTEER, NAVIGABLE_KINDS
+from apps.tools.name_index import get_name_index, normalize_name
+
+logger = logging.getLogger(__name__)
+
+# 정보 요청 패턴 confidence - 기본 임계값(0.85)보다 낮게 두어 fast-path로 확정되지 않도록
+INFO_CONFIDENCE = 0.6
+
+# 정규화(공백 제거, 소문자)된 질문 기준 패턴
+CHAT_PATTERN = re.compile(
+    r"(님)?(한테|에게|께|이랑|랑|하고|와|과)(말을?걸|대화|문자|채팅|얘기|이야기|연락|톡)"
+)
+INFO_PATTERN = re.compile(
+    r"(에대해|에대한|뭐야|뭐였|뭔가|무엇|알려줘|알려주|설명|누구|왜|어떻게|언제|어디|의미|영향|원인|결과)"
+)
+
+KB_RESULT = {"type": "text", "content": ""}
+
+
+@dataclass
+class RouteDecision:
+    result: Optional[dict]
+    confidence: float
+    rule: str
+
+    @property
+    def action(self) -> str:
+        if not self.result or self.result.get('type') != 'tool_call':
+            return 'knowledge_base'
+        return self.result['action']
+
+
+def tool_call(action: str, tool_input: dict) -> dict:
+    """ConverseClient.invoke_with_tools와 같은 형식의 결과"""
+    return {"type": "tool_call", "action": action, "input": tool_input}
+
+
+class PreRouter:
+    def __init__(self, threshold: float = 0.85, shadow_rate: float = 0.0, log_every: int = 100,
+                 use_person_index: bool = True):
+        self.threshold = threshold
+        self.shadow_rate = shadow_rate
+        self.log_every = log_every
+        self.use_person_index = use_person_index
+        self._lock = threading.Lock()
+        self._executor = None
+        self._stats = {'fast': 0, 'fallback': 0, 'shadow_failed': 0}
+        self._agreement = {}
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            threshold=getattr(settings, 'ROUTER_PREROUTE_THRESHOLD', 0.85),
+            shadow_rate=getattr(settings, 'ROUTER_PREROUTE_SHADOW_RATE', 0.05),
+            log_every=getattr(settings, 'ROUTER_PREROUTE_LOG_EVERY', 100),
+            use_person_index=getattr(settings, 'AIPERSON_CACHE_ENABLED', True),
+        )
+
+    def classify(self, query: str) -> RouteDecision:
+        """질문 표면 형태로 라우팅 추정 (ORM 캐시를 읽을 수 있으므로 동기 컨텍스트에서 호출)"""
+        text = normalize_name(query)
+        chat = CHAT_PATTERN.search(text)
+
+        if chat:
+            person = self._person_before(text, chat.start()) if self.use_person_index else None
+            if person is not None:
+                return RouteDecision(
+                    tool_call(TOOL_NAVIGATE_TO_PERSON, {"person_name": person.name}), 0.95, 'person_pattern'
+                )
+            # 대화 요청이지만 모르는 인물 - Converse가 판단
+            return RouteDecision(None, 0.0, 'person_unknown')
+
+        wars = GAZETTEER.find_in(query, kinds=NAVIGABLE_KINDS)
+        # "임진왜란 때 한산도 대첩" - 상위 전쟁과 전투가 함께 나오면 전투로
+        parents = {war.get('parent') for war in wars}
+        wars = [war for war in wars if war['name'] not in parents]
+        if len(wars) == 1:
+            war = wars[0]
+            return RouteDecision(
+                tool_call(TOOL_NAVIGATE_TO_WAR, GAZETTEER.resolve_war_params({"war_name": war['name']})),
+                0.9, 'war_gazetteer'
+            )
+        if len(wars) > 1:
+            return RouteDecision(None, 0.0, 'war_ambiguous')
+
+        if INFO_PATTERN.search(text):
+            return RouteDecision(KB_RESULT, INFO_CONFIDENCE, 'info_pattern')
+
+        return RouteDecision(KB_RESULT, 0.5, 'default_kb')
+
+    def _person_before(self, text: str, position: int):
+        """조사 바로 앞에서 끝나는 인물 이름/별칭"""
+        best = None
+        for start, end, person in get_name_index().find_all_in(text):
+            if end == position and (best is None or end - start > best[0]):
+                best = (end - start, person)
+        return best[1] if best else None
+
+    def is_confident(self, decision: RouteDecision) -> bool:
+        return decision.result is not None and decision.confidence >= self.threshold
+
+    # ---- 일치율 집계 ----
+
+    def record_fast(self, query: str, decision: RouteDecision, converse: Callable[[], dict]):
+        """fast-path로 라우팅한 요청 - 일부는 백그라운드에서 Converse와 비교"""
+        self._count('fast')
+        logger.info(f"Pre-router 라우팅: {decision.action} (rule={decision.rule}, confidence={decision.confidence})")
+        if self.shadow_rate <= 0 or random.random() >= self.shadow_rate:
+            return
+        self._get_executor().submit(self._shadow_check, query, decision, converse)
+
+    def record_fallback(self, decision: RouteDecision, result: dict):
+        """Converse로 넘긴 요청 - 로컬 추정이 있었다면 일치 여부 집계"""
+        self._count('fallback')
+        if decision.result is not None:
+            self._record_agreement(decision, result)
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _shadow_check(self, query: str, decision: RouteDecision, converse: Callable[[], dict]):
+        try:
+            result = converse()
+        except Exception as e:
+            self._count('shadow_failed')
+            logger.warning(f"Pre-router shadow 호출 실패: {str(e)}")
+            return
+        if not self._record_agreement(decision, result):
+            logger.info(f"Pre-router 불일치: '{query[:50]}' local={decision.action} converse={self._action_of(result)}")
+
+    def _record_agreement(self, decision: RouteDecision, result: dict) -> bool:
+        agreed = self._agrees(decision.result, result)
+        with self._lock:
+            counts = self._agreement.setdefault(decision.rule, {'checked': 0, 'agreed': 0})
+            counts['checked'] += 1
+            counts['agreed'] += int(agreed)
+            total = sum(c['checked'] for c in self._agreement.values())
+        if self.log_every and total % self.log_every == 0:
+            logger.info(f"Pre-router 일치율: {self.agreement_rates()}")
+        return agreed
+
+    @staticmethod
+    def _action_of(result: dict) -> str:
+        if not result or result.get('type') != 'tool_call':
+            return 'knowledge_base'
+        return result.get('action')
+
+    def _agrees(self, local: dict, remote: dict) -> bool:
+        action = self._action_of(local)
+        if action != self._action_of(remote):
+            return False
+        if action == TOOL_NAVIGATE_TO_PERSON:
+            remote_name = remote['input'].get('person_name', '')
+            if not self.use_person_index:
+                return normalize_name(remote_name) == normalize_name(local['input']['person_name'])
+            resolved = get_name_index().resolve(remote_name)
+            return resolved is not None and resolved.name == local['input']['person_name']
+        if action == TOOL_NAVIGATE_TO_WAR:
+            war = GAZETTEER.lookup(remote['input'].get('war_name', ''))
+            return war is not None and war['name'] == local['input']['war_name']
+        return True
+
+    def agreement_rates(self) -> dict:
+        with self._lock:
+            return {
+                rule: round(c['agreed'] / c['checked'], 3) if c['checked'] else None
+                for rule, c in self._agreement.items()
+            }
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='preroute-shadow')
+        return self._executor
+
+    def stats(self) -> dict:
+        with self._lock:
+            agreement = {rule: dict(c) for rule, c in self._agreement.items()}
+            stats = dict(self._stats)
+        return {
+            **stats,
+            'threshold': self.threshold,
+            'shadow_rate': self.shadow_rate,
+            'agreement': agreement,
+            'agreement_rates': self.agreement_rates(),
+        }
+
+
+_pre_router = None
+_pre_router_lock = threading.Lock()
+
+
+def get_pre_router() -> PreRouter:
+    global _pre_router
+    if _pre_router is None:
+        with _pre_router_lock:
+            if _pre_router is None:
+                _pre_router = PreRouter.from_settings()
+    return _pre_router
@@ -0,0 +1,158 @@
+"""
+Knowledge Base 투기적(speculative) 호출
+
+Converse Intent Detection과 동시에 KB 스트림(apps.knowledge.retrieval.start_kb_stream)을 시작해, 일반 질문이면
+두 모델 지연이 직렬로 쌓이지 않게 합니다. 의도가 KB(또는 같은 질문으로 KB를 쓰는 navigate_to_war)면
+그 응답을 그대로 쓰고, navigate_to_person 등으로 판명되면 취소합니다.
+
+- 아직 시작 전이면 호출 자체를 취소 (cancelled_early)
+- 이미 요청이 나갔으면 응답 스트림을 닫음 (wasted - 비용이 발생한 호출)
+  비동기 호출은 응답을 받는 순간 취소돼도 스트림이 버려지지 않도록 실제 호출을 shield로 감싸고,
+  취소되면 응답이 도착하는 대로 닫음
+- stats()는 /metrics에서 started/used/wasted 등을 노출
+
+비용이 드는 호출이므로 기본으로 꺼져 있고(ROUTER_SPECULATIVE_KB), 켜더라도 로컬 사전 분류가 KB 쪽으로
+ROUTER_SPECULATIVE_KB_MIN_CONFIDENCE 이상일 때만 시작합니다 (apps.router.views.start_speculative_kb).
+"""
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from apps.knowledge.retrieval import astart_kb_stream, start_kb_stream
+
+logger = logging.getLogger(__name__)
+
+_stats = {'started': 0, 'used': 0, 'wasted': 0, 'cancelled_early': 0, 'failed': 0}
+_stats_lock = threading.Lock()
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# 취소 후 응답을 기다렸다 닫는 호출 (GC 방지용 참조)
+_closing = set()
+
+
+def _count(name: str):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'ROUTER_SPECULATIVE_KB_WORKERS', 8),
+                    thread_name_prefix='speculative-kb',
+                )
+    return _executor
+
+
+def _close_response(started):
+    """받아 둔 KB 응답 스트림을 읽지 않고 닫음 (started: start_kb_stream의 (pipeline, response))"""
+    try:
+        pipeline, response = started
+        stream = response.get(pipeline.source.stream_key) if response else None
+        if stream is not None:
+            stream.close()
+    except Exception as e:
+        logger.warning(f"투기적 KB 스트림 종료 실패: {str(e)}")
+
+
+def _close_finished(future):
+    """완료된 start_kb_stream 호출의 응답 스트림을 닫음 (실패/취소면 닫을 것이 없음)"""
+    if not future.cancelled() and future.exception() is None:
+        _close_response(future.result())
+
+
+def speculation_enabled() -> bool:
+    return getattr(settings, 'ROUTER_SPECULATIVE_KB', False)
+
+
+def speculation_min_confidence() -> float:
+    return getattr(settings, 'ROUTER_SPECULATIVE_KB_MIN_CONFIDENCE', 0.6)
+
+
+class SpeculativeKBCall:
+    """스레드 풀에서 미리 시작한 KB 스트림 호출"""
+
+    def __init__(self, kb_request: dict, pipeline):
+        self._state = 'pending'
+        self._future = _get_executor().submit(start_kb_stream, kb_request, pipeline)
+        _count('started')
+
+    def result(self):
+        """(pipeline, KB 응답) 사용 (호출 실패 시 예외 그대로 전달)"""
+        self._state = 'used'
+        try:
+            response = self._future.result()
+        except Exception:
+            _count('failed')
+            raise
+        _count('used')
+        return response
+
+    def cancel(self):
+        """결과를 쓰지 않기로 함 (result() 이후 호출하면 무시)"""
+        if self._state != 'pending':
+            return
+        self._state = 'cancelled'
+        if self._future.cancel():
+            _count('cancelled_early')
+            return
+        _count('wasted')
+        self._future.add_done_callback(_close_finished)
+
+
+class AsyncSpeculativeKBCall:
+    """이벤트 루프에서 미리 시작한 KB 스트림 호출 (ASGI 전용)"""
+
+    def __init__(self, kb_request: dict, pipeline):
+        self._state = 'pending'
+        self._task = asyncio.ensure_future(self._start(kb_request, pipeline))
+        _count('started')
+
+    @staticmethod
+    async def _start(kb_request: dict, pipeline):
+        # 응답이 도착한 직후 취소되면 CancelledError에 응답이 버려져 스트림이 열린 채 남으므로
+        # 실제 호출은 끝까지 받은 뒤 닫음
+        call = asyncio.ensure_future(astart_kb_stream(kb_request, pipeline))
+        try:
+            return await asyncio.shield(call)
+        except asyncio.CancelledError:
+            _closing.add(call)
+            call.add_done_callback(_close_finished)
+            call.add_done_callback(_closing.discard)
+            raise
+
+    async def result(self):
+        self._state = 'used'
+        try:
+            response = await self._task
+        except Exception:
+            _count('failed')
+            raise
+        _count('used')
+        return response
+
+    def cancel(self):
+        if self._state != 'pending':
+            return
+        self._state = 'cancelled'
+        if not self._task.done():
+            # 응답 헤더를 기다리는 중이면 요청이 이미 나갔을 수 있으므로 wasted로 집계
+            self._task.cancel()
+            _count('wasted')
+            return
+        _count('wasted')
+        if not self._task.cancelled() and self._task.exception() is None:
+            _close_response(self._task.result())
+
+
+def stats() -> dict:
+    with _stats_lock:
+        return {**_stats, 'enabled': speculation_enabled()}
@@ -0,0 +1,55 @@
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from apps.router.intent_cache import IntentCache
+
+TOOL_CALL = {'type': 'tool_call', 'action': 'navigate_to_person', 'input': {'person_name': '이순신'}}
+
+
+class IntentCacheTests(SimpleTestCase):
+    def test_normalized_query_hits(self):
+        cache = IntentCache()
+        cache.put('이순신이랑 대화하고 싶어!', TOOL_CALL)
+        self.assertEqual(cache.get('이순신 대화하고 싶어'), TOOL_CALL)
+        self.assertIsNone(cache.get('세종대왕 대화하고 싶어'))
+        self.assertEqual((cache.stats()['hits'], cache.stats()['misses']), (1, 1))
+
+    def test_text_answer_stored_as_kb_route(self):
+        cache = IntentCache()
+        cache.put('임진왜란 알려줘', {'type': 'text', 'content': '긴 답변'})
+        self.assertEqual(cache.get('임진왜란 알려줘'), {'type': 'text', 'content': ''})
+
+    def test_ttl_and_lru(self):
+        cache = IntentCache(max_size=1, ttl=10)
+        with mock.patch('apps.router.intent_cache.time.monotonic', return_value=0):
+            cache.put('질문 하나', TOOL_CALL)
+            cache.put('질문 둘', TOOL_CALL)
+        self.assertEqual(cache.stats()['evictions'], 1)
+        with mock.patch('apps.router.intent_cache.time.monotonic', return_value=20):
+            self.assertIsNone(cache.get('질문 둘'))
+
+    def test_redis_tier_shared(self):
+        store = {}
+        redis = mock.Mock(get=store.get, set=lambda key, value, ex: store.__setitem__(key, value))
+        writer, reader = IntentCache(use_redis=True), IntentCache(use_redis=True)
+        with mock.patch.object(IntentCache, '_redis', return_value=redis):
+            writer.put('임진왜란 알려줘', TOOL_CALL)
+            self.assertEqual(reader.get('임진왜란을 알려줘'), TOOL_CALL)
+        self.assertEqual(reader.stats()['redis_hits'], 1)
+
+    def test_concurrent_lookups_counted_exactly(self):
+        cache = IntentCache()
+        cache.put('질문', TOOL_CALL)
+
+        def read():
+            for _ in range(500):
+                cache.get('질문')
+
+        threads = [threading.Thread(target=read) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(cache.stats()['hits'], 4000)
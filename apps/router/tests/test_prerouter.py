@@ -0,0 +1,82 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from apps.router import prerouter, views
+from apps.router.prerouter import PreRouter, tool_call
+from apps.tools.definitions import TOOL_NAVIGATE_TO_PERSON, TOOL_NAVIGATE_TO_WAR
+from apps.tools.name_index import DEFAULT_ALIASES, NameIndex
+
+PERSONS = [SimpleNamespace(name='이순신'), SimpleNamespace(name='세종대왕')]
+
+
+def name_index():
+    return mock.patch.object(prerouter, 'get_name_index', return_value=NameIndex(PERSONS, DEFAULT_ALIASES))
+
+
+class ClassifyTests(SimpleTestCase):
+    def setUp(self):
+        self.router = PreRouter(threshold=0.85)
+
+    def test_person_pattern(self):
+        with name_index():
+            decision = self.router.classify('충무공한테 말 걸어줘')
+        self.assertEqual(decision.result, tool_call(TOOL_NAVIGATE_TO_PERSON, {'person_name': '이순신'}))
+        self.assertTrue(self.router.is_confident(decision))
+
+    def test_unknown_person_goes_to_converse(self):
+        with name_index():
+            decision = self.router.classify('홍길동한테 말 걸어줘')
+        self.assertEqual(decision.rule, 'person_unknown')
+        self.assertFalse(self.router.is_confident(decision))
+
+    def test_single_war(self):
+        decision = self.router.classify('임진왜란 지도 보여줘')
+        self.assertEqual(decision.action, TOOL_NAVIGATE_TO_WAR)
+        self.assertEqual(decision.result['input']['year'], 1592)
+        self.assertTrue(self.router.is_confident(decision))
+
+    def test_battle_preferred_over_parent_war(self):
+        decision = self.router.classify('임진왜란 때 한산도 대첩')
+        self.assertEqual(decision.result['input']['war_name'], '한산도 대첩')
+
+    def test_info_pattern_is_not_confident(self):
+        # 정보 요청 패턴은 도구 호출을 배제하지 못함 -> Converse가 판단
+        for query in ('조선의 과거제도에 대해 알려줘', '세종대왕은 왜 한글을 만들었어?'):
+            decision = self.router.classify(query)
+            self.assertEqual((decision.action, decision.rule), ('knowledge_base', 'info_pattern'))
+            self.assertLess(decision.confidence, self.router.threshold)
+            self.assertFalse(self.router.is_confident(decision))
+
+    def test_default_kb(self):
+        decision = self.router.classify('오늘 점심 메뉴')
+        self.assertEqual(decision.rule, 'default_kb')
+        self.assertFalse(self.router.is_confident(decision))
+
+
+class AgreementTests(SimpleTestCase):
+    def test_fallback_records_agreement(self):
+        router = PreRouter(use_person_index=False)
+        decision = router.classify('조선의 과거제도에 대해 알려줘')
+        router.record_fallback(decision, {'type': 'text', 'content': ''})
+        router.record_fallback(decision, tool_call(TOOL_NAVIGATE_TO_WAR, {'war_name': '임진왜란'}))
+        self.assertEqual(router.stats()['agreement']['info_pattern'], {'checked': 2, 'agreed': 1})
+        self.assertEqual(router.agreement_rates()['info_pattern'], 0.5)
+        self.assertEqual(router.stats()['fallback'], 2)
+
+    def test_war_agreement_uses_gazetteer_alias(self):
+        router = PreRouter()
+        decision = router.classify('임진왜란 지도 보여줘')
+        self.assertTrue(router._agrees(decision.result, tool_call(TOOL_NAVIGATE_TO_WAR, {'war_name': '임진 왜란'})))
+
+
+class ClassifyLocallyTests(SimpleTestCase):
+    @override_settings(ROUTER_PREROUTE_ENABLED=False)
+    def test_disabled(self):
+        self.assertEqual(views.classify_locally('임진왜란 지도 보여줘').rule, 'disabled')
+
+    @override_settings(ROUTER_PREROUTE_ENABLED=True)
+    def test_enabled(self):
+        with mock.patch.object(views, 'get_pre_router', return_value=PreRouter()):
+            self.assertEqual(views.classify_locally('임진왜란 지도 보여줘').rule, 'war_gazetteer')
@@ -0,0 +1,177 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from apps.router import speculative, views
+from apps.router.prerouter import KB_RESULT, RouteDecision, tool_call
+from apps.router.speculative import AsyncSpeculativeKBCall, SpeculativeKBCall
+
+
+def started():
+    stream = mock.Mock()
+    pipeline = SimpleNamespace(source=SimpleNamespace(stream_key='stream'))
+    return (pipeline, {'stream': stream}), stream
+
+
+class SyncCallTests(SimpleTestCase):
+    def test_cancel_after_start_closes_stream(self):
+        result, stream = started()
+        release = threading.Event()
+
+        def start_kb_stream(kb_request, pipeline):
+            release.wait(5)
+            return result
+
+        with mock.patch.object(speculative, 'start_kb_stream', start_kb_stream):
+            call = SpeculativeKBCall({}, None)
+            call.cancel()
+            release.set()
+            call._future.result(5)
+        stream.close.assert_called_once()
+
+    def test_result_returns_response(self):
+        result, stream = started()
+        with mock.patch.object(speculative, 'start_kb_stream', return_value=result):
+            call = SpeculativeKBCall({}, None)
+            self.assertIs(call.result(), result)
+            call.cancel()
+        stream.close.assert_not_called()
+
+
+class AsyncCallTests(SimpleTestCase):
+    def test_cancel_while_waiting_closes_late_response(self):
+        result, stream = started()
+
+        async def scenario():
+            release = asyncio.Event()
+
+            async def astart_kb_stream(kb_request, pipeline):
+                await release.wait()
+                return result
+
+            with mock.patch.object(speculative, 'astart_kb_stream', astart_kb_stream):
+                call = AsyncSpeculativeKBCall({}, None)
+                await asyncio.sleep(0)
+                call.cancel()
+                await asyncio.sleep(0)
+                self.assertTrue(call._task.cancelled())
+                release.set()
+                for _ in range(5):
+                    await asyncio.sleep(0)
+
+        asyncio.run(scenario())
+        stream.close.assert_called_once()
+
+    def test_cancel_when_response_already_arrived(self):
+        result, stream = started()
+
+        async def scenario():
+            arrived = asyncio.get_running_loop().create_future()
+
+            async def astart_kb_stream(kb_request, pipeline):
+                return await arrived
+
+            with mock.patch.object(speculative, 'astart_kb_stream', astart_kb_stream):
+                call = AsyncSpeculativeKBCall({}, None)
+                await asyncio.sleep(0)
+                # 응답은 도착했지만 task가 아직 재개되기 전에 취소
+                arrived.set_result(result)
+                call.cancel()
+                for _ in range(5):
+                    await asyncio.sleep(0)
+
+        asyncio.run(scenario())
+        stream.close.assert_called_once()
+
+    def test_result(self):
+        result, stream = started()
+
+        async def scenario():
+            async def astart_kb_stream(kb_request, pipeline):
+                return result
+
+            with mock.patch.object(speculative, 'astart_kb_stream', astart_kb_stream):
+                return await AsyncSpeculativeKBCall({}, None).result()
+
+        self.assertIs(asyncio.run(scenario()), result)
+        stream.close.assert_not_called()
+
+
+@override_settings(ROUTER_SPECULATIVE_KB=True, ROUTER_SPECULATIVE_KB_MIN_CONFIDENCE=0.6)
+class StartSpeculativeKBTests(SimpleTestCase):
+    def start(self, decision):
+        call_class = mock.Mock()
+        with mock.patch.object(views, 'build_kb_request', return_value={'input': {}}):
+            return views.start_speculative_kb('질문', decision, call_class)
+
+    def test_starts_for_info_pattern(self):
+        self.assertIsNotNone(self.start(RouteDecision(KB_RESULT, 0.6, 'info_pattern')))
+
+    def test_skips_uncertain_or_non_kb(self):
+        for decision in (RouteDecision(KB_RESULT, 0.5, 'default_kb'),
+                         RouteDecision(None, 0.0, 'person_unknown'),
+                         RouteDecision(None, 0.0, 'disabled'),
+                         RouteDecision(tool_call('navigate_to_war', {'war_name': '임진왜란'}), 0.7, 'war')):
+            self.assertIsNone(self.start(decision), decision.rule)
+
+    @override_settings(ROUTER_SPECULATIVE_KB=False)
+    def test_disabled(self):
+        self.assertIsNone(self.start(RouteDecision(KB_RESULT, 0.9, 'info_pattern')))
+
+
+class DetectIntentCancelTests(SimpleTestCase):
+    """Converse 이후 단계에서 실패해도 미리 시작한 KB 호출이 취소되는지"""
+
+    def setUp(self):
+        self.call = mock.Mock()
+        decision = RouteDecision(KB_RESULT, 0.6, 'info_pattern')
+        for patcher in (mock.patch.object(views, 'local_intent', return_value=(decision, None)),
+                        mock.patch.object(views, 'start_speculative_kb', return_value=self.call),
+                        mock.patch.object(views, 'converse_intent', return_value=KB_RESULT),
+                        mock.patch.object(views, 'aconverse_intent', mock.AsyncMock(return_value=KB_RESULT)),
+                        mock.patch.object(views, 'remember_intent', side_effect=RuntimeError('redis down'))):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_sync_failure_after_converse_cancels(self):
+        with self.assertRaises(RuntimeError):
+            views.detect_intent('질문')
+        self.call.cancel.assert_called_once()
+
+    def test_async_failure_after_converse_cancels(self):
+        with self.assertRaises(RuntimeError):
+            asyncio.run(views.adetect_intent('질문'))
+        self.call.cancel.assert_called_once()
+
+    def test_async_request_cancelled_cancels(self):
+        async def scenario():
+            converse_started = asyncio.Event()
+
+            async def aconverse_intent(query):
+                converse_started.set()
+                await asyncio.Event().wait()
+
+            with mock.patch.object(views, 'aconverse_intent', aconverse_intent):
+                task = asyncio.ensure_future(views.adetect_intent('질문'))
+                await converse_started.wait()
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+
+        asyncio.run(scenario())
+        self.call.cancel.assert_called_once()
+
+    def test_success_hands_off(self):
+        with mock.patch.object(views, 'remember_intent'):
+            result, call = views.detect_intent('질문')
+        self.assertIs(call, self.call)
+        self.call.cancel.assert_not_called()
+
+    def test_war_stream_closed_early_cancels(self):
+        stream = views.stream_war_navigation_and_kb('질문', {'year': 1592, 'war_name': '임진왜란'}, self.call)
+        next(stream)
+        stream.close()
+        self.call.cancel.assert_called_once()
@@ -1,6 +1,7 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
 urlpatterns = [
-    path('', views.agent_chat_view, name='agent_chat'),
+    path('', views.agent_chat_view_async if settings.BEDROCK_ASYNC_VIEWS else views.agent_chat_view, name='agent_chat'),
 ]
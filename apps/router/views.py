@@ -5,80 +5,270 @@ Tool Calling과 Knowledge Base 검색을 통합하는 라우터
 import json
 import logging
 import os
-from django.http import JsonResponse, StreamingHttpResponse
+from functools import partial
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 
 from common.bedrock.converse import ConverseClient
-from common.bedrock.clients import BedrockClients
-from common.bedrock.streaming import sse_event
+from common.bedrock.resumable import aresume_response, resumable_sse_response, resume_response, stream_owner
+from common.bedrock.streaming import KNOWLEDGE_BASE, StreamPipeline, sse_event, sse_response
+from common.decorators import async_require_http_methods
 from apps.tools.definitions import TOOL_CONFIG, ROUTER_SYSTEM_PROMPT
+from apps.tools.gazetteer import GAZETTEER
 from apps.tools.handlers import handle_tool_result
+from apps.knowledge.answer_cache import cached_kb_answer, remember_kb_answer
+from apps.knowledge.citations import compact_citations_requested, new_citation_compactor
+from apps.knowledge.retrieval import astart_kb_stream, start_kb_stream, with_fanout
+from apps.router.intent_cache import get_intent_cache
+from apps.router.prerouter import RouteDecision, get_pre_router
+from apps.router.speculative import (
+    AsyncSpeculativeKBCall, SpeculativeKBCall, speculation_enabled, speculation_min_confidence,
+)
 
 logger = logging.getLogger(__name__)
 
+KB_PIPELINE = StreamPipeline(KNOWLEDGE_BASE, name='agent-chat-kb')
+# ?citations=compact / X-Citations: compact 요청용 (인용을 도착할 때마다 압축해서 전송)
+KB_COMPACT_PIPELINE = StreamPipeline(KNOWLEDGE_BASE, name='agent-chat-kb', citation_encoder=new_citation_compactor)
+
+
+def kb_pipeline(request) -> StreamPipeline:
+    """요청이 고른 인용 형식의 KB 파이프라인"""
+    return KB_COMPACT_PIPELINE if compact_citations_requested(request) else KB_PIPELINE
+
+
+def build_router_request(query: str) -> dict:
+    """Intent Detection용 Converse 요청 파라미터"""
+    return {
+        "messages": [{
+            "role": "user",
+            "content": [{"text": query}]
+        }],
+        "tool_config": TOOL_CONFIG,
+        "system": [{"text": ROUTER_SYSTEM_PROMPT}]
+    }
+
+
+def classify_locally(query: str) -> RouteDecision:
+    """로컬 사전 분류 (비활성화/오류 시 Converse로 넘기는 빈 결정)"""
+    if not getattr(settings, 'ROUTER_PREROUTE_ENABLED', False):
+        return RouteDecision(None, 0.0, 'disabled')
+    try:
+        return get_pre_router().classify(query)
+    except Exception as e:
+        logger.warning(f"Pre-router 분류 실패: {str(e)}")
+        return RouteDecision(None, 0.0, 'error')
+
+
+def local_intent(query: str):
+    """
+    Converse 없이 얻을 수 있는 라우팅 정보 -> (로컬 사전 분류, 캐시된 Converse 결과 또는 None)
+
+    사전 분류가 확실하면 캐시는 조회하지 않습니다.
+    """
+    decision = classify_locally(query)
+    if get_pre_router().is_confident(decision) or not getattr(settings, 'ROUTER_INTENT_CACHE_ENABLED', True):
+        return decision, None
+    return decision, get_intent_cache().get(query)
+
+
+def remember_intent(query: str, result: dict):
+    if getattr(settings, 'ROUTER_INTENT_CACHE_ENABLED', True):
+        get_intent_cache().put(query, result)
+
+
+def converse_intent(query: str) -> dict:
+    """Converse API Intent Detection (스트리밍이면 toolUse 블록이 완성되는 즉시 반환)"""
+    if getattr(settings, 'ROUTER_CONVERSE_STREAMING', True):
+        return ConverseClient().invoke_with_tools_streaming(**build_router_request(query))
+    return ConverseClient().invoke_with_tools(**build_router_request(query))
+
+
+async def aconverse_intent(query: str) -> dict:
+    """converse_intent의 비동기 버전"""
+    if getattr(settings, 'ROUTER_CONVERSE_STREAMING', True):
+        return await ConverseClient().ainvoke_with_tools_streaming(**build_router_request(query))
+    return await ConverseClient().ainvoke_with_tools(**build_router_request(query))
+
+
+def start_speculative_kb(query: str, decision: RouteDecision, call_class=SpeculativeKBCall,
+                         pipeline: StreamPipeline = KB_PIPELINE):
+    """
+    Converse와 병렬로 KB 호출 시작
+
+    유료 호출이므로 사전 분류가 KB 쪽으로 어느 정도 확신할 때만 (인물 대화 요청, 분류 불가/비활성화면 생략)
+    """
+    if not speculation_enabled():
+        return None
+    if decision.action != 'knowledge_base' or decision.confidence < speculation_min_confidence():
+        return None
+    kb_request = build_kb_request(query)
+    if kb_request is None:
+        return None
+    return call_class(kb_request, pipeline)
+
+
+def detect_intent(query: str, pipeline: StreamPipeline = KB_PIPELINE):
+    """
+    Intent Detection: 로컬 사전 분류가 확실하면 바로, Intent 캐시에 있으면 캐시 결과, 아니면 Converse API
+
+    Returns:
+        (Converse 형식 결과, Converse 대기 중 미리 시작한 KB 호출 또는 None)
+    """
+    pre_router = get_pre_router()
+    decision, cached = local_intent(query)
+
+    if pre_router.is_confident(decision):
+        pre_router.record_fast(query, decision, partial(converse_intent, query))
+        return decision.result, None
+
+    if cached is not None:
+        return cached, None
+
+    speculative = start_speculative_kb(query, decision, pipeline=pipeline)
+    # 호출자에게 넘기기 전에 어디서든 실패하면 미리 시작한 KB 호출을 취소 (넘긴 뒤에는 호출자가 사용/취소)
+    handed_off = False
+    try:
+        result = converse_intent(query)
+        pre_router.record_fallback(decision, result)
+        remember_intent(query, result)
+        handed_off = True
+        return result, speculative
+    finally:
+        if speculative is not None and not handed_off:
+            speculative.cancel()
+
+
+async def adetect_intent(query: str, pipeline: StreamPipeline = KB_PIPELINE):
+    """detect_intent의 비동기 버전"""
+    pre_router = get_pre_router()
+    # 이름 인덱스(AIPerson 캐시 ORM)와 Intent 캐시(Redis)를 읽을 수 있으므로 스레드에서 한 번에 조회
+    decision, cached = await sync_to_async(local_intent, thread_sensitive=False)(query)
+
+    if pre_router.is_confident(decision):
+        # shadow 비교는 백그라운드 스레드에서 동기 클라이언트로 실행
+        pre_router.record_fast(query, decision, partial(converse_intent, query))
+        return decision.result, None
+
+    if cached is not None:
+        return cached, None
+
+    speculative = start_speculative_kb(query, decision, AsyncSpeculativeKBCall, pipeline)
+    # 요청 task가 취소돼도(CancelledError) finally에서 취소되므로 shield로 감싼 실제 호출도 닫힘
+    handed_off = False
+    try:
+        result = await aconverse_intent(query)
+        pre_router.record_fallback(decision, result)
+        await sync_to_async(remember_intent, thread_sensitive=False)(query, result)
+        handed_off = True
+        return result, speculative
+    finally:
+        if speculative is not None and not handed_off:
+            speculative.cancel()
+
+
+def open_kb_stream(kb_request: dict, speculative=None, pipeline: StreamPipeline = KB_PIPELINE):
+    """(KB 파이프라인, 응답) - 미리 시작한 호출이 있으면 그 결과"""
+    if speculative is not None:
+        return speculative.result()
+    return start_kb_stream(kb_request, pipeline)
+
+
+async def aopen_kb_stream(kb_request: dict, speculative=None, pipeline: StreamPipeline = KB_PIPELINE):
+    """open_kb_stream의 비동기 버전"""
+    if speculative is not None:
+        return await speculative.result()
+    return await astart_kb_stream(kb_request, pipeline)
+
+
+def build_kb_request(query: str) -> dict:
+    """retrieve_and_generate_stream 요청 파라미터 (KB 미설정 시 None, KB_FANOUT_IDS가 있으면 팬아웃)"""
+    kb_ids = getattr(settings, 'KB_FANOUT_IDS', [])
+    kb_id = kb_ids[0] if kb_ids else os.getenv('AWS_BEDROCK_KB_ID')
+    model_arn = os.getenv('AWS_BEDROCK_KB_MODEL_ARN')
+
+    if not kb_id or not model_arn:
+        return None
+
+    return with_fanout({
+        'input': {'text': query},
+        'retrieveAndGenerateConfiguration': {
+            'type': 'KNOWLEDGE_BASE',
+            'knowledgeBaseConfiguration': {
+                'knowledgeBaseId': kb_id,
+                'modelArn': model_arn
+            }
+        }
+    }, kb_ids)
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def agent_chat_view(request):
     """
     Agent Router: Tool Calling 또는 Knowledge Base 검색으로 라우팅
-    
+
     Request:
         {"message": "이순신한테 말걸어줘"} - Tool Call 트리거
         {"message": "조선시대 경제는?"} - Knowledge Base 검색
-    
+
     Response (Tool Call):
         {"type": "tool_call", "action": "navigate_to_person", "input": {"person_name": "이순신"}}
-    
+
     Response (Knowledge Base):
-        SSE 스트리밍 응답
+        SSE 스트리밍 응답 (Last-Event-ID로 재연결하면 끊긴 지점부터 재생)
     """
+    resumed = resume_response(request)
+    if resumed is not None:
+        return resumed
+
     try:
         data = json.loads(request.body)
         query = data.get('message') or data.get('query')
-        
+
         if not query:
             return JsonResponse({
                 'type': 'error',
                 'message': 'Missing required field: message'
             }, status=400)
-        
+
         logger.info(f"Agent Chat 요청: {query[:50]}...")
-        
-        # 1단계: Converse API로 Intent Detection
-        converse_client = ConverseClient()
-        result = converse_client.invoke_with_tools(
-            messages=[{
-                "role": "user",
-                "content": [{"text": query}]
-            }],
-            tool_config=TOOL_CONFIG,
-            system=[{"text": ROUTER_SYSTEM_PROMPT}]
-        )
-        
+
+        # 1단계: Intent Detection (로컬 사전 분류 -> 불확실하면 Converse API + 투기적 KB 호출)
+        pipeline = kb_pipeline(request)
+        result, speculative = detect_intent(query, pipeline)
+
         # 2단계: 라우팅
         if result['type'] == 'tool_call':
             action = result['action']
             tool_input = result['input']
-            
+
             logger.info(f"Tool Call 감지: {action}")
 
-            # [CASE A] 전쟁 툴인 경우 -> 스트리밍 (Tool + KB 답변)
+            # [CASE A] 전쟁 툴인 경우 -> 스트리밍 (Tool + KB 답변, 같은 질문이므로 투기적 호출 재사용)
             if action == "navigate_to_war":
-                return StreamingHttpResponse(
-                    stream_war_navigation_and_kb(query, tool_input),
-                    content_type='text/event-stream'
+                # 연도/좌표는 모델 대신 gazetteer 기준 (연도를 알 수 없으면 지도 이동 없이 KB 답변만)
+                tool_input = GAZETTEER.resolve_war_params(tool_input)
+                if tool_input is None:
+                    return knowledge_base_streaming_response(query, speculative, stream_owner(request), pipeline)
+                return resumable_sse_response(
+                    stream_war_navigation_and_kb(query, tool_input, speculative, pipeline), stream_owner(request)
                 )
 
             # [CASE B] 일반 툴인 경우 -> JSON 응답
+            if speculative is not None:
+                speculative.cancel()
             tool_response = handle_tool_result(action, tool_input)
             return JsonResponse(tool_response)
 
         else:
             # 일반 질문 - Knowledge Base 검색으로 Fallback
             logger.info("Knowledge Base 검색으로 Fallback")
-            return knowledge_base_streaming_response(query)
-            
+            return knowledge_base_streaming_response(query, speculative, stream_owner(request), pipeline)
+
     except json.JSONDecodeError:
         return JsonResponse({
             'type': 'error',
@@ -94,114 +284,199 @@ def agent_chat_view(request):
         }, status=500)
 
 
+@csrf_exempt
+@async_require_http_methods(["POST"])
+async def agent_chat_view_async(request):
+    """Agent Router (비동기) - ASGI 전용, 라우팅 규칙은 agent_chat_view와 동일"""
+    resumed = await aresume_response(request)
+    if resumed is not None:
+        return resumed
+
+    try:
+        data = json.loads(request.body)
+        query = data.get('message') or data.get('query')
+
+        if not query:
+            return JsonResponse({
+                'type': 'error',
+                'message': 'Missing required field: message'
+            }, status=400)
+
+        logger.info(f"Agent Chat 요청 (async): {query[:50]}...")
+
+        pipeline = kb_pipeline(request)
+        result, speculative = await adetect_intent(query, pipeline)
+
+        if result['type'] == 'tool_call':
+            action = result['action']
+            tool_input = result['input']
+
+            logger.info(f"Tool Call 감지: {action}")
+
+            if action == "navigate_to_war":
+                tool_input = GAZETTEER.resolve_war_params(tool_input)
+                if tool_input is None:
+                    return await aknowledge_base_streaming_response(query, speculative, stream_owner(request), pipeline)
+                return resumable_sse_response(
+                    astream_war_navigation_and_kb(query, tool_input, speculative, pipeline), stream_owner(request)
+                )
+
+            if speculative is not None:
+                speculative.cancel()
+            # DB 조회가 포함되므로 스레드에서 실행
+            tool_response = await sync_to_async(handle_tool_result)(action, tool_input)
+            return JsonResponse(tool_response)
+
+        else:
+            logger.info("Knowledge Base 검색으로 Fallback")
+            return await aknowledge_base_streaming_response(query, speculative, stream_owner(request), pipeline)
+
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'type': 'error',
+            'message': 'Invalid JSON'
+        }, status=400)
+    except Exception as e:
+        logger.error(f"Agent Chat 오류: {str(e)}", exc_info=True)
+        return JsonResponse({
+            'type': 'error',
+            'message': str(e)
+        }, status=500)
+
+
 
-def knowledge_base_streaming_response(query: str):
-    """Knowledge Base 스트리밍 검색 응답"""
+def knowledge_base_streaming_response(query: str, speculative=None, owner: str = None,
+                                      pipeline: StreamPipeline = KB_PIPELINE):
+    """Knowledge Base 스트리밍 검색 응답 (owner가 있으면 재개 가능)"""
     try:
-        kb_id = os.getenv('AWS_BEDROCK_KB_ID')
-        model_arn = os.getenv('AWS_BEDROCK_KB_MODEL_ARN')
-        
-        
-        print("model_arn", model_arn)
-        if not kb_id or not model_arn:
+        kb_request = build_kb_request(query)
+
+        if kb_request is None:
             return JsonResponse({
                 'type': 'error',
                 'message': 'Knowledge Base not configured'
             }, status=500)
-        
-
-        bedrock_agent_runtime = BedrockClients.get_agent_runtime()
-        response = bedrock_agent_runtime.retrieve_and_generate_stream(
-            input={'text': query},
-            retrieveAndGenerateConfiguration={
-                'type': 'KNOWLEDGE_BASE',
-                'knowledgeBaseConfiguration': {
-                    'knowledgeBaseId': kb_id,
-                    'modelArn': model_arn
-                }
-            }
-        )
-        
-        return StreamingHttpResponse(
-            stream_kb_response(response),
-            content_type='text/event-stream'
-        )
-        
+
+        cached = cached_kb_answer(kb_request, pipeline.citation_encoder)
+        if cached is not None:
+            if speculative is not None:
+                speculative.cancel()
+            return resumable_sse_response(cached, owner)
+
+        pipeline, response = open_kb_stream(kb_request, speculative, pipeline)
+
+        return resumable_sse_response(pipeline.stream(response, on_done=remember_kb_answer(kb_request)), owner)
+
     except Exception as e:
         logger.error(f"Knowledge Base 오류: {str(e)}")
-        return StreamingHttpResponse(
-            [sse_event({'type': 'error', 'message': str(e)})],
-            content_type='text/event-stream'
-        )
-    
-
-def stream_kb_response(response):
-    """Knowledge Base 스트리밍 응답 처리"""
-    citations = []
-    
+        return sse_response([sse_event({'type': 'error', 'message': str(e)})])
+
+
+async def aknowledge_base_streaming_response(query: str, speculative=None, owner: str = None,
+                                             pipeline: StreamPipeline = KB_PIPELINE):
+    """Knowledge Base 스트리밍 검색 응답 (비동기)"""
     try:
-        for event in response['stream']:
-            if 'output' in event:
-                output_data = event['output']
-                if 'text' in output_data:
-                    text = output_data['text']
-                    yield sse_event({'type': 'content', 'text': text})
-            
-            elif 'citation' in event:
-                citations.append(event['citation'])
-        
-        if citations:
-            yield sse_event({
-                'type': 'citations',
-                'count': len(citations),
-                'data': citations
-            })
-        
-        yield sse_event({'type': 'done'})
-        
+        kb_request = build_kb_request(query)
+
+        if kb_request is None:
+            return JsonResponse({
+                'type': 'error',
+                'message': 'Knowledge Base not configured'
+            }, status=500)
+
+        cached = await sync_to_async(cached_kb_answer, thread_sensitive=False)(kb_request, pipeline.citation_encoder)
+        if cached is not None:
+            if speculative is not None:
+                speculative.cancel()
+            return resumable_sse_response(cached, owner)
+
+        pipeline, response = await aopen_kb_stream(kb_request, speculative, pipeline)
+
+        return resumable_sse_response(pipeline.astream(response, on_done=remember_kb_answer(kb_request)), owner)
+
     except Exception as e:
-        logger.error(f"스트리밍 오류: {str(e)}")
-        yield sse_event({'type': 'error', 'message': str(e)})
+        logger.error(f"Knowledge Base 오류: {str(e)}")
+        return sse_response([sse_event({'type': 'error', 'message': str(e)})])
+
 
+def war_tool_call_event(tool_params: dict) -> str:
+    """지도 이동용 navigate_to_war tool_call 이벤트 (gazetteer에 있으면 좌표 포함)"""
+    parameters = {
+        "year": tool_params.get('year'),
+        "war_name": tool_params.get('war_name')
+    }
+    if tool_params.get('latitude') is not None:
+        parameters["latitude"] = tool_params['latitude']
+        parameters["longitude"] = tool_params['longitude']
+    return sse_event({
+        "type": "tool_call",
+        "tool_name": "navigate_to_war",
+        "parameters": parameters
+    })
 
-def stream_war_navigation_and_kb(query, tool_params):
+
+def stream_war_navigation_and_kb(query, tool_params, speculative=None, pipeline: StreamPipeline = KB_PIPELINE):
     """
     1. 툴 호출 이벤트 전송 (navigate_to_war)
     2. KB 검색 결과 스트리밍 전송
     """
-    # 1. Tool Call 먼저 전송 (프론트엔드가 지도 이동 시작)
-    yield sse_event({
-        "type": "tool_call",
-        "tool_name": "navigate_to_war",
-        "parameters": {
-            "year": tool_params.get('year'),
-            "war_name": tool_params.get('war_name')
-        }
-    })
+    # KB 단계 전에 클라이언트가 끊어도 finally에서 미리 시작한 호출을 취소 (이미 사용했으면 무시됨)
+    try:
+        # 1. Tool Call 먼저 전송 (프론트엔드가 지도 이동 시작)
+        yield war_tool_call_event(tool_params)
+
+        # 2. KB 검색 시작 (사용자 질문으로 답변 생성)
+        # 기존 knowledge_base_streaming_response 로직 재사용
+        kb_request = build_kb_request(query)
+        if kb_request is None:
+            raise ValueError('Knowledge Base not configured')
+
+        cached = cached_kb_answer(kb_request, pipeline.citation_encoder)
+        if cached is not None:
+            if speculative is not None:
+                speculative.cancel()
+            yield from cached
+            return
+
+        pipeline, response = open_kb_stream(kb_request, speculative, pipeline)
+
+        # KB 응답 스트리밍 (파이프라인이 마지막에 'done' 이벤트를 보냄)
+        yield from pipeline.stream(response, on_done=remember_kb_answer(kb_request))
+
+    except Exception as e:
+        logger.error(f"KB Stream Error: {e}")
+        yield sse_event({'type': 'error', 'message': str(e)})
+    finally:
+        if speculative is not None:
+            speculative.cancel()
+
 
-    # 2. KB 검색 시작 (사용자 질문으로 답변 생성)
-    # 기존 knowledge_base_streaming_response 로직 재사용
+async def astream_war_navigation_and_kb(query, tool_params, speculative=None,
+                                        pipeline: StreamPipeline = KB_PIPELINE):
+    """stream_war_navigation_and_kb의 비동기 버전"""
     try:
-        kb_id = os.getenv('AWS_BEDROCK_KB_ID')
-        model_arn = os.getenv('AWS_BEDROCK_KB_MODEL_ARN')
-        
-        bedrock_agent_runtime = BedrockClients.get_agent_runtime()
-        response = bedrock_agent_runtime.retrieve_and_generate_stream(
-            input={'text': query},
-            retrieveAndGenerateConfiguration={
-                'type': 'KNOWLEDGE_BASE',
-                'knowledgeBaseConfiguration': {
-                    'knowledgeBaseId': kb_id,
-                    'modelArn': model_arn
-                }
-            }
-        )
-        
-        # KB 응답 스트리밍 (stream_kb_response 재사용)
-        # 주의: stream_kb_response는 'done' 이벤트를 마지막에 보내므로, 
-        # 여기서는 그대로 yield from 해도 됩니다.
-        yield from stream_kb_response(response)
-        
+        yield war_tool_call_event(tool_params)
+
+        kb_request = build_kb_request(query)
+        if kb_request is None:
+            raise ValueError('Knowledge Base not configured')
+
+        cached = await sync_to_async(cached_kb_answer, thread_sensitive=False)(kb_request, pipeline.citation_encoder)
+        if cached is not None:
+            if speculative is not None:
+                speculative.cancel()
+            for frame in cached:
+                yield frame
+            return
+
+        pipeline, response = await aopen_kb_stream(kb_request, speculative, pipeline)
+
+        async for frame in pipeline.astream(response, on_done=remember_kb_answer(kb_request)):
+            yield frame
+
     except Exception as e:
         logger.error(f"KB Stream Error: {e}")
-        yield sse_event({'type': 'error', 'message': str(e)})
\ No newline at end of file
+        yield sse_event({'type': 'error', 'message': str(e)})
+    finally:
+        if speculative is not None:
+            speculative.cancel()
@@ -0,0 +1,143 @@
+"""
+전쟁/사건 지명 사전 (gazetteer)
+
+navigate_to_war 라우팅용 오프라인 한국사 전쟁·전투·사건 목록입니다 (data/war_gazetteer.json).
+서버 시작 시 한 번 읽어 메모리 인덱스를 만들고, LLM 없이 다음을 처리합니다.
+
+- 질문에 나오는 전쟁 이름/별칭 탐색 (Aho-Corasick) -> 로컬 사전 라우팅
+  짧은 별칭(임란)과 숫자 별칭(6.25, 4.19)은 다른 단어/숫자 안에서도 나오므로 단어 경계(+조사)에서만 매칭
+- 모델이 돌려준 war_name의 연도 보정/채움 + 지도 좌표 추가 (연도 환각 방지)
+
+항목: name, kind(war/battle/event), year(시작 연도), latitude, longitude, aliases, parent(상위 전쟁)
+"""
+import json
+import logging
+import os
+import re
+from typing import Iterable, List, Optional
+
+from django.conf import settings
+
+from .name_index import AhoCorasick, normalize_name
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GAZETTEER_PATH = os.path.join(os.path.dirname(__file__), 'data', 'war_gazetteer.json')
+
+# 로컬 사전 라우팅에서 navigate_to_war로 보내는 종류 (사건은 일반 질문으로 KB 검색)
+NAVIGABLE_KINDS = ('war', 'battle')
+
+# 이보다 짧거나 글자 없이 숫자/기호로만 된 별칭은 경계 매칭
+SHORT_ALIAS_LENGTH = 3
+# 경계 매칭 별칭 뒤에 붙을 수 있는 조사/시점 명사 (긴 것 먼저)
+PARTICLES = ('이랑', '에서', '으로', '부터', '까지', '이후', '이전', '당시', '은', '는', '이', '가', '을', '를', '의', '에', '와', '과',
+             '랑', '로', '도', '만', '때')
+
+
+def needs_boundary(key: str) -> bool:
+    """정규화한 별칭이 부분 문자열 매칭에 쓰기엔 너무 짧거나 숫자뿐인지"""
+    return len(key) < SHORT_ALIAS_LENGTH or not any(char.isalpha() for char in key)
+
+
+class Gazetteer:
+    def __init__(self, entries: List[dict]):
+        self.entries = entries
+        self._by_name = {}
+        self._automaton = AhoCorasick()
+        bounded = []
+        for entry in entries:
+            for alias in [entry['name'], *entry.get('aliases', [])]:
+                key = normalize_name(alias)
+                if key in self._by_name and self._by_name[key] is not entry:
+                    logger.warning(f"Gazetteer 별칭 중복: {alias} ({self._by_name[key]['name']}, {entry['name']})")
+                    continue
+                self._by_name[key] = entry
+                if needs_boundary(key):
+                    bounded.append(key)
+                else:
+                    self._automaton.add(key, entry)
+        self._automaton.build()
+        self._bounded = self._boundary_pattern(bounded)
+
+    @staticmethod
+    def _boundary_pattern(keys: List[str]):
+        """원문(공백 유지)에서 앞뒤가 다른 글자/숫자에 붙지 않은 별칭 (뒤에 조사 허용)"""
+        if not keys:
+            return None
+        aliases = '|'.join(r'\s*'.join(re.escape(char) for char in key) for key in sorted(set(keys), key=len, reverse=True))
+        particles = '|'.join(PARTICLES)
+        return re.compile(rf"(?<![\w.·])({aliases})(?:{particles})?(?![\w]|[.·]\d)")
+
+    @classmethod
+    def from_file(cls, path: str) -> "Gazetteer":
+        with open(path, encoding='utf-8') as f:
+            entries = json.load(f)
+        logger.info(f"Gazetteer 적재: {len(entries)}건 ({path})")
+        return cls(entries)
+
+    def lookup(self, name: str) -> Optional[dict]:
+        """전쟁 이름/별칭 -> 항목"""
+        return self._by_name.get(normalize_name(name))
+
+    def find_in(self, text: str, kinds: Optional[Iterable[str]] = None) -> List[dict]:
+        """
+        text에 나오는 항목 목록 (겹치면 긴 이름 우선, 중복 제거)
+
+        경계 매칭 별칭을 위해 정규화 전 원문(공백 포함)을 넘겨야 합니다.
+        """
+        matches = self._automaton.find_all(normalize_name(text)) + self._find_bounded(text)
+        matches = sorted(matches, key=lambda m: (m[0], -(m[1] - m[0])))
+        found = []
+        covered_until = 0
+        for start, end, entry in matches:
+            if start < covered_until:
+                continue
+            covered_until = end
+            if kinds is not None and entry.get('kind') not in kinds:
+                continue
+            if entry not in found:
+                found.append(entry)
+        return found
+
+    def _find_bounded(self, text: str) -> List[tuple]:
+        """경계 매칭 별칭 -> (정규화 문자열 기준 시작, 끝, 항목) 목록"""
+        if self._bounded is None:
+            return []
+        lowered = (text or '').lower()
+        matches = []
+        for match in self._bounded.finditer(lowered):
+            key = normalize_name(match.group(1))
+            start = len(normalize_name(lowered[:match.start(1)]))
+            matches.append((start, start + len(key), self._by_name[key]))
+        return matches
+
+    def resolve_war_params(self, tool_input: dict) -> Optional[dict]:
+        """
+        navigate_to_war 입력 보정
+
+        사전에 있는 전쟁이면 정식 이름/시작 연도/좌표로 채우고, 모델 연도가 다르면 사전 연도로 교정합니다.
+        사전에 없으면 모델 연도를 그대로 쓰고, 연도가 없거나 정수가 아니면 None (지도 이동 불가)
+        """
+        entry = self.lookup(tool_input.get('war_name') or '')
+        if entry is None:
+            try:
+                year = int(tool_input.get('year'))
+            except (TypeError, ValueError):
+                logger.warning(f"navigate_to_war 연도 확인 불가: {tool_input}")
+                return None
+            return {**tool_input, 'year': year}
+
+        year = tool_input.get('year')
+        if year is not None and str(year) != str(entry['year']):
+            logger.warning(f"navigate_to_war 연도 교정: {tool_input.get('war_name')} {year} -> {entry['year']}")
+
+        return {
+            **tool_input,
+            'war_name': entry['name'],
+            'year': entry['year'],
+            'latitude': entry.get('latitude'),
+            'longitude': entry.get('longitude'),
+        }
+
+
+GAZETTEER = Gazetteer.from_file(getattr(settings, 'WAR_GAZETTEER_PATH', '') or DEFAULT_GAZETTEER_PATH)
@@ -11,27 +11,32 @@ logger = logging.getLogger(__name__)
 
 def get_character_info_from_db(person_name: str) -> Optional[dict]:
     """
-    DB에서 캐릭터 이름으로 정보 조회
+    캐릭터 이름으로 정보 조회 (AIPerson 캐시 기반 이름 인덱스 사용, 캐시 비활성화 시 DB)
     """
+    from django.conf import settings
     from apps.prompt.models import AIPerson
+    from .name_index import get_name_index
     
     try:
-        # 1. 정확한 이름 매칭
-        ai_person = AIPerson.objects.filter(name=person_name).first()
-        
-        # 2. 정확한 매칭 실패 시 부분 매칭 시도
-        if not ai_person:
-            ai_person = AIPerson.objects.filter(name__icontains=person_name).first()
-        
-        # 3. 그래도 없으면 역방향 검색 (입력값이 이름에 포함되어 있는지)
-        if not ai_person:
-            for person in AIPerson.objects.all():
-                if person.name in person_name:
-                    ai_person = person
-                    break
+        if getattr(settings, 'AIPERSON_CACHE_ENABLED', True):
+            ai_person = get_name_index().resolve(person_name)
+        else:
+            # 1. 정확한 이름 매칭
+            ai_person = AIPerson.objects.filter(name=person_name).first()
+            
+            # 2. 정확한 매칭 실패 시 부분 매칭 시도
+            if not ai_person:
+                ai_person = AIPerson.objects.filter(name__icontains=person_name).first()
+            
+            # 3. 그래도 없으면 역방향 검색 (입력값이 이름에 포함되어 있는지)
+            if not ai_person:
+                for person in AIPerson.objects.all():
+                    if person.name in person_name:
+                        ai_person = person
+                        break
         
         if ai_person:
-            logger.info(f"DB에서 캐릭터 발견: {ai_person.name} (promptId: {ai_person.promptId})")
+            logger.info(f"캐릭터 발견: {ai_person.name} (promptId: {ai_person.promptId})")
             return {
                 "promptId": ai_person.promptId,
                 "characterName": ai_person.name
@@ -0,0 +1,216 @@
+"""
+캐릭터 이름 인덱스 (navigate_to_person 매핑용)
+
+AIPerson 캐시 스냅샷으로 메모리 인덱스를 만들어 DB 조회 없이 이름을 해석합니다.
+
+- 정확 매칭: 정규화한 이름/별칭 -> dict 조회
+- 부분 매칭 (입력이 이름에 포함): 문자 n-gram 역색인으로 후보를 좁힌 뒤 확인
+- 역방향 매칭 (이름이 입력에 포함): 이름+별칭으로 만든 Aho-Corasick 오토마톤으로 한 번에 탐색
+- 별칭: DEFAULT_ALIASES + settings.AIPERSON_ALIASES (예: 충무공 -> 이순신)
+
+AIPerson 캐시가 다시 적재되면(version 변경) 다음 조회 때 인덱스를 재구성합니다.
+"""
+import logging
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# 별칭 -> AIPerson.name
+DEFAULT_ALIASES = {
+    '충무공': '이순신',
+    '이충무공': '이순신',
+    '세종': '세종대왕',
+    '세종 대왕': '세종대왕',
+    '광개토왕': '광개토대왕',
+    '안중근 의사': '안중근',
+    '유관순 열사': '유관순',
+}
+
+NGRAM_SIZE = 2
+
+
+def normalize_name(text: str) -> str:
+    """공백 제거 + 소문자 ('세종 대왕' == '세종대왕')"""
+    return ''.join((text or '').split()).lower()
+
+
+class AhoCorasick:
+    """다중 패턴 부분 문자열 탐색 오토마톤 (입력 길이에 선형)"""
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[int, object]]] = [[]]
+
+    def add(self, pattern: str, value):
+        if not pattern:
+            return
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append((len(pattern), value))
+
+    def build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def find_all(self, text: str) -> List[Tuple[int, int, object]]:
+        """(시작, 끝, value) 목록"""
+        matches = []
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for length, value in self._output[state]:
+                matches.append((index - length + 1, index + 1, value))
+        return matches
+
+
+class NameIndex:
+    def __init__(self, persons: Iterable, aliases: Optional[Dict[str, str]] = None, version: int = 0):
+        self.version = version
+        self._exact: Dict[str, object] = {}
+        self._names: List[Tuple[str, object]] = []
+        self._grams: Dict[str, set] = {}
+        self._automaton = AhoCorasick()
+
+        for person in persons:
+            key = normalize_name(person.name)
+            if not key:
+                continue
+            self._exact.setdefault(key, person)
+            position = len(self._names)
+            self._names.append((key, person))
+            for gram in self._ngrams(key):
+                self._grams.setdefault(gram, set()).add(position)
+            self._automaton.add(key, person)
+
+        for alias, name in (aliases or {}).items():
+            alias_key = normalize_name(alias)
+            person = self._exact.get(normalize_name(name))
+            if person is None or not alias_key:
+                continue
+            self._exact.setdefault(alias_key, person)
+            self._automaton.add(alias_key, person)
+
+        self._automaton.build()
+
+    @staticmethod
+    def _ngrams(text: str) -> set:
+        # 한 글자 질의도 찾을 수 있도록 1-gram을 함께 색인
+        grams = set(text)
+        grams.update(text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1))
+        return grams
+
+    def resolve(self, query: str):
+        """
+        DB 조회와 같은 우선순위로 매칭: 정확(이름/별칭) -> 부분(입력이 이름에 포함) -> 역방향(이름이 입력에 포함)
+        """
+        key = normalize_name(query)
+        if not key:
+            return None
+
+        person = self._exact.get(key)
+        if person is not None:
+            return person
+
+        person = self.find_containing(key)
+        if person is not None:
+            return person
+
+        return self.find_contained(key)
+
+    def find_containing(self, key: str):
+        """key를 포함하는 이름 중 가장 짧은 것"""
+        grams = [key[i:i + NGRAM_SIZE] for i in range(len(key) - NGRAM_SIZE + 1)] or [key]
+        candidates = None
+        for gram in grams:
+            postings = self._grams.get(gram)
+            if not postings:
+                return None
+            candidates = set(postings) if candidates is None else candidates & postings
+            if not candidates:
+                return None
+
+        best = None
+        for position in candidates:
+            name, person = self._names[position]
+            if key in name and (best is None or (len(name), position) < best[0]):
+                best = ((len(name), position), person)
+        return best[1] if best else None
+
+    def find_contained(self, text: str):
+        """text 안에 나오는 이름/별칭 중 가장 긴 것 (동률이면 먼저 나온 것)"""
+        best = None
+        for start, end, person in self._automaton.find_all(text):
+            rank = (-(end - start), start)
+            if best is None or rank < best[0]:
+                best = (rank, person)
+        return best[1] if best else None
+
+    def find_all_in(self, text: str) -> List[Tuple[int, int, object]]:
+        """text에 나오는 모든 이름/별칭 (라우터 등에서 사용)"""
+        return self._automaton.find_all(normalize_name(text))
+
+
+_index: Optional[NameIndex] = None
+_index_lock = threading.Lock()
+_listener_registered = False
+
+
+def _aliases() -> Dict[str, str]:
+    return {**DEFAULT_ALIASES, **getattr(settings, 'AIPERSON_ALIASES', {})}
+
+
+def _on_cache_reload(version: int):
+    global _index
+    # 다음 조회 때 새 스냅샷으로 재구성
+    _index = None
+
+
+def get_name_index() -> NameIndex:
+    """AIPerson 캐시 버전에 맞는 이름 인덱스"""
+    global _index, _listener_registered
+    from apps.prompt.person_cache import get_person_cache
+
+    cache = get_person_cache()
+    if not _listener_registered:
+        with _index_lock:
+            if not _listener_registered:
+                cache.add_reload_listener(_on_cache_reload)
+                _listener_registered = True
+
+    # version을 먼저 읽고 persons는 그 뒤에 읽음 - 사이에 재적재되면 인덱스가 실제보다 오래된 version으로
+    # 표시될 뿐이라 다음 조회 때 다시 만들어짐 (반대 순서면 옛 목록이 새 version으로 표시되어 고착됨)
+    version = cache.current_version()
+    index = _index
+    if index is None or index.version != version:
+        with _index_lock:
+            index = _index
+            if index is None or index.version != version:
+                persons = cache.all()
+                index = NameIndex(persons, _aliases(), version=version)
+                _index = index
+                logger.info(f"캐릭터 이름 인덱스 재구성: {len(persons)}명 (version={version})")
+    return index
@@ -0,0 +1,75 @@
+from django.test import SimpleTestCase
+
+from apps.tools.gazetteer import GAZETTEER, NAVIGABLE_KINDS, Gazetteer, needs_boundary
+
+
+def names(text, kinds=None):
+    return [entry['name'] for entry in GAZETTEER.find_in(text, kinds=kinds)]
+
+
+class GazetteerDataTests(SimpleTestCase):
+    def test_battles_point_to_existing_wars(self):
+        for entry in GAZETTEER.entries:
+            if 'parent' in entry:
+                self.assertEqual(entry['kind'], 'battle', entry['name'])
+                parent = GAZETTEER.lookup(entry['parent'])
+                self.assertIsNotNone(parent, entry['name'])
+                self.assertEqual(parent['kind'], 'war')
+
+    def test_whole_war_aliases_are_wars(self):
+        for alias, war, battle in (('여수전쟁', '고수전쟁', '살수대첩'), ('여당전쟁', '고당전쟁', '안시성 전투'),
+                                   ('여요전쟁', '고려거란전쟁', '귀주대첩')):
+            self.assertEqual(GAZETTEER.lookup(alias)['name'], war)
+            self.assertEqual(GAZETTEER.lookup(battle)['kind'], 'battle')
+            self.assertEqual(GAZETTEER.lookup(battle)['parent'], war)
+
+
+class FindInTests(SimpleTestCase):
+    def test_longest_match_wins(self):
+        self.assertEqual(names('6.25 전쟁은 왜 일어났어'), ['한국전쟁'])
+        self.assertEqual(names('인천 상륙 작전'), ['인천상륙작전'])
+
+    def test_short_alias_at_word_boundary(self):
+        self.assertEqual(names('임란 때 의병'), ['임진왜란'])
+        self.assertEqual(names('임란이후 조선'), ['임진왜란'])
+        self.assertEqual(names('6.25 때 피난'), ['한국전쟁'])
+        self.assertEqual(names('4.19에 대해'), ['4·19 혁명'])
+
+    def test_short_alias_inside_other_text(self):
+        self.assertEqual(names('임란수 선생'), [])
+        self.assertEqual(names('가격이 16.25% 올랐다'), [])
+        self.assertEqual(names('2016.25'), [])
+        self.assertEqual(names('5.18.1 버전'), [])
+        self.assertEqual(names('버전 14.19 릴리스'), [])
+
+    def test_kinds_filter(self):
+        self.assertEqual(names('3.1운동과 임진왜란', kinds=NAVIGABLE_KINDS), ['임진왜란'])
+
+    def test_needs_boundary(self):
+        self.assertTrue(needs_boundary('임란'))
+        self.assertTrue(needs_boundary('6.25'))
+        self.assertFalse(needs_boundary('6.25전쟁'))
+        self.assertFalse(needs_boundary('사일구'))
+
+    def test_custom_entries(self):
+        gazetteer = Gazetteer([{'name': '가나다', 'kind': 'war', 'year': 1, 'aliases': ['가나']}])
+        self.assertEqual([e['name'] for e in gazetteer.find_in('가나 전쟁')], ['가나다'])
+        self.assertEqual(gazetteer.find_in('가나안'), [])
+
+
+class ResolveWarParamsTests(SimpleTestCase):
+    def test_known_war_uses_gazetteer_year(self):
+        params = GAZETTEER.resolve_war_params({'war_name': '임란', 'year': 1600})
+        self.assertEqual((params['war_name'], params['year']), ('임진왜란', 1592))
+        self.assertIsNotNone(params['latitude'])
+
+    def test_known_war_fills_missing_year(self):
+        self.assertEqual(GAZETTEER.resolve_war_params({'war_name': '병자호란'})['year'], 1636)
+
+    def test_unknown_war_keeps_model_year(self):
+        params = GAZETTEER.resolve_war_params({'war_name': '처인성 전투', 'year': '1232'})
+        self.assertEqual(params, {'war_name': '처인성 전투', 'year': 1232})
+
+    def test_unknown_war_without_year_is_rejected(self):
+        self.assertIsNone(GAZETTEER.resolve_war_params({'war_name': '처인성 전투'}))
+        self.assertIsNone(GAZETTEER.resolve_war_params({'war_name': '처인성 전투', 'year': '몰라'}))
@@ -0,0 +1,108 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from apps.tools import name_index
+from apps.tools.name_index import DEFAULT_ALIASES, AhoCorasick, NameIndex, normalize_name
+
+PERSONS = [SimpleNamespace(name=name) for name in ('세종대왕', '이순신', '이순신 장군', '안중근', '광개토대왕')]
+
+
+class AhoCorasickTests(SimpleTestCase):
+    def test_overlapping_patterns(self):
+        automaton = AhoCorasick()
+        for pattern in ('he', 'she', 'his', 'hers'):
+            automaton.add(pattern, pattern)
+        automaton.build()
+        self.assertEqual(
+            sorted(automaton.find_all('ushers')),
+            [(1, 4, 'she'), (2, 4, 'he'), (2, 6, 'hers')],
+        )
+
+    def test_no_match(self):
+        automaton = AhoCorasick()
+        automaton.add('세종', 1)
+        automaton.build()
+        self.assertEqual(automaton.find_all('이순신'), [])
+
+
+class NameIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = NameIndex(PERSONS, DEFAULT_ALIASES)
+
+    def resolve(self, query):
+        person = self.index.resolve(query)
+        return person.name if person else None
+
+    def test_normalize(self):
+        self.assertEqual(normalize_name(' 세종 대왕 '), '세종대왕')
+
+    def test_exact_and_alias(self):
+        self.assertEqual(self.resolve('이순신'), '이순신')
+        self.assertEqual(self.resolve('충무공'), '이순신')
+        self.assertEqual(self.resolve('세종 대왕'), '세종대왕')
+
+    def test_partial_prefers_shortest_name(self):
+        self.assertEqual(self.resolve('순신'), '이순신')
+        self.assertEqual(self.resolve('개토'), '광개토대왕')
+
+    def test_name_inside_sentence_prefers_longest(self):
+        self.assertEqual(self.resolve('이순신장군과 대화하고 싶어'), '이순신 장군')
+        self.assertEqual(self.resolve('안중근 의사 이야기'), '안중근')
+
+    def test_unknown(self):
+        self.assertIsNone(self.resolve('나폴레옹'))
+        self.assertIsNone(self.resolve('   '))
+
+    def test_alias_for_missing_person_ignored(self):
+        index = NameIndex(PERSONS, {'율곡': '이이'})
+        self.assertIsNone(index.resolve('율곡'))
+
+
+class ReloadingCache:
+    """처음 all()이 옛 목록을 돌려준 직후 재적재가 끼어드는 AIPerson 캐시"""
+
+    def __init__(self):
+        self.version = 1
+        self.persons = [SimpleNamespace(name='이순신')]
+        self.all_calls = 0
+
+    def add_reload_listener(self, callback):
+        self.listener = callback
+
+    def current_version(self):
+        return self.version
+
+    def all(self):
+        self.all_calls += 1
+        snapshot = list(self.persons)
+        if self.all_calls == 1:
+            self.version = 2
+            self.persons = [SimpleNamespace(name='이순신'), SimpleNamespace(name='장영실')]
+            self.listener(self.version)
+        return snapshot
+
+
+class GetNameIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = ReloadingCache()
+        patchers = [
+            mock.patch('apps.prompt.person_cache.get_person_cache', return_value=self.cache),
+            mock.patch.multiple(name_index, _index=None, _listener_registered=False),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_reload_between_version_and_build_is_not_stuck(self):
+        name_index.get_name_index()
+        self.assertEqual(name_index.get_name_index().resolve('장영실').name, '장영실')
+        self.assertEqual(name_index.get_name_index().version, 2)
+
+    def test_current_index_does_not_copy_persons(self):
+        name_index.get_name_index()
+        name_index.get_name_index()
+        calls = self.cache.all_calls
+        name_index.get_name_index()
+        self.assertEqual(self.cache.all_calls, calls)
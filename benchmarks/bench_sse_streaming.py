@@ -0,0 +1,123 @@
+"""
+SSE 스트리밍 청크당 오버헤드 벤치마크 (2,000 토큰 스텁 스트림)
+
+Bedrock 이벤트 스트림을 메모리 스텁으로 대체하고, ASGI 핸들러가 응답을 소비하는 방식
+(StreamingHttpResponse.__aiter__)으로 다음 세 경로를 비교합니다.
+
+- sync (before): 동기 제너레이터를 그대로 넘긴 경우 - Django 4.2가 sync_to_async(list)로 전부 모은 뒤 전송
+- sync + iterate_in_thread: 동기 제너레이터를 청크마다 스레드에서 next (WSGI 폴백 경로를 ASGI에서 쓸 때)
+- async (after): aiobotocore 이벤트 스트림 + astream_bedrock_response
+
+실행:
+    python benchmarks/bench_sse_streaming.py [--tokens 2000] [--repeat 5] [--delay-ms 0]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import warnings
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+os.environ.setdefault('SERVER_INTERFACE', 'asgi')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.http import StreamingHttpResponse  # noqa: E402
+
+from common.bedrock.streaming import (  # noqa: E402
+    astream_bedrock_response,
+    iterate_in_thread,
+    stream_bedrock_response,
+)
+
+
+def make_events(tokens: int) -> list:
+    """Anthropic messages 스트림 형태의 이벤트 목록"""
+    events = [{'chunk': {'bytes': json.dumps({
+        'type': 'content_block_delta',
+        'delta': {'type': 'text_delta', 'text': f'토큰{i} '},
+    }).encode()}} for i in range(tokens)]
+    events.append({'chunk': {'bytes': json.dumps({'type': 'message_stop'}).encode()}})
+    return events
+
+
+def sync_body(events, delay: float):
+    for event in events:
+        if delay:
+            time.sleep(delay)
+        yield event
+
+
+async def async_body(events, delay: float):
+    for event in events:
+        if delay:
+            await asyncio.sleep(delay)
+        yield event
+
+
+async def consume(response: StreamingHttpResponse) -> dict:
+    """ASGIHandler.send_response와 같은 방식으로 응답을 소비하며 시간 측정"""
+    start = time.perf_counter()
+    first = None
+    chunks = 0
+    async for _ in response:
+        if first is None:
+            first = time.perf_counter() - start
+        chunks += 1
+    total = time.perf_counter() - start
+    return {'total': total, 'first': first or 0.0, 'chunks': chunks}
+
+
+def build_cases(events, delay: float) -> dict:
+    return {
+        'sync (before)': lambda: StreamingHttpResponse(
+            stream_bedrock_response({'body': sync_body(events, delay)}),
+            content_type='text/event-stream',
+        ),
+        'sync + iterate_in_thread': lambda: StreamingHttpResponse(
+            iterate_in_thread(stream_bedrock_response({'body': sync_body(events, delay)})),
+            content_type='text/event-stream',
+        ),
+        'async (after)': lambda: StreamingHttpResponse(
+            astream_bedrock_response({'body': async_body(events, delay)}),
+            content_type='text/event-stream',
+        ),
+    }
+
+
+async def run(tokens: int, repeat: int, delay: float):
+    events = make_events(tokens)
+    print(f"tokens={tokens} repeat={repeat} delay={delay * 1000:.2f}ms/token\n")
+    print(f"{'case':<28}{'total(ms)':>12}{'first(ms)':>12}{'per-chunk(us)':>16}{'chunks':>9}")
+
+    for name, factory in build_cases(events, delay).items():
+        results = [await consume(factory()) for _ in range(repeat)]
+        total = statistics.median(r['total'] for r in results)
+        first = statistics.median(r['first'] for r in results)
+        chunks = results[0]['chunks']
+        # 토큰 지연(스텁 대기 시간)을 빼고 순수 전달 오버헤드만 청크당으로 환산
+        overhead = max(total - delay * tokens, 0.0) / max(chunks, 1)
+        print(f"{name:<28}{total * 1000:>12.2f}{first * 1000:>12.2f}{overhead * 1e6:>16.2f}{chunks:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tokens', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--delay-ms', type=float, default=0.0, help='토큰 사이 스텁 지연 (ms)')
+    args = parser.parse_args()
+
+    # sync 이터레이터 경고는 before 케이스에서 의도된 것이므로 숨김
+    warnings.filterwarnings('ignore', message='StreamingHttpResponse must consume synchronous iterators')
+    asyncio.run(run(args.tokens, args.repeat, args.delay_ms / 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,16 @@
 from .clients import BedrockClients
-from .streaming import sse_event, stream_bedrock_response
+from .prompt_cache import PromptTemplateCache, get_compiled_prompt, get_prompt, get_prompt_cache
+from .streaming import astream_bedrock_response, sse_event, stream_bedrock_response
+from .templates import CompiledPrompt
 
 __all__ = [
+    'astream_bedrock_response',
     'BedrockClients',
+    'CompiledPrompt',
+    'PromptTemplateCache',
+    'get_compiled_prompt',
+    'get_prompt',
+    'get_prompt_cache',
     'sse_event',
     'stream_bedrock_response',
 ]
\ No newline at end of file
@@ -0,0 +1,125 @@
+"""
+비동기 Bedrock 클라이언트 (aiobotocore)
+ASGI(uvicorn) 환경에서 LLM 호출/스트림이 워커 스레드를 점유하지 않도록
+이벤트 루프 위에서 직접 Bedrock을 호출합니다.
+
+엔드포인트는 BEDROCK_RUNTIME_ENDPOINT_URL / BEDROCK_AGENT_RUNTIME_ENDPOINT_URL 로
+로컬 스텁(event-stream) 서버를 가리키도록 바꿀 수 있습니다.
+"""
+import asyncio
+import json
+import logging
+import weakref
+
+from aiobotocore.config import AioConfig
+from aiobotocore.session import get_session
+from django.conf import settings
+
+from .clients import BedrockClients, endpoint_url_for
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncBedrockClients:
+    """
+    aiobotocore 클라이언트 레지스트리 (이벤트 루프 + 서비스/리전별 싱글톤)
+
+    aiobotocore 클라이언트는 생성된 이벤트 루프의 aiohttp 세션에 묶이므로 루프 단위로 보관합니다.
+    """
+    _clients = weakref.WeakKeyDictionary()
+    _locks = weakref.WeakKeyDictionary()
+    _session = None
+
+    @classmethod
+    async def get_client(cls, service_name: str, region_name: str = None):
+        region_name = region_name or settings.AWS_REGION
+        key = (service_name, region_name)
+        loop = asyncio.get_running_loop()
+
+        clients = cls._clients.setdefault(loop, {})
+        client = clients.get(key)
+        if client is not None:
+            return client
+
+        lock = cls._locks.setdefault(loop, asyncio.Lock())
+        async with lock:
+            client = clients.get(key)
+            if client is None:
+                if cls._session is None:
+                    cls._session = get_session()
+                client = await cls._session.create_client(
+                    service_name,
+                    region_name=region_name,
+                    endpoint_url=endpoint_url_for(service_name),
+                    config=AioConfig(**BedrockClients.config_options()),
+                ).__aenter__()
+                clients[key] = client
+                logger.info(f"비동기 Bedrock 클라이언트 생성: {service_name} ({region_name})")
+        return client
+
+    @classmethod
+    async def get_runtime(cls, region_name: str = None):
+        return await cls.get_client('bedrock-runtime', region_name)
+
+    @classmethod
+    async def get_agent_runtime(cls, region_name: str = None):
+        return await cls.get_client('bedrock-agent-runtime', region_name)
+
+    @classmethod
+    async def close_all(cls):
+        """현재 이벤트 루프에 묶인 클라이언트 종료 (ASGI lifespan.shutdown - config/asgi.py)"""
+        clients = cls._clients.pop(asyncio.get_running_loop(), {})
+        for (service_name, region_name), client in clients.items():
+            try:
+                await client.close()
+            except Exception as e:
+                logger.warning(f"비동기 Bedrock 클라이언트 종료 실패: {service_name} ({region_name}): {str(e)}")
+        if clients:
+            logger.info(f"비동기 Bedrock 클라이언트 {len(clients)}개 종료")
+
+
+async def invoke_model(model_id: str, body: dict) -> dict:
+    """invoke_model 호출 후 응답 body를 JSON으로 파싱하여 반환"""
+    client = await AsyncBedrockClients.get_runtime()
+    response = await client.invoke_model(
+        modelId=model_id,
+        body=json.dumps(body),
+        accept="application/json",
+        contentType="application/json",
+    )
+    async with response['body'] as stream:
+        raw = await stream.read()
+    return json.loads(raw)
+
+
+async def invoke_model_with_response_stream(model_id: str, body: dict) -> dict:
+    """스트리밍 호출 - response['body']는 `async for`로 순회하는 이벤트 스트림"""
+    client = await AsyncBedrockClients.get_runtime()
+    return await client.invoke_model_with_response_stream(
+        modelId=model_id,
+        body=json.dumps(body),
+    )
+
+
+async def converse(**params) -> dict:
+    """Converse API 호출"""
+    client = await AsyncBedrockClients.get_runtime()
+    return await client.converse(**params)
+
+
+async def converse_stream(**params) -> dict:
+    """Converse 스트리밍 - response['stream']은 `async for`로 순회하는 이벤트 스트림"""
+    client = await AsyncBedrockClients.get_runtime()
+    return await client.converse_stream(**params)
+
+
+async def retrieve_and_generate_stream(**params) -> dict:
+    """Knowledge Base 스트리밍 - response['stream']은 `async for`로 순회하는 이벤트 스트림"""
+    client = await AsyncBedrockClients.get_agent_runtime()
+    return await client.retrieve_and_generate_stream(**params)
+
+
+async def retrieve(**params) -> dict:
+    """Knowledge Base 검색 (retrieve) 호출"""
+    client = await AsyncBedrockClients.get_agent_runtime()
+    return await client.retrieve(**params)
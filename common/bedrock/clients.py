@@ -1,35 +1,125 @@
+import logging
+import threading
+
 import boto3
+from botocore.config import Config
 from django.conf import settings
 
+logger = logging.getLogger(__name__)
+
+
+ENDPOINT_URL_SETTINGS = {
+    'bedrock-runtime': 'BEDROCK_RUNTIME_ENDPOINT_URL',
+    'bedrock-agent-runtime': 'BEDROCK_AGENT_RUNTIME_ENDPOINT_URL',
+}
+
+
+def endpoint_url_for(service_name: str):
+    """서비스별 엔드포인트 오버라이드 (로컬 스텁 서버 테스트용, 없으면 AWS 기본값)"""
+    setting_name = ENDPOINT_URL_SETTINGS.get(service_name)
+    return getattr(settings, setting_name, None) if setting_name else None
+
+
 class BedrockClients:
-    """Bedrock 클라이언트 싱글톤"""
-    _runtime = None
-    _agent_runtime = None
-    _agent = None
-    
+    """
+    Bedrock 클라이언트 레지스트리 (서비스/리전별 싱글톤, 스레드 안전)
+
+    boto3 클라이언트는 생성 비용(세션/자격증명 해석, TLS 연결)이 크지만 생성 후에는
+    스레드 간 공유가 가능하므로, 튜닝된 커넥션 풀 설정으로 한 번만 만들어 재사용합니다.
+    """
+    _clients = {}
+    _lock = threading.Lock()
+    _session = None
+
+    @classmethod
+    def get_client(cls, service_name: str, region_name: str = None):
+        region_name = region_name or settings.AWS_REGION
+        key = (service_name, region_name)
+
+        client = cls._clients.get(key)
+        if client is not None:
+            return client
+
+        with cls._lock:
+            client = cls._clients.get(key)
+            if client is None:
+                # boto3 기본 세션은 스레드 안전하지 않으므로 락 안에서 전용 세션 사용
+                if cls._session is None:
+                    cls._session = boto3.session.Session()
+                client = cls._session.client(
+                    service_name=service_name,
+                    region_name=region_name,
+                    endpoint_url=endpoint_url_for(service_name),
+                    config=cls.build_config(),
+                )
+                cls._clients[key] = client
+                logger.info(f"Bedrock 클라이언트 생성: {service_name} ({region_name})")
+        return client
+
     @classmethod
-    def get_runtime(cls):
-        if cls._runtime is None:
-            cls._runtime = boto3.client(
-                service_name='bedrock-runtime',
-                region_name=settings.AWS_REGION
-            )
-        return cls._runtime
-    
+    def get_runtime(cls, region_name: str = None):
+        return cls.get_client('bedrock-runtime', region_name)
+
     @classmethod
-    def get_agent_runtime(cls):
-        if cls._agent_runtime is None:
-            cls._agent_runtime = boto3.client(
-                service_name='bedrock-agent-runtime',
-                region_name=settings.AWS_REGION
-            )
-        return cls._agent_runtime
-    
+    def get_agent_runtime(cls, region_name: str = None):
+        return cls.get_client('bedrock-agent-runtime', region_name)
+
     @classmethod
-    def get_agent(cls):
-        if cls._agent is None:
-            cls._agent = boto3.client(
-                service_name='bedrock-agent',
-                region_name=settings.AWS_REGION
-            )
-        return cls._agent
\ No newline at end of file
+    def get_agent(cls, region_name: str = None):
+        return cls.get_client('bedrock-agent', region_name)
+
+    @staticmethod
+    def config_options() -> dict:
+        """settings 기반 botocore 설정값 (커넥션 풀, keepalive, 타임아웃, 재시도)"""
+        return {
+            'max_pool_connections': getattr(settings, 'BEDROCK_MAX_POOL_CONNECTIONS', 50),
+            'tcp_keepalive': getattr(settings, 'BEDROCK_TCP_KEEPALIVE', True),
+            'connect_timeout': getattr(settings, 'BEDROCK_CONNECT_TIMEOUT', 5),
+            'read_timeout': getattr(settings, 'BEDROCK_READ_TIMEOUT', 120),
+            'retries': {
+                'mode': getattr(settings, 'BEDROCK_RETRY_MODE', 'adaptive'),
+                'max_attempts': getattr(settings, 'BEDROCK_MAX_ATTEMPTS', 3),
+            },
+        }
+
+    @classmethod
+    def build_config(cls) -> Config:
+        return Config(**cls.config_options())
+
+    @classmethod
+    def pool_stats(cls) -> dict:
+        """
+        클라이언트별 urllib3 커넥션 풀 사용 현황
+
+        in_use가 max_pool_connections에 자주 닿으면 uvicorn 동시성 대비 풀이 작은 것입니다.
+        풀 정보는 botocore/urllib3 내부 속성에서 읽으므로, 구조가 바뀌면 해당 클라이언트에 error만 남깁니다.
+        """
+        stats = {}
+        for (service_name, region_name), client in list(cls._clients.items()):
+            entry = {"max_pool_connections": client.meta.config.max_pool_connections}
+            try:
+                entry["pools"] = cls._urllib3_pools(client)
+            except Exception as e:
+                entry["pools"] = []
+                entry["error"] = f"{type(e).__name__}: {str(e)}"
+            stats[f"{service_name}:{region_name}"] = entry
+        return stats
+
+    @staticmethod
+    def _urllib3_pools(client) -> list:
+        """botocore 클라이언트 내부의 urllib3 풀 현황 (비공개 속성 - 없으면 AttributeError)"""
+        manager = client._endpoint.http_session._manager
+        pools = []
+        for pool_key in list(manager.pools.keys()):
+            pool = manager.pools.get(pool_key)
+            if pool is None:
+                continue
+            queue = getattr(pool, 'pool', None)
+            pools.append({
+                "host": getattr(pool, 'host', None),
+                "connections_created": getattr(pool, 'num_connections', None),
+                "requests": getattr(pool, 'num_requests', None),
+                "in_use": (queue.maxsize - queue.qsize()) if queue else 0,
+                "idle": sum(1 for conn in list(queue.queue) if conn is not None) if queue else 0,
+            })
+        return pools
@@ -1,16 +1,79 @@
 """
 Bedrock Converse API Wrapper
 Tool Calling을 지원하는 Converse API 클라이언트
+
+converse_stream / aconverse_stream은 ConverseStream 이벤트를 파싱해 점진적으로 내보냅니다.
+toolUse 블록은 이름과 입력 JSON이 완성되는 즉시(contentBlockStop) tool_call 이벤트가 되므로,
+전체 응답(messageStop/metadata)을 기다리지 않고 라우팅할 수 있습니다.
 """
 import json
 import logging
-from typing import Optional
+from typing import Iterator, List, Optional
 from django.conf import settings
+from . import async_clients
 from .clients import BedrockClients
 
 logger = logging.getLogger(__name__)
 
 
+class ConverseStreamParser:
+    """
+    ConverseStream 원본 이벤트 -> 파싱된 이벤트
+
+    - {"type": "text", "text": "..."}: 텍스트 델타
+    - {"type": "tool_call", "action": "...", "input": {...}}: toolUse 블록 완성
+    - {"type": "stop", "stop_reason": "..."}: messageStop
+    """
+
+    def __init__(self):
+        self._tool_blocks = {}
+
+    def feed(self, event: dict) -> List[dict]:
+        if 'contentBlockStart' in event:
+            block = event['contentBlockStart']
+            tool_use = block.get('start', {}).get('toolUse')
+            if tool_use:
+                self._tool_blocks[block.get('contentBlockIndex', 0)] = {'name': tool_use.get('name'), 'input': []}
+            return []
+
+        if 'contentBlockDelta' in event:
+            block = event['contentBlockDelta']
+            delta = block.get('delta', {})
+            if 'text' in delta:
+                return [{"type": "text", "text": delta['text']}]
+            if 'toolUse' in delta:
+                tool_block = self._tool_blocks.get(block.get('contentBlockIndex', 0))
+                if tool_block is not None:
+                    tool_block['input'].append(delta['toolUse'].get('input', ''))
+            return []
+
+        if 'contentBlockStop' in event:
+            tool_block = self._tool_blocks.pop(event['contentBlockStop'].get('contentBlockIndex', 0), None)
+            if tool_block is None:
+                return []
+            raw_input = ''.join(tool_block['input'])
+            return [{
+                "type": "tool_call",
+                "action": tool_block['name'],
+                "input": json.loads(raw_input) if raw_input else {}
+            }]
+
+        if 'messageStop' in event:
+            return [{"type": "stop", "stop_reason": event['messageStop'].get('stopReason', '')}]
+
+        return []
+
+
+def close_event_stream(response: dict):
+    """끝까지 읽지 않은 이벤트 스트림 종료 (연결 반환)"""
+    try:
+        stream = response.get('stream')
+        if stream is not None:
+            stream.close()
+    except Exception as e:
+        logger.warning(f"Converse 스트림 종료 실패: {str(e)}")
+
+
 class ConverseClient:
     """Bedrock Converse API를 활용한 Tool Calling 클라이언트"""
     
@@ -45,14 +108,7 @@ class ConverseClient:
             }
         """
         try:
-            request_params = {
-                "modelId": self.model_id,
-                "messages": messages,
-                "toolConfig": tool_config
-            }
-            
-            if system:
-                request_params["system"] = system
+            request_params = self._build_request(messages, tool_config, system)
             
             logger.info(f"Converse API 호출 - Model: {self.model_id}")
             response = self.client.converse(**request_params)
@@ -63,6 +119,144 @@ class ConverseClient:
             logger.error(f"Converse API 오류: {str(e)}")
             raise
     
+    async def ainvoke_with_tools(
+        self, 
+        messages: list, 
+        tool_config: dict, 
+        system: Optional[list] = None
+    ) -> dict:
+        """invoke_with_tools의 비동기 버전 (aiobotocore, ASGI 전용)"""
+        try:
+            request_params = self._build_request(messages, tool_config, system)
+            
+            logger.info(f"Converse API 비동기 호출 - Model: {self.model_id}")
+            response = await async_clients.converse(**request_params)
+            
+            return self._parse_response(response)
+            
+        except Exception as e:
+            logger.error(f"Converse API 오류: {str(e)}")
+            raise
+    
+    def converse_stream(
+        self,
+        messages: list,
+        tool_config: dict,
+        system: Optional[list] = None
+    ) -> Iterator[dict]:
+        """
+        converse_stream 호출 후 파싱된 이벤트를 도착 순서대로 yield (ConverseStreamParser 참고)
+
+        소비자가 중간에 멈추면(generator close) 남은 스트림을 닫습니다.
+        """
+        request_params = self._build_request(messages, tool_config, system)
+
+        logger.info(f"Converse Stream API 호출 - Model: {self.model_id}")
+        response = self.client.converse_stream(**request_params)
+        parser = ConverseStreamParser()
+        try:
+            for event in response['stream']:
+                yield from parser.feed(event)
+        finally:
+            close_event_stream(response)
+
+    async def aconverse_stream(
+        self,
+        messages: list,
+        tool_config: dict,
+        system: Optional[list] = None
+    ):
+        """converse_stream의 비동기 버전 (aiobotocore, ASGI 전용)"""
+        request_params = self._build_request(messages, tool_config, system)
+
+        logger.info(f"Converse Stream API 비동기 호출 - Model: {self.model_id}")
+        response = await async_clients.converse_stream(**request_params)
+        parser = ConverseStreamParser()
+        try:
+            async for event in response['stream']:
+                for parsed in parser.feed(event):
+                    yield parsed
+        finally:
+            close_event_stream(response)
+
+    def invoke_with_tools_streaming(
+        self,
+        messages: list,
+        tool_config: dict,
+        system: Optional[list] = None
+    ) -> dict:
+        """
+        invoke_with_tools와 같은 형식의 결과를 스트리밍으로 얻음
+
+        첫 toolUse 블록이 완성되면 나머지 응답을 기다리지 않고 바로 반환합니다.
+        """
+        try:
+            return self._collect_decision(self.converse_stream(messages, tool_config, system))
+        except Exception as e:
+            logger.error(f"Converse Stream API 오류: {str(e)}")
+            raise
+
+    async def ainvoke_with_tools_streaming(
+        self,
+        messages: list,
+        tool_config: dict,
+        system: Optional[list] = None
+    ) -> dict:
+        """invoke_with_tools_streaming의 비동기 버전"""
+        try:
+            return await self._acollect_decision(self.aconverse_stream(messages, tool_config, system))
+        except Exception as e:
+            logger.error(f"Converse Stream API 오류: {str(e)}")
+            raise
+
+    def _collect_decision(self, events) -> dict:
+        text_parts = []
+        try:
+            for event in events:
+                decision = self._decide(event, text_parts)
+                if decision is not None:
+                    return decision
+            return {"type": "text", "content": "".join(text_parts)}
+        finally:
+            events.close()
+
+    async def _acollect_decision(self, events) -> dict:
+        text_parts = []
+        try:
+            async for event in events:
+                decision = self._decide(event, text_parts)
+                if decision is not None:
+                    return decision
+            return {"type": "text", "content": "".join(text_parts)}
+        finally:
+            await events.aclose()
+
+    @staticmethod
+    def _decide(event: dict, text_parts: list) -> Optional[dict]:
+        """tool_call이면 즉시, messageStop이면 누적 텍스트로 결과 확정"""
+        if event['type'] == 'text':
+            text_parts.append(event['text'])
+            return None
+        if event['type'] == 'tool_call':
+            logger.info(f"Tool 호출 감지 (stream): {event['action']}")
+            return {"type": "tool_call", "action": event['action'], "input": event['input']}
+        if event['type'] == 'stop':
+            logger.info(f"Converse Stream 응답 - stopReason: {event['stop_reason']}")
+            return {"type": "text", "content": "".join(text_parts)}
+        return None
+
+    def _build_request(self, messages: list, tool_config: dict, system: Optional[list]) -> dict:
+        request_params = {
+            "modelId": self.model_id,
+            "messages": messages,
+            "toolConfig": tool_config
+        }
+        
+        if system:
+            request_params["system"] = system
+        
+        return request_params
+    
     def _parse_response(self, response: dict) -> dict:
         """
         Converse API 응답 분석
@@ -0,0 +1,284 @@
+"""
+Bedrock Prompt 템플릿 캐시
+bedrock-agent get_prompt 응답을 프로세스 내 LRU + (선택) Redis에 캐싱하여
+요청마다 발생하던 control-plane 왕복을 제거합니다.
+"""
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from django.conf import settings
+
+from .clients import BedrockClients
+from .templates import CompiledPrompt
+
+logger = logging.getLogger(__name__)
+
+DRAFT_VERSION = 'DRAFT'
+REDIS_KEY_PREFIX = 'bedrock:prompt'
+
+
+def split_prompt_identifier(prompt_identifier: str, version: Optional[str] = None) -> Tuple[str, str]:
+    """
+    프롬프트 식별자에서 버전 분리
+
+    'arn:...:prompt/ABC123:3' → ('arn:...:prompt/ABC123', '3')
+    버전이 없으면 DRAFT로 간주합니다.
+    """
+    identifier = prompt_identifier
+    if version is None:
+        resource = identifier.rsplit('/', 1)[-1]
+        if ':' in resource:
+            identifier, _, version = identifier.rpartition(':')
+    return identifier, str(version) if version else DRAFT_VERSION
+
+
+@dataclass
+class _Entry:
+    prompt: dict
+    expires_at: float
+    compiled: Optional[CompiledPrompt] = None
+
+
+class PromptTemplateCache:
+    """
+    get_prompt 응답 캐시 (프롬프트 ARN + 버전 단위)
+
+    - 1차: 프로세스 내 LRU (OrderedDict)
+    - 2차: Redis (워커 간 공유, 선택)
+    - DRAFT는 수정될 수 있으므로 짧은 TTL, 번호가 붙은 버전은 불변이므로 긴 TTL 적용
+    """
+
+    def __init__(
+        self,
+        max_size: int = 128,
+        ttl: int = 300,
+        versioned_ttl: int = 3600,
+        use_redis: bool = False,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.versioned_ttl = versioned_ttl
+        self.use_redis = use_redis
+
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+        # 여러 스레드가 동시에 갱신하므로 카운터는 별도 락으로 보호
+        self._stats = {'hits': 0, 'misses': 0, 'redis_hits': 0, 'evictions': 0}
+        self._stats_lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls) -> "PromptTemplateCache":
+        return cls(
+            max_size=getattr(settings, 'BEDROCK_PROMPT_CACHE_MAX_SIZE', 128),
+            ttl=getattr(settings, 'BEDROCK_PROMPT_CACHE_TTL', 300),
+            versioned_ttl=getattr(settings, 'BEDROCK_PROMPT_CACHE_VERSIONED_TTL', 3600),
+            use_redis=getattr(settings, 'BEDROCK_PROMPT_CACHE_REDIS', False),
+        )
+
+    def get(self, prompt_identifier: str, version: Optional[str] = None, client=None) -> dict:
+        """
+        캐시된 get_prompt 응답 반환 (없으면 Redis → bedrock-agent 순으로 조회)
+
+        Args:
+            prompt_identifier: 프롬프트 ARN 또는 ID (':버전' 포함 가능)
+            version: 프롬프트 버전 (없으면 식별자에서 추출, 그래도 없으면 DRAFT)
+            client: bedrock-agent 클라이언트 (없으면 BedrockClients.get_agent())
+        """
+        key = split_prompt_identifier(prompt_identifier, version)
+
+        prompt = self._get_local(key)
+        if prompt is not None:
+            self._count('hits')
+            return prompt
+
+        # 같은 프롬프트에 대한 동시 miss는 한 번만 조회
+        with self._lock:
+            inflight = self._inflight.setdefault(key, threading.Lock())
+
+        with inflight:
+            prompt = self._get_local(key)
+            if prompt is not None:
+                self._count('hits')
+                return prompt
+
+            self._count('misses')
+            try:
+                prompt = self._get_redis(key)
+                if prompt is not None:
+                    self._count('redis_hits')
+                else:
+                    prompt = self._fetch(key, client)
+                    self._set_redis(key, prompt)
+                self._set_local(key, prompt)
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+
+        return prompt
+
+    def get_compiled(self, prompt_identifier: str, version: Optional[str] = None, client=None) -> CompiledPrompt:
+        """컴파일된 템플릿 반환 (캐시 엔트리에 함께 보관하여 재파싱 방지)"""
+        key = split_prompt_identifier(prompt_identifier, version)
+        prompt = self.get(prompt_identifier, version=version, client=client)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.prompt is prompt and entry.compiled is not None:
+                return entry.compiled
+
+        compiled = CompiledPrompt.from_prompt(prompt)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.prompt is prompt:
+                entry.compiled = compiled
+
+        return compiled
+
+    def invalidate(self, prompt_identifier: str, version: Optional[str] = None):
+        """
+        캐시 무효화
+
+        version을 지정하면 해당 버전만, 지정하지 않으면(식별자에도 버전이 없으면)
+        해당 프롬프트의 모든 버전을 제거합니다.
+        """
+        identifier, parsed_version = split_prompt_identifier(prompt_identifier, version)
+        all_versions = version is None and identifier == prompt_identifier
+
+        with self._lock:
+            if all_versions:
+                keys = [k for k in self._entries if k[0] == identifier]
+            else:
+                keys = [(identifier, parsed_version)]
+            for key in keys:
+                self._entries.pop(key, None)
+
+        if self.use_redis:
+            try:
+                redis_client = self._redis()
+                if all_versions:
+                    redis_keys = list(redis_client.scan_iter(match=f"{REDIS_KEY_PREFIX}:{identifier}:*"))
+                else:
+                    redis_keys = [self._redis_key((identifier, parsed_version))]
+                if redis_keys:
+                    redis_client.delete(*redis_keys)
+            except Exception as e:
+                logger.warning(f"Prompt 캐시 Redis 무효화 실패: {str(e)}")
+
+        logger.info(f"Prompt 캐시 무효화: {identifier} (version={'*' if all_versions else parsed_version})")
+
+    def clear(self):
+        """프로세스 내 캐시 전체 비우기 (Redis 티어는 유지)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        total = stats['hits'] + stats['misses']
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            **stats,
+            "hit_rate": round(stats['hits'] / total, 4) if total else 0.0,
+        }
+
+    # ----- 내부 구현 -----
+
+    def _count(self, name: str, amount: int = 1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def _ttl_for(self, key: Tuple[str, str]) -> int:
+        return self.ttl if key[1] == DRAFT_VERSION else self.versioned_ttl
+
+    def _get_local(self, key) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry.prompt
+
+    def _set_local(self, key, prompt: dict):
+        with self._lock:
+            self._entries[key] = _Entry(prompt=prompt, expires_at=time.monotonic() + self._ttl_for(key))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._count('evictions')
+
+    def _fetch(self, key, client=None) -> dict:
+        identifier, version = key
+        client = client or BedrockClients.get_agent()
+
+        params = {"promptIdentifier": identifier}
+        if version != DRAFT_VERSION:
+            params["promptVersion"] = version
+
+        started = time.monotonic()
+        response = client.get_prompt(**params)
+        response.pop('ResponseMetadata', None)
+        logger.info(
+            f"Prompt 조회 (cache miss): {response.get('name', 'Unknown')} "
+            f"version={version}, {(time.monotonic() - started) * 1000:.0f}ms"
+        )
+        return response
+
+    def _redis(self):
+        from common.redis.redis_client import get_redis_client
+        return get_redis_client()
+
+    def _redis_key(self, key) -> str:
+        return f"{REDIS_KEY_PREFIX}:{key[0]}:{key[1]}"
+
+    def _get_redis(self, key) -> Optional[dict]:
+        if not self.use_redis:
+            return None
+        try:
+            raw = self._redis().get(self._redis_key(key))
+            return json.loads(raw) if raw else None
+        except Exception as e:
+            logger.warning(f"Prompt 캐시 Redis 조회 실패: {str(e)}")
+            return None
+
+    def _set_redis(self, key, prompt: dict):
+        if not self.use_redis:
+            return
+        try:
+            # createdAt/updatedAt 등 datetime 필드는 문자열로 저장
+            raw = json.dumps(prompt, ensure_ascii=False, default=str)
+            self._redis().set(self._redis_key(key), raw, ex=self._ttl_for(key))
+        except Exception as e:
+            logger.warning(f"Prompt 캐시 Redis 저장 실패: {str(e)}")
+
+
+_prompt_cache: Optional[PromptTemplateCache] = None
+
+
+def get_prompt_cache() -> PromptTemplateCache:
+    """Prompt 캐시 싱글톤 반환"""
+    global _prompt_cache
+    if _prompt_cache is None:
+        _prompt_cache = PromptTemplateCache.from_settings()
+    return _prompt_cache
+
+
+def get_prompt(prompt_identifier: str, version: Optional[str] = None, client=None) -> dict:
+    """캐시를 거쳐 get_prompt 응답 반환"""
+    return get_prompt_cache().get(prompt_identifier, version=version, client=client)
+
+
+def get_compiled_prompt(prompt_identifier: str, version: Optional[str] = None, client=None) -> CompiledPrompt:
+    """캐시를 거쳐 컴파일된 프롬프트 템플릿 반환"""
+    return get_prompt_cache().get_compiled(prompt_identifier, version=version, client=client)
@@ -0,0 +1,299 @@
+"""
+재개 가능한 SSE 스트림 (Redis Stream 기반 Last-Event-ID 재생)
+
+스트리밍 응답의 각 프레임에 `id: {stream_id}:{seq}`를 붙이고 짧은 TTL의 Redis Stream에도 기록합니다.
+클라이언트가 끊겼다가 같은 요청을 `Last-Event-ID` 헤더와 함께 다시 보내면 Bedrock을 다시 호출하지 않고
+놓친 프레임을 재생한 뒤, 생성이 아직 진행 중이면 실시간 꼬리(live tail)에 붙습니다.
+
+클라이언트가 끊겨도 생성은 백그라운드에서 끝까지 진행되어 Redis와 완료 훅(대화 이력 저장)에 반영됩니다.
+
+- Redis 기록은 프레임마다가 아니라 SSE_RESUME_FLUSH_FRAMES개 또는 SSE_RESUME_FLUSH_INTERVAL_MS마다 모아서 보냄
+- 스트림 키에 요청 소유자 지문(stream_owner: 사용자 + 원 요청)을 넣어, stream_id만 알아서는 남의 스트림을 재생할 수 없음
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from common.redis.redis_client import get_redis_client
+
+from .streaming import sse_event, sse_response
+
+logger = logging.getLogger(__name__)
+
+STREAM_KEY_PREFIX = 'sse:stream:'
+TERMINAL_TYPES = ('done', 'error')
+
+# 클라이언트 이탈 후 백그라운드로 넘긴 스트림 (GC 방지용 참조)
+_background_tasks = set()
+
+
+def stream_key(owner: str, stream_id: str) -> str:
+    return f"{STREAM_KEY_PREFIX}{owner}:{stream_id}"
+
+
+def stream_owner(request) -> str:
+    """
+    스트림 소유자 지문 - 인증 사용자/Authorization/userId와 원 요청(경로, 본문)
+
+    재개 요청은 같은 요청을 다시 보내므로 지문이 같아야만 스트림 키를 찾을 수 있습니다.
+    """
+    user = getattr(request, 'user', None)
+    parts = [
+        str(user.pk) if getattr(user, 'is_authenticated', False) else '',
+        request.headers.get('Authorization', ''),
+        request.GET.get('userId', ''),
+        request.path,
+    ]
+    digest = hashlib.sha256('\n'.join(parts).encode('utf-8'))
+    digest.update(request.body)
+    return digest.hexdigest()[:32]
+
+
+def parse_last_event_id(value: str):
+    """'{stream_id}:{seq}' -> (stream_id, seq), 형식이 다르면 None"""
+    if not value:
+        return None
+    stream_id, sep, seq = value.strip().rpartition(':')
+    if not sep or not stream_id or not seq.isdigit():
+        return None
+    return stream_id, int(seq)
+
+
+def tag_frame(frame: str, stream_id: str, seq: int) -> str:
+    return f"id: {stream_id}:{seq}\n{frame}"
+
+
+def is_terminal(frame: str) -> bool:
+    if not frame.startswith('data: '):
+        return False
+    try:
+        return json.loads(frame[6:]).get('type') in TERMINAL_TYPES
+    except ValueError:
+        return False
+
+
+class StreamRecorder:
+    """
+    SSE 프레임을 Redis Stream에 기록 (엔트리 ID = 0-{seq})
+
+    ID를 직접 매기므로 SSE id는 Redis 왕복 없이 바로 붙일 수 있고,
+    기록은 버퍼에 모아 flush_frames개 또는 flush_interval_ms마다 파이프라인 한 번으로 보냅니다.
+    스트림이 끝나면 남은 버퍼를 보냅니다.
+    """
+
+    def __init__(self, owner: str, stream_id: str = None, client=None, ttl: int = None,
+                 flush_frames: int = None, flush_interval_ms: int = None):
+        self.stream_id = stream_id or uuid.uuid4().hex
+        self.key = stream_key(owner, self.stream_id)
+        self.client = client or get_redis_client()
+        self.ttl = ttl or getattr(settings, 'SSE_RESUME_TTL', 300)
+        self.flush_frames = flush_frames or getattr(settings, 'SSE_RESUME_FLUSH_FRAMES', 16)
+        self.flush_interval = (flush_interval_ms or getattr(settings, 'SSE_RESUME_FLUSH_INTERVAL_MS', 100)) / 1000
+        self.seq = 0
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+        self._expire_set = False
+
+    def record(self, frame: str) -> str:
+        """프레임을 버퍼에 넣고 id가 붙은 프레임 반환"""
+        self.seq += 1
+        with self._lock:
+            self._buffer.append((self.seq, frame))
+        return tag_frame(frame, self.stream_id, self.seq)
+
+    def flush_due(self) -> bool:
+        """버퍼가 flush_frames개 이상이거나 마지막 기록 후 flush_interval이 지났는지"""
+        return len(self._buffer) >= self.flush_frames or time.monotonic() - self._flushed_at >= self.flush_interval
+
+    def flush(self):
+        """버퍼의 프레임을 XADD (실패해도 라이브 스트림은 계속)"""
+        # 엔트리 ID가 증가 순서여야 하므로 flush끼리는 직렬화, 버퍼 교체만 짧게 잠금
+        with self._flush_lock:
+            with self._lock:
+                batch, self._buffer = self._buffer, []
+            self._flushed_at = time.monotonic()
+            if not batch:
+                return
+            try:
+                pipe = self.client.pipeline(transaction=False)
+                for seq, frame in batch:
+                    pipe.xadd(self.key, {'frame': frame}, id=f"0-{seq}")
+                if not self._expire_set or is_terminal(batch[-1][1]):
+                    pipe.expire(self.key, self.ttl)
+                    self._expire_set = True
+                pipe.execute()
+            except Exception as e:
+                logger.warning(f"SSE 스트림 기록 실패 ({self.key}): {str(e)}")
+
+    def tee(self, frames):
+        """동기 프레임 스트림에 id를 붙이고 기록 (WSGI - 프레임마다가 아니라 모아서 XADD)"""
+        handed_off = False
+        try:
+            for frame in frames:
+                tagged = self.record(frame)
+                if self.flush_due():
+                    self.flush()
+                yield tagged
+        except GeneratorExit:
+            # 클라이언트 이탈 - 남은 생성분은 백그라운드 스레드에서 Redis에만 기록
+            handed_off = True
+            thread = threading.Thread(target=self._drain, args=(frames,), daemon=True)
+            thread.start()
+            raise
+        finally:
+            if not handed_off:
+                self.flush()
+
+    def _drain(self, frames):
+        try:
+            for frame in frames:
+                self.record(frame)
+                if self.flush_due():
+                    self.flush()
+        except Exception as e:
+            logger.error(f"SSE 백그라운드 스트림 오류 ({self.key}): {str(e)}")
+        self.flush()
+        logger.info(f"클라이언트 이탈 스트림 기록 완료: {self.key} (seq={self.seq})")
+
+    async def atee(self, frames):
+        """
+        비동기 프레임 스트림에 id를 붙이고 기록 (ASGI)
+
+        Redis 쓰기는 스레드에서 수행하며, flush_due가 아니거나 진행 중인 쓰기가 있으면 다음 쓰기 때 모아서 보냅니다.
+        """
+        loop = asyncio.get_running_loop()
+        writing = None
+        handed_off = False
+        try:
+            async for frame in frames:
+                tagged = self.record(frame)
+                if (writing is None or writing.done()) and self.flush_due():
+                    writing = loop.run_in_executor(None, self.flush)
+                yield tagged
+        except GeneratorExit:
+            handed_off = True
+            task = asyncio.ensure_future(self._adrain(frames, writing))
+            _background_tasks.add(task)
+            task.add_done_callback(_background_tasks.discard)
+            raise
+        finally:
+            if not handed_off:
+                if writing is not None:
+                    await writing
+                await loop.run_in_executor(None, self.flush)
+
+    async def _adrain(self, frames, writing):
+        loop = asyncio.get_running_loop()
+        try:
+            async for frame in frames:
+                self.record(frame)
+                if (writing is None or writing.done()) and self.flush_due():
+                    writing = loop.run_in_executor(None, self.flush)
+        except Exception as e:
+            logger.error(f"SSE 백그라운드 스트림 오류 ({self.key}): {str(e)}")
+        if writing is not None:
+            await writing
+        await loop.run_in_executor(None, self.flush)
+        logger.info(f"클라이언트 이탈 스트림 기록 완료: {self.key} (seq={self.seq})")
+
+
+def replay_stream(owner: str, stream_id: str, after_seq: int, client=None):
+    """
+    after_seq 이후 프레임을 재생하고, 종료 프레임(done/error)이 나올 때까지 실시간 꼬리를 따라감
+
+    SSE_RESUME_IDLE_TIMEOUT 동안 새 프레임이 없으면 에러 이벤트로 종료합니다.
+    """
+    client = client or get_redis_client()
+    key = stream_key(owner, stream_id)
+    block_ms = getattr(settings, 'SSE_RESUME_BLOCK_MS', 2000)
+    idle_timeout_ms = getattr(settings, 'SSE_RESUME_IDLE_TIMEOUT', 30) * 1000
+    last_id = f"0-{after_seq}"
+    idle_ms = 0
+
+    try:
+        while True:
+            result = client.xread({key: last_id}, count=100, block=block_ms)
+            if not result:
+                idle_ms += block_ms
+                if idle_ms >= idle_timeout_ms:
+                    yield sse_event({'type': 'error', 'message': 'Stream timed out'})
+                    return
+                continue
+
+            idle_ms = 0
+            for entry_id, fields in result[0][1]:
+                last_id = entry_id
+                frame = fields['frame']
+                yield tag_frame(frame, stream_id, int(entry_id.split('-', 1)[1]))
+                if is_terminal(frame):
+                    return
+
+    except Exception as e:
+        logger.error(f"SSE 재생 오류 ({key}): {str(e)}")
+        yield sse_event({'type': 'error', 'message': str(e)})
+
+
+def resume_enabled() -> bool:
+    return getattr(settings, 'SSE_RESUME_ENABLED', False)
+
+
+def resume_response(request):
+    """
+    Last-Event-ID가 있고 이 요청 소유자의 스트림이 Redis에 남아 있으면 재생 응답, 아니면 None
+
+    None이면 호출한 뷰가 평소대로 새 생성을 시작합니다.
+    """
+    if not resume_enabled():
+        return None
+    parsed = parse_last_event_id(request.headers.get('Last-Event-ID'))
+    if parsed is None:
+        return None
+
+    stream_id, after_seq = parsed
+    owner = stream_owner(request)
+    try:
+        if not get_redis_client().exists(stream_key(owner, stream_id)):
+            logger.info(f"재개할 스트림 없음 (만료 또는 다른 요청): {stream_id}")
+            return None
+    except Exception as e:
+        logger.warning(f"SSE 재개 확인 실패: {str(e)}")
+        return None
+
+    logger.info(f"SSE 스트림 재개: {stream_id} (after seq={after_seq})")
+    response = sse_response(replay_stream(owner, stream_id, after_seq))
+    response['X-Stream-Id'] = stream_id
+    return response
+
+
+async def aresume_response(request):
+    """resume_response의 비동기 버전 (Last-Event-ID가 있을 때만 Redis 조회를 스레드에서 수행)"""
+    if not resume_enabled() or not request.headers.get('Last-Event-ID'):
+        return None
+    return await sync_to_async(resume_response, thread_sensitive=False)(request)
+
+
+def resumable_sse_response(stream, owner: str = None):
+    """
+    프레임마다 id를 붙이고 Redis Stream에 기록하는 SSE 응답
+
+    owner는 stream_owner(request) - 없거나 비활성화 시 일반 SSE 응답
+    """
+    if not resume_enabled() or not owner:
+        return sse_response(stream)
+
+    recorder = StreamRecorder(owner)
+    if hasattr(stream, '__aiter__'):
+        response = sse_response(recorder.atee(stream))
+    else:
+        response = sse_response(recorder.tee(iter(stream)))
+    response['X-Stream-Id'] = recorder.stream_id
+    return response
@@ -1,27 +1,476 @@
+"""
+Bedrock 스트리밍 응답 처리
+
+모든 엔드포인트는 StreamPipeline 하나로 스트림을 처리합니다.
+
+    decode(이벤트) -> extract(델타/인용/종료) -> accumulate(리스트 버퍼)
+        -> coalesce(프레임 묶기) -> encode(SSE) -> on_done 훅
+
+엔드포인트는 이벤트 소스(INVOKE_MODEL / KNOWLEDGE_BASE)와 coalesce 설정만 선언하고,
+요청마다 달라지는 완료 훅(대화 이력 저장 등)은 stream()/astream() 호출 시 넘깁니다.
+
+citation_encoder를 지정하면 인용을 끝에 한 번에 모아 보내지 않고 도착할 때마다 인코더가 만든
+프레임으로 바로 보냅니다 (apps.knowledge.citations 참고).
+"""
+import asyncio
 import json
 import logging
+import time
+from dataclasses import dataclass, field
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import StreamingHttpResponse
 
 logger = logging.getLogger(__name__)
 
+# astream에서 읽기 태스크가 미리 받아 둘 수 있는 이벤트 수 (클라이언트가 느리면 upstream 읽기를 멈춤)
+STREAM_BUFFER_EVENTS = 64
+
+
 def sse_event(data: dict) -> str:
     """SSE 형식으로 데이터 포맷"""
     return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
 
-def stream_bedrock_response(response):
-    """Bedrock 스트리밍 응답 처리"""
+
+async def iterate_in_thread(iterator):
+    """
+    동기 이터레이터를 비동기 이터레이터로 변환 (청크마다 스레드에서 next 호출)
+
+    ASGI에서 async 버전이 없는 동기 스트림(TTS 등)을 보낼 때의 폴백입니다.
+    """
+    iterator = iter(iterator)
+    loop = asyncio.get_running_loop()
+    sentinel = object()
     try:
-        for event in response['body']:
-            chunk = json.loads(event['chunk']['bytes'])
-            
-            if chunk['type'] == 'content_block_delta':
-                text = chunk['delta'].get('text', '')
-                if text:
-                    yield sse_event({'type': 'content', 'text': text})
-            
-            elif chunk['type'] == 'message_stop':
-                yield sse_event({'type': 'done'})
+        while True:
+            item = await loop.run_in_executor(None, next, iterator, sentinel)
+            if item is sentinel:
                 break
-                
+            yield item
+    finally:
+        close = getattr(iterator, 'close', None)
+        if callable(close):
+            await loop.run_in_executor(None, close)
+
+
+def streaming_response(stream, content_type: str) -> StreamingHttpResponse:
+    """
+    서버 인터페이스에 맞는 StreamingHttpResponse 생성
+
+    - async 이터레이터: ASGI에서 스레드 전환 없이 그대로 전송
+    - sync 이터레이터: WSGI에서는 그대로 전송, ASGI에서는 iterate_in_thread로 감싸서 전송
+      (Django 4.2는 ASGI에서 sync 이터레이터를 sync_to_async(list)로 끝까지 모은 뒤 보내므로
+      감싸지 않으면 스트리밍이 되지 않습니다)
+    """
+    is_async = hasattr(stream, '__aiter__')
+    if not is_async and not isinstance(stream, (list, tuple)) \
+            and getattr(settings, 'SERVER_INTERFACE', 'wsgi') == 'asgi':
+        stream = iterate_in_thread(stream)
+    return StreamingHttpResponse(stream, content_type=content_type)
+
+
+def sse_response(stream) -> StreamingHttpResponse:
+    """SSE 스트리밍 응답 (프록시 버퍼링/캐시 비활성화)"""
+    response = streaming_response(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+class InvokeModelSource:
+    """invoke_model_with_response_stream 이벤트 스트림 (Anthropic messages 포맷)"""
+    stream_key = 'body'
+
+    @staticmethod
+    def decode(event):
+        return json.loads(event['chunk']['bytes'])
+
+    @staticmethod
+    def extract(chunk):
+        """(text, citation, stop) 반환"""
+        chunk_type = chunk.get('type')
+        if chunk_type == 'content_block_delta':
+            return chunk['delta'].get('text'), None, False
+        if chunk_type == 'message_stop':
+            return None, None, True
+        return None, None, False
+
+
+class KnowledgeBaseSource:
+    """retrieve_and_generate_stream 이벤트 스트림"""
+    stream_key = 'stream'
+
+    @staticmethod
+    def decode(event):
+        return event
+
+    @staticmethod
+    def extract(event):
+        if 'output' in event:
+            return event['output'].get('text'), None, False
+        if 'citation' in event:
+            return None, event['citation'], False
+        return None, None, False
+
+
+INVOKE_MODEL = InvokeModelSource()
+KNOWLEDGE_BASE = KnowledgeBaseSource()
+
+
+class Coalescer:
+    """
+    적응형 델타 묶기 - min_chars 이상 모이거나 max_delay가 지나면 한 프레임으로 내보냄
+
+    - 첫 델타는 TTFT를 위해 항상 즉시 전송
+    - min_chars가 0이면 델타마다 전송 (묶지 않음)
+    - max_delay(초)가 0이면 시간 기준 flush 없이 크기로만 묶음
+    """
+
+    def __init__(self, min_chars: int = 0, max_delay: float = 0.0, clock=time.monotonic):
+        self.min_chars = min_chars
+        self.max_delay = max_delay
+        self._clock = clock
+        self._parts = []
+        self._size = 0
+        self._deadline = None
+        self._first_sent = False
+
+    def push(self, text: str):
+        """프레임으로 내보낼 텍스트가 생기면 반환, 아니면 None"""
+        if not self._first_sent:
+            self._first_sent = True
+            return text
+        if self.min_chars <= 0:
+            return text
+        self._parts.append(text)
+        self._size += len(text)
+        if self._size >= self.min_chars:
+            return self.flush()
+        if self.max_delay > 0:
+            now = self._clock()
+            if self._deadline is None:
+                self._deadline = now + self.max_delay
+            elif now >= self._deadline:
+                return self.flush()
+        return None
+
+    def time_until_deadline(self):
+        """버퍼가 비었거나 시간 기준이 없으면 None, 아니면 flush까지 남은 초"""
+        if self._deadline is None:
+            return None
+        return max(self._deadline - self._clock(), 0.0)
+
+    def flush(self):
+        if not self._parts:
+            return None
+        text = ''.join(self._parts)
+        self._parts = []
+        self._size = 0
+        self._deadline = None
+        return text
+
+
+def content_event(text: str) -> str:
+    return sse_event({'type': 'content', 'text': text})
+
+
+def citations_event(citations: list) -> str:
+    return sse_event({
+        'type': 'citations',
+        'count': len(citations),
+        'data': citations
+    })
+
+
+def done_event(total_length: int) -> str:
+    return sse_event({'type': 'done', 'total_length': total_length})
+
+
+@dataclass
+class StreamResult:
+    """on_done 훅에 전달되는 스트림 결과"""
+    text: str = ''
+    citations: list = field(default_factory=list)
+    frames: int = 0
+
+
+class _StreamRun:
+    """스트림 1회 처리 상태 (sync/async 루프가 공유)"""
+
+    def __init__(self, pipeline):
+        self.source = pipeline.source
+        self.coalescer = pipeline.coalescer_factory()
+        self.parts = []
+        self.length = 0
+        self.citations = []
+        self.frames = 0
+        self.stopped = False
+        self.citation_encoder = pipeline.citation_encoder() if pipeline.citation_encoder else None
+
+    def feed(self, event) -> list:
+        """이벤트 하나를 처리하고 보낼 SSE 프레임 목록 반환"""
+        text, citation, stop = self.source.extract(self.source.decode(event))
+        if stop:
+            self.stopped = True
+            return []
+        if citation is not None:
+            self.citations.append(citation)
+            return self._citation_frames(citation)
+        if not text:
+            return []
+        self.parts.append(text)
+        self.length += len(text)
+        pending = self.coalescer.push(text)
+        if pending is None:
+            return []
+        self.frames += 1
+        return [content_event(pending)]
+
+    def _citation_frames(self, citation) -> list:
+        """인용을 바로 보내는 경우 - 인용 구간의 텍스트가 먼저 도착하도록 버퍼를 비운 뒤 인용 프레임"""
+        if self.citation_encoder is None:
+            return []
+        frames = []
+        pending = self.coalescer.flush()
+        if pending:
+            frames.append(content_event(pending))
+        frame = self.citation_encoder.encode(citation)
+        if frame is not None:
+            frames.append(frame)
+        self.frames += len(frames)
+        return frames
+
+    def flush_due(self):
+        """max_delay 경과로 내보낼 프레임 (없으면 None)"""
+        pending = self.coalescer.flush()
+        if not pending:
+            return None
+        self.frames += 1
+        return content_event(pending)
+
+    def tail_frames(self) -> list:
+        """남은 버퍼와 인용 프레임"""
+        frames = []
+        pending = self.coalescer.flush()
+        if pending:
+            frames.append(content_event(pending))
+        if self.citations and self.citation_encoder is None:
+            frames.append(citations_event(self.citations))
+        self.frames += len(frames) + 1
+        return frames
+
+    def result(self) -> StreamResult:
+        return StreamResult(text=''.join(self.parts), citations=self.citations, frames=self.frames)
+
+    def completion_hooks(self) -> list:
+        """인코더의 완료 처리 (예: 인용 원문 Redis 저장) - 다른 완료 훅과 같은 스레드에서 실행"""
+        if self.citation_encoder is None:
+            return []
+        return [self.citation_encoder.complete]
+
+    def done_frame(self) -> str:
+        return done_event(self.length)
+
+
+class StreamPipeline:
+    """
+    Bedrock 이벤트 스트림 -> SSE 프레임 파이프라인
+
+    Args:
+        source: 이벤트 소스 (INVOKE_MODEL, KNOWLEDGE_BASE)
+        min_chars: 이 글자 수만큼 모아서 전송 (None이면 SSE_COALESCE_MIN_CHARS, 0이면 델타마다 전송)
+        max_delay_ms: 버퍼를 최대 이만큼만 붙잡아 둠 (None이면 SSE_COALESCE_MAX_DELAY_MS)
+        on_done: 모든 요청에 공통으로 실행할 완료 훅 (StreamResult를 받음)
+        name: 로그용 이름 겸 SSE_COALESCE_ENDPOINTS 키
+        citation_encoder: 스트림마다 호출해 인용 인코더(encode(citation) -> 프레임 또는 None,
+            complete(result))를 만드는 팩토리 - None을 돌려주면 인용을 끝에 한 번에 보냄
+
+    coalesce 설정 우선순위: SSE_COALESCE_ENDPOINTS[name] > 생성자 인자 > 전역 기본값
+    """
+
+    def __init__(self, source, min_chars: int = None, max_delay_ms: float = None,
+                 on_done=None, name: str = 'stream', citation_encoder=None):
+        self.source = source
+        self.min_chars = min_chars
+        self.max_delay_ms = max_delay_ms
+        self.hooks = _as_hooks(on_done)
+        self.name = name
+        self.citation_encoder = citation_encoder
+
+    def coalesce_options(self) -> dict:
+        options = {
+            'min_chars': getattr(settings, 'SSE_COALESCE_MIN_CHARS', 48),
+            'max_delay_ms': getattr(settings, 'SSE_COALESCE_MAX_DELAY_MS', 50),
+        }
+        if self.min_chars is not None:
+            options['min_chars'] = self.min_chars
+        if self.max_delay_ms is not None:
+            options['max_delay_ms'] = self.max_delay_ms
+        options.update(getattr(settings, 'SSE_COALESCE_ENDPOINTS', {}).get(self.name, {}))
+        return options
+
+    def coalescer_factory(self):
+        options = self.coalesce_options()
+        return Coalescer(int(options['min_chars']), float(options['max_delay_ms']) / 1000)
+
+    def stream(self, response, on_done=None):
+        """
+        동기 이벤트 스트림 처리 (WSGI)
+
+        블로킹 read 중에는 끼어들 수 없으므로 max_delay는 다음 델타가 도착할 때 확인합니다.
+        """
+        run = _StreamRun(self)
+        try:
+            for event in response[self.source.stream_key]:
+                yield from run.feed(event)
+                if run.stopped:
+                    break
+
+            yield from run.tail_frames()
+
+            result = run.result()
+            for hook in self.hooks + _as_hooks(on_done) + run.completion_hooks():
+                _run_hook(hook, result)
+
+            self._log_complete(result)
+            yield run.done_frame()
+
+        except Exception as e:
+            logger.error(f"Streaming error ({self.name}): {str(e)}")
+            yield sse_event({'type': 'error', 'message': str(e)})
+
+        finally:
+            _close_events(response[self.source.stream_key])
+
+    async def astream(self, response, on_done=None):
+        """
+        비동기 이벤트 스트림 처리 (ASGI, aiobotocore) - 완료 훅은 스레드에서 실행
+
+        이벤트는 별도 태스크가 크기 제한이 있는 큐로 읽어 옵니다. 큐가 비어 있고 버퍼에 텍스트가 남아 있으면
+        다음 이벤트를 max_delay까지만 기다리고, 그 안에 오지 않으면 버퍼를 먼저 내보냅니다.
+        클라이언트가 끊거나 중간에 멈추면 upstream 이벤트 스트림을 닫아 연결을 풀에 돌려줍니다.
+        """
+        run = _StreamRun(self)
+        events = response[self.source.stream_key]
+        queue = asyncio.Queue(maxsize=STREAM_BUFFER_EVENTS)
+        reader = asyncio.ensure_future(_pump_events(events, queue))
+        try:
+            while True:
+                try:
+                    event = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = run.coalescer.time_until_deadline()
+                    if timeout is None:
+                        event = await queue.get()
+                    else:
+                        try:
+                            event = await asyncio.wait_for(queue.get(), timeout)
+                        except asyncio.TimeoutError:
+                            frame = run.flush_due()
+                            if frame is not None:
+                                yield frame
+                            continue
+
+                if event is _END_OF_STREAM:
+                    break
+                if isinstance(event, _StreamFailure):
+                    raise event.error
+
+                for frame in run.feed(event):
+                    yield frame
+                if run.stopped:
+                    break
+
+            for frame in run.tail_frames():
+                yield frame
+
+            result = run.result()
+            hooks = self.hooks + _as_hooks(on_done) + run.completion_hooks()
+            if hooks:
+                await sync_to_async(_run_hooks, thread_sensitive=False)(hooks, result)
+
+            self._log_complete(result)
+            yield run.done_frame()
+
+        except Exception as e:
+            logger.error(f"Streaming error ({self.name}): {str(e)}")
+            yield sse_event({'type': 'error', 'message': str(e)})
+
+        finally:
+            reader.cancel()
+            _close_events(events)
+
+    def _log_complete(self, result: StreamResult):
+        logger.info(
+            f"Stream complete ({self.name}). Total text length: {len(result.text)}, "
+            f"frames: {result.frames}, citations: {len(result.citations)}"
+        )
+
+
+_END_OF_STREAM = object()
+
+
+class _StreamFailure:
+    def __init__(self, error: Exception):
+        self.error = error
+
+
+async def _pump_events(events, queue: asyncio.Queue):
+    """
+    이벤트 스트림을 끝까지 읽어 큐에 넣음 (astream의 읽기 태스크)
+
+    큐가 차면 put에서 기다리므로 upstream 읽기도 멈춥니다. 취소(CancelledError)되면 아무것도 넣지 않고 종료합니다.
+    """
+    try:
+        async for event in events:
+            await queue.put(event)
     except Exception as e:
-        logger.error(f"Streaming error: {str(e)}")
-        yield sse_event({'type': 'error', 'message': str(e)})
\ No newline at end of file
+        await queue.put(_StreamFailure(e))
+        return
+    await queue.put(_END_OF_STREAM)
+
+
+def _close_events(events):
+    """끝까지 읽지 않았을 수 있는 이벤트 스트림 종료 (aiobotocore EventStream.close는 동기)"""
+    close = getattr(events, 'close', None)
+    if not callable(close):
+        return
+    try:
+        close()
+    except Exception as e:
+        logger.warning(f"이벤트 스트림 종료 실패: {str(e)}")
+
+
+def _as_hooks(on_done) -> list:
+    if on_done is None:
+        return []
+    if callable(on_done):
+        return [on_done]
+    return list(on_done)
+
+
+def _run_hook(hook, result: StreamResult):
+    # 훅 실패가 이미 전송된 답변을 에러로 바꾸지 않도록 로그만 남김
+    try:
+        hook(result)
+    except Exception as e:
+        logger.error(f"Stream on_done hook failed: {str(e)}", exc_info=True)
+
+
+def _run_hooks(hooks, result: StreamResult):
+    for hook in hooks:
+        _run_hook(hook, result)
+
+
+BEDROCK_PIPELINE = StreamPipeline(INVOKE_MODEL, name='bedrock')
+
+
+def stream_bedrock_response(response):
+    """Bedrock 스트리밍 응답 처리"""
+    return BEDROCK_PIPELINE.stream(response)
+
+
+def astream_bedrock_response(response):
+    """Bedrock 스트리밍 응답 처리 (aiobotocore 이벤트 스트림)"""
+    return BEDROCK_PIPELINE.astream(response)
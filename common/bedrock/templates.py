@@ -0,0 +1,166 @@
+"""
+Bedrock Prompt 템플릿 컴파일/렌더링
+get_prompt 응답의 TEXT/CHAT variant를 한 번만 파싱해 두고,
+요청마다 단일 패스로 {{변수}}를 치환하여 invoke_model 요청 body를 생성합니다.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+DEFAULT_MODEL_ID = 'anthropic.claude-3-5-sonnet-20240620-v1:0'
+ANTHROPIC_VERSION = 'bedrock-2023-05-31'
+
+_VARIABLE_PATTERN = re.compile(r'\{\{([^{}]+)\}\}')
+
+
+class CompiledText:
+    """
+    '{{var}}' 자리표시자를 가진 텍스트를 (리터럴, 변수명) 조각으로 미리 분해한 형태
+
+    렌더링은 조각을 한 번 이어 붙이는 것으로 끝나므로 비용이 O(템플릿 길이 + 값 길이)입니다.
+    전달되지 않은 변수는 기존 str.replace 방식과 동일하게 자리표시자를 그대로 남깁니다.
+    """
+    __slots__ = ('raw', 'literals', 'names')
+
+    def __init__(self, text: str):
+        self.raw = text
+        parts = _VARIABLE_PATTERN.split(text)
+        self.literals = parts[0::2]
+        self.names = parts[1::2]
+
+    def render(self, variables: dict) -> str:
+        if not self.names:
+            return self.raw
+
+        out = [self.literals[0]]
+        for name, literal in zip(self.names, self.literals[1:]):
+            if name in variables:
+                out.append(str(variables[name]))
+            else:
+                out.append(f"{{{{{name}}}}}")
+            out.append(literal)
+        return "".join(out)
+
+
+@dataclass
+class CompiledPrompt:
+    """get_prompt 응답의 첫 번째 variant를 컴파일한 결과"""
+    name: str
+    template_type: str
+    model_id: str
+    inference_config: dict
+    text: Optional[CompiledText] = None
+    messages: List[Tuple[str, List[CompiledText]]] = field(default_factory=list)
+    system: List[CompiledText] = field(default_factory=list)
+
+    @classmethod
+    def from_prompt(cls, prompt_response: dict) -> "CompiledPrompt":
+        variants = prompt_response.get('variants', [])
+        if not variants:
+            raise ValueError("Prompt has no variants")
+
+        variant = variants[0]
+        template_type = variant.get('templateType', 'TEXT')
+        template_config = variant.get('templateConfiguration', {})
+
+        compiled = cls(
+            name=prompt_response.get('name', 'Unknown'),
+            template_type=template_type,
+            model_id=prompt_response.get('defaultModelId', DEFAULT_MODEL_ID),
+            inference_config=variant.get('inferenceConfiguration', {}),
+        )
+
+        if template_type == 'TEXT':
+            compiled.text = CompiledText(template_config.get('text', {}).get('text', ''))
+
+        elif template_type == 'CHAT':
+            chat_config = template_config.get('chat', {})
+            for msg in chat_config.get('messages', []):
+                blocks = [
+                    CompiledText(block['text'])
+                    for block in msg.get('content', [])
+                    if 'text' in block
+                ]
+                compiled.messages.append((msg.get('role', 'user'), blocks))
+            compiled.system = [
+                CompiledText(sys_prompt['text'])
+                for sys_prompt in chat_config.get('system', [])
+                if 'text' in sys_prompt
+            ]
+
+        else:
+            raise ValueError(f"Unsupported template type: {template_type}")
+
+        return compiled
+
+    def render_messages(self, variables: dict, fallback_user_message: Optional[str] = None,
+                        history: Optional[list] = None) -> list:
+        """
+        Anthropic messages 형식으로 렌더링
+
+        CHAT 템플릿에서 마지막 메시지가 user가 아니면 fallback_user_message를 user 메시지로 추가합니다.
+        history(이전 대화 [{"role", "content"}])는 마지막 user 메시지(현재 질문) 바로 앞에 넣습니다.
+        """
+        if self.template_type == 'TEXT':
+            formatted_messages = [{"role": "user", "content": self.text.render(variables)}]
+        else:
+            formatted_messages = []
+            for role, blocks in self.messages:
+                texts = [t for t in (block.render(variables) for block in blocks) if t.strip()]
+                if texts:
+                    formatted_messages.append({"role": role, "content": " ".join(texts)})
+
+            if fallback_user_message is not None and (
+                not formatted_messages or formatted_messages[-1].get('role') != 'user'
+            ):
+                formatted_messages.append({"role": "user", "content": fallback_user_message})
+
+        if history:
+            insert_at = len(formatted_messages)
+            if formatted_messages and formatted_messages[-1].get('role') == 'user':
+                insert_at -= 1
+            formatted_messages[insert_at:insert_at] = history
+            formatted_messages = merge_consecutive_roles(formatted_messages)
+
+        return formatted_messages
+
+    def render_system(self, variables: dict) -> Optional[str]:
+        texts = [t for t in (block.render(variables) for block in self.system) if t.strip()]
+        return " ".join(texts) if texts else None
+
+    def build_body(self, variables: dict, fallback_user_message: Optional[str] = None,
+                   history: Optional[list] = None, summary: Optional[str] = None) -> dict:
+        """
+        invoke_model / invoke_model_with_response_stream 요청 body 생성
+
+        summary(이전 대화 요약)가 있으면 system 프롬프트 뒤에 덧붙입니다.
+        """
+        body = {
+            "anthropic_version": ANTHROPIC_VERSION,
+            "max_tokens": self.inference_config.get('maxTokens', 4096),
+            "temperature": self.inference_config.get('temperature', 1.0),
+            "messages": self.render_messages(variables, fallback_user_message, history),
+        }
+
+        system = self.render_system(variables)
+        if summary:
+            summary_text = f"[이전 대화 요약]\n{summary}"
+            system = f"{system}\n\n{summary_text}" if system else summary_text
+        if system:
+            body['system'] = system
+
+        if 'stopSequences' in self.inference_config:
+            body['stop_sequences'] = self.inference_config['stopSequences']
+
+        return body
+
+
+def merge_consecutive_roles(messages: list) -> list:
+    """같은 role이 연속되면 한 메시지로 합침 (Bedrock은 user/assistant 교대만 허용)"""
+    merged = []
+    for message in messages:
+        if merged and merged[-1]['role'] == message['role']:
+            merged[-1] = {"role": message['role'], "content": f"{merged[-1]['content']}\n\n{message['content']}"}
+        else:
+            merged.append(message)
+    return merged
@@ -0,0 +1,80 @@
+"""
+로컬 Bedrock 스텁 서버 (AWS event-stream 인코딩)
+
+aiohttp로 invoke-with-response-stream / converse-stream 경로에 event-stream 응답을 돌려주며,
+BEDROCK_RUNTIME_ENDPOINT_URL을 이 서버로 지정해 aiobotocore 스트림 파싱까지 실제로 거칩니다.
+"""
+import base64
+import binascii
+import json
+import struct
+
+from aiohttp import web
+
+HEADER_STRING = 7
+
+
+def encode_headers(headers: dict) -> bytes:
+    encoded = b''
+    for name, value in headers.items():
+        name, value = name.encode('utf-8'), value.encode('utf-8')
+        encoded += struct.pack('!B', len(name)) + name + struct.pack('!BH', HEADER_STRING, len(value)) + value
+    return encoded
+
+
+def encode_message(headers: dict, payload: bytes) -> bytes:
+    """prelude(전체 길이, 헤더 길이, CRC) + 헤더 + payload + 메시지 CRC"""
+    header_bytes = encode_headers(headers)
+    total = 12 + len(header_bytes) + len(payload) + 4
+    prelude = struct.pack('!II', total, len(header_bytes))
+    prelude += struct.pack('!I', binascii.crc32(prelude) & 0xffffffff)
+    message = prelude + header_bytes + payload
+    return message + struct.pack('!I', binascii.crc32(message) & 0xffffffff)
+
+
+def event(event_type: str, payload: dict) -> bytes:
+    return encode_message(
+        {':event-type': event_type, ':content-type': 'application/json', ':message-type': 'event'},
+        json.dumps(payload).encode('utf-8'),
+    )
+
+
+def anthropic_chunks(texts):
+    """invoke_model_with_response_stream의 chunk 이벤트 (Anthropic messages 포맷)"""
+    chunks = [{'type': 'content_block_delta', 'delta': {'type': 'text_delta', 'text': text}} for text in texts]
+    chunks.append({'type': 'message_stop'})
+    return [event('chunk', {'bytes': base64.b64encode(json.dumps(c).encode('utf-8')).decode('ascii')}) for c in chunks]
+
+
+class StubServer:
+    """async with StubServer(texts) as url: ..."""
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.requests = []
+        self._runner = None
+
+    async def _invoke_stream(self, request):
+        self.requests.append((request.match_info['model_id'], await request.json()))
+        response = web.StreamResponse(headers={
+            'Content-Type': 'application/vnd.amazon.eventstream',
+            'X-Amzn-Bedrock-Content-Type': 'application/json',
+        })
+        await response.prepare(request)
+        for message in anthropic_chunks(self.texts):
+            await response.write(message)
+        await response.write_eof()
+        return response
+
+    async def __aenter__(self) -> str:
+        app = web.Application()
+        app.router.add_post('/model/{model_id}/invoke-with-response-stream', self._invoke_stream)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}"
+
+    async def __aexit__(self, *exc):
+        await self._runner.cleanup()
@@ -0,0 +1,107 @@
+import asyncio
+import json
+import os
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from common.bedrock import async_clients
+from common.bedrock.async_clients import AsyncBedrockClients
+from common.bedrock.streaming import BEDROCK_PIPELINE
+from common.lifespan import LifespanApp
+
+from .eventstream_stub import StubServer
+
+CREDENTIALS = {'AWS_ACCESS_KEY_ID': 'test', 'AWS_SECRET_ACCESS_KEY': 'test', 'AWS_SESSION_TOKEN': 'test'}
+
+
+def payloads(frames):
+    return [json.loads(frame.split('data: ', 1)[1]) for frame in frames]
+
+
+@mock.patch.dict(os.environ, CREDENTIALS)
+class StubEventStreamTests(SimpleTestCase):
+    def run_with_stub(self, texts, scenario):
+        async def main():
+            async with StubServer(texts) as url:
+                with override_settings(BEDROCK_RUNTIME_ENDPOINT_URL=url, BEDROCK_MAX_ATTEMPTS=1):
+                    try:
+                        return await scenario()
+                    finally:
+                        await AsyncBedrockClients.close_all()
+        return asyncio.run(main())
+
+    def test_invoke_model_with_response_stream(self):
+        async def scenario():
+            response = await async_clients.invoke_model_with_response_stream('stub-model', {'messages': []})
+            return [json.loads(event['chunk']['bytes']) async for event in response['body']]
+
+        chunks = self.run_with_stub(['안녕', '하세요'], scenario)
+        self.assertEqual([c['type'] for c in chunks], ['content_block_delta', 'content_block_delta', 'message_stop'])
+        self.assertEqual(chunks[1]['delta']['text'], '하세요')
+
+    @override_settings(SSE_COALESCE_MIN_CHARS=0)
+    def test_pipeline_over_stub_stream(self):
+        async def scenario():
+            response = await async_clients.invoke_model_with_response_stream('stub-model', {'messages': []})
+            return [frame async for frame in BEDROCK_PIPELINE.astream(response)]
+
+        events = payloads(self.run_with_stub(['가', '나', '다'], scenario))
+        self.assertEqual(''.join(e['text'] for e in events if e['type'] == 'content'), '가나다')
+        self.assertEqual(events[-1], {'type': 'done', 'total_length': 3})
+
+    def test_client_reused_per_loop_and_closed(self):
+        async def scenario():
+            first = await AsyncBedrockClients.get_runtime()
+            self.assertIs(first, await AsyncBedrockClients.get_runtime())
+            await AsyncBedrockClients.close_all()
+            self.assertIsNot(first, await AsyncBedrockClients.get_runtime())
+
+        self.run_with_stub([], scenario)
+
+
+class LifespanTests(SimpleTestCase):
+    def test_shutdown_runs_callbacks(self):
+        calls = []
+
+        async def close():
+            calls.append('closed')
+
+        async def failing():
+            raise RuntimeError('boom')
+
+        app = LifespanApp(mock.AsyncMock(), on_shutdown=[failing, close])
+        messages = iter([{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}])
+        sent = []
+
+        async def receive():
+            return next(messages)
+
+        async def send(message):
+            sent.append(message['type'])
+
+        asyncio.run(app({'type': 'lifespan'}, receive, send))
+        self.assertEqual(sent, ['lifespan.startup.complete', 'lifespan.shutdown.complete'])
+        self.assertEqual(calls, ['closed'])
+        app.app.assert_not_called()
+
+    def test_sync_callback_runs_off_loop(self):
+        threads = []
+        app = LifespanApp(mock.AsyncMock(), on_shutdown=[lambda: threads.append(threading.current_thread())])
+        messages = iter([{'type': 'lifespan.shutdown'}])
+
+        async def receive():
+            return next(messages)
+
+        async def send(message):
+            pass
+
+        asyncio.run(app({'type': 'lifespan'}, receive, send))
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.main_thread())
+
+    def test_http_passes_through(self):
+        inner = mock.AsyncMock()
+        asyncio.run(LifespanApp(inner)({'type': 'http'}, None, None))
+        inner.assert_awaited_once()
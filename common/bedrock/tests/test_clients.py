@@ -0,0 +1,32 @@
+from types import SimpleNamespace
+from unittest import mock
+
+import boto3
+
+from django.test import SimpleTestCase
+
+from common.bedrock.clients import BedrockClients
+
+
+def client(endpoint):
+    return SimpleNamespace(meta=SimpleNamespace(config=SimpleNamespace(max_pool_connections=50)), _endpoint=endpoint)
+
+
+class PoolStatsTests(SimpleTestCase):
+    def test_internal_layout_change_reports_error(self):
+        clients = {('bedrock-runtime', 'ap-northeast-2'): client(SimpleNamespace())}
+        with mock.patch.object(BedrockClients, '_clients', clients):
+            stats = BedrockClients.pool_stats()
+        entry = stats['bedrock-runtime:ap-northeast-2']
+        self.assertEqual(entry['max_pool_connections'], 50)
+        self.assertEqual(entry['pools'], [])
+        self.assertIn('AttributeError', entry['error'])
+
+    def test_real_client_pools(self):
+        # 요청 전이라 풀은 비어 있지만, 현재 botocore 구조에서 내부 속성을 읽을 수 있어야 함
+        real = boto3.client('bedrock-runtime', region_name='ap-northeast-2', config=BedrockClients.build_config(),
+                            aws_access_key_id='x', aws_secret_access_key='x')
+        with mock.patch.object(BedrockClients, '_clients', {('bedrock-runtime', 'ap-northeast-2'): real}):
+            entry = BedrockClients.pool_stats()['bedrock-runtime:ap-northeast-2']
+        self.assertNotIn('error', entry)
+        self.assertEqual(entry['pools'], [])
@@ -0,0 +1,87 @@
+import asyncio
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from common.bedrock import converse
+from common.bedrock.converse import ConverseClient, ConverseStreamParser
+
+
+def tool_events(name='navigate_to_person', chunks=('{"person', '_name": "이순신"}')):
+    return [
+        {'contentBlockStart': {'contentBlockIndex': 1, 'start': {'toolUse': {'name': name, 'toolUseId': 't1'}}}},
+        *[{'contentBlockDelta': {'contentBlockIndex': 1, 'delta': {'toolUse': {'input': c}}}} for c in chunks],
+        {'contentBlockStop': {'contentBlockIndex': 1}},
+    ]
+
+
+def text_events(*texts):
+    return [{'contentBlockDelta': {'contentBlockIndex': 0, 'delta': {'text': t}}} for t in texts]
+
+
+class EventStream:
+    def __init__(self, events):
+        self.events = events
+        self.consumed = 0
+        self.closed = False
+
+    def __iter__(self):
+        for event in self.events:
+            self.consumed += 1
+            yield event
+
+    async def __aiter__(self):
+        for event in self:
+            yield event
+
+    def close(self):
+        self.closed = True
+
+
+class ConverseStreamParserTests(SimpleTestCase):
+    def test_tool_input_assembled_from_deltas(self):
+        parser = ConverseStreamParser()
+        parsed = [p for event in tool_events() for p in parser.feed(event)]
+        self.assertEqual(parsed, [{'type': 'tool_call', 'action': 'navigate_to_person', 'input': {'person_name': '이순신'}}])
+
+    def test_text_and_stop(self):
+        parser = ConverseStreamParser()
+        events = [{'messageStart': {'role': 'assistant'}}, *text_events('안', '녕'), {'messageStop': {'stopReason': 'end_turn'}}]
+        parsed = [p for event in events for p in parser.feed(event)]
+        self.assertEqual(parsed, [
+            {'type': 'text', 'text': '안'}, {'type': 'text', 'text': '녕'}, {'type': 'stop', 'stop_reason': 'end_turn'},
+        ])
+
+    def test_tool_without_input(self):
+        parser = ConverseStreamParser()
+        parsed = [p for event in tool_events(chunks=()) for p in parser.feed(event)]
+        self.assertEqual(parsed[0]['input'], {})
+
+
+class StreamingDecisionTests(SimpleTestCase):
+    def converse_client(self):
+        with mock.patch.object(converse.BedrockClients, 'get_runtime'):
+            return ConverseClient(model_id='model')
+
+    def test_returns_on_first_tool_call_and_closes_stream(self):
+        stream = EventStream(tool_events() + text_events('남은 응답') + [{'messageStop': {'stopReason': 'tool_use'}}])
+        client = self.converse_client()
+        client.client.converse_stream.return_value = {'stream': stream}
+        decision = client.invoke_with_tools_streaming([], {'tools': []})
+        self.assertEqual(decision['action'], 'navigate_to_person')
+        self.assertEqual(stream.consumed, len(tool_events()))
+        self.assertTrue(stream.closed)
+
+    def test_text_answer_collected_until_stop(self):
+        stream = EventStream(text_events('일반 ', '답변') + [{'messageStop': {'stopReason': 'end_turn'}}])
+        client = self.converse_client()
+        client.client.converse_stream.return_value = {'stream': stream}
+        self.assertEqual(client.invoke_with_tools_streaming([], {'tools': []}), {'type': 'text', 'content': '일반 답변'})
+
+    def test_async_matches_sync(self):
+        stream = EventStream(text_events('x') + tool_events())
+        client = self.converse_client()
+        with mock.patch.object(converse.async_clients, 'converse_stream', mock.AsyncMock(return_value={'stream': stream})):
+            decision = asyncio.run(client.ainvoke_with_tools_streaming([], {'tools': []}, system=[{'text': 's'}]))
+        self.assertEqual(decision['type'], 'tool_call')
+        self.assertTrue(stream.closed)
@@ -0,0 +1,102 @@
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from common.bedrock.prompt_cache import PromptTemplateCache, split_prompt_identifier
+
+ARN = 'arn:aws:bedrock:ap-northeast-2:123:prompt/ABC123'
+
+
+def prompt(name='p', text='안녕 {{name}}'):
+    return {
+        'name': name,
+        'variants': [{'templateType': 'TEXT', 'templateConfiguration': {'text': {'text': text}}}],
+    }
+
+
+class FakeAgent:
+    def __init__(self, delay=0.0):
+        self.calls = []
+        self.delay = delay
+        self._lock = threading.Lock()
+
+    def get_prompt(self, **params):
+        with self._lock:
+            self.calls.append(params)
+        time.sleep(self.delay)
+        return {**prompt(params['promptIdentifier']), 'ResponseMetadata': {}}
+
+
+class SplitIdentifierTests(SimpleTestCase):
+    def test_version_suffix(self):
+        self.assertEqual(split_prompt_identifier(f"{ARN}:3"), (ARN, '3'))
+
+    def test_no_version_is_draft(self):
+        self.assertEqual(split_prompt_identifier(ARN), (ARN, 'DRAFT'))
+        self.assertEqual(split_prompt_identifier('ABC123'), ('ABC123', 'DRAFT'))
+
+    def test_explicit_version_wins(self):
+        self.assertEqual(split_prompt_identifier(ARN, 5), (ARN, '5'))
+
+
+class PromptTemplateCacheTests(SimpleTestCase):
+    def test_hit_after_miss(self):
+        cache, agent = PromptTemplateCache(), FakeAgent()
+        first = cache.get(ARN, client=agent)
+        self.assertIs(cache.get(ARN, client=agent), first)
+        self.assertEqual(len(agent.calls), 1)
+        self.assertNotIn('ResponseMetadata', first)
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_version_passed_to_agent(self):
+        agent = FakeAgent()
+        PromptTemplateCache().get(f"{ARN}:2", client=agent)
+        self.assertEqual(agent.calls, [{'promptIdentifier': ARN, 'promptVersion': '2'}])
+
+    def test_draft_expires_before_versioned(self):
+        cache, agent = PromptTemplateCache(ttl=10, versioned_ttl=100), FakeAgent()
+        with mock.patch('common.bedrock.prompt_cache.time.monotonic', return_value=0):
+            cache.get(ARN, client=agent)
+            cache.get(f"{ARN}:1", client=agent)
+        with mock.patch('common.bedrock.prompt_cache.time.monotonic', return_value=50):
+            cache.get(ARN, client=agent)
+            cache.get(f"{ARN}:1", client=agent)
+        self.assertEqual(len(agent.calls), 3)
+
+    def test_lru_eviction(self):
+        cache, agent = PromptTemplateCache(max_size=2), FakeAgent()
+        for identifier in ('a', 'b', 'a', 'c'):
+            cache.get(identifier, client=agent)
+        cache.get('a', client=agent)
+        self.assertEqual([c['promptIdentifier'] for c in agent.calls], ['a', 'b', 'c'])
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_invalidate_all_versions(self):
+        cache, agent = PromptTemplateCache(), FakeAgent()
+        cache.get(ARN, client=agent)
+        cache.get(f"{ARN}:1", client=agent)
+        cache.invalidate(ARN)
+        self.assertEqual(cache.stats()['size'], 0)
+
+    def test_compiled_reused_until_refetch(self):
+        cache, agent = PromptTemplateCache(), FakeAgent()
+        compiled = cache.get_compiled(ARN, client=agent)
+        self.assertIs(cache.get_compiled(ARN, client=agent), compiled)
+        self.assertEqual(compiled.text.render({'name': '세종'}), '안녕 세종')
+        cache.invalidate(ARN)
+        self.assertIsNot(cache.get_compiled(ARN, client=agent), compiled)
+
+    def test_concurrent_misses_fetch_once_and_count_exactly(self):
+        cache, agent = PromptTemplateCache(), FakeAgent(delay=0.05)
+        threads = [threading.Thread(target=cache.get, args=(ARN,), kwargs={'client': agent}) for _ in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = cache.stats()
+        self.assertEqual(len(agent.calls), 1)
+        self.assertEqual(stats['hits'] + stats['misses'], 16)
+        self.assertEqual(stats['misses'], 1)
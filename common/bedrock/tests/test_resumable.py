@@ -0,0 +1,98 @@
+import json
+import unittest
+from unittest import mock
+
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from common.bedrock import resumable
+from common.bedrock.resumable import (
+    StreamRecorder, parse_last_event_id, replay_stream, resumable_sse_response, resume_response, stream_key,
+    stream_owner,
+)
+from common.bedrock.streaming import sse_event
+
+try:
+    import fakeredis
+except ImportError:  # requirements-dev.txt
+    fakeredis = None
+
+OWNER = 'owner'
+
+
+def frames(count):
+    return [sse_event({'type': 'content', 'text': str(i)}) for i in range(count)] + [sse_event({'type': 'done'})]
+
+
+def request(body=b'{"message": "q"}', user_id='u1', last_event_id=None):
+    headers = {'HTTP_LAST_EVENT_ID': last_event_id} if last_event_id else {}
+    return RequestFactory().post(f'/api/chat?userId={user_id}', body, content_type='application/json', **headers)
+
+
+class ParseTests(SimpleTestCase):
+    def test_parse_last_event_id(self):
+        self.assertEqual(parse_last_event_id('abc:12'), ('abc', 12))
+        self.assertIsNone(parse_last_event_id('abc'))
+        self.assertIsNone(parse_last_event_id('abc:x'))
+
+    def test_owner_depends_on_user_and_request(self):
+        owner = stream_owner(request())
+        self.assertEqual(owner, stream_owner(request()))
+        self.assertNotEqual(owner, stream_owner(request(user_id='u2')))
+        self.assertNotEqual(owner, stream_owner(request(body=b'{"message": "other"}')))
+        self.assertIn(owner, stream_key(owner, 'sid'))
+
+
+@unittest.skipIf(fakeredis is None, 'fakeredis[lua] not installed')
+@override_settings(SSE_RESUME_ENABLED=True, SSE_RESUME_IDLE_TIMEOUT=1, SSE_RESUME_BLOCK_MS=100)
+class RecorderTests(SimpleTestCase):
+    def setUp(self):
+        self.client = fakeredis.FakeRedis(decode_responses=True)
+
+    def recorder(self, **kwargs):
+        kwargs.setdefault('flush_interval_ms', 60_000)
+        return StreamRecorder(OWNER, client=self.client, **kwargs)
+
+    def test_tee_batches_writes(self):
+        recorder = self.recorder(flush_frames=4)
+        tee = recorder.tee(iter(frames(9)))
+        for _ in range(3):
+            next(tee)
+        self.assertEqual(self.client.xlen(recorder.key), 0)
+        next(tee)
+        self.assertEqual(self.client.xlen(recorder.key), 4)
+        rest = list(tee)
+        self.assertEqual(len(rest), 6)
+        self.assertEqual(self.client.xlen(recorder.key), 10)
+        self.assertGreater(self.client.ttl(recorder.key), 0)
+
+    def test_tags_frames_with_sequence(self):
+        recorder = self.recorder()
+        first = next(recorder.tee(iter(frames(1))))
+        self.assertTrue(first.startswith(f"id: {recorder.stream_id}:1\n"))
+
+    def test_replay_after_sequence(self):
+        recorder = self.recorder()
+        list(recorder.tee(iter(frames(5))))
+        replayed = list(replay_stream(OWNER, recorder.stream_id, 3, client=self.client))
+        self.assertEqual(len(replayed), 3)
+        self.assertTrue(replayed[0].startswith(f"id: {recorder.stream_id}:4\n"))
+        self.assertEqual(json.loads(replayed[-1].split('data: ', 1)[1])['type'], 'done')
+
+    def test_resume_requires_same_owner(self):
+        with mock.patch.object(resumable, 'get_redis_client', return_value=self.client):
+            response = resumable_sse_response(iter(frames(2)), stream_owner(request()))
+            list(response.streaming_content)
+            stream_id = response['X-Stream-Id']
+
+            self.assertIsNotNone(resume_response(request(last_event_id=f"{stream_id}:1")))
+            self.assertIsNone(resume_response(request(user_id='u2', last_event_id=f"{stream_id}:1")))
+            self.assertIsNone(resume_response(request(body=b'{}', last_event_id=f"{stream_id}:1")))
+
+    def test_not_resumable_without_owner(self):
+        response = resumable_sse_response(iter(frames(1)))
+        self.assertFalse(response.has_header('X-Stream-Id'))
+
+    @override_settings(SSE_RESUME_ENABLED=False)
+    def test_disabled(self):
+        self.assertFalse(resumable_sse_response(iter(frames(1)), OWNER).has_header('X-Stream-Id'))
+        self.assertIsNone(resume_response(request(last_event_id='sid:1')))
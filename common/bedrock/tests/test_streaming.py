@@ -0,0 +1,222 @@
+import asyncio
+import json
+
+from django.test import SimpleTestCase, override_settings
+
+from common.bedrock import streaming
+from common.bedrock.streaming import (
+    INVOKE_MODEL, KNOWLEDGE_BASE, Coalescer, StreamPipeline, iterate_in_thread, sse_response, streaming_response,
+)
+
+
+def collect(stream):
+    async def run():
+        return [item async for item in stream]
+    return asyncio.run(run())
+
+
+def payloads(frames):
+    return [json.loads(frame[len('data: '):]) for frame in frames]
+
+
+def invoke_events(*texts):
+    chunks = [{'type': 'content_block_delta', 'delta': {'text': text}} for text in texts]
+    chunks.append({'type': 'message_stop'})
+    return [{'chunk': {'bytes': json.dumps(chunk).encode()}} for chunk in chunks]
+
+
+async def aiter_events(events):
+    for event in events:
+        yield event
+
+
+class ClosingIterator:
+    def __init__(self, items):
+        self.items = iter(items)
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.items)
+
+    def close(self):
+        self.closed = True
+
+
+class AsyncResponseTests(SimpleTestCase):
+    def test_iterate_in_thread_closes_source(self):
+        source = ClosingIterator(['a', 'b'])
+        self.assertEqual(collect(iterate_in_thread(source)), ['a', 'b'])
+        self.assertTrue(source.closed)
+
+    @override_settings(SERVER_INTERFACE='asgi')
+    def test_sync_stream_wrapped_under_asgi(self):
+        response = streaming_response(iter(['x']), content_type='text/plain')
+        self.assertTrue(response.is_async)
+
+    @override_settings(SERVER_INTERFACE='wsgi')
+    def test_sync_stream_kept_under_wsgi(self):
+        self.assertFalse(streaming_response(iter(['x']), content_type='text/plain').is_async)
+
+    def test_async_stream_passed_through(self):
+        async def frames():
+            yield 'data: {}\n\n'
+
+        response = sse_response(frames())
+        self.assertTrue(response.is_async)
+        self.assertEqual(response['X-Accel-Buffering'], 'no')
+
+
+class StreamPipelineTests(SimpleTestCase):
+    def test_sync_stream_frames_and_hooks(self):
+        results = []
+        pipeline = StreamPipeline(INVOKE_MODEL, min_chars=0, on_done=results.append)
+        events = payloads(pipeline.stream({'body': invoke_events('가', '나')}, on_done=results.append))
+        self.assertEqual(events, [
+            {'type': 'content', 'text': '가'},
+            {'type': 'content', 'text': '나'},
+            {'type': 'done', 'total_length': 2},
+        ])
+        self.assertEqual([r.text for r in results], ['가나', '가나'])
+
+    def test_async_stream_matches_sync(self):
+        pipeline = StreamPipeline(INVOKE_MODEL, min_chars=0)
+        sync = list(pipeline.stream({'body': invoke_events('a', 'b', 'c')}))
+        self.assertEqual(collect(pipeline.astream({'body': aiter_events(invoke_events('a', 'b', 'c'))})), sync)
+
+    def test_knowledge_base_citations_sent_at_end(self):
+        events = [{'output': {'text': '답'}}, {'citation': {'id': 1}}, {'output': {'text': '변'}}]
+        frames = payloads(StreamPipeline(KNOWLEDGE_BASE, min_chars=0).stream({'stream': events}))
+        self.assertEqual([f['type'] for f in frames], ['content', 'content', 'citations', 'done'])
+        self.assertEqual(frames[2]['data'], [{'id': 1}])
+
+    def test_failing_hook_does_not_break_stream(self):
+        def broken(result):
+            raise RuntimeError('boom')
+
+        pipeline = StreamPipeline(INVOKE_MODEL, min_chars=0, on_done=broken)
+        with self.assertLogs('common.bedrock.streaming', 'ERROR'):
+            frames = payloads(pipeline.stream({'body': invoke_events('a')}))
+        self.assertEqual(frames[-1]['type'], 'done')
+
+    def test_source_error_becomes_error_event(self):
+        async def failing():
+            yield invoke_events('a')[0]
+            raise RuntimeError('connection reset')
+
+        with self.assertLogs('common.bedrock.streaming', 'ERROR'):
+            frames = payloads(collect(StreamPipeline(INVOKE_MODEL, min_chars=0).astream({'body': failing()})))
+        self.assertEqual(frames[-1], {'type': 'error', 'message': 'connection reset'})
+
+    @override_settings(SSE_COALESCE_MIN_CHARS=48, SSE_COALESCE_ENDPOINTS={'chat': {'min_chars': 5}})
+    def test_endpoint_override_wins(self):
+        self.assertEqual(StreamPipeline(INVOKE_MODEL, min_chars=0, name='chat').coalesce_options()['min_chars'], 5)
+        self.assertEqual(StreamPipeline(INVOKE_MODEL, min_chars=0).coalesce_options()['min_chars'], 0)
+        self.assertEqual(StreamPipeline(INVOKE_MODEL).coalesce_options()['min_chars'], 48)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CoalescerTests(SimpleTestCase):
+    def test_first_delta_sent_immediately(self):
+        coalescer = Coalescer(min_chars=10)
+        self.assertEqual(coalescer.push('첫'), '첫')
+        self.assertIsNone(coalescer.push('둘'))
+
+    def test_flush_by_size(self):
+        coalescer = Coalescer(min_chars=4)
+        coalescer.push('a')
+        self.assertIsNone(coalescer.push('bc'))
+        self.assertEqual(coalescer.push('de'), 'bcde')
+        self.assertIsNone(coalescer.flush())
+
+    def test_flush_by_deadline(self):
+        clock = FakeClock()
+        coalescer = Coalescer(min_chars=100, max_delay=0.05, clock=clock)
+        coalescer.push('a')
+        self.assertIsNone(coalescer.push('b'))
+        clock.now = 0.03
+        self.assertAlmostEqual(coalescer.time_until_deadline(), 0.02)
+        self.assertIsNone(coalescer.push('c'))
+        clock.now = 0.06
+        self.assertEqual(coalescer.push('d'), 'bcd')
+        self.assertIsNone(coalescer.time_until_deadline())
+
+    def test_zero_min_chars_disables_coalescing(self):
+        coalescer = Coalescer(min_chars=0)
+        self.assertEqual([coalescer.push(t) for t in 'abc'], ['a', 'b', 'c'])
+
+    def test_async_stream_flushes_idle_buffer(self):
+        async def slow():
+            events = invoke_events('a', 'b', 'c')
+            yield events[0]
+            yield events[1]
+            await asyncio.sleep(0.2)
+            for event in events[2:]:
+                yield event
+
+        pipeline = StreamPipeline(INVOKE_MODEL, min_chars=100, max_delay_ms=20)
+        frames = payloads(collect(pipeline.astream({'body': slow()})))
+        # 'b'는 'c'를 기다리지 않고 max_delay 후 먼저 전송
+        self.assertEqual([f.get('text') for f in frames], ['a', 'b', 'c', None])
+
+
+class CountingEvents:
+    """읽힌 이벤트 수와 close 여부를 기록하는 이벤트 스트림"""
+
+    def __init__(self, events):
+        self.events = events
+        self.read = 0
+        self.closed = False
+
+    def __iter__(self):
+        for event in self.events:
+            self.read += 1
+            yield event
+
+    async def __aiter__(self):
+        for event in self.events:
+            self.read += 1
+            yield event
+            await asyncio.sleep(0)
+
+    def close(self):
+        self.closed = True
+
+
+class StreamLifecycleTests(SimpleTestCase):
+    def test_slow_client_bounds_upstream_reads(self):
+        events = CountingEvents(invoke_events(*['x'] * 1000))
+        pipeline = StreamPipeline(INVOKE_MODEL, min_chars=0)
+
+        async def first_frame_then_stall():
+            stream = pipeline.astream({'body': events})
+            await stream.__anext__()
+            await asyncio.sleep(0.05)
+            read = events.read
+            await stream.aclose()
+            return read
+
+        read = asyncio.run(first_frame_then_stall())
+        self.assertLessEqual(read, streaming.STREAM_BUFFER_EVENTS + 2)
+        self.assertTrue(events.closed)
+
+    def test_async_stream_closed_after_completion(self):
+        events = CountingEvents(invoke_events('a'))
+        collect(StreamPipeline(INVOKE_MODEL, min_chars=0).astream({'body': events}))
+        self.assertTrue(events.closed)
+
+    def test_sync_stream_closed_on_disconnect(self):
+        events = CountingEvents(invoke_events('a', 'b', 'c'))
+        stream = StreamPipeline(INVOKE_MODEL, min_chars=0).stream({'body': events})
+        next(stream)
+        stream.close()
+        self.assertTrue(events.closed)
@@ -0,0 +1,68 @@
+from django.test import SimpleTestCase
+
+from common.bedrock.templates import CompiledPrompt, CompiledText, merge_consecutive_roles
+
+
+def chat_prompt(messages, system=()):
+    return {
+        'name': 'chat',
+        'defaultModelId': 'model-x',
+        'variants': [{
+            'templateType': 'CHAT',
+            'inferenceConfiguration': {'maxTokens': 512, 'temperature': 0.3, 'stopSequences': ['END']},
+            'templateConfiguration': {'chat': {
+                'messages': [{'role': role, 'content': [{'text': text}]} for role, text in messages],
+                'system': [{'text': text} for text in system],
+            }},
+        }],
+    }
+
+
+class CompiledTextTests(SimpleTestCase):
+    def test_renders_variables_in_one_pass(self):
+        text = CompiledText('{{a}}와 {{b}}, 다시 {{a}}')
+        self.assertEqual(text.render({'a': '세종', 'b': 1443}), '세종와 1443, 다시 세종')
+
+    def test_missing_variable_left_as_placeholder(self):
+        self.assertEqual(CompiledText('안녕 {{name}}').render({}), '안녕 {{name}}')
+
+    def test_values_are_not_rescanned(self):
+        # 치환된 값 안의 {{...}}는 다시 치환하지 않음
+        self.assertEqual(CompiledText('{{a}}{{b}}').render({'a': '{{b}}', 'b': 'x'}), '{{b}}x')
+
+    def test_plain_text(self):
+        text = CompiledText('변수 없음')
+        self.assertEqual(text.render({'a': 1}), '변수 없음')
+
+
+class CompiledPromptTests(SimpleTestCase):
+    def test_text_template(self):
+        compiled = CompiledPrompt.from_prompt({
+            'variants': [{'templateType': 'TEXT', 'templateConfiguration': {'text': {'text': 'Q: {{q}}'}}}],
+        })
+        self.assertEqual(compiled.render_messages({'q': '임진왜란'}), [{'role': 'user', 'content': 'Q: 임진왜란'}])
+
+    def test_chat_fallback_user_and_system(self):
+        compiled = CompiledPrompt.from_prompt(chat_prompt([('assistant', '나는 {{who}}')], system=['{{who}}로 답하라']))
+        body = compiled.build_body({'who': '이순신'}, fallback_user_message='질문', summary='요약')
+        self.assertEqual(body['messages'], [
+            {'role': 'assistant', 'content': '나는 이순신'},
+            {'role': 'user', 'content': '질문'},
+        ])
+        self.assertEqual(body['system'], '이순신로 답하라\n\n[이전 대화 요약]\n요약')
+        self.assertEqual((body['max_tokens'], body['temperature'], body['stop_sequences']), (512, 0.3, ['END']))
+
+    def test_history_inserted_before_current_question(self):
+        compiled = CompiledPrompt.from_prompt(chat_prompt([('user', '{{q}}')]))
+        history = [{'role': 'user', 'content': '이전 질문'}, {'role': 'assistant', 'content': '이전 답'}]
+        self.assertEqual(compiled.render_messages({'q': '지금'}, history=history), [*history, {'role': 'user', 'content': '지금'}])
+
+    def test_no_variants(self):
+        with self.assertRaises(ValueError):
+            CompiledPrompt.from_prompt({'variants': []})
+
+    def test_merge_consecutive_roles(self):
+        merged = merge_consecutive_roles([
+            {'role': 'user', 'content': 'a'}, {'role': 'user', 'content': 'b'}, {'role': 'assistant', 'content': 'c'},
+        ])
+        self.assertEqual(merged, [{'role': 'user', 'content': 'a\n\nb'}, {'role': 'assistant', 'content': 'c'}])
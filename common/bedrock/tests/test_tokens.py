@@ -0,0 +1,21 @@
+from django.test import SimpleTestCase
+
+from common.bedrock.tokens import MESSAGE_OVERHEAD_TOKENS, estimate_message_tokens, estimate_tokens
+
+
+class EstimateTokensTests(SimpleTestCase):
+    def test_empty(self):
+        self.assertEqual(estimate_tokens(''), 0)
+        self.assertEqual(estimate_tokens(None), 0)
+
+    def test_ascii_rounds_up_per_four_chars(self):
+        self.assertEqual(estimate_tokens('abcd'), 1)
+        self.assertEqual(estimate_tokens('abcde'), 2)
+
+    def test_wide_chars_one_each(self):
+        self.assertEqual(estimate_tokens('세종대왕'), 4)
+        self.assertEqual(estimate_tokens('세종 1443'), 2 + 2)
+
+    def test_message_overhead(self):
+        self.assertEqual(estimate_message_tokens({'role': 'user', 'content': 'abcd'}), 1 + MESSAGE_OVERHEAD_TOKENS)
+        self.assertEqual(estimate_message_tokens({'role': 'user'}), MESSAGE_OVERHEAD_TOKENS)
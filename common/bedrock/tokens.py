@@ -0,0 +1,24 @@
+"""
+로컬 토큰 수 추정 (Bedrock 호출 없이 히스토리 윈도우 예산 계산용)
+
+Claude 토크나이저 기준 대략치입니다.
+- 한글 등 비 ASCII 문자: 약 1자당 1토큰
+- ASCII(영문/숫자/공백/구두점): 약 4자당 1토큰
+정확한 값이 아니라 예산을 넘지 않도록 자르는 용도이므로 약간 크게 잡습니다.
+"""
+
+# 메시지마다 붙는 role/구분자 오버헤드
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    # encode(ignore)로 ASCII만 남겨 C 레벨에서 문자 종류를 셈 (문자 단위 파이썬 루프 회피)
+    ascii_chars = len(text.encode('ascii', 'ignore'))
+    wide_chars = len(text) - ascii_chars
+    return wide_chars + (ascii_chars + 3) // 4
+
+
+def estimate_message_tokens(message: dict) -> int:
+    return estimate_tokens(message.get('content', '')) + MESSAGE_OVERHEAD_TOKENS
@@ -0,0 +1,72 @@
+"""
+뷰 데코레이터
+
+- async_require_http_methods: Django 4.2의 require_http_methods는 async 뷰를 동기 함수로 감싸 버리므로
+  ASGI 비동기 뷰에서는 이 모듈의 데코레이터를 사용합니다.
+- internal_only: 운영용 엔드포인트(/metrics)를 내부망 또는 토큰을 가진 요청으로 제한
+"""
+import hmac
+import ipaddress
+from functools import wraps
+
+from django.conf import settings
+from django.http import HttpResponseNotAllowed, JsonResponse
+from django.utils.log import log_response
+
+
+def async_require_http_methods(request_method_list):
+    """require_http_methods의 async 뷰 버전"""
+
+    def decorator(func):
+        @wraps(func)
+        async def inner(request, *args, **kwargs):
+            if request.method not in request_method_list:
+                response = HttpResponseNotAllowed(request_method_list)
+                log_response(
+                    "Method Not Allowed (%s): %s",
+                    request.method,
+                    request.path,
+                    response=response,
+                    request=request,
+                )
+                return response
+            return await func(request, *args, **kwargs)
+
+        return inner
+
+    return decorator
+
+
+def is_internal_request(request) -> bool:
+    """
+    X-Internal-Token이 INTERNAL_API_TOKEN과 같거나, 접속 주소(REMOTE_ADDR)가 INTERNAL_NETWORKS 안이면 True
+
+    프록시 뒤에서는 REMOTE_ADDR이 프록시 주소이므로, 위조 가능한 X-Forwarded-For 대신 토큰을 쓰세요.
+    """
+    token = getattr(settings, 'INTERNAL_API_TOKEN', '')
+    supplied = request.headers.get('X-Internal-Token', '')
+    if token and supplied and hmac.compare_digest(supplied.encode('utf-8'), token.encode('utf-8')):
+        return True
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    for network in getattr(settings, 'INTERNAL_NETWORKS', ['127.0.0.1/32', '::1/128']):
+        try:
+            if address in ipaddress.ip_network(network, strict=False):
+                return True
+        except ValueError:
+            continue
+    return False
+
+
+def internal_only(func):
+    """내부 요청이 아니면 403"""
+
+    @wraps(func)
+    def inner(request, *args, **kwargs):
+        if not is_internal_request(request):
+            return JsonResponse({'error': 'Forbidden'}, status=403)
+        return func(request, *args, **kwargs)
+
+    return inner
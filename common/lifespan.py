@@ -0,0 +1,39 @@
+"""
+ASGI lifespan 처리
+
+Django ASGI 앱은 lifespan 이벤트를 처리하지 않으므로(uvicorn이 경고 후 무시) 앱을 감싸 종료 시점에
+정리 작업(비동기 Bedrock 클라이언트 종료, 대화 이력 큐 flush 등)을 실행합니다.
+코루틴 함수는 요청을 처리하던 이벤트 루프에서, 일반 함수는 루프를 막지 않도록 스레드에서 실행됩니다.
+"""
+import asyncio
+import logging
+
+from asgiref.sync import sync_to_async
+
+logger = logging.getLogger(__name__)
+
+
+class LifespanApp:
+    def __init__(self, app, on_shutdown=()):
+        self.app = app
+        self.on_shutdown = list(on_shutdown)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'lifespan':
+            return await self.app(scope, receive, send)
+
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                for callback in self.on_shutdown:
+                    try:
+                        if asyncio.iscoroutinefunction(callback):
+                            await callback()
+                        else:
+                            await sync_to_async(callback, thread_sensitive=False)()
+                    except Exception as e:
+                        logger.warning(f"종료 처리 실패 ({getattr(callback, '__qualname__', callback)}): {str(e)}")
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
@@ -1,9 +1,13 @@
 import os
+import uuid
+from typing import Optional
+
 import redis
 from django.conf import settings
 from urllib.parse import urlparse
 
 _redis_client = None
+_raw_redis_client = None
 
 def get_redis_client() -> redis.Redis:
     """
@@ -11,9 +15,45 @@ def get_redis_client() -> redis.Redis:
     REDIS_URL 우선 사용, 없으면 개별 설정 사용
     """
     global _redis_client
-    if _redis_client is not None:
-        return _redis_client
-    
+    if _redis_client is None:
+        _redis_client = _create_client(decode_responses=True)
+    return _redis_client
+
+
+def get_raw_redis_client() -> redis.Redis:
+    """
+    bytes 그대로 주고받는 Redis 클라이언트 싱글톤 (decode_responses=False)
+    바이너리 코덱으로 저장하는 대화 이력 경로용
+    """
+    global _raw_redis_client
+    if _raw_redis_client is None:
+        _raw_redis_client = _create_client(decode_responses=False)
+    return _raw_redis_client
+
+
+# 토큰이 같을 때만 삭제 (만료 후 다른 워커가 잡은 락을 지우지 않도록)
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def acquire_lock(client: redis.Redis, key: str, ttl: int) -> Optional[str]:
+    """짧은 분산 락 - 잡으면 소유 토큰, 이미 잡혀 있으면 None"""
+    token = uuid.uuid4().hex
+    if client.set(key, token, nx=True, ex=ttl):
+        return token
+    return None
+
+
+def release_lock(client: redis.Redis, key: str, token: str) -> bool:
+    """acquire_lock으로 잡은 락 해제 (소유 토큰이 다르면 아무것도 하지 않음)"""
+    return bool(client.register_script(RELEASE_LOCK_SCRIPT)(keys=[key], args=[token]))
+
+
+def _create_client(decode_responses: bool) -> redis.Redis:
     # REDIS_URL 우선 확인
     redis_url = getattr(settings, 'REDIS_URL', None) or os.getenv('REDIS_URL')
     
@@ -23,7 +63,7 @@ def get_redis_client() -> redis.Redis:
         is_ssl = url.scheme == 'rediss'
         
         kwargs = {
-            'decode_responses': True,
+            'decode_responses': decode_responses,
             'socket_connect_timeout': 5,
             'socket_timeout': 5,
             'retry_on_timeout': True,
@@ -34,36 +74,33 @@ def get_redis_client() -> redis.Redis:
             kwargs['ssl_cert_reqs'] = None  # ElastiCache는 인증서 검증 안 함
         
         # 비밀번호가 URL에 있으면 자동으로 처리됨
-        _redis_client = redis.Redis.from_url(redis_url, **kwargs)
+        return redis.Redis.from_url(redis_url, **kwargs)
     
-    else:
-        # REDIS_URL이 없으면 개별 설정 사용
-        host = getattr(settings, 'REDIS_HOST', os.getenv('REDIS_HOST', 'localhost'))
-        port = int(getattr(settings, 'REDIS_PORT', os.getenv('REDIS_PORT', 6379)))
-        db = int(getattr(settings, 'REDIS_DB', os.getenv('REDIS_DB', 0)))
-        password = getattr(settings, 'REDIS_PASSWORD', os.getenv('REDIS_PASSWORD', None))
-        use_ssl = str(getattr(settings, 'REDIS_SSL', os.getenv('REDIS_SSL', 'false'))).lower() in ('1', 'true', 'yes')
-        
-        kwargs = {
-            'host': host,
-            'port': port,
-            'db': db,
-            'decode_responses': True,
-            'socket_connect_timeout': 5,
-            'socket_timeout': 5,
-            'retry_on_timeout': True,
-        }
-        
-        if password:
-            kwargs['password'] = password
-        
-        if use_ssl:
-            kwargs['ssl'] = True
-            kwargs['ssl_cert_reqs'] = None
-        
-        _redis_client = redis.Redis(**kwargs)
+    # REDIS_URL이 없으면 개별 설정 사용
+    host = getattr(settings, 'REDIS_HOST', os.getenv('REDIS_HOST', 'localhost'))
+    port = int(getattr(settings, 'REDIS_PORT', os.getenv('REDIS_PORT', 6379)))
+    db = int(getattr(settings, 'REDIS_DB', os.getenv('REDIS_DB', 0)))
+    password = getattr(settings, 'REDIS_PASSWORD', os.getenv('REDIS_PASSWORD', None))
+    use_ssl = str(getattr(settings, 'REDIS_SSL', os.getenv('REDIS_SSL', 'false'))).lower() in ('1', 'true', 'yes')
     
-    return _redis_client
+    kwargs = {
+        'host': host,
+        'port': port,
+        'db': db,
+        'decode_responses': decode_responses,
+        'socket_connect_timeout': 5,
+        'socket_timeout': 5,
+        'retry_on_timeout': True,
+    }
+    
+    if password:
+        kwargs['password'] = password
+    
+    if use_ssl:
+        kwargs['ssl'] = True
+        kwargs['ssl_cert_reqs'] = None
+    
+    return redis.Redis(**kwargs)
 
 
 def test_redis_connection():
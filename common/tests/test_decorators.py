@@ -0,0 +1,46 @@
+from unittest import mock
+
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from common.decorators import is_internal_request
+
+
+def request(address='127.0.0.1', **headers):
+    return RequestFactory().get('/metrics', REMOTE_ADDR=address, **headers)
+
+
+@override_settings(INTERNAL_NETWORKS=['127.0.0.1/32', '10.0.0.0/8'], INTERNAL_API_TOKEN='')
+class InternalRequestTests(SimpleTestCase):
+    def test_networks(self):
+        self.assertTrue(is_internal_request(request('127.0.0.1')))
+        self.assertTrue(is_internal_request(request('10.1.2.3')))
+        self.assertFalse(is_internal_request(request('203.0.113.5')))
+        self.assertFalse(is_internal_request(request('')))
+
+    def test_forwarded_for_is_ignored(self):
+        self.assertFalse(is_internal_request(request('203.0.113.5', HTTP_X_FORWARDED_FOR='127.0.0.1')))
+
+    @override_settings(INTERNAL_API_TOKEN='secret')
+    def test_token(self):
+        self.assertTrue(is_internal_request(request('203.0.113.5', HTTP_X_INTERNAL_TOKEN='secret')))
+        self.assertFalse(is_internal_request(request('203.0.113.5', HTTP_X_INTERNAL_TOKEN='wrong')))
+
+    def test_empty_token_never_matches(self):
+        self.assertFalse(is_internal_request(request('203.0.113.5', HTTP_X_INTERNAL_TOKEN='')))
+
+
+@override_settings(INTERNAL_NETWORKS=['127.0.0.1/32'], INTERNAL_API_TOKEN='')
+class MetricsViewTests(SimpleTestCase):
+    def test_public_request_forbidden(self):
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='203.0.113.5').status_code, 403)
+
+    def test_failing_source_does_not_break_metrics(self):
+        from config import urls
+
+        sources = {'ok': lambda: {'hits': 1}, 'broken': mock.Mock(side_effect=AttributeError('_manager'))}
+        with mock.patch.object(urls, 'METRICS_SOURCES', sources):
+            response = self.client.get('/metrics', REMOTE_ADDR='127.0.0.1')
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['ok'], {'hits': 1})
+        self.assertIn('_manager', body['broken']['error'])
@@ -0,0 +1,20 @@
+from django.test import SimpleTestCase
+
+from common.text import normalize_query, strip_particle
+
+
+class NormalizeQueryTests(SimpleTestCase):
+    def test_particles_punctuation_and_spacing(self):
+        self.assertEqual(normalize_query('임진왜란을 알려줘!'), normalize_query('임진왜란 알려줘'))
+        self.assertEqual(normalize_query('세종대왕이랑 대화하고 싶어'), normalize_query('세종대왕 대화하고 싶어'))
+
+    def test_short_words_kept(self):
+        self.assertEqual(strip_particle('인도'), '인도')
+        self.assertEqual(strip_particle('고려의'), '고려')
+
+    def test_digits_kept(self):
+        self.assertNotEqual(normalize_query('1592년 전쟁'), normalize_query('1597년 전쟁'))
+
+    def test_empty(self):
+        self.assertEqual(normalize_query(None), '')
+        self.assertEqual(normalize_query(' ?! '), '')
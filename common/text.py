@@ -0,0 +1,32 @@
+"""
+한국어 질문 정규화
+
+라우터 Intent 캐시와 KB 답변 캐시가 같은 질문을 같은 키로 보도록 표기 차이를 없앱니다.
+NFKC, 소문자, 구두점 제거, 어절 끝 조사 제거, 공백 제거
+("임진왜란을 알려줘!" == "임진왜란 알려줘")
+"""
+import re
+import unicodedata
+
+# 긴 조사부터 제거 ('이랑'이 '랑'보다 먼저)
+PARTICLES = sorted([
+    '에게서', '한테서', '에서는', '으로는', '이랑은', '에대해', '에대한',
+    '에게', '한테', '께서', '이랑', '에서', '으로', '처럼', '보다', '까지', '부터', '하고', '이나', '이란', '이야',
+    '은', '는', '이', '가', '을', '를', '와', '과', '랑', '도', '의', '에', '로', '께',
+], key=len, reverse=True)
+
+PUNCTUATION = re.compile(r"[^\w\s]")
+
+
+def strip_particle(token: str) -> str:
+    """어절 끝 조사 하나 제거 (남는 부분이 2글자 미만이면 그대로 - '인도' 같은 단어 보호)"""
+    for particle in PARTICLES:
+        if token.endswith(particle) and len(token) - len(particle) >= 2:
+            return token[:-len(particle)]
+    return token
+
+
+def normalize_query(query: str) -> str:
+    text = unicodedata.normalize('NFKC', query or '').lower()
+    text = PUNCTUATION.sub(' ', text)
+    return ''.join(strip_particle(token) for token in text.split())
@@ -2,4 +2,21 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
-application = get_asgi_application()
\ No newline at end of file
+os.environ.setdefault('SERVER_INTERFACE', 'asgi')
+django_application = get_asgi_application()
+
+# uvicorn 종료(lifespan.shutdown) 시 이벤트 루프에 묶인 aiobotocore 클라이언트(aiohttp 세션) 정리,
+# write-behind 큐에 남은 대화 이력 기록 (atexit는 인터프리터가 정상 종료될 때만 실행됨)
+from apps.prompt.history_writer import get_history_writer  # noqa: E402
+from common.bedrock.async_clients import AsyncBedrockClients  # noqa: E402
+from common.lifespan import LifespanApp  # noqa: E402
+
+application = LifespanApp(
+    django_application,
+    on_shutdown=[get_history_writer().shutdown, AsyncBedrockClients.close_all],
+)
+
+# AIPerson 캐시 preload (uvicorn은 이벤트 루프 안에서 앱을 import하므로 ORM 호출은 별도 스레드에서)
+from apps.prompt.person_cache import preload_in_background  # noqa: E402
+
+preload_in_background()
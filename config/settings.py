@@ -1,5 +1,7 @@
+import json
 import os
 from pathlib import Path
+from corsheaders.defaults import default_headers
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -51,6 +53,12 @@ TEMPLATES = [
 WSGI_APPLICATION = 'config.wsgi.application'
 ASGI_APPLICATION = 'config.asgi.application'
 
+# ASGI(uvicorn) 구동 여부 - config/asgi.py에서 'asgi'로 설정
+SERVER_INTERFACE = os.getenv('SERVER_INTERFACE', 'wsgi')
+
+# Bedrock 호출 뷰를 async 뷰로 라우팅 (기본: ASGI일 때만)
+BEDROCK_ASYNC_VIEWS = os.getenv('BEDROCK_ASYNC_VIEWS', str(SERVER_INTERFACE == 'asgi')).lower() in ('true', '1', 'yes')
+
 # Database
 DATABASES = {
     'default': {
@@ -124,9 +132,148 @@ else:
 AWS_REGION = os.getenv('AWS_REGION', 'ap-northeast-2')
 AWS_ACCOUNT_ID = os.getenv('AWS_ACCOUNT_ID', '125814533785')
 
+# Bedrock 엔드포인트 오버라이드 (로컬 스텁 event-stream 서버 테스트용)
+BEDROCK_RUNTIME_ENDPOINT_URL = os.getenv('BEDROCK_RUNTIME_ENDPOINT_URL') or None
+BEDROCK_AGENT_RUNTIME_ENDPOINT_URL = os.getenv('BEDROCK_AGENT_RUNTIME_ENDPOINT_URL') or None
+
+# Bedrock 클라이언트 커넥션 풀 (uvicorn 동시성에 맞춰 조정)
+BEDROCK_MAX_POOL_CONNECTIONS = int(os.getenv('BEDROCK_MAX_POOL_CONNECTIONS', 50))
+BEDROCK_TCP_KEEPALIVE = os.getenv('BEDROCK_TCP_KEEPALIVE', 'true').lower() in ('true', '1', 'yes')
+BEDROCK_CONNECT_TIMEOUT = int(os.getenv('BEDROCK_CONNECT_TIMEOUT', 5))
+BEDROCK_READ_TIMEOUT = int(os.getenv('BEDROCK_READ_TIMEOUT', 120))
+BEDROCK_RETRY_MODE = os.getenv('BEDROCK_RETRY_MODE', 'adaptive')
+BEDROCK_MAX_ATTEMPTS = int(os.getenv('BEDROCK_MAX_ATTEMPTS', 3))
+
+# Bedrock Prompt 템플릿 캐시 (get_prompt 응답)
+BEDROCK_PROMPT_CACHE_MAX_SIZE = int(os.getenv('BEDROCK_PROMPT_CACHE_MAX_SIZE', 128))
+BEDROCK_PROMPT_CACHE_TTL = int(os.getenv('BEDROCK_PROMPT_CACHE_TTL', 300))  # DRAFT
+BEDROCK_PROMPT_CACHE_VERSIONED_TTL = int(os.getenv('BEDROCK_PROMPT_CACHE_VERSIONED_TTL', 3600))
+BEDROCK_PROMPT_CACHE_REDIS = os.getenv('BEDROCK_PROMPT_CACHE_REDIS', 'true').lower() in ('true', '1', 'yes')
+
+# SSE 델타 묶기 (첫 토큰은 즉시 전송, 이후 min_chars 이상 또는 max_delay 경과 시 전송)
+SSE_COALESCE_MIN_CHARS = int(os.getenv('SSE_COALESCE_MIN_CHARS', 48))
+SSE_COALESCE_MAX_DELAY_MS = float(os.getenv('SSE_COALESCE_MAX_DELAY_MS', 50))
+# 엔드포인트(파이프라인 이름)별 오버라이드 - 예: {"prompt-chat": {"min_chars": 24, "max_delay_ms": 30}}
+SSE_COALESCE_ENDPOINTS = json.loads(os.getenv('SSE_COALESCE_ENDPOINTS', '{}'))
+
+# 대화 이력 (Redis 리스트) 최대 메시지 수 - 0이면 제한 없음 (TTL로만 만료)
+CHAT_HISTORY_MAX_LENGTH = int(os.getenv('CHAT_HISTORY_MAX_LENGTH', 0))
+# 캐릭터 채팅에 넣을 최근 대화 윈도우 (LRANGE -N -1 후 토큰 예산에 맞게 자름)
+CHAT_HISTORY_WINDOW_MESSAGES = int(os.getenv('CHAT_HISTORY_WINDOW_MESSAGES', 20))
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv('CHAT_HISTORY_TOKEN_BUDGET', 2000))
+# 대화 이력 저장 코덱 - json(기존 형식, 다른 서비스와 공유 시) / binary(버전 바이트 + 압축)
+# 읽기는 두 형식 모두 지원하므로 binary로 바꿔도 기존 JSON 엔트리를 그대로 읽음
+CHAT_HISTORY_CODEC = os.getenv('CHAT_HISTORY_CODEC', 'json')
+CHAT_HISTORY_COMPRESSION = os.getenv('CHAT_HISTORY_COMPRESSION', 'zlib')  # none / zlib / zstd(zstandard 설치 필요)
+CHAT_HISTORY_COMPRESS_MIN_BYTES = int(os.getenv('CHAT_HISTORY_COMPRESS_MIN_BYTES', 512))
+
+# 롤링 요약 - 대화가 TRIGGER개를 넘으면 최근 KEEP_RECENT개를 제외한 구간을 백그라운드에서 요약
+# Bedrock 호출 비용이 드므로 기본 꺼짐 (CHAT_SUMMARY_ENABLED=true로 켬)
+CHAT_SUMMARY_ENABLED = os.getenv('CHAT_SUMMARY_ENABLED', 'false').lower() in ('true', '1', 'yes')
+CHAT_SUMMARY_TRIGGER_MESSAGES = int(os.getenv('CHAT_SUMMARY_TRIGGER_MESSAGES', 24))
+CHAT_SUMMARY_KEEP_RECENT = int(os.getenv('CHAT_SUMMARY_KEEP_RECENT', 10))
+CHAT_SUMMARY_MIN_BATCH = int(os.getenv('CHAT_SUMMARY_MIN_BATCH', 8))
+CHAT_SUMMARY_MODEL_ID = os.getenv('CHAT_SUMMARY_MODEL_ID', 'anthropic.claude-3-haiku-20240307-v1:0')
+CHAT_SUMMARY_MAX_TOKENS = int(os.getenv('CHAT_SUMMARY_MAX_TOKENS', 512))
+CHAT_SUMMARY_WORKERS = int(os.getenv('CHAT_SUMMARY_WORKERS', 2))
+# write-behind 저장 (스트리밍 완료 시 큐에만 넣고 백그라운드 스레드가 배치로 기록) - 기본 꺼짐
+# 켜면 다음 턴은 이력을 읽기 전에 같은 key의 미기록 턴을 최대 CHAT_HISTORY_READ_WAIT_SECONDS까지 기다림
+CHAT_HISTORY_WRITE_BEHIND = os.getenv('CHAT_HISTORY_WRITE_BEHIND', 'false').lower() in ('true', '1', 'yes')
+CHAT_HISTORY_READ_WAIT_SECONDS = float(os.getenv('CHAT_HISTORY_READ_WAIT_SECONDS', 2.0))
+CHAT_HISTORY_QUEUE_SIZE = int(os.getenv('CHAT_HISTORY_QUEUE_SIZE', 10000))
+CHAT_HISTORY_BATCH_SIZE = int(os.getenv('CHAT_HISTORY_BATCH_SIZE', 100))
+
+# 재개 가능한 SSE (Redis Stream 기록 + Last-Event-ID 재생)
+SSE_RESUME_ENABLED = os.getenv('SSE_RESUME_ENABLED', 'false').lower() in ('true', '1', 'yes')
+SSE_RESUME_TTL = int(os.getenv('SSE_RESUME_TTL', 300))
+# Redis Stream 기록 배치 (프레임 수 또는 시간 중 먼저 도달하는 쪽에서 XADD)
+SSE_RESUME_FLUSH_FRAMES = int(os.getenv('SSE_RESUME_FLUSH_FRAMES', 16))
+SSE_RESUME_FLUSH_INTERVAL_MS = int(os.getenv('SSE_RESUME_FLUSH_INTERVAL_MS', 100))
+SSE_RESUME_BLOCK_MS = int(os.getenv('SSE_RESUME_BLOCK_MS', 2000))  # Redis socket_timeout(5초)보다 짧게
+SSE_RESUME_IDLE_TIMEOUT = int(os.getenv('SSE_RESUME_IDLE_TIMEOUT', 30))
+
+# AIPerson 프로세스 내 캐시 (Redis pub/sub으로 워커 간 무효화)
+AIPERSON_CACHE_ENABLED = os.getenv('AIPERSON_CACHE_ENABLED', 'true').lower() in ('true', '1', 'yes')
+AIPERSON_CACHE_TTL = int(os.getenv('AIPERSON_CACHE_TTL', 600))
+AIPERSON_CACHE_NEGATIVE_TTL = int(os.getenv('AIPERSON_CACHE_NEGATIVE_TTL', 30))
+AIPERSON_CACHE_CHANNEL = os.getenv('AIPERSON_CACHE_CHANNEL', 'aiperson:invalidate')
+# 캐릭터 이름 별칭 (JSON, 예: {"충무공": "이순신"}) - apps.tools.name_index.DEFAULT_ALIASES에 덧붙음
+AIPERSON_ALIASES = json.loads(os.getenv('AIPERSON_ALIASES', '{}'))
+
+# Agent Chat 로컬 사전 라우팅 (확실한 요청은 Converse 호출 생략) - shadow 일치율 확인 후 켜기
+ROUTER_PREROUTE_ENABLED = os.getenv('ROUTER_PREROUTE_ENABLED', 'false').lower() in ('true', '1', 'yes')
+ROUTER_PREROUTE_THRESHOLD = float(os.getenv('ROUTER_PREROUTE_THRESHOLD', 0.85))
+# fast-path 결정 중 백그라운드로 Converse와 비교할 비율 (일치율 집계용)
+ROUTER_PREROUTE_SHADOW_RATE = float(os.getenv('ROUTER_PREROUTE_SHADOW_RATE', 0.05))
+ROUTER_PREROUTE_LOG_EVERY = int(os.getenv('ROUTER_PREROUTE_LOG_EVERY', 100))
+
+# Converse Intent Detection과 병렬로 KB 스트림을 미리 시작 (도구 호출로 판명되면 취소)
+# 유료 호출 - 로컬 사전 분류(ROUTER_PREROUTE_ENABLED)가 KB 쪽으로 MIN_CONFIDENCE 이상일 때만
+ROUTER_SPECULATIVE_KB = os.getenv('ROUTER_SPECULATIVE_KB', 'false').lower() in ('true', '1', 'yes')
+ROUTER_SPECULATIVE_KB_MIN_CONFIDENCE = float(os.getenv('ROUTER_SPECULATIVE_KB_MIN_CONFIDENCE', 0.6))
+ROUTER_SPECULATIVE_KB_WORKERS = int(os.getenv('ROUTER_SPECULATIVE_KB_WORKERS', 8))
+
+# 라우터 Intent Detection을 converse_stream으로 호출 (tool_call을 응답 완료 전에 확정)
+ROUTER_CONVERSE_STREAMING = os.getenv('ROUTER_CONVERSE_STREAMING', 'true').lower() in ('true', '1', 'yes')
+
+# Agent Chat Intent 캐시 (정규화한 질문 -> Converse 라우팅 결과)
+ROUTER_INTENT_CACHE_ENABLED = os.getenv('ROUTER_INTENT_CACHE_ENABLED', 'true').lower() in ('true', '1', 'yes')
+ROUTER_INTENT_CACHE_MAX_SIZE = int(os.getenv('ROUTER_INTENT_CACHE_MAX_SIZE', 2048))
+ROUTER_INTENT_CACHE_TTL = int(os.getenv('ROUTER_INTENT_CACHE_TTL', 3600))
+ROUTER_INTENT_CACHE_REDIS = os.getenv('ROUTER_INTENT_CACHE_REDIS', 'true').lower() in ('true', '1', 'yes')
+
+# 전쟁/사건 gazetteer JSON 경로 (비우면 apps/tools/data/war_gazetteer.json)
+WAR_GAZETTEER_PATH = os.getenv('WAR_GAZETTEER_PATH', '')
+
+# Knowledge Base 답변 캐시 (정규화 질문 정확 일치)
+KB_ANSWER_CACHE_ENABLED = os.getenv('KB_ANSWER_CACHE_ENABLED', 'true').lower() in ('true', '1', 'yes')
+KB_ANSWER_CACHE_MAX_SIZE = int(os.getenv('KB_ANSWER_CACHE_MAX_SIZE', 1000))
+KB_ANSWER_CACHE_TTL = int(os.getenv('KB_ANSWER_CACHE_TTL', 86400))
+# near-match (해싱 n-gram 코사인 유사도 + 숫자/고유명 일치) - 철자 유사도라 기본 끔
+KB_ANSWER_CACHE_NEAR_MATCH = os.getenv('KB_ANSWER_CACHE_NEAR_MATCH', 'false').lower() in ('true', '1', 'yes')
+KB_ANSWER_CACHE_SIMILARITY = float(os.getenv('KB_ANSWER_CACHE_SIMILARITY', 0.95))
+KB_ANSWER_CACHE_REDIS = os.getenv('KB_ANSWER_CACHE_REDIS', 'true').lower() in ('true', '1', 'yes')
+KB_ANSWER_CACHE_REPLAY_CHUNK_CHARS = int(os.getenv('KB_ANSWER_CACHE_REPLAY_CHUNK_CHARS', 200))
+
+# Knowledge Base 호출 방식: retrieve_and_generate (기본) | retrieve_then_generate (검색/생성 분리 + 검색 캐시)
+KB_MODE = os.getenv('KB_MODE', 'retrieve_and_generate')
+KB_RETRIEVAL_RESULTS = int(os.getenv('KB_RETRIEVAL_RESULTS', 5))
+# 분리 모드 생성 모델 (비우면 KB 요청의 모델 ARN)
+KB_GENERATION_MODEL_ID = os.getenv('KB_GENERATION_MODEL_ID', '')
+KB_GENERATION_MAX_TOKENS = int(os.getenv('KB_GENERATION_MAX_TOKENS', 2048))
+KB_RETRIEVAL_CACHE_MAX_SIZE = int(os.getenv('KB_RETRIEVAL_CACHE_MAX_SIZE', 2000))
+KB_RETRIEVAL_CACHE_TTL = int(os.getenv('KB_RETRIEVAL_CACHE_TTL', 3600))
+# 검색 캐시 near-match (숫자/고유명 일치 + 유사도) - 기본 끔, 정확 일치만
+KB_RETRIEVAL_CACHE_NEAR_MATCH = os.getenv('KB_RETRIEVAL_CACHE_NEAR_MATCH', 'false').lower() in ('true', '1', 'yes')
+KB_RETRIEVAL_CACHE_SIMILARITY = float(os.getenv('KB_RETRIEVAL_CACHE_SIMILARITY', 0.95))
+KB_RETRIEVAL_CACHE_REDIS = os.getenv('KB_RETRIEVAL_CACHE_REDIS', 'true').lower() in ('true', '1', 'yes')
+
+# 다중 KB 팬아웃 (쉼표 구분 KB ID, 둘 이상이면 동시 검색 -> 병합/재정렬 -> 한 번 생성)
+KB_FANOUT_IDS = [kb_id.strip() for kb_id in os.getenv('KB_FANOUT_IDS', '').split(',') if kb_id.strip()]
+KB_FANOUT_TIMEOUT = float(os.getenv('KB_FANOUT_TIMEOUT', 3.0))
+KB_FANOUT_TOP_K = int(os.getenv('KB_FANOUT_TOP_K', 8))
+KB_FANOUT_LEXICAL_WEIGHT = float(os.getenv('KB_FANOUT_LEXICAL_WEIGHT', 0.3))
+KB_FANOUT_WORKERS = int(os.getenv('KB_FANOUT_WORKERS', 16))
+
+# KB 인용 압축 (도착 즉시 전송 + 출처/청크 중복 제거 + 발췌, 원문은 /api/knowledge/citations/<id>)
+# 요청별로 ?citations=compact|full 또는 X-Citations 헤더로 고르며, 이 값은 둘 다 없을 때의 기본 형식
+KB_CITATIONS_COMPACT = os.getenv('KB_CITATIONS_COMPACT', 'false').lower() in ('true', '1', 'yes')
+KB_CITATION_EXCERPT_CHARS = int(os.getenv('KB_CITATION_EXCERPT_CHARS', 200))
+KB_CITATION_STORE_MAX_SIZE = int(os.getenv('KB_CITATION_STORE_MAX_SIZE', 5000))
+KB_CITATION_STORE_TTL = int(os.getenv('KB_CITATION_STORE_TTL', 86400))
+KB_CITATION_STORE_REDIS = os.getenv('KB_CITATION_STORE_REDIS', 'true').lower() in ('true', '1', 'yes')
+
+# 운영용 엔드포인트(/metrics) 접근 - 이 네트워크에서 직접 접속했거나 X-Internal-Token이 일치할 때만
+INTERNAL_NETWORKS = [
+    network.strip() for network in os.getenv('INTERNAL_NETWORKS', '127.0.0.1/32,::1/128').split(',') if network.strip()
+]
+INTERNAL_API_TOKEN = os.getenv('INTERNAL_API_TOKEN', '')
+
 # CORS
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
+# 인용 형식 선택(X-Citations), 끊긴 SSE 재개(Last-Event-ID) 헤더
+CORS_ALLOW_HEADERS = (*default_headers, 'x-citations', 'last-event-id')
 
 # Static files
 STATIC_URL = 'static/'
@@ -1,3 +1,5 @@
+import logging
+
 from django.urls import path, include, re_path
 from django.http import JsonResponse
 from datetime import datetime
@@ -5,6 +7,19 @@ from datetime import datetime
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 from apps.prompt import views as prompt_views
 from apps.knowledge import views as knowledge_views
+from apps.knowledge.answer_cache import get_answer_cache
+from apps.knowledge.citations import get_reference_store
+from apps.knowledge.retrieval import fanout_stats, get_retrieval_cache
+from apps.prompt.history_writer import get_history_writer
+from apps.prompt.person_cache import get_person_cache
+from apps.router.intent_cache import get_intent_cache
+from apps.router.prerouter import get_pre_router
+from apps.router import speculative as speculative_kb
+from common.bedrock.clients import BedrockClients
+from common.bedrock.prompt_cache import get_prompt_cache
+from common.decorators import internal_only
+
+logger = logging.getLogger(__name__)
 
 def root_view(request):
     return JsonResponse({
@@ -20,9 +35,45 @@ def health_check(request):
         "timestamp": datetime.utcnow().isoformat()
     })
 
+METRICS_SOURCES = {
+    "bedrock_pools": BedrockClients.pool_stats,
+    "prompt_cache": lambda: get_prompt_cache().stats(),
+    "history_writer": lambda: get_history_writer().stats(),
+    "aiperson_cache": lambda: get_person_cache().stats(),
+    "pre_router": lambda: get_pre_router().stats(),
+    "intent_cache": lambda: get_intent_cache().stats(),
+    "kb_answer_cache": lambda: get_answer_cache().stats(),
+    "kb_retrieval_cache": lambda: get_retrieval_cache().stats(),
+    "kb_citation_store": lambda: get_reference_store().stats(),
+    "kb_fanout": fanout_stats,
+    "speculative_kb": speculative_kb.stats,
+}
+
+
+def collect_metrics() -> dict:
+    """항목별로 수집 (한 항목이 실패해도 나머지는 응답)"""
+    metrics = {}
+    for name, source in METRICS_SOURCES.items():
+        try:
+            metrics[name] = source()
+        except Exception as e:
+            logger.warning(f"metrics 수집 실패 ({name}): {str(e)}")
+            metrics[name] = {"error": str(e)}
+    return metrics
+
+
+@internal_only
+def metrics_view(request):
+    """커넥션 풀/캐시 사용 현황 (용량 산정용, 내부망/토큰 전용)"""
+    return JsonResponse({
+        **collect_metrics(),
+        "timestamp": datetime.utcnow().isoformat()
+    })
+
 urlpatterns = [
     path('', root_view),
     path('health', health_check),
+    path('metrics', metrics_view),
 
     path('api/', include('apps.prompt.urls')),  # /api/character/... 매칭
     path('api/agent-chat', include('apps.router.urls')),
@@ -31,6 +82,7 @@ urlpatterns = [
     # === TTS ===
     path('api/prompt/speak/', prompt_views.tts_view, name='tts_view'),
     path('api/knowledge/speak/', knowledge_views.chatbot_tts_view, name='chatbot_tts_view'),
+    path('api/knowledge/citations/<str:reference_id>', knowledge_views.citation_view, name='kb_citation'),
 
     
     # === Swagger ===
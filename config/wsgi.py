@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# AIPerson 캐시 preload (실패해도 첫 조회 때 다시 적재)
+from apps.prompt.person_cache import preload_in_background  # noqa: E402
+
+preload_in_background()